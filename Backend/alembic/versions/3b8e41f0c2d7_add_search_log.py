@@ -0,0 +1,41 @@
+"""Add search_log table
+
+Revision ID: 3b8e41f0c2d7
+Revises: e5a7d16caa89
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e41f0c2d7'
+down_revision: Union[str, Sequence[str], None] = 'e5a7d16caa89'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'search_log',
+        sa.Column('search_log_id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('query', sa.String(length=255), nullable=False),
+        sa.Column('filters', sa.JSON(), nullable=True),
+        sa.Column('result_count', sa.Integer(), nullable=False),
+        sa.Column('latency_ms', sa.Float(), nullable=False),
+        sa.Column('searched_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('search_log_id')
+    )
+    op.create_index(op.f('ix_search_log_query'), 'search_log', ['query'], unique=False)
+    op.create_index(op.f('ix_search_log_searched_at'), 'search_log', ['searched_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_search_log_searched_at'), table_name='search_log')
+    op.drop_index(op.f('ix_search_log_query'), table_name='search_log')
+    op.drop_table('search_log')
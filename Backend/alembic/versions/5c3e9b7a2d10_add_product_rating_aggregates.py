@@ -0,0 +1,79 @@
+"""Add product rating aggregates
+
+Revision ID: 5c3e9b7a2d10
+Revises: a41f6b8d9e02
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from decimal import Decimal
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c3e9b7a2d10'
+down_revision: Union[str, Sequence[str], None] = 'a41f6b8d9e02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+STAR_COLUMNS = [f'rating_{star}' for star in range(1, 6)]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('product', sa.Column('rating_sum', sa.Numeric(10, 1), nullable=False, server_default='0'))
+    op.add_column('product', sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+    for column in STAR_COLUMNS:
+        op.add_column('product', sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill de agregados desde las reseñas existentes (medio punto cuenta en la estrella inferior)
+    product = sa.table(
+        'product',
+        sa.column('product_id', sa.Integer),
+        sa.column('rating_sum', sa.Numeric),
+        sa.column('rating_count', sa.Integer),
+        sa.column('average_rating', sa.Numeric),
+        *(sa.column(column, sa.Integer) for column in STAR_COLUMNS),
+    )
+    review = sa.table(
+        'review',
+        sa.column('review_id', sa.Integer),
+        sa.column('product_id', sa.Integer),
+        sa.column('rating', sa.Numeric),
+    )
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(review.c.product_id, review.c.rating, sa.func.count(review.c.review_id))
+        .group_by(review.c.product_id, review.c.rating)
+    ).all()
+
+    aggregates = {}
+    for product_id, rating, count in rows:
+        values = aggregates.setdefault(product_id, {
+            'pid': product_id, 'rating_sum': Decimal('0'), 'rating_count': 0,
+            **{column: 0 for column in STAR_COLUMNS},
+        })
+        star = min(5, max(1, int(float(rating))))
+        values['rating_sum'] += Decimal(str(rating)) * count
+        values['rating_count'] += count
+        values[f'rating_{star}'] += count
+
+    for values in aggregates.values():
+        values['average_rating'] = round(values['rating_sum'] / values['rating_count'], 1)
+
+    if aggregates:
+        conn.execute(
+            product.update().where(product.c.product_id == sa.bindparam('pid')),
+            list(aggregates.values())
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in reversed(STAR_COLUMNS):
+        op.drop_column('product', column)
+    op.drop_column('product', 'rating_count')
+    op.drop_column('product', 'rating_sum')
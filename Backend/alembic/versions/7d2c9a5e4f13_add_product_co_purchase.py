@@ -0,0 +1,48 @@
+"""Add product_co_purchase table and order co_purchase_processed flag
+
+Revision ID: 7d2c9a5e4f13
+Revises: 3b8e41f0c2d7
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2c9a5e4f13'
+down_revision: Union[str, Sequence[str], None] = '3b8e41f0c2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'product_co_purchase',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('related_product_id', sa.Integer(), nullable=False),
+        sa.Column('co_count', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['product.product_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['related_product_id'], ['product.product_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id', 'related_product_id')
+    )
+    op.create_index(
+        'ix_product_co_purchase_score', 'product_co_purchase',
+        ['product_id', sa.text('score DESC')]
+    )
+
+    # Las órdenes existentes quedan pendientes; el primer job nocturno las procesa
+    op.add_column('order', sa.Column('co_purchase_processed', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_index('ix_order_co_purchase_pending', 'order', ['order_status', 'co_purchase_processed'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_order_co_purchase_pending', table_name='order')
+    op.drop_column('order', 'co_purchase_processed')
+    op.drop_index('ix_product_co_purchase_score', table_name='product_co_purchase')
+    op.drop_table('product_co_purchase')
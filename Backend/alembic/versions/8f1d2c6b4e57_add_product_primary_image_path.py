@@ -0,0 +1,39 @@
+"""Add denormalized primary_image_path to product
+
+Revision ID: 8f1d2c6b4e57
+Revises: 5c3e9b7a2d10
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f1d2c6b4e57'
+down_revision: Union[str, Sequence[str], None] = '5c3e9b7a2d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('product', sa.Column('primary_image_path', sa.String(length=500), nullable=True))
+
+    # Backfill: imagen principal o, si no hay, la primera subida
+    op.execute("""
+        UPDATE product SET primary_image_path = (
+            SELECT pi.image_path
+            FROM product_image pi
+            WHERE pi.product_id = product.product_id
+            ORDER BY pi.is_primary DESC, pi.image_id
+            LIMIT 1
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('product', 'primary_image_path')
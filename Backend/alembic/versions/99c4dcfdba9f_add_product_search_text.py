@@ -0,0 +1,57 @@
+"""Add normalized search_text to product
+
+Revision ID: 99c4dcfdba9f
+Revises: c8f9e7d2a1b3
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.text import build_search_text
+
+
+# revision identifiers, used by Alembic.
+revision: str = '99c4dcfdba9f'
+down_revision: Union[str, Sequence[str], None] = 'c8f9e7d2a1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('product', sa.Column('search_text', sa.Text(), nullable=True))
+
+    # Backfill: normaliza el texto de los productos existentes
+    product = sa.table(
+        'product',
+        sa.column('product_id', sa.Integer),
+        sa.column('name', sa.String),
+        sa.column('description', sa.Text),
+        sa.column('brand', sa.String),
+        sa.column('category', sa.String),
+        sa.column('search_text', sa.Text),
+    )
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(
+        product.c.product_id, product.c.name, product.c.description,
+        product.c.brand, product.c.category
+    )).all()
+    if rows:
+        conn.execute(
+            product.update().where(product.c.product_id == sa.bindparam('pid')),
+            [
+                {
+                    'pid': row.product_id,
+                    'search_text': build_search_text(row.name, row.description, row.brand, row.category),
+                }
+                for row in rows
+            ]
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('product', 'search_text')
@@ -0,0 +1,31 @@
+"""Add review (product_id, date_created) index
+
+Revision ID: a41f6b8d9e02
+Revises: 7d2c9a5e4f13
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f6b8d9e02'
+down_revision: Union[str, Sequence[str], None] = '7d2c9a5e4f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_review_product_date', 'review',
+        ['product_id', sa.text('date_created DESC'), sa.text('review_id DESC')]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_review_product_date', table_name='review')
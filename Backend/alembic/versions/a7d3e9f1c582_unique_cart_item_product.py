@@ -0,0 +1,42 @@
+"""Unique cart_item per (cart_id, product_id)
+
+Revision ID: a7d3e9f1c582
+Revises: f2c8a5d9e641
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e9f1c582'
+down_revision: Union[str, Sequence[str], None] = 'f2c8a5d9e641'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fusiona las líneas repetidas (suma cantidades en la más antigua) antes de la restricción
+    op.execute(
+        "UPDATE cart_item SET quantity = ("
+        " SELECT SUM(dup.quantity) FROM cart_item dup"
+        " WHERE dup.cart_id = cart_item.cart_id AND dup.product_id = cart_item.product_id"
+        ") WHERE cart_item_id IN ("
+        " SELECT MIN(cart_item_id) FROM cart_item GROUP BY cart_id, product_id HAVING COUNT(*) > 1"
+        ")"
+    )
+    op.execute(
+        "DELETE FROM cart_item WHERE cart_item_id NOT IN ("
+        " SELECT MIN(cart_item_id) FROM cart_item GROUP BY cart_id, product_id"
+        ")"
+    )
+    op.create_unique_constraint('uq_cart_item_cart_product', 'cart_item', ['cart_id', 'product_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_cart_item_cart_product', 'cart_item', type_='unique')
@@ -0,0 +1,31 @@
+"""Add supplier sku to product
+
+Revision ID: b27d4e9c1f83
+Revises: 8f1d2c6b4e57
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b27d4e9c1f83'
+down_revision: Union[str, Sequence[str], None] = '8f1d2c6b4e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('product', sa.Column('sku', sa.String(length=64), nullable=True))
+    # Índice único: destino del ON CONFLICT de la importación masiva (admite varios NULL)
+    op.create_index(op.f('ix_product_sku'), 'product', ['sku'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_product_sku'), table_name='product')
+    op.drop_column('product', 'sku')
@@ -0,0 +1,30 @@
+"""Add updated_at indexes for abandoned cart cleanup
+
+Revision ID: b3e8f5c2d917
+Revises: a7d3e9f1c582
+Create Date: 2026-10-19 23:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8f5c2d917'
+down_revision: Union[str, Sequence[str], None] = 'a7d3e9f1c582'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_shopping_cart_updated_at', 'shopping_cart', ['updated_at'], unique=False)
+    op.create_index('ix_cart_item_cart_updated', 'cart_item', ['cart_id', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cart_item_cart_updated', table_name='cart_item')
+    op.drop_index('ix_shopping_cart_updated_at', table_name='shopping_cart')
@@ -0,0 +1,49 @@
+"""Add inventory reservations and product reserved_stock
+
+Revision ID: d6a3f8e2b514
+Revises: b27d4e9c1f83
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6a3f8e2b514'
+down_revision: Union[str, Sequence[str], None] = 'b27d4e9c1f83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('product', sa.Column('reserved_stock', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table(
+        'inventory_reservation',
+        sa.Column('reservation_id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('reference', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.user_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['product.product_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('reservation_id')
+    )
+    op.create_index(op.f('ix_inventory_reservation_user_id'), 'inventory_reservation', ['user_id'], unique=False)
+    op.create_index(op.f('ix_inventory_reservation_expires_at'), 'inventory_reservation', ['expires_at'], unique=False)
+    op.create_index('ix_inventory_reservation_product', 'inventory_reservation', ['product_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inventory_reservation_product', table_name='inventory_reservation')
+    op.drop_index(op.f('ix_inventory_reservation_expires_at'), table_name='inventory_reservation')
+    op.drop_index(op.f('ix_inventory_reservation_user_id'), table_name='inventory_reservation')
+    op.drop_table('inventory_reservation')
+    op.drop_column('product', 'reserved_stock')
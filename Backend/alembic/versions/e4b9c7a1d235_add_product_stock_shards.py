@@ -0,0 +1,38 @@
+"""Add product stock shards for hot SKUs
+
+Revision ID: e4b9c7a1d235
+Revises: d6a3f8e2b514
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9c7a1d235'
+down_revision: Union[str, Sequence[str], None] = 'd6a3f8e2b514'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('product', sa.Column('stock_shards', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table(
+        'product_stock_shard',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('shard_no', sa.Integer(), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['product.product_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id', 'shard_no')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('product_stock_shard')
+    op.drop_column('product', 'stock_shards')
@@ -0,0 +1,51 @@
+"""Add product sales_count and search sort indexes
+
+Revision ID: e5a7d16caa89
+Revises: 99c4dcfdba9f
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7d16caa89'
+down_revision: Union[str, Sequence[str], None] = '99c4dcfdba9f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('product', sa.Column('sales_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_index('ix_product_active_price', 'product', ['is_active', 'price', 'product_id'])
+    op.create_index('ix_product_active_sales', 'product', ['is_active', sa.text('sales_count DESC'), 'product_id'])
+    op.create_index('ix_product_active_created', 'product', ['is_active', sa.text('created_at DESC'), 'product_id'])
+    op.create_index(
+        'ix_product_active_rating', 'product',
+        ['is_active', sa.text('average_rating DESC NULLS LAST'), 'product_id']
+    )
+
+    # Backfill de unidades vendidas (excluye órdenes canceladas)
+    op.execute("""
+        UPDATE product SET sales_count = COALESCE((
+            SELECT SUM(oi.quantity)
+            FROM order_item oi
+            JOIN "order" o ON o.order_id = oi.order_id
+            WHERE oi.product_id = product.product_id
+              AND o.order_status != 'CANCELLED'
+        ), 0)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_product_active_rating', table_name='product')
+    op.drop_index('ix_product_active_created', table_name='product')
+    op.drop_index('ix_product_active_sales', table_name='product')
+    op.drop_index('ix_product_active_price', table_name='product')
+    op.drop_column('product', 'sales_count')
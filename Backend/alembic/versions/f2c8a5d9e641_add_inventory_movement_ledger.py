@@ -0,0 +1,66 @@
+"""Add inventory movement ledger and low stock set
+
+Revision ID: f2c8a5d9e641
+Revises: e4b9c7a1d235
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8a5d9e641'
+down_revision: Union[str, Sequence[str], None] = 'e4b9c7a1d235'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Umbral de la carga inicial (LOW_STOCK_THRESHOLD al crear la revisión). Si la configuración
+# usa otro valor, el job rebuild_low_stock_daily recalcula el conjunto al arrancar
+LOW_STOCK_THRESHOLD = 10
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'inventory_movement',
+        sa.Column('movement_id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('quantity_change', sa.Integer(), nullable=False),
+        sa.Column('reason', sa.Enum('sale', 'cancellation', 'subscription', 'adjustment', 'import', name='inventorymovementreason', native_enum=False), nullable=False),
+        sa.Column('stock_after', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        # Sin llave foránea a product: el historial sobrevive al borrado del producto
+        sa.ForeignKeyConstraint(['order_id'], ['order.order_id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('movement_id')
+    )
+    op.create_index('ix_inventory_movement_product_created', 'inventory_movement', ['product_id', 'created_at'], unique=False)
+
+    op.create_table(
+        'low_stock_product',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('stock', sa.Integer(), nullable=False),
+        sa.Column('flagged_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['product.product_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_index(op.f('ix_low_stock_product_stock'), 'low_stock_product', ['stock'], unique=False)
+
+    # Carga inicial del conjunto con los productos que ya están bajo el umbral
+    op.execute(
+        sa.text(
+            "INSERT INTO low_stock_product (product_id, stock, flagged_at) "
+            "SELECT product_id, stock, CURRENT_TIMESTAMP FROM product WHERE stock < :threshold"
+        ).bindparams(threshold=LOW_STOCK_THRESHOLD)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_low_stock_product_stock'), table_name='low_stock_product')
+    op.drop_table('low_stock_product')
+    op.drop_index('ix_inventory_movement_product_created', table_name='inventory_movement')
+    op.drop_table('inventory_movement')
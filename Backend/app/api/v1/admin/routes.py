@@ -4,9 +4,10 @@
 #              para crear, actualizar y eliminar productos, así como operaciones en lote.
 #              Todos los endpoints requieren permisos de administrador.
 
-from fastapi import APIRouter, Depends, Query, status, Form, UploadFile, File, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, status, Form, UploadFile, File, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
 import json
 
 from app.api.deps import get_db, require_admin, get_current_user
@@ -14,7 +15,12 @@ from app.api.v1.admin import schemas
 from app.api.v1.admin.service import AdminProductService, AdminUserService
 from app.api.v1.products import schemas as product_schemas
 from app.api.v1.products.service import ProductService
+from app.models.product import Product
 from app.models.user import User
+from app.services.image_uploads import owns_upload_key, process_product_upload, product_upload_prefix
+from app.services.inventory import set_stock_shards
+from app.services.product_import import detect_import_format, import_jobs, run_import, spool_upload
+from app.services.s3_service import S3Service
 
 router = APIRouter()
 
@@ -32,15 +38,20 @@ async def create_product(
     nutritional_value: str = Form(...),
     price: float = Form(..., gt=0),
     stock: int = Form(..., ge=0),
-    images: List[UploadFile] = File(..., description="Al menos 1 imagen es requerida"),
+    images: Optional[List[UploadFile]] = File(
+        None, description="Opcional: sin imágenes se suben después con /images/upload-url"
+    ),
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """
     Autor: Luis Flores
-    Descripción: Crea un nuevo producto con sus imágenes. Este endpoint usa multipart/form-data
-                 para permitir la carga de archivos. Valida formatos de imagen y tamaños,
-                 sube las imágenes a S3 y registra el producto en la base de datos.
+    Descripción: Crea un nuevo producto y, opcionalmente, sus imágenes. Este endpoint usa
+                 multipart/form-data para permitir la carga de archivos. Valida formatos de
+                 imagen y tamaños, genera variantes WebP (thumb, medium, large) de todas las
+                 imágenes en paralelo, las sube a S3 y registra el producto en la base de datos.
+                 Para no pasar los archivos por la API, el cliente puede crear el producto sin
+                 imágenes y subirlas directo a S3 con /products/{product_id}/images/upload-url.
     Parámetros:
         name (str): Nombre del producto.
         description (str): Descripción detallada.
@@ -51,25 +62,16 @@ async def create_product(
         nutritional_value (str): Información nutricional.
         price (float): Precio del producto (mayor a 0).
         stock (int): Cantidad en inventario (mayor o igual a 0).
-        images (List[UploadFile]): Lista de imágenes del producto (mínimo 1).
+        images (List[UploadFile], opcional): Imágenes del producto (la primera es la principal).
         current_user (User): Usuario administrador autenticado.
         db (Session): Sesión de base de datos.
     Retorna:
         ProductResponse: Producto creado con todas sus relaciones.
     Excepciones:
-        HTTPException 400: Si no se proporciona al menos 1 imagen o hay errores en los datos.
+        HTTPException 400: Si ninguna de las imágenes enviadas se pudo subir o hay errores en los datos.
     """
-    from app.services.s3_service import S3Service
-    from app.models.product import Product
     from app.models.product_image import ProductImage
     
-    # Validar que hay al menos 1 imagen
-    if not images or len(images) == 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Debes subir al menos 1 imagen del producto"
-        )
-    
     # Función helper para parsear arrays
     def parse_array_field(value: str, field_name: str) -> list:
         """
@@ -134,36 +136,35 @@ async def create_product(
     db.add(new_product)
     db.flush()  # Para obtener el product_id sin hacer commit aún
     
-    # Subir imágenes a S3
+    # Sin imágenes: el cliente las sube después directo a S3
+    if not images:
+        db.commit()
+        db.refresh(new_product)
+        return new_product
+    
+    # Procesar y subir imágenes a S3 (variantes WebP en paralelo, fuera del event loop)
     s3_service = S3Service()
     uploaded_count = 0
     errors = []
     
-    for idx, image_file in enumerate(images):
-        try:
-            # Leer la imagen
-            image_bytes = await image_file.read()
-            
-            # Subir a S3
-            result = await s3_service.upload_product_img(
-                file_content=image_bytes,
-                product_id=str(new_product.product_id)
+    images_content = [await image_file.read() for image_file in images]
+    results = await s3_service.upload_product_images(
+        images_content,
+        product_id=str(new_product.product_id)
+    )
+    
+    for idx, result in enumerate(results):
+        if result["success"]:
+            # Guardar en la BD; la primera imagen subida es la principal
+            db_image = ProductImage(
+                product_id=new_product.product_id,
+                image_path=result["file_url"],
+                is_primary=(uploaded_count == 0)
             )
-            
-            if result["success"]:
-                # Guardar en la BD
-                db_image = ProductImage(
-                    product_id=new_product.product_id,
-                    image_path=result["file_url"],
-                    is_primary=(idx == 0)  # La primera imagen es primary
-                )
-                db.add(db_image)
-                uploaded_count += 1
-            else:
-                errors.append(f"Imagen {idx + 1}: {result['error']}")
-        
-        except Exception as e:
-            errors.append(f"Imagen {idx + 1}: Error - {str(e)}")
+            db.add(db_image)
+            uploaded_count += 1
+        else:
+            errors.append(f"Imagen {idx + 1}: {result['error']}")
     
     # Si ninguna imagen se subió, revertir la creación del producto
     if uploaded_count == 0:
@@ -183,6 +184,167 @@ async def create_product(
     return new_product
 
 
+@router.post("/products/import", response_model=schemas.ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def import_products(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(..., description="Archivo .csv (con encabezado) o .jsonl (un producto por línea)"),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Autor: Luis Flores
+    Descripción: Inicia una importación masiva de productos. Cada fila se identifica por su
+                 SKU: si ya existe el producto se actualiza, si no se crea. La importación
+                 corre en segundo plano; el progreso y los errores por fila se consultan en
+                 /products/import/{job_id}.
+    Parámetros:
+        background_tasks (BackgroundTasks): Tareas a ejecutar después de responder.
+        file (UploadFile): Archivo CSV o JSONL. Columnas: sku, name, description, brand,
+            category, physical_activities, fitness_objectives, nutritional_value, price,
+            stock, is_active.
+        current_user (User): Usuario administrador autenticado.
+    Retorna:
+        ImportJobResponse: Job creado (estado pending).
+    Excepciones:
+        HTTPException 400: Si el formato del archivo no es soportado.
+    """
+    try:
+        file_format = detect_import_format(file.filename, file.content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    path = await run_in_threadpool(spool_upload, file.file)
+    job = import_jobs.create(file.filename, file_format)
+    background_tasks.add_task(run_import, job, path)
+    return job.snapshot()
+
+
+@router.get("/products/import/{job_id}", response_model=schemas.ImportJobResponse)
+def get_import_job(
+    job_id: str,
+    current_user: User = Depends(require_admin)
+):
+    """
+    Autor: Luis Flores
+    Descripción: Consulta el progreso de una importación masiva.
+    Parámetros:
+        job_id (str): ID del job.
+        current_user (User): Usuario administrador autenticado.
+    Retorna:
+        ImportJobResponse: Estado, contadores y errores por fila.
+    Excepciones:
+        HTTPException 404: Si el job no existe (o ya se descartó).
+    """
+    job = import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Importación no encontrada")
+    return job.snapshot()
+
+
+def _get_product_or_404(db: Session, product_id: int) -> Product:
+    product = db.get(Product, product_id)
+    if product is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Producto no encontrado")
+    return product
+
+
+@router.post("/products/{product_id}/images/upload-url", response_model=product_schemas.PresignedUploadResponse)
+def create_product_image_upload_url(
+    product_id: int,
+    upload_data: product_schemas.ImageUploadRequest,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Autor: Luis Flores
+    Descripción: Genera una política POST prefirmada para subir una imagen de producto directo
+                 a S3, sin que el archivo pase por la API. Después de subirla, el cliente debe
+                 confirmarla en /products/{product_id}/images/complete.
+    Parámetros:
+        product_id (int): ID del producto.
+        upload_data (ImageUploadRequest): Tipo de contenido de la imagen.
+        current_user (User): Usuario administrador autenticado.
+        db (Session): Sesión de base de datos.
+    Retorna:
+        PresignedUploadResponse: URL, campos del formulario y llave asignada.
+    Excepciones:
+        HTTPException 404: Si el producto no existe.
+        HTTPException 400: Si el tipo de contenido no está permitido.
+    """
+    _get_product_or_404(db, product_id)
+    try:
+        return S3Service().create_presigned_upload(product_upload_prefix(product_id), upload_data.content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.post(
+    "/products/{product_id}/images/complete",
+    response_model=product_schemas.ImageUploadAccepted,
+    status_code=status.HTTP_202_ACCEPTED
+)
+def complete_product_image_upload(
+    product_id: int,
+    upload_data: product_schemas.ImageUploadComplete,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Autor: Luis Flores
+    Descripción: Confirma una subida directa a S3. Las variantes se generan en segundo plano y
+                 la imagen se agrega al producto al terminar.
+    Parámetros:
+        product_id (int): ID del producto.
+        upload_data (ImageUploadComplete): Llave subida y si es la imagen principal.
+        background_tasks (BackgroundTasks): Tareas a ejecutar después de responder.
+        current_user (User): Usuario administrador autenticado.
+        db (Session): Sesión de base de datos.
+    Retorna:
+        ImageUploadAccepted: Llave aceptada para procesamiento.
+    Excepciones:
+        HTTPException 404: Si el producto o el archivo subido no existen.
+        HTTPException 400: Si la llave no corresponde al producto.
+    """
+    _get_product_or_404(db, product_id)
+    if not owns_upload_key(upload_data.key, product_upload_prefix(product_id)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La llave no corresponde al producto")
+    if not S3Service().object_exists(upload_data.key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No se encontró el archivo subido")
+
+    background_tasks.add_task(process_product_upload, upload_data.key, product_id, upload_data.is_primary)
+    return {"key": upload_data.key}
+
+
+@router.put("/products/{product_id}/stock-shards", response_model=schemas.StockShardsResponse)
+def update_stock_shards(
+    product_id: int,
+    shard_data: schemas.StockShardsUpdate,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Autor: Luis Flores
+    Descripción: Activa, cambia o desactiva el stock fragmentado de un producto de alta
+                 demanda (ventas relámpago): el stock se reparte en N filas y las compras
+                 concurrentes descuentan de fragmentos distintos en lugar de esperar el
+                 bloqueo de una sola fila.
+    Parámetros:
+        product_id (int): ID del producto.
+        shard_data (StockShardsUpdate): Número de fragmentos (0 desactiva).
+        current_user (User): Usuario administrador autenticado.
+        db (Session): Sesión de base de datos.
+    Retorna:
+        StockShardsResponse: Fragmentos y stock disponible del producto.
+    Excepciones:
+        HTTPException 404: Si el producto no existe.
+    """
+    product = set_stock_shards(db, product_id, shard_data.shards)
+    if product is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Producto no encontrado")
+    db.commit()
+    return product
+
+
 @router.put("/products/{product_id}", response_model=product_schemas.ProductResponse)
 def update_product(
     product_id: int,
@@ -245,9 +407,10 @@ def bulk_product_action(
     """
     Autor: Luis Flores
     Descripción: Realiza operaciones en lote sobre múltiples productos.
-                 Acciones disponibles: activar, desactivar o eliminar productos.
+                 Acciones disponibles: activar, desactivar, eliminar productos o ajustar
+                 precio y stock (absoluto o porcentaje).
     Parámetros:
-        action_data (BulkProductAction): IDs de productos y acción a realizar.
+        action_data (BulkProductAction): IDs de productos, acción a realizar y ajustes.
         current_user (User): Usuario administrador autenticado.
         db (Session): Sesión de base de datos.
     Retorna:
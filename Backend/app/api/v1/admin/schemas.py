@@ -3,25 +3,77 @@
 # Descripción: Schemas de validación y serialización para el módulo de administración.
 #              Define las estructuras de datos para operaciones administrativas en lote.
 
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import List, Literal, Optional
 from datetime import date, datetime
+from decimal import Decimal
+import json
+
+from app.config import settings
 
 
 # ============ GESTIÓN DE PRODUCTOS ============
 
+class PriceAdjustment(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Ajuste de precio en lote: valor absoluto ("set") o porcentaje ("percent",
+                 p. ej. 10 sube 10% y -15 baja 15%; el resultado se redondea a centavos).
+    """
+    mode: Literal["set", "percent"] = Field(..., description="'set' o 'percent'")
+    value: Decimal = Field(..., max_digits=10, decimal_places=2)
+
+    @model_validator(mode="after")
+    def check_value(self):
+        if self.mode == "set" and self.value <= 0:
+            raise ValueError("El precio debe ser mayor a 0")
+        if self.mode == "percent" and self.value <= -100:
+            raise ValueError("El porcentaje debe ser mayor a -100")
+        return self
+
+
+class StockAdjustment(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Ajuste de stock en lote: valor absoluto ("set"), suma o resta ("add") o
+                 porcentaje ("percent", redondeado a unidades). El stock nunca queda negativo.
+    """
+    mode: Literal["set", "add", "percent"] = Field(..., description="'set', 'add' o 'percent'")
+    value: Decimal = Field(..., max_digits=10, decimal_places=2)
+
+    @model_validator(mode="after")
+    def check_value(self):
+        if self.mode in ("set", "add") and self.value != self.value.to_integral_value():
+            raise ValueError("El stock debe ser un número entero")
+        if self.mode == "set" and self.value < 0:
+            raise ValueError("El stock debe ser mayor o igual a 0")
+        return self
+
+
 class BulkProductAction(BaseModel):
     """
     Autor: Luis Flores
     Descripción: Schema para realizar acciones en lote sobre múltiples productos.
-                 Permite activar, desactivar o eliminar varios productos simultáneamente.
+                 Permite activar, desactivar o eliminar varios productos simultáneamente, y
+                 ajustar precio y stock (solos con 'update' o junto con activar/desactivar).
     """
     product_ids: List[int] = Field(..., description="Lista de IDs de productos a procesar")
     action: str = Field(
         ..., 
-        pattern="^(activate|deactivate|delete)$",
-        description="Acción a realizar: 'activate', 'deactivate' o 'delete'"
+        pattern="^(activate|deactivate|delete|update)$",
+        description="Acción a realizar: 'activate', 'deactivate', 'delete' o 'update'"
     )
+    price: Optional[PriceAdjustment] = Field(None, description="Ajuste de precio")
+    stock: Optional[StockAdjustment] = Field(None, description="Ajuste de stock")
+
+    @model_validator(mode="after")
+    def check_adjustments(self):
+        has_adjustments = self.price is not None or self.stock is not None
+        if self.action == "delete" and has_adjustments:
+            raise ValueError("La acción 'delete' no admite ajustes de precio o stock")
+        if self.action == "update" and not has_adjustments:
+            raise ValueError("La acción 'update' requiere un ajuste de precio o stock")
+        return self
 
 
 class BulkActionResponse(BaseModel):
@@ -38,6 +90,118 @@ class BulkActionResponse(BaseModel):
     )
 
 
+
+# ============ IMPORTACIÓN MASIVA ============
+
+class ProductImportRow(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Schema de validación de una fila de la importación masiva de productos.
+                 El SKU identifica al producto: si ya existe se actualiza, si no se crea.
+                 Los campos de lista aceptan un JSON array o valores separados por comas.
+                 Los campos opcionales omitidos (o con celda vacía) quedan en None: el
+                 producto existente conserva su valor y uno nuevo toma el valor por defecto.
+    """
+    sku: str = Field(..., min_length=1, max_length=64, description="SKU del proveedor")
+    name: str = Field(..., min_length=1, max_length=255)
+    description: Optional[str] = None
+    brand: str = Field(..., min_length=1, max_length=100)
+    category: str = Field(..., min_length=1, max_length=100)
+    physical_activities: Optional[List[str]] = None
+    fitness_objectives: Optional[List[str]] = None
+    nutritional_value: Optional[str] = None
+    price: Decimal = Field(..., gt=0, max_digits=10, decimal_places=2)
+    stock: Optional[int] = Field(default=None, ge=0)
+    is_active: Optional[bool] = None
+
+    @field_validator("sku", "name", "brand", "category", mode="before")
+    @classmethod
+    def strip_text(cls, value):
+        return value.strip() if isinstance(value, str) else value
+
+    @field_validator("description", "nutritional_value", "stock", "is_active", mode="before")
+    @classmethod
+    def empty_as_none(cls, value):
+        # En CSV una celda vacía equivale a omitir la columna
+        if value == "":
+            return None
+        return value
+
+    @field_validator("physical_activities", "fitness_objectives", mode="before")
+    @classmethod
+    def parse_list(cls, value):
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                return None
+            if value.startswith("["):
+                try:
+                    value = json.loads(value)
+                except json.JSONDecodeError:
+                    raise ValueError("JSON inválido, ejemplo: [\"weightlifting\", \"crossfit\"]")
+            else:
+                return [item.strip() for item in value.split(",") if item.strip()]
+        return value
+
+
+class ImportRowError(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Error de una fila de la importación.
+    """
+    row: int = Field(..., description="Número de fila de datos (1 = primera fila después del encabezado)")
+    sku: Optional[str] = None
+    error: str
+
+
+class ImportJobResponse(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Estado y progreso de una importación masiva de productos.
+    """
+    job_id: str
+    filename: Optional[str] = None
+    file_format: str = Field(..., description="csv o jsonl")
+    status: str = Field(..., description="pending, running, completed o failed")
+    rows_processed: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = Field(default=[], description="Errores por fila (se guardan los primeros)")
+    errors_truncated: bool = False
+    detail: Optional[str] = Field(None, description="Motivo si la importación completa falló")
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class StockShardsUpdate(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Número de fragmentos de stock de un producto de alta demanda (0 desactiva).
+    """
+    shards: int = Field(..., ge=0, description="Fragmentos de stock (0 = stock en una sola fila)")
+
+    @field_validator("shards")
+    @classmethod
+    def check_max(cls, value: int) -> int:
+        if value > settings.INVENTORY_MAX_STOCK_SHARDS:
+            raise ValueError(f"El máximo es {settings.INVENTORY_MAX_STOCK_SHARDS} fragmentos")
+        return value
+
+
+class StockShardsResponse(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Estado del stock fragmentado de un producto.
+    """
+    product_id: int
+    stock_shards: int
+    stock: int
+
+    class Config:
+        from_attributes = True
+
+
 # ============ GESTIÓN DE ADMINISTRADORES ============
 
 class CreateAdminRequest(BaseModel):
@@ -3,17 +3,28 @@
 # Descripción: Servicios de lógica de negocio para operaciones administrativas.
 #              Implementa funcionalidades para gestión masiva de productos y administradores.
 
+from sqlalchemy import Integer, case, cast, delete, func, select, update
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Any, Dict, Optional, Set
+from decimal import Decimal
 from datetime import datetime, UTC, date
 import uuid
 
 from app.models.product import Product
+from app.models.order_item import OrderItem
 from app.models.user import User
-from app.models.enum import UserRole, AuthType, Gender
+from app.models.enum import UserRole, AuthType, Gender, InventoryMovementReason
 from app.core.security import hash_password
 from app.services.s3_service import S3Service
 from app.api.v1.admin import schemas
+from app.services.catalog_events import notify_catalog_change
+from app.services.inventory import (
+    adjust_shard_stock, lock_stock_shards, record_movements, redistribute_stock_shards,
+    sync_sharded_stock, track_low_stock
+)
+
+# IDs por sentencia en las operaciones en lote
+BULK_CHUNK_SIZE = 1000
 
 
 class AdminProductService:
@@ -24,6 +35,40 @@ class AdminProductService:
                  que requieren permisos de administrador.
     """
     
+    @staticmethod
+    def _adjustment_values(action_data: schemas.BulkProductAction) -> Dict[str, Any]:
+        """
+        Autor: Luis Flores
+        Descripción: Construye los valores del UPDATE en lote. Los ajustes relativos se
+                     expresan sobre la columna para aplicarse en la misma sentencia.
+        """
+        values: Dict[str, Any] = {}
+        if action_data.action in ("activate", "deactivate"):
+            values["is_active"] = action_data.action == "activate"
+
+        price = action_data.price
+        if price is not None:
+            if price.mode == "set":
+                values["price"] = price.value
+            else:
+                factor = 1 + price.value / 100
+                # Un porcentaje negativo nunca deja el precio en 0
+                new_price = func.round(Product.price * factor, 2)
+                values["price"] = case((new_price < Decimal("0.01"), Decimal("0.01")), else_=new_price)
+
+        stock = action_data.stock
+        if stock is not None:
+            if stock.mode == "set":
+                values["stock"] = int(stock.value)
+            else:
+                if stock.mode == "add":
+                    new_stock = Product.stock + int(stock.value)
+                else:
+                    new_stock = cast(func.round(Product.stock * (1 + stock.value / 100)), Integer)
+                values["stock"] = case((new_stock < 0, 0), else_=new_stock)
+
+        return values
+
     @staticmethod
     def bulk_update_products(
         db: Session,
@@ -31,48 +76,99 @@ class AdminProductService:
     ) -> schemas.BulkActionResponse:
         """
         Autor: Luis Flores
-        Descripción: Realiza operaciones en lote sobre múltiples productos.
-                     Procesa cada producto individualmente y registra éxitos y errores.
-                     Acciones soportadas: activate, deactivate, delete.
+        Descripción: Realiza operaciones en lote sobre múltiples productos con sentencias por
+                     conjunto: un UPDATE (o DELETE) ... WHERE product_id IN (...) RETURNING
+                     product_id por cada bloque de IDs. Los IDs que no regresa la sentencia
+                     son los inexistentes. Acciones soportadas: activate, deactivate, delete y
+                     update (ajustes de precio/stock, que también se pueden combinar con
+                     activate/deactivate). No se eliminan productos con órdenes.
         Parámetros:
             db (Session): Sesión de base de datos.
-            action_data (BulkProductAction): Contiene lista de product_ids y acción a realizar.
+            action_data (BulkProductAction): Contiene lista de product_ids, acción y ajustes.
         Retorna:
             BulkActionResponse: Objeto con contadores de success y failed, 
                                 más lista de mensajes de error.
         """
-        success = 0
-        failed = 0
+        product_ids = list(dict.fromkeys(action_data.product_ids))
+        processed: Set[int] = set()
+        blocked: Set[int] = set()
         errors = []
-        
-        for product_id in action_data.product_ids:
-            try:
-                product = db.query(Product).filter(
-                    Product.product_id == product_id
-                ).first()
-                
-                if not product:
-                    errors.append(f"Producto {product_id} no encontrado")
-                    failed += 1
-                    continue
-                
-                if action_data.action == "activate":
-                    product.is_active = True
-                elif action_data.action == "deactivate":
-                    product.is_active = False
-                elif action_data.action == "delete":
-                    db.delete(product)
-                
-                success += 1
-            except Exception as e:
-                errors.append(f"Error en producto {product_id}: {str(e)}")
-                failed += 1
-        
-        db.commit()
-        
+
+        values = AdminProductService._adjustment_values(action_data)
+
+        try:
+            for start in range(0, len(product_ids), BULK_CHUNK_SIZE):
+                chunk = product_ids[start:start + BULK_CHUNK_SIZE]
+
+                if action_data.action == "delete":
+                    # order_item es RESTRICT: esos productos solo pueden desactivarse
+                    with_orders = set(db.scalars(
+                        select(OrderItem.product_id).where(OrderItem.product_id.in_(chunk)).distinct()
+                    ))
+                    for product_id in chunk:
+                        if product_id in with_orders:
+                            blocked.add(product_id)
+                            errors.append(f"Producto {product_id} tiene órdenes asociadas; desactívalo en su lugar")
+                    chunk = [product_id for product_id in chunk if product_id not in with_orders]
+                    if not chunk:
+                        continue
+                    statement = delete(Product).where(Product.product_id.in_(chunk))
+                else:
+                    if action_data.stock is not None:
+                        # Productos fragmentados: bloquear sus fragmentos (las compras esperan)
+                        # y ajustar sobre su total actual
+                        shards = lock_stock_shards(db, chunk)
+                        sync_sharded_stock(db, shards)
+                        stock_before = dict(db.execute(
+                            select(Product.product_id, Product.stock).where(Product.product_id.in_(chunk))
+                        ).all())
+                    statement = update(Product).where(Product.product_id.in_(chunk)).values(**values)
+
+                rows = db.execute(
+                    statement.returning(Product.product_id, Product.stock),
+                    execution_options={"synchronize_session": "fetch"}
+                ).all()
+                if action_data.stock is not None:
+                    stock_after = dict(rows)
+                    record_movements(
+                        db,
+                        {pid: stock - stock_before[pid] for pid, stock in stock_after.items()},
+                        InventoryMovementReason.ADJUSTMENT,
+                        stock_after
+                    )
+                    track_low_stock(db, stock_after)
+                    if action_data.stock.mode == "set":
+                        redistribute_stock_shards(db, stock_after)
+                    else:
+                        adjust_shard_stock(
+                            db,
+                            {pid: stock_after[pid] - stock_before[pid] for pid in shards if pid in stock_after},
+                            shards
+                        )
+                processed.update(product_id for product_id, _ in rows)
+
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            return schemas.BulkActionResponse(
+                success=0,
+                failed=len(product_ids),
+                errors=[f"Error al procesar el lote: {str(e)}"]
+            )
+
+        # Las sentencias masivas no pasan por el flush: avisar a los caches del catálogo
+        if processed:
+            notify_catalog_change(processed)
+
+        errors.extend(
+            f"Producto {product_id} no encontrado"
+            for product_id in product_ids
+            if product_id not in processed and product_id not in blocked
+        )
+
         return schemas.BulkActionResponse(
-            success=success,
-            failed=failed,
+            success=len(processed),
+            failed=len(product_ids) - len(processed),
             errors=errors
         )
 
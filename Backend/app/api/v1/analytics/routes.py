@@ -71,6 +71,23 @@ def generate_product_report(
     return AnalyticsService.get_product_report(db, start_date, end_date)
 
 
+@router.get("/reports/search", response_model=schemas.SearchReport)
+def generate_search_report(
+    days: int = Query(30, ge=1, le=365, description="Días hacia atrás a considerar"),
+    limit: int = Query(20, ge=1, le=100, description="Máximo de queries por lista"),
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Autor: Luis Flores
+    Genera un reporte de búsquedas del catálogo.
+    
+    Incluye: total de búsquedas, latencia promedio, queries más frecuentes y
+    queries sin resultados (útil para detectar productos faltantes o sinónimos).
+    """
+    return AnalyticsService.get_search_report(db, days, limit)
+
+
 @router.get("/products/low-stock")
 def get_low_stock_products(
     threshold: int = Query(10, ge=1, le=100, description="Umbral de stock bajo"),
@@ -123,3 +123,21 @@ class SalesReport(BaseModel):
     end_date: datetime
     summary: Dict[str, Any]
     details: List[SalesReportItem]
+
+class SearchQueryStat(BaseModel):
+    """Estadística agregada de una query de búsqueda"""
+    query: str
+    searches: int
+    avg_results: float
+    avg_latency_ms: float
+    last_searched_at: datetime
+
+class SearchReport(BaseModel):
+    """Reporte de búsquedas: queries más frecuentes y queries sin resultados"""
+    start_date: datetime
+    end_date: datetime
+    total_searches: int
+    zero_result_searches: int
+    avg_latency_ms: float
+    top_queries: List[SearchQueryStat]
+    zero_result_queries: List[SearchQueryStat]
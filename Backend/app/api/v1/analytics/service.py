@@ -5,9 +5,9 @@
 # todas las métricas, estadísticas y reportes utilizados en el dashboard administrativo
 # y los endpoints de analíticas. Utiliza SQLAlchemy para interactuar con la base de datos.
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract
+from sqlalchemy import func, and_, extract, case
 from typing import List, Optional
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, date, UTC
 import io, csv
 # Imports de reportlab - TODOS AL INICIO
 from reportlab.lib.pagesizes import letter, landscape
@@ -16,13 +16,16 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from app.config import settings
 from app.models.product import Product
-from app.models.product_image import ProductImage
+from app.models.low_stock_product import LowStockProduct
 from app.models.order import Order
 from app.models.order_item import OrderItem
 from app.models.user import User
 from app.models.subscription import Subscription
+from app.models.search_log import SearchLog
 from app.models.enum import OrderStatus, SubscriptionStatus
+from app.services.product_cards import product_cards
 from app.api.v1.analytics import schemas
 
 class AnalyticsService:
@@ -47,9 +50,10 @@ class AnalyticsService:
         subscription_stats = AnalyticsService._get_subscription_stats(db)
         
         total_products = db.query(Product).filter(Product.is_active == True).count()
-        low_stock_products = db.query(Product).filter(
-            and_(Product.is_active == True, Product.stock < 10)
-        ).count()
+        # Conjunto precalculado (low_stock_product), no un recorrido de product
+        low_stock_products = db.query(LowStockProduct).join(
+            Product, Product.product_id == LowStockProduct.product_id
+        ).filter(Product.is_active == True).count()
         
         # Producto más vendido
         top_product = AnalyticsService._get_top_product(db)
@@ -259,15 +263,9 @@ class AnalyticsService:
         if not top_product_query:
             return None
         
-        # Obtener imagen del producto
-        product_image = db.query(ProductImage).filter(
-            and_(
-                ProductImage.product_id == top_product_query.product_id,
-                ProductImage.is_primary == True
-            )
-        ).first()
-        
-        image_url = product_image.image_path if product_image else None
+        # Imagen principal desde el cache de tarjetas de producto
+        card = product_cards.get(db, top_product_query.product_id)
+        image_url = card.primary_image if card else None
         
         return schemas.TopProduct(
             product_id=top_product_query.product_id,
@@ -625,6 +623,18 @@ class AnalyticsService:
         Returns:
             List[Product]: Lista de productos con stock por debajo del umbral.
         """
+        # Hasta LOW_STOCK_THRESHOLD basta el conjunto precalculado; un umbral mayor
+        # requiere recorrer product
+        if threshold <= settings.LOW_STOCK_THRESHOLD:
+            return db.query(Product).join(
+                LowStockProduct, LowStockProduct.product_id == Product.product_id
+            ).filter(
+                and_(
+                    Product.is_active == True,
+                    Product.stock < threshold
+                )
+            ).order_by(Product.stock.asc()).all()
+
         return db.query(Product).filter(
             and_(
                 Product.is_active == True,
@@ -632,6 +642,68 @@ class AnalyticsService:
             )
         ).order_by(Product.stock.asc()).all()
     
+    @staticmethod
+    def get_search_report(db: Session, days: int = 30, limit: int = 20) -> schemas.SearchReport:
+        """
+        Autor: Luis Flores
+        Genera el reporte de búsquedas a partir de search_log: las queries más frecuentes
+        y las queries que no devolvieron resultados dentro del período solicitado.
+
+        Args:
+            db (Session): Sesión de SQLAlchemy.
+            days (int, opcional): Días hacia atrás a considerar. Default = 30.
+            limit (int, opcional): Máximo de queries por lista. Default = 20.
+
+        Returns:
+            SearchReport: Totales del período, top queries y queries sin resultados.
+        """
+        end_date = datetime.now(UTC)
+        start_date = end_date - timedelta(days=days)
+        in_period = SearchLog.searched_at >= start_date
+        
+        totals = db.query(
+            func.count(SearchLog.search_log_id).label('total'),
+            func.coalesce(func.sum(case((SearchLog.result_count == 0, 1), else_=0)), 0).label('zero'),
+            func.coalesce(func.avg(SearchLog.latency_ms), 0).label('latency')
+        ).filter(in_period).one()
+        
+        def _query_stats(*conditions) -> List[schemas.SearchQueryStat]:
+            searches = func.count(SearchLog.search_log_id)
+            rows = db.query(
+                SearchLog.query,
+                searches.label('searches'),
+                func.avg(SearchLog.result_count).label('avg_results'),
+                func.avg(SearchLog.latency_ms).label('avg_latency_ms'),
+                func.max(SearchLog.searched_at).label('last_searched_at')
+            ).filter(
+                in_period, SearchLog.query != "", *conditions
+            ).group_by(
+                SearchLog.query
+            ).order_by(
+                searches.desc(), SearchLog.query.asc()
+            ).limit(limit).all()
+            
+            return [
+                schemas.SearchQueryStat(
+                    query=row.query,
+                    searches=row.searches,
+                    avg_results=round(float(row.avg_results or 0), 2),
+                    avg_latency_ms=round(float(row.avg_latency_ms or 0), 2),
+                    last_searched_at=row.last_searched_at
+                )
+                for row in rows
+            ]
+        
+        return schemas.SearchReport(
+            start_date=start_date,
+            end_date=end_date,
+            total_searches=totals.total,
+            zero_result_searches=int(totals.zero),
+            avg_latency_ms=round(float(totals.latency), 2),
+            top_queries=_query_stats(),
+            zero_result_queries=_query_stats(SearchLog.result_count == 0)
+        )
+    
 class ReportExportService:
     """Servicio para generación de reportes y exportación de datos"""
     
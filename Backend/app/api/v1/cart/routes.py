@@ -4,17 +4,61 @@
 #              para obtener, agregar, actualizar, eliminar items del carrito y 
 #              validar stock disponible.
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
+from typing import List
 
 from app.api.deps import get_db, get_current_user
 from app.api.v1.cart import schemas
-from app.api.v1.cart.service import CartService
+from app.api.v1.cart.service import CartLine, CartService, CartView
+from app.api.v1.products import schemas as product_schemas
+from app.api.v1.products.routes import to_list_items
+from app.api.v1.products.service import ProductService
 from app.models.user import User
 
 router = APIRouter()
 
 
+def to_item_response(line: CartLine) -> schemas.CartItemResponse:
+    """
+    Autor: Luis Flores
+    Descripción: Convierte una línea del carrito al schema de respuesta.
+    """
+    return schemas.CartItemResponse(
+        cart_item_id=line.cart_item_id,
+        cart_id=line.cart_id,
+        product_id=line.product_id,
+        quantity=line.quantity,
+        added_at=line.added_at,
+        updated_at=line.updated_at,
+        product=schemas.CartItemProductInfo(
+            product_id=line.product_id,
+            name=line.name,
+            price=line.price,
+            stock=line.stock,
+            image_path=line.image_path,
+            brand=line.brand
+        ),
+        subtotal=round(line.subtotal, 2)
+    )
+
+
+def to_cart_response(cart: CartView) -> schemas.ShoppingCartResponse:
+    """
+    Autor: Luis Flores
+    Descripción: Convierte la vista del carrito al schema de respuesta.
+    """
+    return schemas.ShoppingCartResponse(
+        cart_id=cart.cart_id,
+        user_id=cart.user_id,
+        items=[to_item_response(line) for line in cart.items],
+        total_items=cart.total_items,
+        total_price=round(cart.total_price, 2),
+        created_at=cart.created_at,
+        updated_at=cart.updated_at
+    )
+
+
 @router.get("/", response_model=schemas.ShoppingCartResponse)
 def get_cart(
     current_user: User = Depends(get_current_user),
@@ -23,65 +67,19 @@ def get_cart(
     """
     Autor: Luis Flores
     Descripción: Obtiene el carrito completo del usuario autenticado con todos
-                 sus items, información de productos y totales calculados.
+                 sus items, información de productos y totales calculados (una sola
+                 consulta con solo las columnas que muestra la vista).
     Parámetros:
         current_user (User): Usuario autenticado obtenido del token JWT.
         db (Session): Sesión de base de datos.
     Retorna:
         ShoppingCartResponse: Carrito con lista de items, total de items y precio total.
     """
-    cart = CartService.get_cart(db, current_user.user_id)
-    
-    # Preparar respuesta con cálculos
-    items_response = []
-    total_items = 0
-    total_price = 0.0
+    cart = CartService.get_cart_view(db, current_user.user_id)
+    if cart is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Carrito no encontrado")
     
-    for item in cart.cart_items:
-        # Obtener imagen principal del producto
-        primary_image = None
-        if item.product.product_images:
-            primary = next((img for img in item.product.product_images if img.is_primary), None)
-            primary_image = primary.image_path if primary else item.product.product_images[0].image_path
-        
-        # Crear info del producto
-        product_info = schemas.CartItemProductInfo(
-            product_id=item.product.product_id,
-            name=item.product.name,
-            price=item.product.price,
-            stock=item.product.stock,
-            image_path=primary_image,
-            brand=item.product.brand
-        )
-        
-        # Calcular subtotal
-        subtotal = item.quantity * item.product.price
-        
-        # Crear respuesta del item
-        item_response = schemas.CartItemResponse(
-            cart_item_id=item.cart_item_id,
-            cart_id=item.cart_id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            added_at=item.added_at,
-            updated_at=item.updated_at,
-            product=product_info,
-            subtotal=round(subtotal, 2)
-        )
-        
-        items_response.append(item_response)
-        subtotal = item.quantity * item.product.price
-        total_price += float(subtotal)
-    
-    return schemas.ShoppingCartResponse(
-        cart_id=cart.cart_id,
-        user_id=cart.user_id,
-        items=items_response,
-        total_items=total_items,
-        total_price=round(total_price, 2),
-        created_at=cart.created_at,
-        updated_at=cart.updated_at
-    )
+    return to_cart_response(cart)
 
 
 @router.get("/summary", response_model=schemas.CartSummary)
@@ -103,6 +101,28 @@ def get_cart_summary(
     return summary
 
 
+@router.get("/recommendations", response_model=List[product_schemas.ProductListResponse])
+def get_cart_recommendations(
+    limit: int = Query(6, ge=1, le=20),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Autor: Luis Flores
+    Descripción: Obtiene recomendaciones de "comprados juntos" para los productos del carrito,
+                 excluyendo los que ya están en él.
+    Parámetros:
+        limit (int): Cantidad máxima de productos a retornar (1-20).
+        current_user (User): Usuario autenticado.
+        db (Session): Sesión de base de datos.
+    Retorna:
+        List[ProductListResponse]: Productos recomendados.
+    """
+    product_ids = CartService.get_cart_product_ids(db, current_user.user_id)
+    products = ProductService.get_bought_together_for_products(db, product_ids, limit)
+    return to_list_items(products)
+
+
 @router.post("/add", response_model=schemas.CartItemResponse, status_code=status.HTTP_201_CREATED)
 def add_item_to_cart(
     item_data: schemas.CartItemAdd,
@@ -120,42 +140,34 @@ def add_item_to_cart(
     Retorna:
         CartItemResponse: Item del carrito creado o actualizado con información del producto.
     """
-    cart_item = CartService.add_item_to_cart(
+    line = CartService.add_item_to_cart(
         db=db,
         user_id=current_user.user_id,
         item_data=item_data
     )
-    
-    # Recargar con relaciones para la respuesta
-    db.refresh(cart_item)
-    
-    # Preparar respuesta
-    primary_image = None
-    if cart_item.product.product_images:
-        primary = next((img for img in cart_item.product.product_images if img.is_primary), None)
-        primary_image = primary.image_path if primary else cart_item.product.product_images[0].image_path
-    
-    product_info = schemas.CartItemProductInfo(
-        product_id=cart_item.product.product_id,
-        name=cart_item.product.name,
-        price=cart_item.product.price,
-        stock=cart_item.product.stock,
-        image_path=primary_image,
-        brand=cart_item.product.brand
-    )
-    
-    subtotal = cart_item.quantity * cart_item.product.price
-    
-    return schemas.CartItemResponse(
-        cart_item_id=cart_item.cart_item_id,
-        cart_id=cart_item.cart_id,
-        product_id=cart_item.product_id,
-        quantity=cart_item.quantity,
-        added_at=cart_item.added_at,
-        updated_at=cart_item.updated_at,
-        product=product_info,
-        subtotal=round(subtotal, 2)
-    )
+    return to_item_response(line)
+
+
+@router.post("/batch", response_model=schemas.ShoppingCartResponse)
+def apply_cart_batch(
+    batch: schemas.CartBatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Autor: Luis Flores
+    Descripción: Aplica varias operaciones al carrito (agregar, fijar cantidad, eliminar) en
+                 una sola petición y transacción, p. ej. al fusionar el carrito de invitado
+                 después de iniciar sesión o al volver a pedir una orden anterior.
+    Parámetros:
+        batch (CartBatchRequest): Operaciones a aplicar, en orden.
+        current_user (User): Usuario autenticado.
+        db (Session): Sesión de base de datos.
+    Retorna:
+        ShoppingCartResponse: Carrito final con items y totales.
+    """
+    cart = CartService.apply_batch(db, current_user.user_id, batch)
+    return to_cart_response(cart)
 
 
 @router.put("/{cart_item_id}", response_model=schemas.CartItemResponse)
@@ -177,43 +189,13 @@ def update_cart_item(
     Retorna:
         CartItemResponse: Item del carrito actualizado con información del producto.
     """
-    cart_item = CartService.update_cart_item(
+    line = CartService.update_cart_item(
         db=db,
         user_id=current_user.user_id,
         cart_item_id=cart_item_id,
         update_data=update_data
     )
-    
-    # Recargar con relaciones
-    db.refresh(cart_item)
-    
-    # Preparar respuesta
-    primary_image = None
-    if cart_item.product.product_images:
-        primary = next((img for img in cart_item.product.product_images if img.is_primary), None)
-        primary_image = primary.image_path if primary else cart_item.product.product_images[0].image_path
-    
-    product_info = schemas.CartItemProductInfo(
-        product_id=cart_item.product.product_id,
-        name=cart_item.product.name,
-        price=cart_item.product.price,
-        stock=cart_item.product.stock,
-        image_path=primary_image,
-        brand=cart_item.product.brand
-    )
-    
-    subtotal = cart_item.quantity * cart_item.product.price
-    
-    return schemas.CartItemResponse(
-        cart_item_id=cart_item.cart_item_id,
-        cart_id=cart_item.cart_id,
-        product_id=cart_item.product_id,
-        quantity=cart_item.quantity,
-        added_at=cart_item.added_at,
-        updated_at=cart_item.updated_at,
-        product=product_info,
-        subtotal=round(subtotal, 2)
-    )
+    return to_item_response(line)
 
 
 @router.delete("/{cart_item_id}", status_code=status.HTTP_204_NO_CONTENT)
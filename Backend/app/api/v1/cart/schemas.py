@@ -3,8 +3,8 @@
 # Descripción: Schemas de validación y serialización para el módulo de carrito de compras.
 #              Define las estructuras de datos para items del carrito, resúmenes y respuestas.
 
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -71,6 +71,36 @@ class CartItemResponse(BaseModel):
         from_attributes = True
 
 
+class CartBatchOperation(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Operación de un lote sobre el carrito, por producto: sumar unidades
+                 ("add"), fijar la cantidad ("set"; 0 elimina la línea) o eliminar la línea
+                 ("remove").
+    """
+    op: Literal["add", "set", "remove"] = Field(..., description="'add', 'set' o 'remove'")
+    product_id: int
+    quantity: Optional[int] = Field(None, ge=0, description="Unidades (requerido en 'add' y 'set')")
+
+    @model_validator(mode="after")
+    def check_quantity(self):
+        if self.op == "add" and not self.quantity:
+            raise ValueError("La operación 'add' requiere una cantidad mayor a 0")
+        if self.op == "set" and self.quantity is None:
+            raise ValueError("La operación 'set' requiere una cantidad")
+        return self
+
+
+class CartBatchRequest(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Lote de operaciones sobre el carrito (fusión del carrito de invitado,
+                 volver a pedir una orden anterior). Se aplican en orden y en una sola
+                 transacción.
+    """
+    operations: List[CartBatchOperation] = Field(..., min_length=1, max_length=100)
+
+
 # ============ SHOPPING CART SCHEMAS ============
 
 class ShoppingCartResponse(BaseModel):
@@ -2,17 +2,95 @@
 # Fecha: 13/11/2025
 # Descripción: Servicios de lógica de negocio para el carrito de compras. Implementa
 #              operaciones CRUD del carrito, validación de stock y cálculos de totales.
+#              Con un store de carritos con escritura diferida (cart_store), las lecturas y
+#              los cambios de cantidad se atienden en memoria; solo las líneas nuevas se
+#              escriben de inmediato (necesitan su cart_item_id).
 
+from dataclasses import dataclass, replace
+from datetime import datetime, UTC
+from decimal import Decimal
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
+from sqlalchemy import DateTime, Integer, and_, case, delete, func, literal, or_, select, update
 from fastapi import HTTPException, status
+from typing import List, Optional, Tuple
 
 from app.models.shopping_cart import ShoppingCart
 from app.models.cart_item import CartItem
 from app.models.product import Product
+from app.core.upsert import upsert_insert
+from app.services.cart_store import StoredCart, StoredItem, cart_store, load_cart
+from app.services.product_cards import ProductCard, product_cards
 from app.api.v1.cart import schemas
 
 
+@dataclass(frozen=True)
+class CartLine:
+    """
+    Autor: Luis Flores
+    Descripción: Línea del carrito para mostrar: item más las columnas del producto que usa
+                 la vista (sin descripción ni valor nutricional) y su subtotal.
+    """
+    cart_item_id: int
+    cart_id: int
+    product_id: int
+    quantity: int
+    added_at: datetime
+    updated_at: datetime
+    name: str
+    brand: Optional[str]
+    price: Decimal
+    stock: int
+    image_path: Optional[str]
+    subtotal: Decimal
+
+
+@dataclass(frozen=True)
+class CartView:
+    """
+    Autor: Luis Flores
+    Descripción: Carrito con sus líneas y totales (calculados en la consulta).
+    """
+    cart_id: int
+    user_id: int
+    created_at: datetime
+    updated_at: datetime
+    items: Tuple[CartLine, ...]
+    total_items: int
+    total_price: Decimal
+
+
+@dataclass(frozen=True)
+class PricedCartLine:
+    """
+    Autor: Luis Flores
+    Descripción: Línea del carrito con los datos del producto que necesitan validación,
+                 resumen y checkout (precio, stock, stock reservado y si está activo).
+    """
+    cart_item_id: int
+    product_id: int
+    name: str
+    quantity: int
+    price: Decimal
+    stock: int
+    reserved_stock: int
+    is_active: bool
+    subtotal: Decimal
+
+
+@dataclass(frozen=True)
+class CartPricing:
+    """
+    Autor: Luis Flores
+    Descripción: Líneas con precio del carrito y sus agregados (calculados en la consulta).
+                 unavailable_lines cuenta las líneas inactivas o con más unidades que el stock.
+    """
+    cart_id: int
+    lines: Tuple[PricedCartLine, ...]
+    total_items: int
+    total_price: Decimal
+    unavailable_lines: int
+
+
 class CartService:
     """
     Autor: Luis Flores
@@ -33,9 +111,7 @@ class CartService:
         Retorna:
             ShoppingCart: Carrito del usuario (existente o recién creado).
         """
-        cart = db.query(ShoppingCart).options(
-            joinedload(ShoppingCart.cart_items).joinedload(CartItem.product)
-        ).filter(ShoppingCart.user_id == user_id).first()
+        cart = db.query(ShoppingCart).filter(ShoppingCart.user_id == user_id).first()
         
         if not cart:
             cart = ShoppingCart(user_id=user_id)
@@ -59,8 +135,10 @@ class CartService:
         Excepciones:
             HTTPException 404: Si el carrito no existe.
         """
+        # El ORM lee de la base de datos: primero se escriben los cambios diferidos
+        cart_store.flush(db, user_id)
         cart = db.query(ShoppingCart).options(
-            joinedload(ShoppingCart.cart_items).joinedload(CartItem.product).joinedload(Product.product_images)
+            joinedload(ShoppingCart.cart_items).joinedload(CartItem.product)
         ).filter(ShoppingCart.user_id == user_id).first()
         
         if not cart:
@@ -71,86 +149,357 @@ class CartService:
         
         return cart
     
+    @staticmethod
+    def get_cart_view(db: Session, user_id: int) -> Optional[CartView]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene el carrito para mostrarlo con una sola consulta: carrito LEFT JOIN
+                     items JOIN producto, solo con las columnas que usa la vista (la imagen
+                     principal está desnormalizada en product, sin unir product_image).
+                     Subtotales y totales se calculan en SQL (los totales con funciones de
+                     ventana sobre las mismas filas).
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            user_id (int): ID del usuario.
+        Retorna:
+            CartView | None: Carrito con líneas y totales, o None si el usuario no tiene carrito.
+        """
+        if cart_store.write_behind:
+            cart = CartService._stored_cart(db, user_id)
+            return CartService._view_from_store(db, cart) if cart else None
+        
+        subtotal = (CartItem.quantity * Product.price).label("subtotal")
+        rows = db.execute(
+            select(
+                ShoppingCart.cart_id, ShoppingCart.user_id, ShoppingCart.created_at,
+                ShoppingCart.updated_at,
+                CartItem.cart_item_id, CartItem.product_id, CartItem.quantity,
+                CartItem.added_at, CartItem.updated_at.label("item_updated_at"),
+                Product.name, Product.brand, Product.price, Product.stock,
+                Product.primary_image_path, subtotal,
+                func.coalesce(func.sum(CartItem.quantity).over(), 0).label("total_items"),
+                func.coalesce(func.sum(CartItem.quantity * Product.price).over(), 0).label("total_price"),
+            )
+            .select_from(ShoppingCart)
+            .outerjoin(CartItem, CartItem.cart_id == ShoppingCart.cart_id)
+            .outerjoin(Product, Product.product_id == CartItem.product_id)
+            .where(ShoppingCart.user_id == user_id)
+            .order_by(CartItem.cart_item_id)
+        ).all()
+
+        if not rows:
+            return None
+
+        first = rows[0]
+        items = tuple(
+            CartLine(
+                cart_item_id=row.cart_item_id,
+                cart_id=row.cart_id,
+                product_id=row.product_id,
+                quantity=row.quantity,
+                added_at=row.added_at,
+                updated_at=row.item_updated_at,
+                name=row.name,
+                brand=row.brand,
+                price=row.price,
+                stock=row.stock,
+                image_path=row.primary_image_path,
+                subtotal=row.subtotal,
+            )
+            for row in rows
+            if row.cart_item_id is not None
+        )
+        return CartView(
+            cart_id=first.cart_id,
+            user_id=first.user_id,
+            created_at=first.created_at,
+            updated_at=first.updated_at,
+            items=items,
+            total_items=int(first.total_items),
+            total_price=Decimal(first.total_price),
+        )
+    
+    @staticmethod
+    def get_cart_pricing(db: Session, user_id: int) -> Optional[CartPricing]:
+        """
+        Autor: Luis Flores
+        Descripción: Consulta de precios del carrito compartida por validación, resumen y
+                     checkout: un solo SELECT de carrito LEFT JOIN items LEFT JOIN producto
+                     con precio, stock, estado y subtotal por línea; el total de unidades, el
+                     total a pagar y las líneas no disponibles se calculan en SQL (funciones de
+                     ventana sobre las mismas filas). Lee de la base de datos, por lo que
+                     primero escribe los cambios diferidos del usuario.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            user_id (int): ID del usuario.
+        Retorna:
+            CartPricing | None: Líneas y agregados, o None si el usuario no tiene carrito.
+        """
+        cart_store.flush(db, user_id)
+        
+        subtotal = CartItem.quantity * Product.price
+        unavailable = case(
+            (or_(Product.is_active == False, Product.stock < CartItem.quantity), 1),
+            else_=0
+        )
+        rows = db.execute(
+            select(
+                ShoppingCart.cart_id,
+                CartItem.cart_item_id, CartItem.product_id, CartItem.quantity,
+                Product.name, Product.price, Product.stock, Product.reserved_stock,
+                Product.is_active, subtotal.label("subtotal"),
+                func.coalesce(func.sum(CartItem.quantity).over(), 0).label("total_items"),
+                func.coalesce(func.sum(subtotal).over(), 0).label("total_price"),
+                func.coalesce(func.sum(unavailable).over(), 0).label("unavailable_lines"),
+            )
+            .select_from(ShoppingCart)
+            .outerjoin(CartItem, CartItem.cart_id == ShoppingCart.cart_id)
+            .outerjoin(Product, Product.product_id == CartItem.product_id)
+            .where(ShoppingCart.user_id == user_id)
+            .order_by(CartItem.cart_item_id)
+        ).all()
+        
+        if not rows:
+            return None
+        
+        first = rows[0]
+        return CartPricing(
+            cart_id=first.cart_id,
+            lines=tuple(
+                PricedCartLine(
+                    cart_item_id=row.cart_item_id,
+                    product_id=row.product_id,
+                    name=row.name,
+                    quantity=row.quantity,
+                    price=row.price,
+                    stock=row.stock,
+                    reserved_stock=row.reserved_stock or 0,
+                    is_active=bool(row.is_active),
+                    subtotal=row.subtotal,
+                )
+                for row in rows
+                if row.cart_item_id is not None
+            ),
+            total_items=int(first.total_items),
+            total_price=Decimal(first.total_price),
+            unavailable_lines=int(first.unavailable_lines),
+        )
+    
+    @staticmethod
+    def _stored_cart(db: Session, user_id: int) -> Optional[StoredCart]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene el carrito del store de carritos, leyéndolo de la base de datos
+                     la primera vez.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            user_id (int): ID del usuario.
+        Retorna:
+            StoredCart | None: Copia del carrito solo para leer (los cambios se aplican con
+                cart_store.mutate), o None si el usuario no tiene carrito.
+        """
+        cart = cart_store.get(user_id)
+        if cart is None:
+            cart = load_cart(db, user_id)
+            if cart is not None:
+                cart = cart_store.remember(cart)
+        return cart
+    
+    @staticmethod
+    def _view_from_store(db: Session, cart: StoredCart) -> CartView:
+        # Las columnas del producto salen de las tarjetas en cache (sin consulta si están vigentes)
+        cards = product_cards.get_many(db, (item.product_id for item in cart.items.values()))
+        items = tuple(
+            CartService._cart_line(item, cards[item.product_id])
+            for _, item in sorted(cart.items.items())
+            if item.product_id in cards
+        )
+        return CartView(
+            cart_id=cart.cart_id,
+            user_id=cart.user_id,
+            created_at=cart.created_at,
+            updated_at=cart.updated_at,
+            items=items,
+            total_items=sum(line.quantity for line in items),
+            total_price=sum((line.subtotal for line in items), Decimal("0")),
+        )
+    
+    @staticmethod
+    def _check_stock(card: Optional[ProductCard], quantity: int, in_cart: int = 0) -> None:
+        # Validación contra la tarjeta del producto (el checkout vuelve a validar con bloqueo)
+        if card is None or not card.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Producto no encontrado o no disponible"
+            )
+        if card.stock < quantity:
+            detail = f"Stock insuficiente. Disponible: {card.stock}"
+            if in_cart:
+                detail += f", en carrito: {in_cart}"
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+    
+    @staticmethod
+    def _upsert_cart_id(db: Session, user_id: int) -> int:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene el ID del carrito del usuario creándolo si no existe, con un solo
+                     INSERT ... ON CONFLICT (user_id) DO UPDATE ... RETURNING (no hace commit).
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            user_id (int): ID del usuario.
+        Retorna:
+            int: ID del carrito.
+        """
+        insert = upsert_insert(db)
+        now = datetime.now(UTC)
+        statement = insert(ShoppingCart).values(user_id=user_id, created_at=now, updated_at=now)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ShoppingCart.user_id],
+            set_={"updated_at": statement.excluded.updated_at}
+        ).returning(ShoppingCart.cart_id)
+        return db.scalar(statement)
+    
+    @staticmethod
+    def _touch_cart(db: Session, cart_id: int) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Actualiza shopping_cart.updated_at al modificar sus items (la limpieza de
+                     carritos abandonados usa esa fecha). No hace commit.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            cart_id (int): ID del carrito.
+        """
+        db.execute(
+            update(ShoppingCart)
+            .where(ShoppingCart.cart_id == cart_id)
+            .values(updated_at=datetime.now(UTC))
+        )
+    
+    @staticmethod
+    def _cart_line(row, card: ProductCard) -> CartLine:
+        # Completa un item (fila de cart_item o StoredItem) con la tarjeta de su producto
+        return CartLine(
+            cart_item_id=row.cart_item_id,
+            cart_id=row.cart_id,
+            product_id=row.product_id,
+            quantity=row.quantity,
+            added_at=row.added_at,
+            updated_at=row.updated_at,
+            name=card.name,
+            brand=card.brand,
+            price=card.price,
+            stock=card.stock,
+            image_path=card.primary_image,
+            subtotal=card.price * row.quantity,
+        )
+    
     @staticmethod
     def add_item_to_cart(
         db: Session,
         user_id: int,
         item_data: schemas.CartItemAdd
-    ) -> CartItem:
+    ) -> CartLine:
         """
         Autor: Luis Flores
-        Descripción: Agrega un producto al carrito o actualiza la cantidad si ya existe.
-                     Verifica disponibilidad del producto y suficiencia de stock.
+        Descripción: Agrega un producto al carrito o suma la cantidad si ya existe, con un solo
+                     INSERT ... SELECT ... ON CONFLICT (cart_id, product_id) DO UPDATE. El
+                     SELECT solo produce la fila si el producto está activo y tiene stock para
+                     la cantidad pedida, y el DO UPDATE solo suma si el stock alcanza para la
+                     cantidad total. Si la sentencia no regresa fila, se consulta el motivo.
         Parámetros:
             db (Session): Sesión de base de datos.
             user_id (int): ID del usuario.
             item_data (CartItemAdd): Datos del item a agregar (product_id y quantity).
         Retorna:
-            CartItem: Item del carrito creado o actualizado.
+            CartLine: Línea del carrito creada o actualizada, con los datos del producto.
         Excepciones:
             HTTPException 404: Si el producto no existe o no está disponible.
             HTTPException 400: Si no hay stock suficiente.
         """
-        # Obtener o crear carrito
-        cart = CartService.get_or_create_cart(db, user_id)
+        if cart_store.write_behind:
+            cart = CartService._stored_cart(db, user_id)
+            item = cart.item_for_product(item_data.product_id) if cart else None
+            if item is not None:
+                card = product_cards.get(db, item_data.product_id)
+                CartService._check_stock(card, item.quantity + item_data.quantity, item.quantity)
+                
+                def add(stored: Optional[StoredCart]) -> Optional[StoredItem]:
+                    # Suma sobre la cantidad guardada (otra petición pudo cambiarla)
+                    current = stored.item_for_product(item_data.product_id) if stored else None
+                    if current is None:
+                        return None
+                    quantity = current.quantity + item_data.quantity
+                    CartService._check_stock(card, quantity, current.quantity)
+                    return replace(stored.set_quantity(current.cart_item_id, quantity, datetime.now(UTC)))
+                
+                updated = cart_store.mutate(user_id, add)
+                if updated is not None:
+                    return CartService._cart_line(updated, card)
+            # Línea nueva (o eliminada mientras tanto): se escriben los cambios diferidos del
+            # usuario antes del upsert
+            cart_store.flush(db, user_id)
         
-        # Verificar que el producto existe y está activo
-        product = db.query(Product).filter(
-            and_(
-                Product.product_id == item_data.product_id,
-                Product.is_active == True
-            )
-        ).first()
+        cart_id = CartService._upsert_cart_id(db, user_id)
         
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Producto no encontrado o no disponible"
-            )
+        insert = upsert_insert(db)
+        now = datetime.now(UTC)
+        source = select(
+            literal(cart_id, Integer),
+            Product.product_id,
+            literal(item_data.quantity, Integer),
+            literal(now, DateTime),
+            literal(now, DateTime)
+        ).where(
+            Product.product_id == item_data.product_id,
+            Product.is_active == True,
+            Product.stock >= item_data.quantity
+        )
+        statement = insert(CartItem).from_select(
+            ["cart_id", "product_id", "quantity", "added_at", "updated_at"], source
+        )
+        new_quantity = CartItem.quantity + statement.excluded.quantity
+        statement = statement.on_conflict_do_update(
+            index_elements=[CartItem.cart_id, CartItem.product_id],
+            set_={"quantity": new_quantity, "updated_at": statement.excluded.updated_at},
+            where=select(Product.stock).where(
+                Product.product_id == statement.excluded.product_id
+            ).scalar_subquery() >= new_quantity
+        ).returning(
+            CartItem.cart_item_id, CartItem.cart_id, CartItem.product_id, CartItem.quantity,
+            CartItem.added_at, CartItem.updated_at
+        )
+        row = db.execute(statement).first()
         
-        # Verificar stock disponible
-        if product.stock < item_data.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Stock insuficiente. Disponible: {product.stock}"
-            )
-        
-        # Verificar si el item ya existe en el carrito
-        existing_item = db.query(CartItem).filter(
-            and_(
-                CartItem.cart_id == cart.cart_id,
-                CartItem.product_id == item_data.product_id
+        if row is None:
+            product = db.execute(
+                select(Product.stock, Product.is_active).where(Product.product_id == item_data.product_id)
+            ).first()
+            in_cart = db.scalar(
+                select(CartItem.quantity).where(
+                    CartItem.cart_id == cart_id,
+                    CartItem.product_id == item_data.product_id
+                )
             )
-        ).first()
-        
-        if existing_item:
-            # Actualizar cantidad
-            new_quantity = existing_item.quantity + item_data.quantity
+            db.rollback()
             
-            if product.stock < new_quantity:
+            if not product or not product.is_active:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Producto no encontrado o no disponible"
+                )
+            if in_cart:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Stock insuficiente. Disponible: {product.stock}, en carrito: {existing_item.quantity}"
+                    detail=f"Stock insuficiente. Disponible: {product.stock}, en carrito: {in_cart}"
                 )
-            
-            existing_item.quantity = new_quantity
-            db.commit()
-            db.refresh(existing_item)
-            
-            return existing_item
-        else:
-            # Crear nuevo item
-            cart_item = CartItem(
-                cart_id=cart.cart_id,
-                product_id=item_data.product_id,
-                quantity=item_data.quantity
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Stock insuficiente. Disponible: {product.stock}"
             )
-            
-            db.add(cart_item)
-            db.commit()
-            db.refresh(cart_item)
-            
-            return cart_item
+        
+        db.commit()
+        cart_store.discard(user_id)
+        return CartService._cart_line(row, product_cards.get(db, row.product_id))
     
     @staticmethod
     def update_cart_item(
@@ -158,7 +507,7 @@ class CartService:
         user_id: int,
         cart_item_id: int,
         update_data: schemas.CartItemUpdate
-    ) -> CartItem:
+    ) -> CartLine:
         """
         Autor: Luis Flores
         Descripción: Actualiza la cantidad de un item específico en el carrito.
@@ -169,11 +518,41 @@ class CartService:
             cart_item_id (int): ID del item del carrito a actualizar.
             update_data (CartItemUpdate): Nueva cantidad del item.
         Retorna:
-            CartItem: Item del carrito actualizado.
+            CartLine: Item del carrito actualizado, con los datos del producto.
         Excepciones:
             HTTPException 404: Si el item o producto no existe.
             HTTPException 400: Si no hay stock suficiente.
         """
+        if cart_store.write_behind:
+            cart = CartService._stored_cart(db, user_id)
+            item = cart.items.get(cart_item_id) if cart else None
+            if item is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Item no encontrado en el carrito"
+                )
+            card = product_cards.get(db, item.product_id)
+            if card is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Producto no encontrado"
+                )
+            if card.stock < update_data.quantity:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Stock insuficiente. Disponible: {card.stock}"
+                )
+            
+            def set_quantity(stored: Optional[StoredCart]) -> StoredItem:
+                if stored is None or cart_item_id not in stored.items:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Item no encontrado en el carrito"
+                    )
+                return replace(stored.set_quantity(cart_item_id, update_data.quantity, datetime.now(UTC)))
+            
+            return CartService._cart_line(cart_store.mutate(user_id, set_quantity), card)
+        
         # Obtener el item y verificar que pertenece al usuario
         cart_item = db.query(CartItem).join(ShoppingCart).filter(
             and_(
@@ -207,10 +586,10 @@ class CartService:
         
         # Actualizar cantidad
         cart_item.quantity = update_data.quantity
+        CartService._touch_cart(db, cart_item.cart_id)
         db.commit()
-        db.refresh(cart_item)
         
-        return cart_item
+        return CartService._cart_line(cart_item, product_cards.get(db, cart_item.product_id))
     
     @staticmethod
     def remove_item_from_cart(
@@ -230,6 +609,22 @@ class CartService:
         Excepciones:
             HTTPException 404: Si el item no existe en el carrito del usuario.
         """
+        if cart_store.write_behind:
+            # Carga el carrito en el store la primera vez; la eliminación se aplica sobre el
+            # carrito guardado
+            CartService._stored_cart(db, user_id)
+            
+            def remove(stored: Optional[StoredCart]) -> bool:
+                if stored is None or cart_item_id not in stored.items:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Item no encontrado en el carrito"
+                    )
+                stored.remove(cart_item_id, datetime.now(UTC))
+                return True
+            
+            return cart_store.mutate(user_id, remove)
+        
         cart_item = db.query(CartItem).join(ShoppingCart).filter(
             and_(
                 CartItem.cart_item_id == cart_item_id,
@@ -244,6 +639,7 @@ class CartService:
             )
         
         db.delete(cart_item)
+        CartService._touch_cart(db, cart_item.cart_id)
         db.commit()
         
         return True
@@ -261,6 +657,20 @@ class CartService:
         Excepciones:
             HTTPException 404: Si el carrito no existe.
         """
+        if cart_store.write_behind:
+            CartService._stored_cart(db, user_id)
+            
+            def clear(stored: Optional[StoredCart]) -> bool:
+                if stored is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Carrito no encontrado"
+                    )
+                stored.clear(datetime.now(UTC))
+                return True
+            
+            return cart_store.mutate(user_id, clear)
+        
         cart = db.query(ShoppingCart).filter(
             ShoppingCart.user_id == user_id
         ).first()
@@ -273,29 +683,169 @@ class CartService:
         
         # Eliminar todos los items
         db.query(CartItem).filter(CartItem.cart_id == cart.cart_id).delete()
+        CartService._touch_cart(db, cart.cart_id)
         db.commit()
         
         return True
     
+    @staticmethod
+    def apply_batch(
+        db: Session,
+        user_id: int,
+        batch: schemas.CartBatchRequest
+    ) -> CartView:
+        """
+        Autor: Luis Flores
+        Descripción: Aplica un lote de operaciones (add, set, remove) al carrito en una sola
+                     transacción. Las cantidades actuales y el stock de todos los productos
+                     del lote se leen con una consulta; las cantidades finales se escriben con
+                     un INSERT ... ON CONFLICT DO UPDATE y las líneas que quedan en 0 con un
+                     DELETE. El upsert del carrito bloquea su fila hasta el commit, por lo que
+                     los cambios concurrentes del mismo usuario se serializan. Si algún producto
+                     no está disponible o no tiene stock para su cantidad final, no se aplica
+                     ninguna operación.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            user_id (int): ID del usuario.
+            batch (CartBatchRequest): Operaciones en el orden en que se aplican.
+        Retorna:
+            CartView: Carrito final con sus líneas y totales.
+        Excepciones:
+            HTTPException 400: Si algún producto no está disponible o no tiene stock
+                suficiente (detail incluye la lista de problemas).
+        """
+        # El lote lee el carrito de la base de datos: primero se escriben los cambios diferidos
+        cart_store.flush(db, user_id)
+        cart_id = CartService._upsert_cart_id(db, user_id)
+        
+        product_ids = {operation.product_id for operation in batch.operations}
+        rows = db.execute(
+            select(
+                Product.product_id, Product.name, Product.stock, Product.is_active,
+                CartItem.quantity.label("in_cart")
+            )
+            .outerjoin(CartItem, and_(
+                CartItem.product_id == Product.product_id,
+                CartItem.cart_id == cart_id
+            ))
+            .where(Product.product_id.in_(product_ids))
+        ).all()
+        products = {row.product_id: row for row in rows}
+        current = {row.product_id: row.in_cart for row in rows if row.in_cart}
+        
+        # Cantidades finales por producto
+        quantities = dict(current)
+        for operation in batch.operations:
+            if operation.op == "add":
+                quantities[operation.product_id] = quantities.get(operation.product_id, 0) + operation.quantity
+            elif operation.op == "set":
+                quantities[operation.product_id] = operation.quantity
+            else:
+                quantities[operation.product_id] = 0
+        
+        issues = []
+        for product_id, quantity in quantities.items():
+            if not quantity or quantity == current.get(product_id):
+                continue
+            product = products.get(product_id)
+            if product is None or not product.is_active:
+                issues.append({
+                    "product_id": product_id,
+                    "product_name": product.name if product else None,
+                    "issue": "Producto no disponible",
+                    "requested": quantity,
+                    "available": 0
+                })
+            elif product.stock < quantity:
+                issues.append({
+                    "product_id": product_id,
+                    "product_name": product.name,
+                    "issue": "Stock insuficiente",
+                    "requested": quantity,
+                    "available": product.stock
+                })
+        
+        if issues:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"message": "No se aplicó ninguna operación del lote", "issues": issues}
+            )
+        
+        now = datetime.now(UTC)
+        upserts = [
+            {"cart_id": cart_id, "product_id": product_id, "quantity": quantity, "added_at": now, "updated_at": now}
+            for product_id, quantity in quantities.items()
+            if quantity and quantity != current.get(product_id)
+        ]
+        removed = [product_id for product_id, quantity in quantities.items() if not quantity and product_id in current]
+        
+        if upserts:
+            insert = upsert_insert(db)
+            statement = insert(CartItem).values(upserts)
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[CartItem.cart_id, CartItem.product_id],
+                set_={"quantity": statement.excluded.quantity, "updated_at": statement.excluded.updated_at}
+            ))
+        if removed:
+            db.execute(
+                delete(CartItem).where(CartItem.cart_id == cart_id, CartItem.product_id.in_(removed))
+            )
+        db.commit()
+        cart_store.discard(user_id)
+        
+        return CartService.get_cart_view(db, user_id)
+    
+    @staticmethod
+    def get_cart_product_ids(db: Session, user_id: int) -> List[int]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene los IDs de los productos en el carrito del usuario sin cargar
+                     items ni productos completos.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            user_id (int): ID del usuario.
+        Retorna:
+            List[int]: IDs de productos en el carrito (vacío si no hay carrito).
+        """
+        if cart_store.write_behind:
+            cart = CartService._stored_cart(db, user_id)
+            return [item.product_id for item in cart.items.values()] if cart else []
+        
+        rows = db.query(CartItem.product_id).join(
+            ShoppingCart, ShoppingCart.cart_id == CartItem.cart_id
+        ).filter(ShoppingCart.user_id == user_id).all()
+        return [row.product_id for row in rows]
+    
     @staticmethod
     def get_cart_summary(db: Session, user_id: int) -> dict:
         """
         Autor: Luis Flores
-        Descripción: Obtiene un resumen rápido del carrito con total de items y precio total.
+        Descripción: Obtiene un resumen rápido del carrito con total de items y precio total
+                     (agregados de la consulta de precios; con el store en memoria, de la
+                     vista del carrito sin escribir los cambios diferidos).
         Parámetros:
             db (Session): Sesión de base de datos.
             user_id (int): ID del usuario.
         Retorna:
             dict: Diccionario con 'total_items' y 'total_price'.
+        Excepciones:
+            HTTPException 404: Si el carrito no existe.
         """
-        cart = CartService.get_cart(db, user_id)
+        if cart_store.write_behind:
+            cart = CartService.get_cart_view(db, user_id)
+        else:
+            cart = CartService.get_cart_pricing(db, user_id)
         
-        total_items = sum(item.quantity for item in cart.cart_items)
-        total_price = sum(item.quantity * item.product.price for item in cart.cart_items)
+        if cart is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Carrito no encontrado"
+            )
         
         return {
-            "total_items": total_items,
-            "total_price": round(total_price, 2)
+            "total_items": cart.total_items,
+            "total_price": round(cart.total_price, 2)
         }
     
     @staticmethod
@@ -303,37 +853,44 @@ class CartService:
         """
         Autor: Luis Flores
         Descripción: Valida que todos los productos en el carrito tengan stock suficiente.
-                     Retorna información sobre productos sin stock o con stock insuficiente.
+                     Retorna información sobre productos sin stock o con stock insuficiente
+                     (a partir de la consulta de precios; solo recorre las líneas si la
+                     consulta reporta líneas no disponibles).
         Parámetros:
             db (Session): Sesión de base de datos.
             user_id (int): ID del usuario.
         Retorna:
             dict: Diccionario con 'valid' (bool) y lista de 'issues' con problemas encontrados.
+        Excepciones:
+            HTTPException 404: Si el carrito no existe.
         """
-        cart = CartService.get_cart(db, user_id)
+        pricing = CartService.get_cart_pricing(db, user_id)
+        if pricing is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Carrito no encontrado"
+            )
         
         issues = []
         
-        for item in cart.cart_items:
-            product = item.product
-            
-            if not product.is_active:
+        for line in pricing.lines if pricing.unavailable_lines else ():
+            if not line.is_active:
                 issues.append({
-                    "cart_item_id": item.cart_item_id,
-                    "product_id": product.product_id,
-                    "product_name": product.name,
+                    "cart_item_id": line.cart_item_id,
+                    "product_id": line.product_id,
+                    "product_name": line.name,
                     "issue": "Producto no disponible",
-                    "requested": item.quantity,
+                    "requested": line.quantity,
                     "available": 0
                 })
-            elif product.stock < item.quantity:
+            elif line.stock < line.quantity:
                 issues.append({
-                    "cart_item_id": item.cart_item_id,
-                    "product_id": product.product_id,
-                    "product_name": product.name,
+                    "cart_item_id": line.cart_item_id,
+                    "product_id": line.product_id,
+                    "product_name": line.name,
                     "issue": "Stock insuficiente",
-                    "requested": item.quantity,
-                    "available": product.stock
+                    "requested": line.quantity,
+                    "available": line.stock
                 })
         
         return {
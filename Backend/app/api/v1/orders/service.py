@@ -3,6 +3,7 @@
 # Descripcion: Servicio encargado de gestionar las ordenes, desde su creación 
 #              (que se llama en checkout), hasta las operaciones CRUD
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from typing import Dict, Optional
 from decimal import Decimal
@@ -15,8 +16,11 @@ from app.models.product import Product
 from app.models.shopping_cart import ShoppingCart
 from app.models.cart_item import CartItem
 from app.models.user_coupon import UserCoupon
-from app.models.enum import OrderStatus
+from app.models.enum import InventoryMovementReason, OrderStatus
 from app.api.v1.shipping.service import shipping_service
+from app.services.inventory import (
+    InsufficientStockError, adjust_stock, decrement_stock, lock_products, quantities_by_product
+)
 
 class OrderService:
     
@@ -56,6 +60,11 @@ class OrderService:
 
         Retorna:
             Dict: Resultado con estado de éxito, la orden creada y los puntos generados.
+            Si no tiene éxito, quien llama debe hacer rollback (el descuento de stock se
+            aplica con sentencias directas); out_of_stock indica que faltó inventario
+            o que un producto ya no está a la venta. Tras el commit, quien llama debe
+            descartar la copia del carrito en cart_store (antes, una lectura concurrente
+            volvería a cargar el carrito sin confirmar).
         """
         try:
             cart = db.query(ShoppingCart).filter(ShoppingCart.user_id == user_id).first()
@@ -66,17 +75,13 @@ class OrderService:
             if not cart_items:
                 return {"success": False, "error": "El carrito está vacío"}
             
-            # Valida productos y stock
+            # Valida productos (el stock se valida al descontarlo); las filas quedan bloqueadas
+            # en orden de product_id hasta el commit para evitar deadlocks entre checkouts
+            products = lock_products(db, (item.product_id for item in cart_items))
             for cart_item in cart_items:
-                product = db.query(Product).filter(
-                    Product.product_id == cart_item.product_id
-                ).first()
-                
+                product = products.get(cart_item.product_id)
                 if not product or not product.is_active:
-                    return {"success": False, "error": f"Producto no disponible"}
-                
-                if product.stock < cart_item.quantity:
-                    return {"success": False, "error": f"Stock insuficiente para {product.name}"}
+                    return {"success": False, "error": f"Producto no disponible", "out_of_stock": True}
             
             is_subscription = subscription_id is not None
             
@@ -106,25 +111,29 @@ class OrderService:
             db.add(order)
             db.flush()
             
-            # Crea order_items y actualiza stock
-            for cart_item in cart_items:
-                product = db.query(Product).filter(
-                    Product.product_id == cart_item.product_id
-                ).first()
-                
-                item_subtotal = product.price * cart_item.quantity
-                
-                order_item = OrderItem(
-                    order_id=order.order_id,
-                    product_id=product.product_id,
-                    quantity=cart_item.quantity,
-                    unit_price=product.price,
-                    subtotal=item_subtotal
+            # Descuenta stock de todas las líneas con un UPDATE condicional (consume la reserva del usuario)
+            try:
+                decrement_stock(
+                    db,
+                    quantities_by_product((item.product_id, item.quantity) for item in cart_items),
+                    user_id=user_id,
+                    order_id=order.order_id
                 )
-                db.add(order_item)
-
-                # Actualiza stock
-                product.stock -= cart_item.quantity
+            except InsufficientStockError as e:
+                names = ", ".join(products[product_id].name for product_id in e.product_ids)
+                return {"success": False, "error": f"Stock insuficiente para {names}", "out_of_stock": True}
+            
+            # Crea order_items con un solo INSERT masivo
+            db.execute(insert(OrderItem), [
+                {
+                    "order_id": order.order_id,
+                    "product_id": cart_item.product_id,
+                    "quantity": cart_item.quantity,
+                    "unit_price": products[cart_item.product_id].price,
+                    "subtotal": products[cart_item.product_id].price * cart_item.quantity
+                }
+                for cart_item in cart_items
+            ])
             
             # Limpia carrito
             db.query(CartItem).filter(CartItem.cart_id == cart.cart_id).delete()
@@ -360,12 +369,12 @@ class OrderService:
                 OrderItem.order_id == order_id
             ).all()
 
-            for item in order_items:
-                product = db.query(Product).filter(
-                    Product.product_id == item.product_id
-                ).first()
-                if product:
-                    product.stock += item.quantity
+            adjust_stock(
+                db,
+                quantities_by_product((item.product_id, item.quantity) for item in order_items),
+                InventoryMovementReason.CANCELLATION,
+                order_id=order_id
+            )
             
             # Estatus update
             order.order_status = OrderStatus.CANCELLED
@@ -4,14 +4,14 @@
 #              creación de sesiones de pago, captura de pagos, y generación de órdenes asociadas
 #              incluyendo cálculos de checkout, con integración con Stripe y PayPal
 
+import logging
 from sqlalchemy.orm import Session
 from typing import Dict, Optional
 from decimal import Decimal
-from datetime import date
+from datetime import date, datetime, timedelta, UTC
 from app.models.user import User
 from app.models.address import Address
 from app.models.payment_method import PaymentMethod
-from app.models.product import Product
 from app.models.user_loyalty import UserLoyalty
 from app.models.loyalty_tier import LoyaltyTier
 from app.models.shopping_cart import ShoppingCart
@@ -24,8 +24,16 @@ from app.services.stripe_service import stripe_service
 from app.services.paypal_service import paypal_service
 from app.api.v1.orders.service import order_service
 from app.api.v1.loyalty.service import loyalty_service
+from app.api.v1.cart.service import cart_service
+from app.services.cart_store import cart_store
+from app.services.inventory import (
+    InsufficientStockError, held_quantities, quantities_by_product, release_user_reservations,
+    reserve_stock, set_reservation_reference, shard_totals
+)
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 class PaymentProcessService:
     
     def calculate_checkout_summary(
@@ -33,7 +41,8 @@ class PaymentProcessService:
         db: Session,
         user_id: int,
         address_id: int,
-        coupon_code: Optional[str] = None
+        coupon_code: Optional[str] = None,
+        check_stock: bool = True
     ) -> Dict:
         """
         Autor: Lizbeth Barajas
@@ -48,17 +57,20 @@ class PaymentProcessService:
             user_id (int): ID del usuario dueño del carrito.
             address_id (int): ID de la dirección seleccionada para envío.
             coupon_code (str, opcional): Código de cupón a aplicar.
+            check_stock (bool): Si valida disponibilidad. Los flujos que crean la orden
+                justo después lo desactivan: el stock se valida al descontarlo y la falta
+                se reporta como out_of_stock.
 
         Retorna:
             dict: Resultado del cálculo, incluyendo resumen y coupon_id si aplica.
         """
         try:
-            cart = db.query(ShoppingCart).filter(ShoppingCart.user_id == user_id).first()
-            if not cart:
+            # Líneas con precio, stock y subtotal en una consulta (escribe antes los cambios diferidos)
+            pricing = cart_service.get_cart_pricing(db, user_id)
+            if pricing is None:
                 return {"success": False, "error": "Carrito no encontrado"}
             
-            cart_items = db.query(CartItem).filter(CartItem.cart_id == cart.cart_id).all()
-            if not cart_items:
+            if not pricing.lines:
                 return {"success": False, "error": "El carrito está vacío"}
             
             # Valida direccion
@@ -69,20 +81,21 @@ class PaymentProcessService:
             if not address:
                 return {"success": False, "error": "Dirección no encontrada"}
             
-            # Calcula subtotal y checa stock
-            subtotal = Decimal('0.00')
-            for cart_item in cart_items:
-                product = db.query(Product).filter(
-                    Product.product_id == cart_item.product_id
-                ).first()
-                
-                if not product or not product.is_active:
-                    return {"success": False, "error": f"Producto no disponible"}
-                
-                if product.stock < cart_item.quantity:
-                    return {"success": False, "error": f"Stock insuficiente para {product.name}"}
-                
-                subtotal += product.price * cart_item.quantity
+            # Checa stock (sin contar lo que otros checkouts tienen reservado); el subtotal
+            # viene de la consulta de precios
+            if check_stock:
+                held = held_quantities(db, user_id)
+                sharded = shard_totals(db, [line.product_id for line in pricing.lines])
+                for line in pricing.lines:
+                    if not line.is_active:
+                        return {"success": False, "error": f"Producto no disponible"}
+                    
+                    on_hand = sharded.get(line.product_id, line.stock - line.reserved_stock)
+                    available = on_hand + held.get(line.product_id, 0)
+                    if available < line.quantity:
+                        return {"success": False, "error": f"Stock insuficiente para {line.name}"}
+            
+            subtotal = pricing.total_price
             
             # Calculos de shipping (depende de loyalty tier)
             user_loyalty = db.query(UserLoyalty).filter(
@@ -159,7 +172,7 @@ class PaymentProcessService:
                     "shipping_cost": float(shipping_cost),
                     "discount_amount": float(discount_amount),
                     "total_amount": float(total_amount),
-                    "items_count": len(cart_items),
+                    "items_count": len(pricing.lines),
                     "points_to_earn": points_to_earn
                 },
                 "coupon_id": coupon_id
@@ -167,6 +180,58 @@ class PaymentProcessService:
         except Exception as e:
             return {"success": False, "error": f"Error al calcular resumen: {str(e)}"}
     
+    def _reserve_cart(self, db: Session, user_id: int, ttl_minutes: Optional[int] = None) -> Optional[Dict]:
+        """
+        Autor: Luis Flores
+
+        Descripción:
+            Aparta el inventario del carrito antes de crear la sesión de pago, para no cobrar
+            productos que otro checkout ya se llevó. La reserva se confirma de inmediato y
+            expira sola si el pago no se completa.
+
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            user_id (int): ID del usuario dueño del carrito.
+            ttl_minutes (int, opcional): Vigencia de la reserva; por defecto
+                INVENTORY_RESERVATION_TTL_MINUTES.
+
+        Retorna:
+            dict | None: Error si no hay stock suficiente; None si se reservó.
+        """
+        cart_items = db.query(CartItem).join(
+            ShoppingCart, ShoppingCart.cart_id == CartItem.cart_id
+        ).filter(ShoppingCart.user_id == user_id).all()
+        
+        try:
+            reserve_stock(
+                db,
+                user_id,
+                quantities_by_product((item.product_id, item.quantity) for item in cart_items),
+                ttl_minutes=ttl_minutes
+            )
+            db.commit()
+        except InsufficientStockError:
+            db.rollback()
+            return {"success": False, "error": "Stock insuficiente: otro cliente apartó las últimas unidades"}
+        return None
+    
+    def _release_cart(self, db: Session, user_id: int) -> None:
+        """
+        Autor: Luis Flores
+
+        Descripción:
+            Libera la reserva de inventario del usuario cuando no se pudo iniciar el pago.
+
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            user_id (int): ID del usuario.
+
+        Retorna:
+            None
+        """
+        release_user_reservations(db, user_id)
+        db.commit()
+    
     async def create_stripe_checkout_session(
         self,
         db: Session,
@@ -210,6 +275,20 @@ class PaymentProcessService:
             coupon_id = summary_result.get("coupon_id")
             total_amount = Decimal(str(summary["total_amount"]))
             
+            # Aparta el inventario antes de llamar a Stripe. Con tarjeta nueva la reserva dura
+            # lo mismo que la sesión de Checkout (más margen para el webhook), de modo que no se
+            # pueda pagar después de liberarla
+            session_expires_at = datetime.now(UTC) + timedelta(minutes=settings.STRIPE_CHECKOUT_EXPIRES_MINUTES)
+            reserve_error = self._reserve_cart(
+                db,
+                user.user_id,
+                ttl_minutes=None if payment_method_id else (
+                    settings.STRIPE_CHECKOUT_EXPIRES_MINUTES + settings.INVENTORY_RESERVATION_TTL_MINUTES
+                )
+            )
+            if reserve_error:
+                return reserve_error
+            
             # si es con pago guardado
             if payment_method_id:
                 return await self._process_with_saved_card(
@@ -242,12 +321,17 @@ class PaymentProcessService:
                     product_name="Compra BeFit",
                     success_url=f"{settings.APP_URL}/order-success?session_id={{CHECKOUT_SESSION_ID}}",
                     cancel_url=f"{settings.APP_URL}/checkout",
-                    metadata=metadata
+                    metadata=metadata,
+                    expires_at=int(session_expires_at.timestamp())
                 )
                 
                 if not stripe_session:
+                    self._release_cart(db, user.user_id)
                     return {"success": False, "error": "Error al crear sesión de Stripe"}
                 
+                set_reservation_reference(db, user.user_id, stripe_session.get("id"))
+                db.commit()
+                
                 return {
                     "success": True,
                     "message": "Sesión de pago creada",
@@ -326,6 +410,7 @@ class PaymentProcessService:
                         "error": "Requiere autenticación adicional"
                     }
                 else:
+                    self._release_cart(db, user.user_id)
                     return {
                         "success": False,
                         "error": payment_result.get('error', 'Error al procesar pago')
@@ -368,6 +453,7 @@ class PaymentProcessService:
             
             db.commit()
             db.refresh(order)
+            cart_store.discard(user.user_id)
             
             return {
                 "success": True,
@@ -423,9 +509,10 @@ class PaymentProcessService:
             address_id = int(address_id)
             subscription_id = int(subscription_id) if subscription_id else None
             
-            # Calcula resumen otra vez para obtener info necesaria
+            # Calcula resumen otra vez para obtener info necesaria. El pago ya se cobró: el stock
+            # no se valida aquí sino al crear la orden, para reembolsar si falta
             summary_result = self.calculate_checkout_summary(
-                db, user_id, address_id, coupon_code
+                db, user_id, address_id, coupon_code, check_stock=False
             )
             if not summary_result.get("success"):
                 return summary_result
@@ -489,6 +576,17 @@ class PaymentProcessService:
             
             if not order_result.get("success"):
                 db.rollback()
+                if order_result.get("out_of_stock"):
+                    # El pago ya se cobró pero el inventario se agotó: se reembolsa para no
+                    # dejar un cargo sin orden
+                    refund = stripe_service.refund_payment(payment_intent_id)
+                    if not refund.get("success"):
+                        logger.error(
+                            "Pago %s cobrado sin orden ni reembolso: %s",
+                            payment_intent_id, refund.get("error")
+                        )
+                    order_result["refund"] = refund
+                    self._release_cart(db, user_id)
                 return order_result
             
             order = order_result["order"]
@@ -513,6 +611,7 @@ class PaymentProcessService:
             
             db.commit()
             db.refresh(order)
+            cart_store.discard(user_id)
             
             return {
                 "success": True,
@@ -553,6 +652,7 @@ class PaymentProcessService:
             if not user or not user.account_status:
                 return {"success": False, "error": "Usuario no encontrado o inactivo"}
             
+            cart_store.flush(db, user.user_id)
             cart = db.query(ShoppingCart).filter(ShoppingCart.user_id == user.user_id).first()
             if not cart:
                 return {"success": False, "error": "Carrito no encontrado"}
@@ -571,6 +671,11 @@ class PaymentProcessService:
             summary = summary_result["summary"]
             total_amount = Decimal(str(summary["total_amount"]))
             
+            # Aparta el inventario antes de llamar a PayPal
+            reserve_error = self._reserve_cart(db, user.user_id)
+            if reserve_error:
+                return reserve_error
+            
             # Crea orden en paypal
             paypal_response = await paypal_service.create_order(
                 amount=float(total_amount),
@@ -585,8 +690,12 @@ class PaymentProcessService:
                     break
             
             if not approval_url:
+                self._release_cart(db, user.user_id)
                 return {"success": False, "error": "No se pudo obtener URL de aprobación de PayPal"}
             
+            set_reservation_reference(db, user.user_id, paypal_response.get("id"))
+            db.commit()
+            
             return {
                 "success": True,
                 "message": "Checkout PayPal iniciado",
@@ -612,6 +721,9 @@ class PaymentProcessService:
         Descripción:
             Captura un pago autorizado en PayPal, genera la orden correspondiente,
             registra el método de pago y asigna puntos al usuario si corresponde.
+            La orden (y el descuento de stock que consume la reserva) se crea antes
+            de capturar y se confirma sólo si la captura se completa; si no hay stock
+            no se cobra, y si la captura falla se revierte la orden y se libera la reserva.
 
         Parámetros:
             db (Session): Sesión de base de datos.
@@ -623,21 +735,15 @@ class PaymentProcessService:
         Retorna:
             dict: Resultado del proceso, incluyendo ID de orden y puntos generados.
         """
+        user = None
         try:
             user = db.query(User).filter(User.cognito_sub == cognito_sub).first()
             if not user or not user.account_status:
                 return {"success": False, "error": "Usuario no encontrado o inactivo"}
             
-            # Captura pago
-            capture_response = await paypal_service.capture_order(paypal_order_id)
-            
-            # Verifica estatus
-            if capture_response.get("status") != "COMPLETED":
-                return {"success": False, "error": "El pago de PayPal no se completó"}
-            
-            # Resumen
+            # Resumen (el stock se valida al descontarlo en la orden)
             summary_result = self.calculate_checkout_summary(
-                db, user.user_id, address_id, coupon_code
+                db, user.user_id, address_id, coupon_code, check_stock=False
             )
             if not summary_result.get("success"):
                 return summary_result
@@ -655,6 +761,8 @@ class PaymentProcessService:
             db.add(paypal_payment)
             db.flush()
             
+            # Crea la orden antes de cobrar: descuenta el stock (consume la reserva) y deja
+            # las filas bloqueadas hasta confirmar la captura
             order_result = order_service.create_order_from_cart(
                 db=db,
                 user_id=user.user_id,
@@ -671,8 +779,19 @@ class PaymentProcessService:
             
             if not order_result.get("success"):
                 db.rollback()
+                if order_result.get("out_of_stock"):
+                    self._release_cart(db, user.user_id)
                 return order_result
             
+            # Captura pago
+            capture_response = await paypal_service.capture_order(paypal_order_id)
+            
+            # Verifica estatus
+            if capture_response.get("status") != "COMPLETED":
+                db.rollback()
+                self._release_cart(db, user.user_id)
+                return {"success": False, "error": "El pago de PayPal no se completó"}
+            
             order = order_result["order"]
             points_earned = order_result["points_earned"]
             
@@ -693,8 +812,13 @@ class PaymentProcessService:
                     if not loyalty_result.get("success"):
                         print(f"Error al agregar puntos: {loyalty_result.get('error')}")
             
-            db.commit()
+            try:
+                db.commit()
+            except Exception:
+                logger.error("Pago PayPal %s capturado sin orden", paypal_order_id, exc_info=True)
+                raise
             db.refresh(order)
+            cart_store.discard(user.user_id)
             
             return {
                 "success": True,
@@ -705,6 +829,8 @@ class PaymentProcessService:
             }
         except Exception as e:
             db.rollback()
+            if user is not None:
+                self._release_cart(db, user.user_id)
             return {"success": False, "error": f"Error al capturar pago PayPal: {str(e)}"}
 
 payment_process_service = PaymentProcessService()
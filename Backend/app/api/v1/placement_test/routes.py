@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.models.user import User
 from app.api.v1.placement_test.service import prepare_profile_attributes
+from app.api.v1.search.ranking import invalidate_profile
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +58,7 @@ def placement_test_endpoint(data: PlacementTestInput, db: Session = Depends(get_
         db.add(new_profile)
         db.commit()
         db.refresh(new_profile)
+        invalidate_profile(user_id_to_insert)
         
         return result
         
@@ -4,40 +4,115 @@
 #              para consultar productos, obtener productos relacionados y gestionar reseñas.
 #              La mayoría son públicos excepto crear reseñas que requiere autenticación.
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from app.api.deps import get_db, get_current_user
 from app.api.v1.products import schemas
 from app.api.v1.products.service import ProductService, ReviewService
+from app.models.product import Product
+from app.models.review import Review
 from app.models.user import User
+from app.services.product_cards import ProductCard
 
 router = APIRouter()
 
 
+def to_list_items(cards: List[ProductCard]) -> List[schemas.ProductListResponse]:
+    """
+    Autor: Luis Flores
+    Descripción: Convierte tarjetas de producto (cache de product_cards) a su representación
+                 de listado.
+    Parámetros:
+        cards (List[ProductCard]): Tarjetas a convertir.
+    Retorna:
+        List[ProductListResponse]: Productos en formato de listado.
+    """
+    return [schemas.ProductListResponse.model_validate(card) for card in cards]
+
+
+def to_review_responses(reviews: List[Review]) -> List[schemas.ReviewResponse]:
+    """
+    Autor: Luis Flores
+    Descripción: Convierte reseñas (con usuario cargado) a su schema de respuesta,
+                 agregando el nombre completo del autor.
+    Parámetros:
+        reviews (List[Review]): Reseñas a convertir.
+    Retorna:
+        List[ReviewResponse]: Reseñas con nombre de usuario.
+    """
+    response = []
+    for review in reviews:
+        review_dict = schemas.ReviewResponse.from_orm(review)
+        review_dict.user_name = f"{review.user.first_name} {review.user.last_name}" if review.user else "Usuario"
+        response.append(review_dict)
+    
+    return response
+
+
 # ============ ENDPOINTS DE PRODUCTOS ============
 
-@router.get("/{product_id}", response_model=schemas.ProductResponse)
+@router.get("/", response_model=List[schemas.ProductListResponse])
+def get_products_by_ids(
+    ids: str = Query(..., description="IDs de producto separados por coma (máximo 100)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Autor: Luis Flores
+    Descripción: Obtiene varios productos en una sola petición (lista de deseos, vistos
+                 recientemente, carruseles de recomendaciones). Retorna la información de
+                 listado en el mismo orden de los IDs, omitiendo los que no existen o están
+                 inactivos. Endpoint público, no requiere autenticación.
+    Parámetros:
+        ids (str): IDs separados por coma, p. ej. "12,5,40".
+        db (Session): Sesión de base de datos.
+    Retorna:
+        List[ProductListResponse]: Productos encontrados, en el orden solicitado.
+    Excepciones:
+        HTTPException 400: Si algún ID no es un entero o se piden más de 100.
+    """
+    try:
+        product_ids = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids debe ser una lista de enteros separados por coma"
+        )
+    
+    cards = ProductService.get_products_by_ids(db, product_ids)
+    return to_list_items(cards)
+
+
+@router.get("/{product_id}", response_model=schemas.ProductDetailResponse)
 def get_product_detail(
     product_id: int,
+    review_limit: int = Query(10, ge=1, le=50, description="Reseñas incluidas en el detalle"),
     db: Session = Depends(get_db)
 ):
     """
     Autor: Luis Flores
     Descripción: Obtiene los detalles completos de un producto específico.
-                 Incluye información del producto, todas sus imágenes y reseñas.
+                 Incluye información del producto, todas sus imágenes, el resumen de
+                 reseñas (total, promedio e histograma) y la primera página de reseñas.
+                 Las páginas siguientes se obtienen con GET /products/{product_id}/reviews.
                  Endpoint público, no requiere autenticación.
     Parámetros:
         product_id (int): ID del producto a consultar.
+        review_limit (int): Cantidad de reseñas de la primera página (1-50).
         db (Session): Sesión de base de datos.
     Retorna:
-        ProductResponse: Producto completo con imágenes y rating promedio.
+        ProductDetailResponse: Producto con imágenes, resumen de reseñas y primera página.
     Excepciones:
         HTTPException 404: Si el producto no existe.
     """
-    product = ProductService.get_product_by_id(db, product_id)
-    return product
+    product, summary, reviews = ProductService.get_product_detail(db, product_id, review_limit)
+    
+    return schemas.ProductDetailResponse(
+        **schemas.ProductResponse.model_validate(product).model_dump(),
+        review_summary=schemas.ReviewSummary(**summary),
+        reviews=to_review_responses(reviews)
+    )
 
 
 @router.get("/{product_id}/related", response_model=List[schemas.ProductListResponse])
@@ -48,8 +123,9 @@ def get_related_products(
 ):
     """
     Autor: Luis Flores
-    Descripción: Obtiene productos relacionados basados en categoría y objetivos fitness.
-                 Útil para mostrar recomendaciones en la página de detalle del producto.
+    Descripción: Obtiene productos relacionados por similitud de contenido, ordenados del más
+                 al menos parecido. Útil para mostrar recomendaciones en la página de detalle
+                 del producto.
     Parámetros:
         product_id (int): ID del producto de referencia.
         limit (int): Cantidad máxima de productos relacionados a retornar (1-20).
@@ -58,26 +134,28 @@ def get_related_products(
         List[ProductListResponse]: Lista de productos relacionados con información básica.
     """
     products = ProductService.get_related_products(db, product_id, limit)
-    
-    items = []
-    for product in products:
-        primary_image = None
-        if product.product_images:
-            primary = next((img for img in product.product_images if img.is_primary), None)
-            primary_image = primary.image_path if primary else product.product_images[0].image_path
-        
-        items.append(schemas.ProductListResponse(
-            product_id=product.product_id,
-            name=product.name,
-            price=product.price,
-            stock=product.stock,
-            average_rating=product.average_rating,
-            brand=product.brand,
-            category=product.category,
-            primary_image=primary_image
-        ))
-    
-    return items
+    return to_list_items(products)
+
+
+@router.get("/{product_id}/bought-together", response_model=List[schemas.ProductListResponse])
+def get_bought_together(
+    product_id: int,
+    limit: int = Query(6, ge=1, le=20),
+    db: Session = Depends(get_db)
+):
+    """
+    Autor: Luis Flores
+    Descripción: Obtiene los productos que los clientes compran junto con este producto,
+                 calculados a partir de las órdenes entregadas (job nocturno).
+    Parámetros:
+        product_id (int): ID del producto de referencia.
+        limit (int): Cantidad máxima de productos a retornar (1-20).
+        db (Session): Sesión de base de datos.
+    Retorna:
+        List[ProductListResponse]: Productos comprados juntos, del más al menos frecuente.
+    """
+    products = ProductService.get_bought_together(db, product_id, limit)
+    return to_list_items(products)
 
 
 # ============ ENDPOINTS DE REVIEWS ============
@@ -102,15 +180,8 @@ def get_product_reviews(
         List[ReviewResponse]: Lista de reseñas con información del usuario y rating.
     """
     skip = (page - 1) * limit
-    reviews, total = ReviewService.get_product_reviews(db, product_id, skip, limit)
-    
-    response = []
-    for review in reviews:
-        review_dict = schemas.ReviewResponse.from_orm(review)
-        review_dict.user_name = f"{review.user.first_name} {review.user.last_name}" if review.user else "Usuario"
-        response.append(review_dict)
-    
-    return response
+    reviews = ReviewService.get_review_page(db, product_id, skip, limit)
+    return to_review_responses(reviews)
 
 
 @router.post(
@@ -3,10 +3,12 @@
 # Descripción: Schemas de validación y serialización para productos y reseñas.
 #              Define las estructuras de datos para productos, imágenes y reseñas.
 
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, computed_field
+from typing import Optional, List, Dict
 from datetime import datetime
 
+from app.services.image_pipeline import VARIANTS, variant_url
+
 
 # ============ PRODUCT IMAGE SCHEMAS ============
 
@@ -35,10 +37,56 @@ class ProductImageResponse(ProductImageBase):
     image_id: int
     product_id: int
 
+    @computed_field(description="URL por variante (thumb, medium, large); vacío en imágenes anteriores al pipeline")
+    @property
+    def variants(self) -> Dict[str, str]:
+        urls = {variant: variant_url(self.image_path, variant) for variant in VARIANTS}
+        return {variant: url for variant, url in urls.items() if url}
+
     class Config:
         from_attributes = True
 
 
+# ============ DIRECT UPLOAD SCHEMAS ============
+
+class ImageUploadRequest(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Schema para solicitar una política de subida directa a S3.
+    """
+    content_type: str = Field(..., description="Tipo MIME de la imagen (image/jpeg, image/png o image/webp)")
+
+
+class PresignedUploadResponse(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Política POST prefirmada: el cliente envía un multipart/form-data a `url` con
+                 todos los `fields` y el archivo al final, en el campo "file".
+    """
+    url: str = Field(..., description="URL del bucket a la que se envía el formulario")
+    fields: Dict[str, str] = Field(..., description="Campos del formulario (incluyen la firma)")
+    key: str = Field(..., description="Llave asignada al archivo; se envía al confirmar la subida")
+    expires_in: int = Field(..., description="Segundos de validez de la política")
+
+
+class ImageUploadComplete(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Schema para confirmar una subida directa a S3.
+    """
+    key: str = Field(..., description="Llave recibida en la política de subida")
+    is_primary: bool = Field(default=False, description="Marcar como imagen principal (solo productos)")
+
+
+class ImageUploadAccepted(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Respuesta al confirmar una subida: el procesamiento continúa en segundo plano.
+    """
+    key: str
+    status: str = Field(default="processing", description="Estado del procesamiento")
+
+
 # ============ PRODUCT SCHEMAS ============
 
 class ProductBase(BaseModel):
@@ -100,6 +148,7 @@ class ProductResponse(ProductBase):
                  Incluye toda la información del producto, imágenes y metadatos.
     """
     product_id: int
+    sku: Optional[str] = Field(None, description="SKU del proveedor (llave de la importación masiva)")
     average_rating: Optional[float] = Field(None, description="Rating promedio del producto (1-5)")
     is_active: bool = Field(..., description="Indica si el producto está activo")
     created_at: datetime
@@ -175,4 +224,32 @@ class ReviewResponse(ReviewBase):
     user_name: Optional[str] = Field(None, description="Nombre completo del usuario que hizo la reseña")
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class ReviewSummary(BaseModel):
+    """
+    Autor: Luis Flores
+    Descripción: Agregados de las reseñas de un producto: total, promedio e histograma
+                 de calificaciones (1-5 estrellas).
+    """
+    count: int = Field(0, description="Total de reseñas")
+    average: Optional[float] = Field(None, description="Calificación promedio (1-5)")
+    histogram: Dict[int, int] = Field(
+        default_factory=lambda: {star: 0 for star in range(1, 6)},
+        description="Cantidad de reseñas por estrella (1-5)"
+    )
+
+
+class ProductDetailResponse(ProductResponse):
+    """
+    Autor: Luis Flores
+    Descripción: Schema de respuesta del detalle de producto. Incluye los agregados de
+                 reseñas y solo la primera página de reseñas; las siguientes se obtienen
+                 con GET /products/{product_id}/reviews.
+    """
+    review_summary: ReviewSummary
+    reviews: List[ReviewResponse] = Field(
+        default=[],
+        description="Primera página de reseñas (más recientes primero)"
+    )
@@ -3,15 +3,27 @@
 # Descripción: Servicios de lógica de negocio para productos y reseñas. Implementa
 #              operaciones CRUD de productos, gestión de reseñas y cálculo de ratings.
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, and_, or_
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, and_, or_, select, update, case
+from decimal import Decimal
+from typing import Dict, List, Optional
 from fastapi import HTTPException, status
 
 from app.models.product import Product
 from app.models.product_image import ProductImage
 from app.models.review import Review
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.product_co_purchase import ProductCoPurchase
+from app.models.enum import OrderStatus
+from app.services.catalog_events import notify_catalog_change, notify_sales_change
+from app.services.inventory import redistribute_stock_shards
+from app.services.product_cards import ProductCard, product_cards
 from app.api.v1.products import schemas
+from app.api.v1.products.similarity import similarity_index
+
+# Máximo de productos por petición en la consulta por lote
+MAX_BULK_PRODUCT_IDS = 100
 
 
 class ProductService:
@@ -26,19 +38,49 @@ class ProductService:
     def get_product_by_id(db: Session, product_id: int) -> Product:
         """
         Autor: Luis Flores
-        Descripción: Obtiene un producto por ID con todas sus relaciones cargadas
-                     (imágenes y reseñas).
+        Descripción: Obtiene un producto por ID sin cargar colecciones (imágenes, reseñas).
+                     Es el cargador para uso interno (actualizar, desactivar, eliminar);
+                     las relaciones se cargan de forma diferida solo si se acceden.
         Parámetros:
             db (Session): Sesión de base de datos.
             product_id (int): ID del producto a buscar.
         Retorna:
-            Product: Producto completo con relaciones.
+            Product: Producto encontrado.
+        Excepciones:
+            HTTPException 404: Si el producto no existe.
+        """
+        product = db.query(Product).filter(Product.product_id == product_id).first()
+        
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Producto con ID {product_id} no encontrado"
+            )
+        
+        return product
+    
+    @staticmethod
+    def get_product_detail(
+        db: Session,
+        product_id: int,
+        review_limit: int = 10
+    ) -> tuple[Product, dict, List[Review]]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene lo necesario para la página de detalle: el producto con sus
+                     imágenes, los agregados de reseñas y solo la primera página de reseñas
+                     (las demás se piden al endpoint de reseñas).
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            product_id (int): ID del producto.
+            review_limit (int): Tamaño de la primera página de reseñas.
+        Retorna:
+            tuple: (producto, resumen de reseñas, reseñas de la primera página).
         Excepciones:
             HTTPException 404: Si el producto no existe.
         """
         product = db.query(Product).options(
-            joinedload(Product.product_images),
-            joinedload(Product.reviews)
+            selectinload(Product.product_images)
         ).filter(Product.product_id == product_id).first()
         
         if not product:
@@ -47,42 +89,145 @@ class ProductService:
                 detail=f"Producto con ID {product_id} no encontrado"
             )
         
-        return product
+        summary = ReviewService.get_review_summary(product)
+        reviews = ReviewService.get_review_page(db, product_id, 0, review_limit) if summary["count"] else []
+        
+        return product, summary, reviews
+    
+    @staticmethod
+    def get_products_by_ids(db: Session, product_ids: List[int]) -> List[ProductCard]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene las tarjetas de varios productos activos en el orden recibido.
+                     Los que no están en el cache de tarjetas se leen en una sola consulta
+                     WHERE product_id IN (...) más una de imágenes para todo el lote.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            product_ids (List[int]): IDs solicitados (los duplicados se ignoran).
+        Retorna:
+            List[ProductCard]: Productos activos encontrados, en el orden solicitado.
+        Excepciones:
+            HTTPException 400: Si se piden más de MAX_BULK_PRODUCT_IDS productos.
+        """
+        unique_ids = list(dict.fromkeys(product_ids))
+        if len(unique_ids) > MAX_BULK_PRODUCT_IDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Se pueden consultar máximo {MAX_BULK_PRODUCT_IDS} productos por petición"
+            )
+        
+        return product_cards.get_ordered(db, unique_ids, active_only=True)
     
     @staticmethod
     def get_related_products(
         db: Session,
         product_id: int,
         limit: int = 6
-    ) -> List[Product]:
+    ) -> List[ProductCard]:
         """
         Autor: Luis Flores
-        Descripción: Obtiene productos relacionados basados en categoría y objetivos fitness.
+        Descripción: Obtiene productos relacionados por similitud de contenido (TF-IDF sobre
+                     nombre, descripción, marca, categoría, objetivos y actividades), ordenados
+                     de mayor a menor similitud. Los vecinos salen del índice en memoria y los
+                     datos de cada producto del cache de tarjetas.
                      Excluye el producto de referencia y solo retorna productos activos.
         Parámetros:
             db (Session): Sesión de base de datos.
             product_id (int): ID del producto de referencia.
             limit (int): Cantidad máxima de productos a retornar.
         Retorna:
-            List[Product]: Lista de productos relacionados.
+            List[ProductCard]: Tarjetas de los productos relacionados.
+        Excepciones:
+            HTTPException 404: Si el producto no existe.
         """
-        product = ProductService.get_product_by_id(db, product_id)
-        
-        query = db.query(Product).options(
-            joinedload(Product.product_images)
-        ).filter(
-            and_(
-                Product.product_id != product_id,
-                Product.is_active == True,
-                or_(
-                    Product.category == product.category,
-                    *[Product.fitness_objectives.contains([obj]) 
-                      for obj in product.fitness_objectives] if product.fitness_objectives else []
-                )
+        if not similarity_index.contains(db, product_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Producto con ID {product_id} no encontrado"
             )
-        )
         
-        return query.limit(limit).all()
+        related_ids = [pid for pid, _ in similarity_index.neighbors(db, product_id, limit)]
+        if not related_ids:
+            return []
+        
+        # Respeta el orden por similitud
+        return product_cards.get_ordered(db, related_ids, active_only=True)
+    
+    @staticmethod
+    def get_bought_together(
+        db: Session,
+        product_id: int,
+        limit: int = 6
+    ) -> List[ProductCard]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene los productos que más se compran junto con el producto indicado
+                     ("los clientes también compraron"), ordenados por score de co-compra.
+                     Es una lectura directa del índice (product_id, score) de product_co_purchase,
+                     que mantiene el job nocturno; los datos de cada producto salen del cache
+                     de tarjetas.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            product_id (int): ID del producto de referencia.
+            limit (int): Cantidad máxima de productos a retornar.
+        Retorna:
+            List[ProductCard]: Productos activos comprados junto con el de referencia.
+        """
+        related_ids = [row[0] for row in db.query(
+            ProductCoPurchase.related_product_id
+        ).join(
+            Product, Product.product_id == ProductCoPurchase.related_product_id
+        ).filter(
+            ProductCoPurchase.product_id == product_id,
+            ProductCoPurchase.related_product_id != product_id,
+            Product.is_active == True
+        ).order_by(
+            ProductCoPurchase.score.desc(), ProductCoPurchase.related_product_id.asc()
+        ).limit(limit).all()]
+        
+        return product_cards.get_ordered(db, related_ids)
+    
+    @staticmethod
+    def get_bought_together_for_products(
+        db: Session,
+        product_ids: List[int],
+        limit: int = 6
+    ) -> List[ProductCard]:
+        """
+        Autor: Luis Flores
+        Descripción: Recomendaciones de co-compra para un conjunto de productos (p. ej. el
+                     carrito): suma los scores contra cada producto del conjunto y excluye los
+                     que ya forman parte de él.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            product_ids (List[int]): Productos de referencia.
+            limit (int): Cantidad máxima de productos a retornar.
+        Retorna:
+            List[ProductCard]: Productos activos recomendados, de mayor a menor score acumulado.
+        """
+        if not product_ids:
+            return []
+        
+        total_score = func.sum(ProductCoPurchase.score)
+        ranked = db.query(
+            ProductCoPurchase.related_product_id, total_score.label("total_score")
+        ).join(
+            Product, Product.product_id == ProductCoPurchase.related_product_id
+        ).filter(
+            ProductCoPurchase.product_id.in_(product_ids),
+            ProductCoPurchase.related_product_id.notin_(product_ids),
+            Product.is_active == True
+        ).group_by(
+            ProductCoPurchase.related_product_id
+        ).order_by(
+            total_score.desc(), ProductCoPurchase.related_product_id.asc()
+        ).limit(limit).all()
+        
+        related_ids = [row.related_product_id for row in ranked]
+        if not related_ids:
+            return []
+        
+        return product_cards.get_ordered(db, related_ids)
     
     @staticmethod
     def create_product(
@@ -142,6 +287,10 @@ class ProductService:
         for field, value in update_data.items():
             setattr(product, field, value)
         
+        if "stock" in update_data:
+            db.flush()
+            redistribute_stock_shards(db, [product_id])
+        
         db.commit()
         db.refresh(product)
         
@@ -184,6 +333,45 @@ class ProductService:
         db.delete(product)
         db.commit()
         return True
+    
+    @staticmethod
+    def refresh_sales_counts(db: Session) -> int:
+        """
+        Autor: Luis Flores
+        Descripción: Recalcula la columna precalculada sales_count (unidades vendidas) de
+                     todos los productos a partir de order_item, excluyendo órdenes canceladas.
+                     Se ejecuta como un único UPDATE con subconsulta correlacionada (solo de
+                     los productos cuyo conteo cambió) y respalda el orden "best_selling" de la
+                     búsqueda.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+        Retorna:
+            int: Cantidad de productos actualizados.
+        """
+        units_sold = (
+            select(func.coalesce(func.sum(OrderItem.quantity), 0))
+            .join(Order, Order.order_id == OrderItem.order_id)
+            .where(
+                OrderItem.product_id == Product.product_id,
+                Order.order_status != OrderStatus.CANCELLED
+            )
+            .scalar_subquery()
+        )
+        
+        result = db.execute(
+            update(Product)
+            .where(Product.sales_count != units_sold)
+            .values(sales_count=units_sold, updated_at=Product.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        
+        # updated_at se conserva: las ventas no son una edición del producto.
+        # sales_count solo cambia el orden "best_selling": no es un cambio de catálogo
+        if result.rowcount:
+            notify_sales_change()
+        
+        return result.rowcount
 
 
 class ReviewService:
@@ -212,15 +400,60 @@ class ReviewService:
         Retorna:
             tuple: (lista de reseñas, total de reseñas).
         """
-        query = db.query(Review).options(
-            joinedload(Review.user)
-        ).filter(Review.product_id == product_id)
-        
-        total = query.count()
-        reviews = query.order_by(Review.date_created.desc()).offset(skip).limit(limit).all()
+        total = db.query(func.count(Review.review_id)).filter(
+            Review.product_id == product_id
+        ).scalar()
+        reviews = ReviewService.get_review_page(db, product_id, skip, limit)
         
         return reviews, total
     
+    @staticmethod
+    def get_review_page(
+        db: Session,
+        product_id: int,
+        skip: int = 0,
+        limit: int = 10
+    ) -> List[Review]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene una página de reseñas (más recientes primero) con su usuario,
+                     sin contar el total.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            product_id (int): ID del producto.
+            skip (int): Cantidad de reseñas a saltar.
+            limit (int): Cantidad máxima de reseñas a retornar.
+        Retorna:
+            List[Review]: Reseñas de la página.
+        """
+        return db.query(Review).options(
+            joinedload(Review.user)
+        ).filter(
+            Review.product_id == product_id
+        ).order_by(
+            Review.date_created.desc(), Review.review_id.desc()
+        ).offset(skip).limit(limit).all()
+    
+    @staticmethod
+    def get_review_summary(product: Product) -> dict:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene los agregados de reseñas de un producto (total, promedio e
+                     histograma 1-5) desde las columnas precalculadas del producto, sin
+                     consultar la tabla de reseñas.
+        Parámetros:
+            product (Product): Producto ya cargado.
+        Retorna:
+            dict: {'count', 'average', 'histogram'}.
+        """
+        count = product.rating_count or 0
+        
+        return {
+            "count": count,
+            "average": round(float(product.rating_sum) / count, 2) if count else None,
+            "histogram": {star: getattr(product, f"rating_{star}") or 0 for star in range(1, 6)},
+        }
+    
     @staticmethod
     def create_review(
         db: Session,
@@ -278,7 +511,7 @@ class ReviewService:
 
         db.flush()
         
-        ReviewService._update_product_rating(db, product_id)
+        ReviewService._apply_rating_delta(db, product_id, 1, db_review.rating, {db_review.rating: 1})
         
         db.commit()
         db.refresh(db_review)
@@ -321,11 +554,18 @@ class ReviewService:
                 detail="No tienes permiso para editar esta reseña"
             )
         
+        old_rating = review.rating
         update_data = review_data.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(review, field, value)
         
-        ReviewService._update_product_rating(db, review.product_id)
+        new_rating = review.rating
+        if new_rating is not None and Decimal(str(new_rating)) != Decimal(str(old_rating)):
+            ReviewService._apply_rating_delta(
+                db, review.product_id, 0,
+                Decimal(str(new_rating)) - Decimal(str(old_rating)),
+                {old_rating: -1, new_rating: 1}
+            )
         
         db.commit()
         db.refresh(review)
@@ -365,33 +605,134 @@ class ReviewService:
             )
         
         product_id = review.product_id
+        rating = review.rating
         db.delete(review)
         
-        ReviewService._update_product_rating(db, product_id)
+        ReviewService._apply_rating_delta(db, product_id, -1, -Decimal(str(rating)), {rating: -1})
         
         db.commit()
         return True
     
     @staticmethod
-    def _update_product_rating(db: Session, product_id: int):
+    def _rating_star(rating) -> int:
         """
         Autor: Luis Flores
-        Descripción: Actualiza el rating promedio de un producto basándose en todas
-                     sus reseñas. Método interno usado después de crear, actualizar
-                     o eliminar reseñas.
+        Descripción: Estrella del histograma a la que corresponde una calificación
+                     (los medios puntos cuentan en la estrella inferior).
+        """
+        return min(5, max(1, int(float(rating))))
+    
+    @staticmethod
+    def _apply_rating_delta(
+        db: Session,
+        product_id: int,
+        count_delta: int,
+        sum_delta,
+        rating_deltas: Dict
+    ) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Aplica a los agregados de reseñas del producto (rating_sum, rating_count,
+                     histograma y average_rating) un UPDATE relativo en la transacción actual.
+                     Al ser relativo a los valores de la fila, dos reseñas concurrentes no se
+                     pisan entre sí y no hace falta leer las reseñas del producto.
         Parámetros:
             db (Session): Sesión de base de datos.
-            product_id (int): ID del producto a actualizar.
+            product_id (int): ID del producto.
+            count_delta (int): Cambio en la cantidad de reseñas (+1, 0 o -1).
+            sum_delta (Decimal | int): Cambio en la suma de calificaciones.
+            rating_deltas (Dict): Cambio por calificación ({rating: +1/-1}).
         Retorna:
-            None: Actualiza directamente en la base de datos.
+            None: No hace commit; el llamador confirma junto con la reseña.
         """
-        avg_rating = db.query(func.avg(Review.rating)).filter(
-            Review.product_id == product_id
-        ).scalar()
+        star_deltas: Dict[int, int] = {}
+        for rating, delta in rating_deltas.items():
+            star = ReviewService._rating_star(rating)
+            star_deltas[star] = star_deltas.get(star, 0) + delta
+        
+        sum_delta = Decimal(str(sum_delta))
+        new_count = Product.rating_count + count_delta
+        new_sum = Product.rating_sum + sum_delta
+        
+        values = {
+            "rating_count": new_count,
+            "rating_sum": new_sum,
+            "average_rating": case((new_count > 0, func.round(new_sum / new_count, 1)), else_=None),
+            # Las reseñas no son una edición del producto
+            "updated_at": Product.updated_at,
+        }
+        for star, delta in star_deltas.items():
+            if delta:
+                column = getattr(Product, f"rating_{star}")
+                values[f"rating_{star}"] = column + delta
+        
+        db.execute(
+            update(Product)
+            .where(Product.product_id == product_id)
+            .values(**values)
+            .execution_options(synchronize_session="fetch")
+        )
+    
+    @staticmethod
+    def reconcile_rating_aggregates(db: Session) -> int:
+        """
+        Autor: Luis Flores
+        Descripción: Recalcula desde la tabla review los agregados de reseñas de todos los
+                     productos (una consulta agrupada por producto y calificación) y corrige
+                     en un solo UPDATE masivo los productos cuyos valores guardados difieren.
+                     Respaldo de los UPDATE relativos ante escrituras que no pasan por el
+                     servicio (cargas directas, borrados en cascada).
+        Parámetros:
+            db (Session): Sesión de base de datos.
+        Retorna:
+            int: Cantidad de productos corregidos.
+        """
+        expected: Dict[int, dict] = {}
+        rows = db.query(Review.product_id, Review.rating, func.count(Review.review_id)).group_by(
+            Review.product_id, Review.rating
+        ).all()
+        for product_id, rating, count in rows:
+            aggregates = expected.setdefault(product_id, {
+                "rating_sum": Decimal("0"), "rating_count": 0,
+                **{f"rating_{star}": 0 for star in range(1, 6)},
+            })
+            aggregates["rating_sum"] += Decimal(str(rating)) * count
+            aggregates["rating_count"] += count
+            aggregates[f"rating_{ReviewService._rating_star(rating)}"] += count
+        
+        empty = {"rating_sum": Decimal("0"), "rating_count": 0, **{f"rating_{star}": 0 for star in range(1, 6)}}
+        fields = ["rating_sum", "rating_count"] + [f"rating_{star}" for star in range(1, 6)]
+        
+        corrections = []
+        for row in db.query(
+            Product.product_id, Product.average_rating, Product.updated_at,
+            *(getattr(Product, field) for field in fields)
+        ).all():
+            target = dict(expected.get(row.product_id, empty))
+            count = target["rating_count"]
+            target["average_rating"] = (
+                round(target["rating_sum"] / count, 1) if count else None
+            )
+            current = {field: getattr(row, field) for field in fields}
+            current["average_rating"] = row.average_rating
+            if any(
+                (current[f] is None) != (target[f] is None)
+                or (target[f] is not None and Decimal(str(current[f])) != target[f])
+                for f in target
+            ):
+                corrections.append({"product_id": row.product_id, "updated_at": row.updated_at, **target})
+        
+        if corrections:
+            db.execute(update(Product), corrections)
+        db.commit()
         
-        product = db.query(Product).filter(Product.product_id == product_id).first()
-        if product:
-            product.average_rating = float(avg_rating) if avg_rating else None
+        # El UPDATE masivo no pasa por el ORM: se avisa del cambio de catálogo manualmente
+        if corrections:
+            notify_catalog_change(row["product_id"] for row in corrections)
+        
+        return len(corrections)
+
+
 # Instancias singleton de los servicios
 product_service = ProductService()
 review_service = ReviewService()
@@ -0,0 +1,353 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Índice de similitud de productos basado en contenido. Cada producto se
+#              representa con un vector TF-IDF (nombre, descripción, marca, categoría y tags de
+#              objetivos/actividades) y los relacionados son sus vecinos más cercanos por
+#              similitud coseno. El índice se mantiene en memoria con vectores dispersos (un
+#              dict por producto más un índice invertido término -> productos activos) y se
+#              actualiza de forma incremental: ante un cambio de catálogo solo se vuelven a leer
+#              los productos afectados, y solo se re-vectorizan los que cambiaron de texto o de
+#              estado activo.
+
+import heapq
+import math
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.text import fold_text, tokenize
+from app.models.product import Product
+from app.services.catalog_events import register_catalog_listener
+
+# Vecinos precalculados por producto (límite máximo del endpoint de relacionados)
+MAX_NEIGHBORS = 20
+
+# Los vectores re-vectorizados de forma incremental usan el idf del momento; cuando los
+# cambios acumulados superan esta fracción del catálogo (y el mínimo) se recalculan todos, sin
+# releer la base de datos
+REVECTORIZE_RATIO = 0.2
+REVECTORIZE_MIN_CHANGES = 50
+
+# Peso de cada campo en la frecuencia de términos
+FIELD_WEIGHTS = {
+    "name": 2.0,
+    "category": 1.5,
+    "tags": 1.5,
+    "brand": 1.0,
+    "description": 1.0,
+}
+
+STOPWORDS = {
+    "para", "con", "por", "del", "las", "los", "una", "uno", "que", "sin", "mas", "muy",
+    "the", "and", "for", "with", "de", "en", "y",
+}
+
+
+def document_terms(
+    name: Optional[str],
+    description: Optional[str],
+    brand: Optional[str],
+    category: Optional[str],
+    fitness_objectives: Optional[List[str]],
+    physical_activities: Optional[List[str]]
+) -> Dict[str, float]:
+    """
+    Autor: Luis Flores
+    Descripción: Calcula la frecuencia ponderada de términos de un producto.
+    Parámetros:
+        name, description, brand, category (str | None): Campos de texto del producto.
+        fitness_objectives, physical_activities (List[str] | None): Tags del producto.
+    Retorna:
+        Dict[str, float]: Peso acumulado por término.
+    """
+    counts: Counter = Counter()
+    for field, value in (("name", name), ("description", description), ("category", category)):
+        for word in tokenize(value):
+            if word not in STOPWORDS:
+                counts[word] += FIELD_WEIGHTS[field]
+
+    brand_term = fold_text(brand)
+    if brand_term:
+        counts[f"brand:{brand_term}"] += FIELD_WEIGHTS["brand"]
+
+    for tag in (fitness_objectives or []) + (physical_activities or []):
+        tag_term = fold_text(tag).replace(" ", "_")
+        if tag_term:
+            counts[f"tag:{tag_term}"] += FIELD_WEIGHTS["tags"]
+
+    return dict(counts)
+
+
+class SimilarityIndex:
+    """
+    Autor: Luis Flores
+    Descripción: Índice TF-IDF disperso en memoria con vecinos más cercanos por producto.
+                 Los cambios de catálogo solo marcan productos como pendientes; la siguiente
+                 consulta los lee y re-vectoriza fuera del lock de lectura (un solo hilo a la
+                 vez; mientras tanto las demás consultas usan el índice vigente) y publica el
+                 resultado en un paso corto. Los cambios que no tocan el texto ni el estado
+                 activo (precio, stock) no modifican el índice. Los vecinos de cada producto se
+                 calculan bajo demanda y solo se descartan los que un cambio puede alterar.
+    """
+
+    def __init__(self, max_neighbors: int = MAX_NEIGHBORS):
+        self.max_neighbors = max_neighbors
+        # _lock protege el índice publicado y los pendientes; _refresh_lock serializa a quien
+        # aplica los cambios (dueño de _documents y _document_frequency)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._loaded = False
+        self._reload = False
+        self._pending: Set[int] = set()
+        self._documents: Dict[int, Tuple[Dict[str, float], bool]] = {}
+        self._document_frequency: Counter = Counter()
+        self._stale = 0
+        self._vectors: Dict[int, Dict[str, float]] = {}
+        self._active: Dict[int, bool] = {}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._neighbors: Dict[int, List[Tuple[int, float]]] = {}
+
+    # ---------- Mantenimiento ----------
+
+    def mark_changed(self, product_ids: Set[int]) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Listener de catálogo. Marca productos para recargarse; un conjunto vacío
+                     (cambio masivo sin IDs) hace que se relean todos los productos, pero solo
+                     se aplican los que realmente cambiaron.
+        """
+        with self._lock:
+            if product_ids:
+                self._pending.update(product_ids)
+            else:
+                self._reload = True
+
+    def invalidate(self) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Fuerza la reconstrucción completa en la siguiente consulta.
+        """
+        with self._lock:
+            self._loaded = False
+
+    def _load_rows(self, db: Session, product_ids: Optional[Set[int]] = None) -> list:
+        query = db.query(
+            Product.product_id, Product.name, Product.description, Product.brand,
+            Product.category, Product.fitness_objectives, Product.physical_activities,
+            Product.is_active
+        )
+        if product_ids is not None:
+            query = query.filter(Product.product_id.in_(product_ids))
+        return query.all()
+
+    def _ensure_fresh(self, db: Session) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Aplica los cambios pendientes si los hay. La carga inicial espera a que
+                     termine; después, si otro hilo ya está aplicando cambios, se sigue usando
+                     el índice vigente.
+        """
+        with self._lock:
+            loaded = self._loaded
+            if loaded and not self._pending and not self._reload:
+                return
+        if not self._refresh_lock.acquire(blocking=not loaded):
+            return
+        try:
+            self._refresh(db)
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self, db: Session) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Lee los productos pendientes (todos en la carga inicial o tras un cambio
+                     sin IDs), re-vectoriza los que cambiaron y publica el resultado. Debe
+                     llamarse con _refresh_lock adquirido.
+        """
+        with self._lock:
+            full = not self._loaded
+            reload = full or self._reload
+            pending, self._pending, self._reload = self._pending, set(), False
+        if not reload and not pending:
+            # Otro hilo aplicó los cambios mientras se esperaba el lock
+            return
+
+        if full:
+            self._documents.clear()
+            self._document_frequency = Counter()
+            self._stale = 0
+
+        rows = self._load_rows(db) if reload else self._load_rows(db, pending)
+        seen = set()
+        changed: Set[int] = set()
+        for row in rows:
+            seen.add(row.product_id)
+            document = (
+                document_terms(
+                    row.name, row.description, row.brand, row.category,
+                    row.fitness_objectives, row.physical_activities
+                ),
+                bool(row.is_active),
+            )
+            if self._documents.get(row.product_id) != document:
+                self._set_document(row.product_id, document)
+                changed.add(row.product_id)
+        for product_id in (set(self._documents) if reload else pending) - seen:
+            if product_id in self._documents:
+                self._set_document(product_id, None)
+                changed.add(product_id)
+
+        self._stale += len(changed)
+        if full or self._stale > max(REVECTORIZE_RATIO * len(self._documents), REVECTORIZE_MIN_CHANGES):
+            self._publish_all()
+        else:
+            self._publish_changes(changed)
+
+    def _set_document(self, product_id: int, document: Optional[Tuple[Dict[str, float], bool]]) -> None:
+        previous = self._documents.pop(product_id, None)
+        if previous:
+            for term in previous[0]:
+                self._document_frequency[term] -= 1
+                if self._document_frequency[term] <= 0:
+                    del self._document_frequency[term]
+        if document is not None:
+            self._documents[product_id] = document
+            self._document_frequency.update(document[0].keys())
+
+    def _vectorize(self, terms: Dict[str, float]) -> Dict[str, float]:
+        # tf sublineal por idf suavizado, con norma L2
+        total = len(self._documents)
+        weights = {
+            term: (1.0 + math.log(weight))
+            * (math.log((1 + total) / (1 + self._document_frequency[term])) + 1.0)
+            for term, weight in terms.items()
+        }
+        norm = math.sqrt(sum(value * value for value in weights.values()))
+        if not norm:
+            return {}
+        return {term: value / norm for term, value in weights.items()}
+
+    def _publish_all(self) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Recalcula todos los vectores con el idf actual y los publica de una vez.
+        """
+        vectors = {pid: self._vectorize(terms) for pid, (terms, _) in self._documents.items()}
+        active = {pid: is_active for pid, (_, is_active) in self._documents.items()}
+        postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        for product_id, vector in vectors.items():
+            if active[product_id]:
+                for term, weight in vector.items():
+                    postings[term][product_id] = weight
+
+        with self._lock:
+            self._vectors, self._active, self._postings = vectors, active, dict(postings)
+            self._neighbors = {}
+            self._loaded = True
+        self._stale = 0
+
+    def _publish_changes(self, changed: Set[int]) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Publica los vectores de los productos que cambiaron y descarta solo los
+                     vecinos en cache que pueden cambiar: los de esos productos, las listas
+                     que los incluyen y aquellas en las que su nuevo vector entraría.
+        """
+        updates = {
+            product_id: (self._vectorize(self._documents[product_id][0]), self._documents[product_id][1])
+            if product_id in self._documents else None
+            for product_id in changed
+        }
+
+        with self._lock:
+            for product_id, update in updates.items():
+                for term in self._vectors.pop(product_id, {}):
+                    posting = self._postings.get(term)
+                    if posting is not None:
+                        posting.pop(product_id, None)
+                        if not posting:
+                            del self._postings[term]
+                self._active.pop(product_id, None)
+                if update is None:
+                    continue
+                vector, is_active = update
+                self._vectors[product_id] = vector
+                self._active[product_id] = is_active
+                if is_active:
+                    for term, weight in vector.items():
+                        self._postings.setdefault(term, {})[product_id] = weight
+
+            entering = [self._vectors[pid] for pid in changed if self._active.get(pid)]
+            for product_id, cached in list(self._neighbors.items()):
+                if product_id in changed or any(pid in changed for pid, _ in cached):
+                    del self._neighbors[product_id]
+                    continue
+                floor = cached[-1][1] if len(cached) >= self.max_neighbors else 0.0
+                vector = self._vectors.get(product_id, {})
+                if any(_dot(vector, other) > floor for other in entering):
+                    del self._neighbors[product_id]
+            self._loaded = True
+
+    # ---------- Consultas ----------
+
+    def contains(self, db: Session, product_id: int) -> bool:
+        """
+        Autor: Luis Flores
+        Descripción: Indica si el producto existe en el índice (activo o inactivo).
+        """
+        self._ensure_fresh(db)
+        with self._lock:
+            return product_id in self._vectors
+
+    def neighbors(self, db: Session, product_id: int, limit: int = 6) -> List[Tuple[int, float]]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene los productos activos más similares a un producto.
+        Parámetros:
+            db (Session): Sesión de base de datos (solo se usa si hay cambios pendientes).
+            product_id (int): Producto de referencia.
+            limit (int): Máximo de vecinos a retornar.
+        Retorna:
+            List[Tuple[int, float]]: (product_id, similitud) en orden descendente; vacío si el
+                producto no existe o no tiene términos en común con otros.
+        """
+        self._ensure_fresh(db)
+        with self._lock:
+            cached = self._neighbors.get(product_id)
+            if cached is None:
+                cached = self._compute_neighbors(product_id)
+                self._neighbors[product_id] = cached
+            return cached[:limit]
+
+    def _compute_neighbors(self, product_id: int) -> List[Tuple[int, float]]:
+        # Producto punto disperso contra los productos activos que comparten algún término
+        vector = self._vectors.get(product_id)
+        if not vector:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term, weight in vector.items():
+            for other, other_weight in self._postings.get(term, {}).items():
+                scores[other] += weight * other_weight
+        scores.pop(product_id, None)
+
+        # Orden por similitud descendente; empates por product_id
+        best = heapq.nsmallest(
+            self.max_neighbors,
+            ((-score, other) for other, score in scores.items() if score > 0)
+        )
+        return [(other, -score) for score, other in best]
+
+
+def _dot(left: Dict[str, float], right: Dict[str, float]) -> float:
+    if len(left) > len(right):
+        left, right = right, left
+    return sum(weight * right.get(term, 0.0) for term, weight in left.items())
+
+
+# Instancia global del índice; se actualiza con cada cambio de catálogo
+similarity_index = SimilarityIndex()
+register_catalog_listener(similarity_index.mark_changed)
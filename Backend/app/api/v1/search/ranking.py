@@ -0,0 +1,303 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Re-ranking personalizado de resultados de búsqueda a partir del perfil fitness
+#              (placement test). Cada producto se representa como un vector binario de términos
+#              (objetivos, actividades y palabras de nombre/categoría); la matriz de productos y
+#              la afinidad de cada plan contra todo el catálogo se precalculan en memoria por
+#              versión del catálogo. En cada petición solo se hace un producto punto sobre los
+#              productos de la página.
+
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.cache import TTLCache
+from app.core.text import fold_text, tokenize
+from app.models.fitness_profile import FitnessProfile
+from app.models.product import Product
+from app.services.catalog_events import get_catalog_version
+
+# Términos asociados a cada plan del placement test (objetivos/actividades y productos sugeridos)
+PLAN_TERMS: Dict[str, Dict[str, float]] = {
+    "BeStrong": {
+        "muscle_gain": 1.0, "strength": 1.0, "weightlifting": 0.5, "crossfit": 0.5,
+        "w:proteina": 1.0, "w:creatina": 1.0, "w:pre": 0.5, "w:entreno": 0.5,
+    },
+    "BeLean": {
+        "weight_loss": 1.0, "fat_loss": 1.0, "running": 0.5, "cardio": 0.5,
+        "w:termogenico": 1.0, "w:omega": 0.5, "w:ligera": 0.5,
+    },
+    "BeBalance": {
+        "health": 1.0, "wellness": 1.0, "maintenance": 1.0, "yoga": 0.5,
+        "w:multivitaminico": 1.0, "w:vitamina": 0.5, "w:colageno": 1.0,
+    },
+    "BeDefine": {
+        "definition": 1.0, "toning": 1.0, "fat_loss": 0.5, "crossfit": 0.5,
+        "w:carnitina": 1.0, "w:bcaa": 1.0, "w:ligera": 0.5,
+    },
+    "BeNutri": {
+        "nutrition": 1.0, "health": 0.5, "weight_loss": 0.5,
+        "w:batido": 1.0, "w:fibra": 1.0, "w:omega": 0.5,
+    },
+}
+
+# Respuestas del test (goal_declared / activity_type) traducidas a términos de catálogo
+GOAL_TERMS: Dict[str, Dict[str, float]] = {
+    "gain_muscle": {"muscle_gain": 1.0, "strength": 0.5},
+    "lose_fat": {"weight_loss": 1.0, "fat_loss": 1.0},
+    "maintain": {"health": 1.0, "maintenance": 1.0},
+    "define": {"definition": 1.0, "toning": 1.0},
+    "nutrition": {"nutrition": 1.0, "health": 0.5},
+}
+
+ACTIVITY_TERMS: Dict[str, Dict[str, float]] = {
+    "strength": {"strength": 0.5, "weightlifting": 0.5},
+    "cardio": {"cardio": 0.5, "running": 0.5, "cycling": 0.5},
+    "mixed": {"crossfit": 0.5, "functional": 0.5},
+}
+
+# Perfil de cada usuario (plan y términos propios); se invalida al guardar un nuevo test
+profile_cache = TTLCache(maxsize=4096, ttl=settings.SEARCH_CACHE_TTL_SECONDS)
+
+
+def _token(value: Optional[str]) -> str:
+    """
+    Autor: Luis Flores
+    Descripción: Normaliza un objetivo/actividad a un término ("Muscle Gain" -> "muscle_gain").
+    """
+    return fold_text(value).replace("-", " ").replace(" ", "_")
+
+
+def _words(value: Optional[str]) -> List[str]:
+    """
+    Autor: Luis Flores
+    Descripción: Obtiene los términos de palabra ("w:") de un texto libre, con un stemming
+                 mínimo de plurales ("Proteínas" -> "w:proteina").
+    """
+    return [f"w:{word}" for word in tokenize(value)]
+
+
+def product_terms(
+    name: Optional[str],
+    category: Optional[str],
+    fitness_objectives: Optional[Iterable[str]],
+    physical_activities: Optional[Iterable[str]]
+) -> Set[str]:
+    """
+    Autor: Luis Flores
+    Descripción: Construye el conjunto de términos que describen a un producto.
+    Parámetros:
+        name (str | None): Nombre del producto.
+        category (str | None): Categoría.
+        fitness_objectives (Iterable[str] | None): Objetivos fitness.
+        physical_activities (Iterable[str] | None): Actividades físicas.
+    Retorna:
+        Set[str]: Términos del producto.
+    """
+    terms = {_token(value) for value in (fitness_objectives or []) if value}
+    terms.update(_token(value) for value in (physical_activities or []) if value)
+    terms.update(_words(name))
+    terms.update(_words(category))
+    terms.discard("")
+    return terms
+
+
+def profile_terms(attributes: Optional[dict]) -> Dict[str, float]:
+    """
+    Autor: Luis Flores
+    Descripción: Términos propios del usuario (además de los de su plan): objetivo declarado,
+                 tipo de actividad, objetivos fitness y productos recomendados del perfil.
+    Parámetros:
+        attributes (dict | None): FitnessProfile.attributes.
+    Retorna:
+        Dict[str, float]: Peso por término.
+    """
+    attributes = attributes or {}
+    terms: Dict[str, float] = {}
+
+    def add(term: str, weight: float) -> None:
+        if term:
+            terms[term] = max(terms.get(term, 0.0), weight)
+
+    goal = _token(attributes.get("goal_declared"))
+    for term, weight in GOAL_TERMS.get(goal, {goal: 1.0} if goal else {}).items():
+        add(term, weight)
+
+    for term, weight in ACTIVITY_TERMS.get(_token(attributes.get("activity_type")), {}).items():
+        add(term, weight)
+
+    for objective in attributes.get("fitness_objectives") or []:
+        add(_token(objective), 1.0)
+
+    for product_name in attributes.get("recommended_products") or []:
+        for term in _words(product_name):
+            add(term, 0.5)
+
+    return terms
+
+
+def get_profile_attributes(db: Session, user_id: int) -> Optional[dict]:
+    """
+    Autor: Luis Flores
+    Descripción: Obtiene los atributos del perfil fitness del usuario, usando el cache de
+                 perfiles para no consultar la base de datos en cada búsqueda.
+    Parámetros:
+        db (Session): Sesión de base de datos.
+        user_id (int): ID del usuario.
+    Retorna:
+        dict | None: Atributos del perfil o None si el usuario no ha hecho el test.
+    """
+    cached = profile_cache.get(user_id, False)
+    if cached is not False:
+        return cached
+
+    attributes = db.query(FitnessProfile.attributes).filter(
+        FitnessProfile.user_id == user_id
+    ).scalar()
+    profile_cache.set(user_id, attributes)
+    return attributes
+
+
+def invalidate_profile(user_id: int) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Descarta el perfil en cache de un usuario (al guardar un nuevo test).
+    """
+    profile_cache.pop(user_id)
+
+
+class _AffinitySnapshot:
+    """
+    Autor: Luis Flores
+    Descripción: Matriz producto x término de una versión del catálogo y afinidades por plan.
+    """
+
+    def __init__(self, version: int, positions: Dict[int, int], vocabulary: Dict[str, int], matrix: np.ndarray):
+        self.version = version
+        self.positions = positions
+        self.vocabulary = vocabulary
+        self.matrix = matrix
+        self.plan_affinity: Dict[str, np.ndarray] = {}
+
+    def vectorize(self, terms: Dict[str, float]) -> np.ndarray:
+        """
+        Autor: Luis Flores
+        Descripción: Convierte pesos por término a un vector del vocabulario del catálogo
+                     (los términos que ningún producto tiene se ignoran).
+        """
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for term, weight in terms.items():
+            column = self.vocabulary.get(term)
+            if column is not None:
+                vector[column] = weight
+        return vector
+
+    def affinity_for_plan(self, plan: str) -> np.ndarray:
+        """
+        Autor: Luis Flores
+        Descripción: Afinidad de todos los productos con un plan (calculada una vez por versión).
+        """
+        affinity = self.plan_affinity.get(plan)
+        if affinity is None:
+            affinity = self.matrix @ self.vectorize(PLAN_TERMS.get(plan, {}))
+            self.plan_affinity[plan] = affinity
+        return affinity
+
+
+class ProfileRanker:
+    """
+    Autor: Luis Flores
+    Descripción: Re-ordena resultados de búsqueda por afinidad con el perfil fitness del
+                 usuario. La matriz del catálogo se reconstruye solo cuando cambia la versión
+                 del catálogo.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[_AffinitySnapshot] = None
+        self._lock = threading.Lock()
+
+    def _get_snapshot(self, db: Session) -> _AffinitySnapshot:
+        """
+        Autor: Luis Flores
+        Descripción: Retorna la matriz vigente, reconstruyéndola si el catálogo cambió.
+        """
+        version = get_catalog_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == version:
+                return snapshot
+
+            rows = db.query(
+                Product.product_id, Product.name, Product.category,
+                Product.fitness_objectives, Product.physical_activities
+            ).filter(Product.is_active == True).all()
+
+            positions: Dict[int, int] = {}
+            vocabulary: Dict[str, int] = {}
+            features: List[Set[str]] = []
+            for row in rows:
+                terms = product_terms(row.name, row.category, row.fitness_objectives, row.physical_activities)
+                for term in terms:
+                    vocabulary.setdefault(term, len(vocabulary))
+                positions[row.product_id] = len(features)
+                features.append(terms)
+
+            matrix = np.zeros((len(features), len(vocabulary)), dtype=np.float32)
+            for index, terms in enumerate(features):
+                matrix[index, [vocabulary[term] for term in terms]] = 1.0
+
+            snapshot = _AffinitySnapshot(version, positions, vocabulary, matrix)
+            self._snapshot = snapshot
+            return snapshot
+
+    def rerank(self, db: Session, product_ids: List[int], attributes: Optional[dict]) -> List[int]:
+        """
+        Autor: Luis Flores
+        Descripción: Ordena los IDs de una página por afinidad con el perfil. Los empates
+                     (incluidos productos sin afinidad) conservan el orden original.
+        Parámetros:
+            db (Session): Sesión de base de datos (solo se usa si hay que reconstruir la matriz).
+            product_ids (List[int]): IDs de la página en su orden original.
+            attributes (dict | None): FitnessProfile.attributes del usuario.
+        Retorna:
+            List[int]: IDs re-ordenados.
+        """
+        if len(product_ids) < 2 or not attributes:
+            return product_ids
+
+        snapshot = self._get_snapshot(db)
+        if not snapshot.vocabulary:
+            return product_ids
+
+        known = np.array([pid in snapshot.positions for pid in product_ids])
+        rows = np.array([snapshot.positions.get(pid, 0) for pid in product_ids])
+
+        plan = attributes.get("recommended_plan") or ""
+        user_vector = snapshot.vectorize(profile_terms(attributes))
+        scores = snapshot.affinity_for_plan(plan)[rows] + snapshot.matrix[rows] @ user_vector
+        scores = np.where(known, scores, 0.0)
+
+        if not scores.any():
+            return product_ids
+
+        order = np.argsort(-scores, kind="stable")
+        return [product_ids[i] for i in order]
+
+    def clear(self) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Descarta la matriz precalculada.
+        """
+        with self._lock:
+            self._snapshot = None
+
+
+# Instancia global del ranker
+profile_ranker = ProfileRanker()
@@ -7,9 +7,11 @@ from sqlalchemy.orm import Session
 from typing import Optional
 import math
 
-from app.api.deps import get_db
+from app.api.deps import get_db, get_optional_user
 from app.api.v1.search import schemas
+from app.api.v1.search.ranking import get_profile_attributes
 from app.api.v1.search.service import SearchService
+from app.models.user import User
 
 router = APIRouter()
 
@@ -24,6 +26,8 @@ def search_products(
     min_price: Optional[float] = Query(None, description="Precio mínimo"),
     max_price: Optional[float] = Query(None, description="Precio máximo"),
     is_active: bool = Query(True, description="Solo productos activos"),
+    sort: Optional[schemas.SearchSort] = Query(None, description="Orden: price_asc, price_desc, rating, best_selling, newest"),
+    current_user: Optional[User] = Depends(get_optional_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -41,13 +45,19 @@ def search_products(
     - **min_price** y **max_price**: Rango de precios
     - **is_active**: Mostrar solo productos activos
     
+    **Ordenamiento:**
+    - **sort**: price_asc, price_desc, rating, best_selling (más vendidos) o newest
+    - Sin **sort**, si el usuario está autenticado y tiene perfil fitness, los resultados
+      de la página se ordenan por afinidad con su plan y objetivos
+    
     **Paginación:**
     - **page**: Número de página (default: 1)
     - **limit**: Items por página (default: 10, max: 100)
     """
     skip = (page - 1) * limit
+    profile_attributes = get_profile_attributes(db, current_user.user_id) if current_user else None
     
-    products, total = SearchService.search_and_filter_products(
+    cards, total = SearchService.search_product_cards(
         db=db,
         query=query,
         skip=skip,
@@ -57,27 +67,13 @@ def search_products(
         physical_activity=physical_activity,
         min_price=min_price,
         max_price=max_price,
-        is_active=is_active
+        is_active=is_active,
+        sort=sort,
+        profile_attributes=profile_attributes
     )
     
-    # Convertir a ProductListResponse
-    items = []
-    for product in products:
-        primary_image = None
-        if product.product_images:
-            primary = next((img for img in product.product_images if img.is_primary), None)
-            primary_image = primary.image_path if primary else product.product_images[0].image_path
-        
-        items.append(schemas.ProductListResponse(
-            product_id=product.product_id,
-            name=product.name,
-            price=product.price,
-            stock=product.stock,
-            average_rating=product.average_rating,
-            brand=product.brand,
-            category=product.category,
-            primary_image=primary_image
-        ))
+    # Convertir las tarjetas de producto a ProductListResponse
+    items = [schemas.ProductListResponse.model_validate(card) for card in cards]
     
     total_pages = math.ceil(total / limit)
     
@@ -4,6 +4,7 @@
 
 from pydantic import BaseModel, Field
 from typing import List, Optional
+from enum import Enum
 
 # ============ PRODUCT LIST RESPONSE ============
 class ProductListResponse(BaseModel):
@@ -35,6 +36,16 @@ class PaginatedResponse(BaseModel):
     total_pages: int
 
 
+# ============ SORTING ============
+class SearchSort(str, Enum):
+    """Órdenes disponibles para la búsqueda (cada uno respaldado por un índice)"""
+    PRICE_ASC = "price_asc"
+    PRICE_DESC = "price_desc"
+    RATING = "rating"
+    BEST_SELLING = "best_selling"
+    NEWEST = "newest"
+
+
 # ============ SEARCH FILTERS ============
 class SearchFilters(BaseModel):
     """Filtros disponibles para búsqueda"""
@@ -44,4 +55,5 @@ class SearchFilters(BaseModel):
     physical_activity: Optional[str] = None
     min_price: Optional[float] = None
     max_price: Optional[float] = None
-    is_active: bool = True
\ No newline at end of file
+    is_active: bool = True
+    sort: Optional[SearchSort] = None
\ No newline at end of file
@@ -3,20 +3,88 @@
 # Descripción: Servicio para búsqueda avanzada y filtrado de productos, incluyendo categorías,
 #              actividades físicas, objetivos fitness, rangos de precio y combinación de filtros.
 
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from sqlalchemy import func, or_, and_
 from typing import List, Optional, Tuple
+import time
 from fastapi import HTTPException, status
 
+from app.config import settings
+from app.core.cache import TTLCache
+from app.core.text import fold_text
 from app.models.product import Product
+from app.services.catalog_events import get_catalog_version, get_sales_version
+from app.services.search_log import search_log_buffer
+from app.services.product_cards import ProductCard, product_cards
 from app.api.v1.search import schemas
+from app.api.v1.search.ranking import profile_ranker
+
+# ORDER BY de cada orden disponible; product_id desempata para paginación estable
+SORT_ORDERS = {
+    schemas.SearchSort.PRICE_ASC: (Product.price.asc(), Product.product_id.asc()),
+    schemas.SearchSort.PRICE_DESC: (Product.price.desc(), Product.product_id.asc()),
+    schemas.SearchSort.RATING: (Product.average_rating.desc().nulls_last(), Product.product_id.asc()),
+    schemas.SearchSort.BEST_SELLING: (Product.sales_count.desc(), Product.product_id.asc()),
+    schemas.SearchSort.NEWEST: (Product.created_at.desc(), Product.product_id.asc()),
+}
+
+# Cache de resultados: llave normalizada -> (ids de la página, total)
+search_cache = TTLCache(
+    maxsize=settings.SEARCH_CACHE_MAX_ENTRIES,
+    ttl=settings.SEARCH_CACHE_TTL_SECONDS
+)
 
 
 class SearchService:
     """Servicio para búsqueda y filtrado de productos"""
     
     @staticmethod
-    def search_and_filter_products(
+    def build_cache_key(
+        query: Optional[str],
+        skip: int,
+        limit: int,
+        is_active: Optional[bool],
+        **filters
+    ) -> tuple:
+        """
+        Autor: Luis Flores
+
+        Descripción:
+            Construye la llave de cache de una búsqueda. El texto se normaliza (minúsculas,
+            sin acentos), los filtros se ordenan por nombre y se incluye la versión del
+            catálogo, de modo que cualquier cambio de productos invalida las entradas previas.
+            El orden "best_selling" incluye además la versión de las unidades vendidas.
+
+        Parámetros:
+            query (str | None): Texto de búsqueda.
+            skip (int): Registros omitidos (paginación).
+            limit (int): Tamaño de página.
+            is_active (bool | None): Filtro de productos activos.
+            **filters: Resto de filtros (categoría, actividad, objetivo, precios).
+
+        Retorna:
+            tuple: Llave hashable para el cache.
+        """
+        normalized_filters = tuple(sorted(
+            (name, float(value) if name in ("min_price", "max_price") else value)
+            for name, value in filters.items()
+            if value is not None
+        ))
+        sales_version = (
+            get_sales_version() if filters.get("sort") == schemas.SearchSort.BEST_SELLING.value else None
+        )
+        return (
+            get_catalog_version(),
+            sales_version,
+            fold_text(query),
+            normalized_filters,
+            is_active,
+            skip,
+            limit,
+        )
+    
+    @staticmethod
+    def search_product_ids(
         db: Session,
         query: Optional[str] = None,
         skip: int = 0,
@@ -26,83 +94,239 @@ class SearchService:
         fitness_objective: Optional[str] = None,
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
-        is_active: bool = True
-    ) -> Tuple[List[Product], int]:
+        is_active: bool = True,
+        sort: Optional[schemas.SearchSort] = None
+    ) -> Tuple[List[int], int]:
         """
-        Autor: Luis Flores y Lizbeth Barajas
+        Autor: Luis Flores
 
         Descripción:
-            Realiza una búsqueda avanzada de productos aplicando múltiples filtros como texto,
-            categoría, actividad física, objetivos fitness, rango de precios y estado de actividad.
-            Incluye paginación y devuelve el total sin paginar.
+            Obtiene los IDs de la página solicitada y el total de coincidencias. Los resultados
+            se sirven desde el cache de búsquedas cuando existen; solo en un fallo de cache se
+            ejecutan las consultas de conteo y de página, que seleccionan únicamente IDs.
+            La primera página de cada búsqueda se registra en el buffer de analítica
+            (query, filtros, total y latencia); la escritura a BD la hace el scheduler.
 
         Parámetros:
-            db (Session): Sesión activa de la base de datos.
-            query (str | None): Texto de búsqueda para nombre, descripción, marca o categoría.
-            skip (int): Número de registros a omitir para paginación.
-            limit (int): Número máximo de registros a devolver.
-            category (str | None): Categoría específica a filtrar.
-            physical_activity (str | None): Actividad física asociada al producto.
-            fitness_objective (str | None): Objetivo fitness asociado al producto.
-            min_price (float | None): Precio mínimo permitido.
-            max_price (float | None): Precio máximo permitido.
-            is_active (bool): Estado del producto (activo/inactivo).
+            Los mismos que search_and_filter_products.
 
         Retorna:
-            Tuple[List[Product], int]: Lista de productos filtrados y total de coincidencias.
+            Tuple[List[int], int]: IDs de productos de la página y total de coincidencias.
         """
+        if min_price and max_price and min_price > max_price:
+            raise HTTPException(400, "min_price no puede ser mayor que max_price")
 
-        db_query = db.query(Product).options(
-            joinedload(Product.product_images)
-        )
+        started = time.perf_counter()
+        sort = schemas.SearchSort(sort) if sort else None
+        filters = {
+            "category": category,
+            "physical_activity": physical_activity,
+            "fitness_objective": fitness_objective,
+            "min_price": min_price,
+            "max_price": max_price,
+            "sort": sort.value if sort else None,
+        }
+        cache_key = SearchService.build_cache_key(query, skip, limit, is_active, **filters)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            product_ids, total = cached
+            if skip == 0:
+                SearchService._log_search(query, filters, total, started)
+            return list(product_ids), total
+
+        conditions = []
         
         # Filtro de activos
         if is_active is not None:
-            db_query = db_query.filter(Product.is_active == is_active)
-        
-        # Búsqueda por texto
-        if query:
-            search_filter = or_(
-                Product.name.ilike(f"%{query}%"),
-                Product.description.ilike(f"%{query}%"),
-                Product.brand.ilike(f"%{query}%"),
-                Product.category.ilike(f"%{query}%")
-            )
-            db_query = db_query.filter(search_filter)
+            conditions.append(Product.is_active == is_active)
+        
+        # Búsqueda por texto (sobre el texto normalizado: sin acentos ni mayúsculas)
+        folded_query = fold_text(query)
+        if folded_query:
+            conditions.append(Product.search_text.like(f"%{folded_query}%"))
         
         # Filtro por categoría
         if category:
-            db_query = db_query.filter(Product.category == category)
+            conditions.append(Product.category == category)
         
         # Filtro por actividad física
         if physical_activity:
-            db_query = db_query.filter(
-                Product.physical_activities.contains([physical_activity])
-            )
+            conditions.append(Product.physical_activities.contains([physical_activity]))
         
         # Filtro por objetivo fitness
         if fitness_objective:
-            db_query = db_query.filter(
-                Product.fitness_objectives.contains([fitness_objective])
-            )
+            conditions.append(Product.fitness_objectives.contains([fitness_objective]))
         
         # Filtros de precio
         if min_price is not None:
-            db_query = db_query.filter(Product.price >= min_price)
+            conditions.append(Product.price >= min_price)
         
         if max_price is not None:
-            db_query = db_query.filter(Product.price <= max_price)
-
-        if min_price and max_price and min_price > max_price:
-            raise HTTPException(400, "min_price no puede ser mayor que max_price")
+            conditions.append(Product.price <= max_price)
         
         # Obtener total antes de paginar
-        total = db_query.count()
+        total = db.query(func.count(Product.product_id)).filter(*conditions).scalar() or 0
+        
+        # Ordenamiento en SQL (respaldado por índices) y paginación (solo IDs)
+        order_by = SORT_ORDERS.get(sort, (Product.product_id.asc(),))
+        product_ids = [
+            row[0] for row in
+            db.query(Product.product_id).filter(*conditions)
+            .order_by(*order_by).offset(skip).limit(limit).all()
+        ]
+        
+        search_cache.set(cache_key, (tuple(product_ids), total))
+        if skip == 0:
+            SearchService._log_search(query, filters, total, started)
+        return product_ids, total
+    
+    @staticmethod
+    def _log_search(query: Optional[str], filters: dict, total: int, started: float) -> None:
+        """
+        Autor: Luis Flores
+
+        Descripción:
+            Agrega la búsqueda al buffer de analítica. Solo se registra la primera página para
+            que la paginación no infle los conteos por query.
+
+        Parámetros:
+            query (str | None): Texto de búsqueda original.
+            filters (dict): Filtros de la búsqueda (se guardan solo los que tienen valor).
+            total (int): Total de coincidencias.
+            started (float): Marca de time.perf_counter() al iniciar la búsqueda.
+
+        Retorna:
+            None
+        """
+        applied = {
+            name: float(value) if name in ("min_price", "max_price") else value
+            for name, value in filters.items()
+            if value is not None
+        }
+        search_log_buffer.record(
+            query=fold_text(query),
+            filters=applied,
+            result_count=total,
+            latency_ms=(time.perf_counter() - started) * 1000
+        )
+    
+    @staticmethod
+    def search_page_ids(
+        db: Session,
+        sort: Optional[schemas.SearchSort] = None,
+        profile_attributes: Optional[dict] = None,
+        **params
+    ) -> Tuple[List[int], int]:
+        """
+        Autor: Luis Flores
+
+        Descripción:
+            Obtiene los IDs de la página (ver search_product_ids) y, si hay perfil fitness y
+            no hay orden explícito, los re-ordena por afinidad con el perfil.
+
+        Parámetros:
+            Los mismos que search_and_filter_products.
+
+        Retorna:
+            Tuple[List[int], int]: IDs de la página en orden final y total de coincidencias.
+        """
+        product_ids, total = SearchService.search_product_ids(db, sort=sort, **params)
+        
+        if product_ids and profile_attributes and sort is None:
+            product_ids = profile_ranker.rerank(db, product_ids, profile_attributes)
+        
+        return product_ids, total
+    
+    @staticmethod
+    def search_product_cards(
+        db: Session,
+        **params
+    ) -> Tuple[List[ProductCard], int]:
+        """
+        Autor: Luis Flores
+
+        Descripción:
+            Igual que search_and_filter_products, pero retorna las tarjetas de producto del
+            cache en lugar de entidades del ORM. Es lo que usa el endpoint de búsqueda: con
+            el cache de búsquedas y el de tarjetas calientes, una página no consulta la BD.
+
+        Parámetros:
+            Los mismos que search_and_filter_products.
+
+        Retorna:
+            Tuple[List[ProductCard], int]: Tarjetas de la página y total de coincidencias.
+        """
+        product_ids, total = SearchService.search_page_ids(db, **params)
+        return product_cards.get_ordered(db, product_ids), total
+    
+    @staticmethod
+    def search_and_filter_products(
+        db: Session,
+        query: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 10,
+        category: Optional[str] = None,
+        physical_activity: Optional[str] = None,
+        fitness_objective: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        is_active: bool = True,
+        sort: Optional[schemas.SearchSort] = None,
+        profile_attributes: Optional[dict] = None
+    ) -> Tuple[List[Product], int]:
+        """
+        Autor: Luis Flores y Lizbeth Barajas
+
+        Descripción:
+            Realiza una búsqueda avanzada de productos aplicando múltiples filtros como texto,
+            categoría, actividad física, objetivos fitness, rango de precios y estado de actividad.
+            Incluye paginación y devuelve el total sin paginar. Los IDs de cada página se
+            obtienen del cache de búsquedas (ver search_product_ids).
+
+        Parámetros:
+            db (Session): Sesión activa de la base de datos.
+            query (str | None): Texto de búsqueda para nombre, descripción, marca o categoría.
+            skip (int): Número de registros a omitir para paginación.
+            limit (int): Número máximo de registros a devolver.
+            category (str | None): Categoría específica a filtrar.
+            physical_activity (str | None): Actividad física asociada al producto.
+            fitness_objective (str | None): Objetivo fitness asociado al producto.
+            min_price (float | None): Precio mínimo permitido.
+            max_price (float | None): Precio máximo permitido.
+            is_active (bool): Estado del producto (activo/inactivo).
+            sort (SearchSort | None): Orden de resultados (price_asc, price_desc, rating,
+                best_selling, newest). Sin orden se usa el ID del producto.
+            profile_attributes (dict | None): Perfil fitness del usuario autenticado. Si se
+                indica y no hay orden explícito, la página se re-ordena por afinidad con el perfil.
+
+        Retorna:
+            Tuple[List[Product], int]: Lista de productos filtrados y total de coincidencias.
+        """
+        product_ids, total = SearchService.search_page_ids(
+            db,
+            query=query,
+            skip=skip,
+            limit=limit,
+            category=category,
+            physical_activity=physical_activity,
+            fitness_objective=fitness_objective,
+            min_price=min_price,
+            max_price=max_price,
+            is_active=is_active,
+            sort=sort,
+            profile_attributes=profile_attributes
+        )
+        
+        if not product_ids:
+            return [], total
+        
+        products = db.query(Product).filter(Product.product_id.in_(product_ids)).all()
         
-        # Paginación
-        products = db_query.offset(skip).limit(limit).all()
+        # Respeta el orden de la página
+        by_id = {product.product_id: product for product in products}
+        ordered = [by_id[pid] for pid in product_ids if pid in by_id]
         
-        return products, total
+        return ordered, total
     
     @staticmethod
     def get_available_categories(db: Session) -> List[str]:
@@ -17,6 +17,8 @@ from app.models.product import Product as ProductModel
 from app.models.enum import OrderStatus
 from app.models.cart_item import CartItem as CartItemModel
 from app.models.shopping_cart import ShoppingCart as ShoppingCartModel
+from app.services.cart_store import cart_store
+from app.services.inventory import InsufficientStockError, decrement_stock, quantities_by_product
 
 class ShippingService:
     """
@@ -29,7 +31,8 @@ class ShippingService:
         tracking_number = ShippingService.generate_tracking_number()
         total_subtotal = Decimal("0.0")
         order_item_models = [] # lista para guardar los items del carrito
-        # obtiene el carrito del usuario
+        # obtiene el carrito del usuario (con los cambios diferidos ya escritos)
+        cart_store.flush(db, order_in.user_id)
         cart = db.query(ShoppingCartModel).filter(ShoppingCartModel.user_id == order_in.user_id).first()
 
         if not cart:
@@ -51,13 +54,6 @@ class ShippingService:
         for cart_item in cart_items:
             product = cart_item.product
 
-            # verifica el stock de los productos
-            if product.stock < cart_item.quantity:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Stock insuficiente para el producto: {product.name} | Solcitados: {cart_item.quantity} | Disponibles: {product.stock}"
-                )
-            
             # calcula el subtotal del item
             item_subtotal = product.price * cart_item.quantity
             total_subtotal += item_subtotal
@@ -69,8 +65,6 @@ class ShippingService:
                 subtotal=item_subtotal
             )
             order_item_models.append(new_order_item)
-            # Reduce el stock del producto comprado
-            product.stock -= cart_item.quantity 
 
             # En esta parte, faltaria la logica de los cupones y del coste del envio
             # shiiping_cost =
@@ -94,10 +88,36 @@ class ShippingService:
 
         try:
             db.add(new_order)
+            db.flush() # Obtiene new_order.order_id para el ledger de inventario
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"No se pudo crear el pedido: {e}"
+            )
+
+        # descuenta el stock de todas las líneas con un UPDATE condicional (sin leer y comparar en Python)
+        try:
+            decrement_stock(
+                db,
+                quantities_by_product((item.product_id, item.quantity) for item in cart_items),
+                user_id=order_in.user_id,
+                order_id=new_order.order_id
+            )
+        except InsufficientStockError as e:
+            names = ", ".join(item.product.name for item in cart_items if item.product_id in e.product_ids)
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Stock insuficiente para el producto: {names}"
+            )
+
+        try:
             for cart_item in cart_items:
                 db.delete(cart_item)
             db.commit()
             db.refresh(new_order) # Obtiene new_order.order_id
+            cart_store.discard(order_in.user_id) # Después del commit para no recargar el carrito viejo
         except Exception as e:
             db.rollback()
             raise HTTPException(
@@ -17,8 +17,9 @@ from app.models.product import Product
 from app.models.order import Order
 from app.models.order_item import OrderItem
 from app.models.address import Address
-from app.models.enum import SubscriptionStatus, OrderStatus, PaymentType
+from app.models.enum import SubscriptionStatus, OrderStatus, PaymentType, InventoryMovementReason
 from app.services.stripe_service import stripe_service
+from app.services.inventory import adjust_stock, quantities_by_product
 
 
 class SubscriptionService:
@@ -551,9 +552,14 @@ class SubscriptionService:
                     subtotal=product.price
                 )
                 db.add(order_item)
-                
-                # Reducir stock
-                product.stock -= 1
+            
+            # Reducir stock (el cobro ya se hizo: se descuenta sin condición y queda en el ledger)
+            adjust_stock(
+                db,
+                quantities_by_product((product.product_id, -1) for product in products),
+                InventoryMovementReason.SUBSCRIPTION,
+                order_id=new_order.order_id
+            )
             
             # Actualizar suscripción
             subscription.last_payment_date = date.today()
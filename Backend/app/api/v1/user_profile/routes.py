@@ -6,6 +6,7 @@
 
 from fastapi import (
     APIRouter,
+    BackgroundTasks,
     HTTPException,
     Depends,
     UploadFile,
@@ -18,6 +19,9 @@ from app.api.deps import get_current_user
 from app.models.user import User
 from app.api.v1.user_profile import schemas
 from app.api.v1.user_profile.service import user_profile_service
+from app.api.v1.products import schemas as product_schemas
+from app.services.image_uploads import owns_upload_key, process_profile_upload, profile_upload_prefix
+from app.services.s3_service import S3Service
 
 router = APIRouter()
 
@@ -178,6 +182,74 @@ async def update_profile_image(
     
     return result
 
+@router.post("/me/image/upload-url", response_model=product_schemas.PresignedUploadResponse, status_code=status.HTTP_200_OK)
+def create_profile_image_upload_url(
+    upload_data: product_schemas.ImageUploadRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Autor: Luis Flores
+
+    Descripción:
+        Genera una política POST prefirmada para subir la imagen de perfil directo a S3.
+        Después de subirla, el cliente debe confirmarla en /me/image/complete.
+
+    Parámetros:
+        upload_data (ImageUploadRequest): Tipo de contenido de la imagen.
+        current_user (User): Usuario autenticado.
+
+    Retorna:
+        PresignedUploadResponse: URL, campos del formulario y llave asignada.
+    """
+    try:
+        return S3Service().create_presigned_upload(
+            profile_upload_prefix(current_user.cognito_sub),
+            upload_data.content_type
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/me/image/complete", response_model=product_schemas.ImageUploadAccepted, status_code=status.HTTP_202_ACCEPTED)
+def complete_profile_image_upload(
+    upload_data: product_schemas.ImageUploadComplete,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Autor: Luis Flores
+
+    Descripción:
+        Confirma la subida directa de la imagen de perfil. El redimensionamiento y el
+        reemplazo de la imagen anterior se hacen en segundo plano.
+
+    Parámetros:
+        upload_data (ImageUploadComplete): Llave subida.
+        background_tasks (BackgroundTasks): Tareas a ejecutar después de responder.
+        current_user (User): Usuario autenticado.
+
+    Retorna:
+        ImageUploadAccepted: Llave aceptada para procesamiento.
+    """
+    cognito_sub = current_user.cognito_sub
+
+    if not owns_upload_key(upload_data.key, profile_upload_prefix(cognito_sub)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La llave no corresponde al usuario"
+        )
+
+    if not S3Service().object_exists(upload_data.key):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No se encontró el archivo subido"
+        )
+
+    background_tasks.add_task(process_profile_upload, upload_data.key, cognito_sub)
+    return {"key": upload_data.key}
+
 @router.delete("/me", response_model=schemas.DeleteAccountResponse, status_code=status.HTTP_200_OK)
 async def delete_my_account(
     db: Session = Depends(get_db),
@@ -6,7 +6,7 @@
 # Su propósito es centralizar parámetros sensibles y configuraciones relacionadas
 # con la base de datos, AWS, Cognito, S3, JWT, Stripe y PayPal.
 import json
-from typing import List
+from typing import List, Optional
 from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
@@ -36,6 +36,8 @@ class Settings(BaseSettings):
     
     # ============ AWS S3 ============
     S3_BUCKET_NAME: str
+    S3_ENDPOINT_URL: Optional[str] = None  # S3 compatible local (MinIO, moto server)
+    S3_PRESIGNED_EXPIRES_SECONDS: int = 600
     
     # ============ JWT ============
     JWT_SECRET_KEY: str | None = None
@@ -46,12 +48,43 @@ class Settings(BaseSettings):
     STRIPE_API_KEY: str
     STRIPE_SECRET_KEY: str
     STRIPE_WEBHOOK_SECRET: str
+    # Vigencia de la sesión de Checkout (Stripe exige entre 30 minutos y 24 horas); la reserva
+    # de inventario del checkout dura lo mismo más INVENTORY_RESERVATION_TTL_MINUTES de margen
+    # para la entrega del webhook
+    STRIPE_CHECKOUT_EXPIRES_MINUTES: int = 30
     
     # ============ PAYPAL ============
     PAYPAL_CLIENT_ID: str
     PAYPAL_CLIENT_SECRET: str
     PAYPAL_API_BASE_URL: str
     
+    # ============ CACHE ============
+    SEARCH_CACHE_TTL_SECONDS: int = 60
+    SEARCH_CACHE_MAX_ENTRIES: int = 2048
+    PRODUCT_CARD_CACHE_SIZE: int = 5000
+    
+    # ============ SEARCH LOG ============
+    SEARCH_LOG_BUFFER_SIZE: int = 10000
+    SEARCH_LOG_FLUSH_SECONDS: int = 5
+    
+    # ============ IMAGES ============
+    IMAGE_WORKERS: int = 4
+    IMAGE_UPLOAD_CONCURRENCY: int = 8
+    
+    # ============ INVENTORY ============
+    INVENTORY_RESERVATION_TTL_MINUTES: int = 15
+    INVENTORY_MAX_STOCK_SHARDS: int = 64
+    INVENTORY_SHARD_SYNC_SECONDS: int = 30
+    LOW_STOCK_THRESHOLD: int = 10
+    
+    # ============ CART ============
+    # "database" escribe cada cambio directo; "memory" los difiere (solo con un worker)
+    CART_STORE_BACKEND: str = "database"
+    CART_STORE_FLUSH_SECONDS: int = 5
+    CART_STORE_MAX_CARTS: int = 10000
+    CART_ABANDONED_DAYS: int = 60
+    CART_CLEANUP_BATCH_SIZE: int = 500
+    
     # ============ CORS ============
      #BACKEND_CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:8000"]
     BACKEND_CORS_ORIGINS: List[str] = []
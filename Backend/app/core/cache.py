@@ -0,0 +1,90 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Cache en memoria de tamaño acotado con expiración (TTL) y política LRU.
+#              Es seguro para uso concurrente desde los hilos del servidor y de los jobs.
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Autor: Luis Flores
+    Descripción: Cache LRU con expiración por entrada. Cuando se alcanza el tamaño
+                 máximo se descarta la entrada usada menos recientemente.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene un valor del cache si existe y no ha expirado.
+        Parámetros:
+            key (Hashable): Llave a buscar.
+            default (Any): Valor a retornar si la llave no existe o expiró.
+        Retorna:
+            Any: Valor almacenado o el valor por defecto.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Guarda un valor en el cache, desalojando la entrada más antigua
+                     si se supera el tamaño máximo.
+        Parámetros:
+            key (Hashable): Llave del valor.
+            value (Any): Valor a guardar.
+        Retorna:
+            None
+        """
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        Autor: Luis Flores
+        Descripción: Elimina una llave del cache y retorna su valor si existía.
+        """
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else default
+
+    def clear(self) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Vacía completamente el cache.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+
+_MISSING = object()
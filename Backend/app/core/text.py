@@ -0,0 +1,61 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Utilidades de normalización de texto usadas por la búsqueda y los caches
+#              (minúsculas, sin acentos y con espacios colapsados).
+
+import re
+import unicodedata
+from typing import List, Optional
+
+_WORD_SPLIT = re.compile(r"[^a-z0-9]+")
+
+
+def fold_text(value: Optional[str]) -> str:
+    """
+    Autor: Luis Flores
+    Descripción: Normaliza un texto para comparaciones: lo pasa a minúsculas, elimina
+                 acentos/diacríticos y colapsa espacios repetidos.
+    Parámetros:
+        value (str | None): Texto a normalizar.
+    Retorna:
+        str: Texto normalizado ("Proteína  Whey" -> "proteina whey").
+    """
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    without_marks = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(without_marks.casefold().split())
+
+
+def build_search_text(*parts: Optional[str]) -> str:
+    """
+    Autor: Luis Flores
+    Descripción: Construye el texto de búsqueda normalizado de un producto a partir de
+                 sus campos de texto.
+    Parámetros:
+        *parts (str | None): Campos de texto (nombre, descripción, marca, categoría).
+    Retorna:
+        str: Texto normalizado separado por espacios.
+    """
+    return fold_text(" ".join(p for p in parts if p))
+
+
+def tokenize(value: Optional[str], min_length: int = 3) -> List[str]:
+    """
+    Autor: Luis Flores
+    Descripción: Divide un texto normalizado en palabras, descartando las muy cortas y
+                 aplicando un stemming mínimo de plurales.
+    Parámetros:
+        value (str | None): Texto a dividir.
+        min_length (int): Longitud mínima de palabra.
+    Retorna:
+        List[str]: Palabras normalizadas ("Proteínas Whey" -> ["proteina", "whey"]).
+    """
+    words = []
+    for word in _WORD_SPLIT.split(fold_text(value)):
+        if len(word) < min_length:
+            continue
+        if len(word) > 4 and word.endswith("s"):
+            word = word[:-1]
+        words.append(word)
+    return words
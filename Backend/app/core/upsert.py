@@ -0,0 +1,31 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: INSERT ... ON CONFLICT según el dialecto de la sesión. PostgreSQL (producción)
+#              y SQLite (pruebas) comparten la misma sintaxis de upsert en SQLAlchemy
+#              (on_conflict_do_update / on_conflict_do_nothing y excluded).
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+_UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def upsert_insert(db: Session):
+    """
+    Autor: Luis Flores
+    Descripción: Obtiene la función insert() del dialecto de la sesión, que soporta ON CONFLICT.
+    Parámetros:
+        db (Session): Sesión de base de datos.
+    Retorna:
+        Callable: postgresql.insert o sqlite.insert.
+    Excepciones:
+        RuntimeError: Si el dialecto no soporta upsert.
+    """
+    name = db.get_bind().dialect.name
+    insert = _UPSERT_DIALECTS.get(name)
+    if insert is None:
+        raise RuntimeError(f"Upsert no soportado en {name}")
+    return insert
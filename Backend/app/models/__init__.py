@@ -17,6 +17,12 @@ from .review import Review
 from .loyalty_tier import LoyaltyTier
 from .user_loyalty import UserLoyalty
 from .point_history import PointHistory
+from .search_log import SearchLog
+from .product_co_purchase import ProductCoPurchase
+from .inventory_reservation import InventoryReservation
+from .product_stock_shard import ProductStockShard
+from .inventory_movement import InventoryMovement
+from .low_stock_product import LowStockProduct
 
 __all__ = [
     "UserRole",
@@ -26,6 +32,7 @@ __all__ = [
     "SubscriptionStatus",
     "OrderStatus",
     "PointEventType",
+    "InventoryMovementReason",
     "User",
     "FitnessProfile",
     "Address",
@@ -43,5 +50,11 @@ __all__ = [
     "LoyaltyTier",
     "UserLoyalty",
     "PointHistory",
+    "SearchLog",
+    "ProductCoPurchase",
+    "InventoryReservation",
+    "ProductStockShard",
+    "InventoryMovement",
+    "LowStockProduct",
     "Base",
 ]
\ No newline at end of file
@@ -40,4 +40,11 @@ class OrderStatus(str, Enum):
 class PointEventType(str, Enum):
     """Point history event type enum"""
     EARNED = "earned"
-    EXPIRED = "expired"
\ No newline at end of file
+    EXPIRED = "expired"
+class InventoryMovementReason(str, Enum):
+    """Inventory movement reason enum"""
+    SALE = "sale"
+    CANCELLATION = "cancellation"
+    SUBSCRIPTION = "subscription"
+    ADJUSTMENT = "adjustment"
+    IMPORT = "import"
@@ -0,0 +1,28 @@
+from sqlalchemy import Integer, ForeignKey, DateTime, Enum, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
+from datetime import datetime, UTC
+from app.core.database import Base
+from .enum import InventoryMovementReason
+
+class InventoryMovement(Base):
+    __tablename__ = "inventory_movement"
+
+    # Keys
+    movement_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    product_id: Mapped[int] = mapped_column(Integer, nullable=False) # No FK: the history (and the product's ID) survives deleting the product
+    order_id: Mapped[Optional[int]] = mapped_column(ForeignKey("order.order_id", ondelete="SET NULL"), nullable=True) # Sales, cancellations and subscription shipments
+
+    # Attributes
+    quantity_change: Mapped[int] = mapped_column(Integer, nullable=False) # Negative for units out - positive for units in
+    reason: Mapped[InventoryMovementReason] = mapped_column(Enum(InventoryMovementReason, native_enum=False, values_callable=lambda x: [e.value for e in x]), nullable=False)
+    stock_after: Mapped[Optional[int]] = mapped_column(Integer, nullable=True) # Null for sharded products (total is synced later)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=lambda: datetime.now(UTC))
+
+    # Constraints (append-only: rows are never updated)
+    __table_args__ = (
+        Index("ix_inventory_movement_product_created", "product_id", "created_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<InventoryMovement(movement_id={self.movement_id}, product_id={self.product_id}, quantity_change={self.quantity_change}, reason={self.reason})>"
@@ -0,0 +1,27 @@
+from sqlalchemy import Integer, String, ForeignKey, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
+from datetime import datetime, UTC
+from app.core.database import Base
+
+class InventoryReservation(Base):
+    __tablename__ = "inventory_reservation"
+
+    # Keys
+    reservation_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("product.product_id", ondelete="CASCADE"), nullable=False)
+
+    # Attributes
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False) # Units held in product.reserved_stock
+    reference: Mapped[Optional[str]] = mapped_column(String(255), nullable=True) # Stripe session / PayPal order that took the reservation
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=lambda: datetime.now(UTC))
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    # Constraints
+    __table_args__ = (
+        Index("ix_inventory_reservation_product", "product_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<InventoryReservation(reservation_id={self.reservation_id}, product_id={self.product_id}, quantity={self.quantity})>"
@@ -0,0 +1,17 @@
+from sqlalchemy import Integer, ForeignKey, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime, UTC
+from app.core.database import Base
+
+class LowStockProduct(Base):
+    __tablename__ = "low_stock_product"
+
+    # Keys
+    product_id: Mapped[int] = mapped_column(ForeignKey("product.product_id", ondelete="CASCADE"), primary_key=True)
+
+    # Attributes
+    stock: Mapped[int] = mapped_column(Integer, nullable=False, index=True) # Stock when last updated (always below LOW_STOCK_THRESHOLD)
+    flagged_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=lambda: datetime.now(UTC)) # When the product crossed below the threshold
+
+    def __repr__(self) -> str:
+        return f"<LowStockProduct(product_id={self.product_id}, stock={self.stock})>"
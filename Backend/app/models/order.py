@@ -1,4 +1,4 @@
-from sqlalchemy import DateTime, Boolean, String, Numeric, Integer, ForeignKey, Enum, CheckConstraint
+from sqlalchemy import DateTime, Boolean, String, Numeric, Integer, ForeignKey, Enum, CheckConstraint, Index, false
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import Optional, List
 from datetime import datetime, UTC
@@ -27,6 +27,7 @@ class Order(Base):
     shipping_cost: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
     total_amount: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
     points_earned: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    co_purchase_processed: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default=false()) # Already counted in product_co_purchase
 
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="orders")
@@ -45,6 +46,7 @@ class Order(Base):
             "(is_subscription = true AND subscription_id IS NOT NULL) OR (is_subscription = false)",
             name="check_subscription_order"
         ),
+        Index("ix_order_co_purchase_pending", "order_status", "co_purchase_processed"),
     )
 
     def __repr__(self) -> str:
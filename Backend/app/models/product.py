@@ -1,9 +1,10 @@
-from sqlalchemy import Integer, String, Text, Numeric, JSON, Boolean, DateTime
+from sqlalchemy import Integer, String, Text, Numeric, JSON, Boolean, DateTime, Index, event, inspect
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from typing import List, Optional
 from decimal import Decimal
 from datetime import datetime, UTC
 from app.core.database import Base
+from app.core.text import build_search_text
 
 class Product(Base):
     __tablename__ = "product"
@@ -12,6 +13,7 @@ class Product(Base):
     product_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
 
     # Attributes
+    sku: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, unique=True, index=True) # Added - Supplier SKU, natural key for bulk import upserts
     name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     description: Mapped[str] = mapped_column(Text, nullable=False)
     brand: Mapped[str] = mapped_column(String(100), nullable=False)
@@ -21,10 +23,22 @@ class Product(Base):
     nutritional_value: Mapped[str] = mapped_column(Text, nullable=False)
     price: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
     stock: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    reserved_stock: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0") # Added - Units held by active checkout reservations (available = stock - reserved_stock)
+    stock_shards: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0") # Added - Hot SKUs: stock split across N product_stock_shard rows (0 = not sharded; stock is then a periodically synced total)
     average_rating: Mapped[Optional[Decimal]] = mapped_column(Numeric(2, 1), nullable=True, default=None)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.now(UTC))
-    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.now(UTC), onupdate=datetime.now(UTC))
+    primary_image_path: Mapped[Optional[str]] = mapped_column(String(500), nullable=True) # Added - Primary (or first) image, kept in sync by ProductImage events (list views)
+    search_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True) # Added - Normalized text (lowercase, no accents) for search
+    sales_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0") # Added - Units sold, refreshed from order_item (best_selling sort)
+    rating_sum: Mapped[Decimal] = mapped_column(Numeric(10, 1), nullable=False, default=0, server_default="0") # Added - Sum of review ratings (updated with each review write)
+    rating_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0") # Added - Number of reviews
+    rating_1: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0") # Added - Reviews per star (half points count in the lower star)
+    rating_2: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    rating_3: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    rating_4: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    rating_5: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=lambda: datetime.now(UTC)) # Callable so each row gets its own timestamp (newest sort)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
     
     # Relationships
     product_images: Mapped[List["ProductImage"]] = relationship("ProductImage", back_populates="product", cascade="all, delete-orphan")
@@ -33,4 +47,32 @@ class Product(Base):
     reviews: Mapped[List["Review"]] = relationship("Review", back_populates="product", cascade="all, delete-orphan")
     
     def __repr__(self) -> str:
-        return f"<Product(product_id={self.product_id}, name={self.name})>"
\ No newline at end of file
+        return f"<Product(product_id={self.product_id}, name={self.name})>"
+
+
+# Indexes for the search sort orders (always filtered by is_active, product_id as tiebreaker)
+Index("ix_product_active_price", Product.is_active, Product.price, Product.product_id)
+Index("ix_product_active_sales", Product.is_active, Product.sales_count.desc(), Product.product_id)
+Index("ix_product_active_created", Product.is_active, Product.created_at.desc(), Product.product_id)
+# NULLS LAST in an index is PostgreSQL-only
+Index(
+    "ix_product_active_rating",
+    Product.is_active, Product.average_rating.desc().nulls_last(), Product.product_id
+).ddl_if(dialect="postgresql")
+
+
+SEARCH_TEXT_FIELDS = ("name", "description", "brand", "category")
+
+
+@event.listens_for(Product, "before_insert")
+def _set_search_text(mapper, connection, target: Product) -> None:
+    # Calcula el texto normalizado usado por la búsqueda
+    target.search_text = build_search_text(*(getattr(target, f) for f in SEARCH_TEXT_FIELDS))
+
+
+@event.listens_for(Product, "before_update")
+def _refresh_search_text(mapper, connection, target: Product) -> None:
+    # Solo se recalcula si cambió alguno de los campos de texto
+    state = inspect(target)
+    if any(state.attrs[f].history.has_changes() for f in SEARCH_TEXT_FIELDS):
+        target.search_text = build_search_text(*(getattr(target, f) for f in SEARCH_TEXT_FIELDS))
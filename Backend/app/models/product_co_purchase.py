@@ -0,0 +1,22 @@
+from sqlalchemy import Integer, Float, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+
+class ProductCoPurchase(Base):
+    __tablename__ = "product_co_purchase"
+
+    # Keys
+    product_id: Mapped[int] = mapped_column(ForeignKey("product.product_id", ondelete="CASCADE"), primary_key=True)
+    related_product_id: Mapped[int] = mapped_column(ForeignKey("product.product_id", ondelete="CASCADE"), primary_key=True)
+
+    # Attributes
+    co_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0) # Delivered orders containing both products (diagonal row: orders containing the product)
+    score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0) # Cosine similarity: co_count / sqrt(n_product * n_related)
+
+    # Constraints
+    __table_args__ = (
+        Index("ix_product_co_purchase_score", "product_id", score.desc()),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ProductCoPurchase(product_id={self.product_id}, related_product_id={self.related_product_id}, score={self.score})>"
@@ -1,6 +1,8 @@
-from sqlalchemy import String, Boolean, ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Boolean, ForeignKey, event, select, update, inspect
+from sqlalchemy.orm import Mapped, mapped_column, relationship, Session, object_session
+from sqlalchemy.orm.attributes import set_committed_value
 from app.core.database import Base
+from app.models.product import Product
 
 class ProductImage(Base):
     __tablename__ = "product_image"
@@ -18,4 +20,39 @@ class ProductImage(Base):
 
     def __repr__(self) -> str:
         return f"<ProductImage(image_id={self.image_id}, product_id={self.product_id})>"
-    
\ No newline at end of file
+    
+
+
+def _sync_primary_image(connection, target: "ProductImage") -> None:
+    # Copia a product.primary_image_path la imagen principal (o la primera subida)
+    path = connection.scalar(
+        select(ProductImage.image_path)
+        .where(ProductImage.product_id == target.product_id)
+        .order_by(ProductImage.is_primary.desc(), ProductImage.image_id)
+        .limit(1)
+    )
+    connection.execute(
+        update(Product.__table__)
+        .where(Product.__table__.c.product_id == target.product_id)
+        .values(primary_image_path=path)
+    )
+
+    # Mantiene al día el producto si ya está cargado en la sesión
+    session = object_session(target)
+    if session is not None:
+        product = session.identity_map.get(Session.identity_key(Product, target.product_id))
+        if product is not None:
+            set_committed_value(product, "primary_image_path", path)
+
+
+@event.listens_for(ProductImage, "after_insert")
+@event.listens_for(ProductImage, "after_delete")
+def _image_added_or_removed(mapper, connection, target: ProductImage) -> None:
+    _sync_primary_image(connection, target)
+
+
+@event.listens_for(ProductImage, "after_update")
+def _image_changed(mapper, connection, target: ProductImage) -> None:
+    state = inspect(target)
+    if state.attrs.is_primary.history.has_changes() or state.attrs.image_path.history.has_changes():
+        _sync_primary_image(connection, target)
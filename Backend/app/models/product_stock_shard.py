@@ -0,0 +1,16 @@
+from sqlalchemy import Integer, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.database import Base
+
+class ProductStockShard(Base):
+    __tablename__ = "product_stock_shard"
+
+    # Keys
+    product_id: Mapped[int] = mapped_column(ForeignKey("product.product_id", ondelete="CASCADE"), primary_key=True)
+    shard_no: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # Attributes
+    stock: Mapped[int] = mapped_column(Integer, nullable=False, default=0) # Available units in this shard (product total = sum of shards)
+
+    def __repr__(self) -> str:
+        return f"<ProductStockShard(product_id={self.product_id}, shard_no={self.shard_no}, stock={self.stock})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, ForeignKey, Numeric, Text, DateTime
+from sqlalchemy import Integer, ForeignKey, Numeric, Text, DateTime, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from datetime import datetime, UTC
 from typing import Optional
@@ -25,5 +25,10 @@ class Review(Base):
     order: Mapped[Optional["Order"]] = relationship("Order", back_populates="reviews")
     user: Mapped["User"] = relationship("User", back_populates="reviews")
 
+    # Indexes
+    __table_args__ = (
+        Index("ix_review_product_date", "product_id", date_created.desc(), review_id.desc()), # Review pages per product (newest first)
+    )
+
     def __repr__(self) -> str:
         return f"<Review(review_id={self.review_id}, product_id={self.product_id}, rating={self.rating})>"
\ No newline at end of file
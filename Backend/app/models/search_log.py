@@ -0,0 +1,21 @@
+from sqlalchemy import Integer, String, Float, JSON, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
+from datetime import datetime, UTC
+from app.core.database import Base
+
+class SearchLog(Base):
+    __tablename__ = "search_log"
+
+    # Keys
+    search_log_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    # Attributes
+    query: Mapped[str] = mapped_column(String(255), nullable=False, default="", index=True) # Normalized text (lowercase, no accents), empty if only filters
+    filters: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    result_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    latency_ms: Mapped[float] = mapped_column(Float, nullable=False)
+    searched_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=lambda: datetime.now(UTC), index=True)
+
+    def __repr__(self) -> str:
+        return f"<SearchLog(search_log_id={self.search_log_id}, query={self.query}, result_count={self.result_count})>"
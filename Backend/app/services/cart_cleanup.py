@@ -0,0 +1,104 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Limpieza de carritos abandonados (job del scheduler). Un carrito está
+#              abandonado si ni él ni sus items cambiaron en CART_ABANDONED_DAYS días. Se
+#              eliminan por lotes de CART_CLEANUP_BATCH_SIZE (índices sobre updated_at), cada
+#              lote en su propia transacción corta, para no retener bloqueos sobre las tablas
+#              del carrito que usa el resto de la aplicación.
+
+import logging
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, UTC
+from typing import Optional
+
+from sqlalchemy import delete, exists, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.cart_item import CartItem
+from app.models.shopping_cart import ShoppingCart
+from app.services.cart_store import cart_store
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CartCleanupStats:
+    """
+    Autor: Luis Flores
+    Descripción: Métricas de una ejecución de la limpieza.
+    """
+    carts: int = 0
+    items: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+
+def purge_abandoned_carts(
+    db: Session,
+    idle_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> CartCleanupStats:
+    """
+    Autor: Luis Flores
+    Descripción: Elimina los carritos abandonados y sus items por lotes. Cada lote toma los
+                 carritos más antiguos con FOR UPDATE SKIP LOCKED (un carrito que se está
+                 modificando se deja para la siguiente ejecución), elimina sus items y los
+                 carritos y hace commit. Antes se escriben los cambios diferidos del store de
+                 carritos para que sus fechas estén al día, y después se olvidan los carritos
+                 eliminados.
+    Parámetros:
+        db (Session): Sesión de base de datos.
+        idle_days (int, opcional): Días sin cambios (por defecto CART_ABANDONED_DAYS).
+        batch_size (int, opcional): Carritos por lote (por defecto CART_CLEANUP_BATCH_SIZE).
+        now (datetime, opcional): Fecha de referencia; por defecto ahora.
+    Retorna:
+        CartCleanupStats: Carritos e items eliminados, lotes y duración.
+    """
+    started = time.monotonic()
+    idle_days = idle_days or settings.CART_ABANDONED_DAYS
+    batch_size = batch_size or settings.CART_CLEANUP_BATCH_SIZE
+    cutoff = (now or datetime.now(UTC)) - timedelta(days=idle_days)
+    stats = CartCleanupStats()
+
+    cart_store.flush(db)
+
+    idle_carts = (
+        select(ShoppingCart.cart_id)
+        .where(
+            ShoppingCart.updated_at < cutoff,
+            ~exists().where(CartItem.cart_id == ShoppingCart.cart_id, CartItem.updated_at >= cutoff)
+        )
+        .order_by(ShoppingCart.updated_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+    while True:
+        cart_ids = db.scalars(idle_carts).all()
+        if not cart_ids:
+            break
+
+        items = db.execute(delete(CartItem).where(CartItem.cart_id.in_(cart_ids))).rowcount
+        user_ids = db.scalars(
+            delete(ShoppingCart)
+            .where(ShoppingCart.cart_id.in_(cart_ids))
+            .returning(ShoppingCart.user_id)
+        ).all()
+        db.commit()
+
+        for user_id in user_ids:
+            cart_store.discard(user_id)
+        stats.carts += len(user_ids)
+        stats.items += items
+        stats.batches += 1
+
+        if len(cart_ids) < batch_size:
+            break
+
+    stats.seconds = round(time.monotonic() - started, 3)
+    if stats.carts:
+        logger.info(f"Carritos abandonados eliminados: {asdict(stats)}")
+    return stats
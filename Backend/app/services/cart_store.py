@@ -0,0 +1,346 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Almacenamiento del estado del carrito detrás de CartService. El backend
+#              "database" no guarda nada (cada operación escribe directo en shopping_cart y
+#              cart_item). El backend "memory" conserva cada carrito en memoria, atiende las
+#              lecturas y los cambios de cantidad sin tocar la base de datos y los persiste
+#              después (write-behind): un job del scheduler escribe solo los items que cambiaron
+#              desde el último flush, de modo que varios cambios al mismo item se vuelven una
+#              sola escritura. El checkout llama a flush() del usuario antes de leer el carrito
+#              de la base de datos. El estado en memoria es por proceso: con varios workers se
+#              necesita un backend compartido (clave-valor) con la misma interfaz.
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.cart_item import CartItem
+from app.models.shopping_cart import ShoppingCart
+
+T = TypeVar("T")
+
+
+@dataclass
+class StoredItem:
+    """
+    Autor: Luis Flores
+    Descripción: Item del carrito guardado en el store (mismas columnas que cart_item).
+    """
+    cart_item_id: int
+    cart_id: int
+    product_id: int
+    quantity: int
+    added_at: datetime
+    updated_at: datetime
+
+
+@dataclass
+class StoredCart:
+    """
+    Autor: Luis Flores
+    Descripción: Estado de un carrito en el store. changed y removed son los cart_item_id
+                 pendientes de escribir o eliminar en la base de datos.
+    """
+    cart_id: int
+    user_id: int
+    created_at: datetime
+    updated_at: datetime
+    items: Dict[int, StoredItem] = field(default_factory=dict)
+    changed: Set[int] = field(default_factory=set)
+    removed: Set[int] = field(default_factory=set)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.changed or self.removed)
+
+    def item_for_product(self, product_id: int) -> Optional[StoredItem]:
+        return next((item for item in self.items.values() if item.product_id == product_id), None)
+
+    def set_quantity(self, cart_item_id: int, quantity: int, now: datetime) -> StoredItem:
+        item = self.items[cart_item_id]
+        item.quantity = quantity
+        item.updated_at = now
+        self.updated_at = now
+        self.changed.add(cart_item_id)
+        return item
+
+    def remove(self, cart_item_id: int, now: datetime) -> None:
+        self.items.pop(cart_item_id)
+        self.changed.discard(cart_item_id)
+        self.removed.add(cart_item_id)
+        self.updated_at = now
+
+    def clear(self, now: datetime) -> None:
+        for cart_item_id in list(self.items):
+            self.remove(cart_item_id, now)
+
+    def copy(self) -> "StoredCart":
+        return replace(
+            self,
+            items={key: replace(item) for key, item in self.items.items()},
+            changed=set(self.changed),
+            removed=set(self.removed),
+        )
+
+
+def load_cart(db: Session, user_id: int) -> Optional[StoredCart]:
+    """
+    Autor: Luis Flores
+    Descripción: Lee el carrito de un usuario de la base de datos (carrito LEFT JOIN items,
+                 una consulta).
+    Parámetros:
+        db (Session): Sesión de base de datos.
+        user_id (int): ID del usuario.
+    Retorna:
+        StoredCart | None: Carrito sin cambios pendientes, o None si el usuario no tiene carrito.
+    """
+    rows = db.execute(
+        select(
+            ShoppingCart.cart_id, ShoppingCart.created_at, ShoppingCart.updated_at,
+            CartItem.cart_item_id, CartItem.product_id, CartItem.quantity, CartItem.added_at,
+            CartItem.updated_at.label("item_updated_at")
+        )
+        .select_from(ShoppingCart)
+        .outerjoin(CartItem, CartItem.cart_id == ShoppingCart.cart_id)
+        .where(ShoppingCart.user_id == user_id)
+    ).all()
+    if not rows:
+        return None
+
+    first = rows[0]
+    return StoredCart(
+        cart_id=first.cart_id,
+        user_id=user_id,
+        created_at=first.created_at,
+        updated_at=first.updated_at,
+        items={
+            row.cart_item_id: StoredItem(
+                cart_item_id=row.cart_item_id,
+                cart_id=row.cart_id,
+                product_id=row.product_id,
+                quantity=row.quantity,
+                added_at=row.added_at,
+                updated_at=row.item_updated_at,
+            )
+            for row in rows
+            if row.cart_item_id is not None
+        },
+    )
+
+
+class CartStore:
+    """
+    Autor: Luis Flores
+    Descripción: Interfaz del store de carritos. Esta implementación es el backend
+                 "database": no guarda estado, por lo que CartService lee y escribe
+                 directo en la base de datos y flush() no tiene nada que escribir.
+    """
+    write_behind = False
+
+    def get(self, user_id: int) -> Optional[StoredCart]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene una copia del carrito guardado (None si no está en el store).
+                     La copia es solo para leer: los cambios se aplican con mutate().
+        """
+        return None
+
+    def remember(self, cart: StoredCart) -> StoredCart:
+        """
+        Autor: Luis Flores
+        Descripción: Guarda un carrito recién leído de la base de datos si el store aún no
+                     tiene uno para ese usuario.
+        Retorna:
+            StoredCart: Copia del carrito que quedó guardado.
+        """
+        return cart
+
+    def mutate(self, user_id: int, change: Callable[[Optional[StoredCart]], T]) -> T:
+        """
+        Autor: Luis Flores
+        Descripción: Aplica un cambio sobre el carrito guardado (no sobre una copia), de modo
+                     que dos peticiones concurrentes del mismo carrito no pierdan cambios. El
+                     cambio se ejecuta con el lock del store tomado: no debe consultar la base
+                     de datos ni otros caches.
+        Parámetros:
+            user_id (int): ID del usuario.
+            change (Callable): Recibe el carrito guardado (None si ya no está en el store),
+                lo modifica con set_quantity/remove/clear y regresa el resultado.
+        Retorna:
+            T: Lo que regresa change.
+        """
+        return change(None)
+
+    def discard(self, user_id: int) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Olvida el carrito de un usuario (se volverá a leer de la base de datos).
+                     Se llama después de escribir su carrito directo en la base de datos.
+        """
+
+    def flush(self, db: Session, user_id: Optional[int] = None) -> int:
+        """
+        Autor: Luis Flores
+        Descripción: Escribe en la base de datos los cambios pendientes.
+        Parámetros:
+            db (Session): Sesión de base de datos (se hace commit si hubo cambios).
+            user_id (int | None): Solo el carrito de este usuario (todos si es None).
+        Retorna:
+            int: Número de carritos escritos.
+        """
+        return 0
+
+    def __len__(self) -> int:
+        return 0
+
+
+class MemoryCartStore(CartStore):
+    """
+    Autor: Luis Flores
+    Descripción: Store de carritos en memoria con escritura diferida. Al superar max_carts
+                 se descartan los carritos menos usados que no tienen cambios pendientes
+                 (los pendientes se conservan hasta el siguiente flush).
+    """
+    write_behind = True
+
+    def __init__(self, max_carts: int = 10000):
+        self.max_carts = max_carts
+        self._carts: "OrderedDict[int, StoredCart]" = OrderedDict()
+        self._dirty: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[StoredCart]:
+        with self._lock:
+            cart = self._carts.get(user_id)
+            if cart is None:
+                return None
+            self._carts.move_to_end(user_id)
+            return cart.copy()
+
+    def remember(self, cart: StoredCart) -> StoredCart:
+        with self._lock:
+            stored = self._carts.setdefault(cart.user_id, cart.copy())
+            self._carts.move_to_end(cart.user_id)
+            self._evict()
+            return stored.copy()
+
+    def mutate(self, user_id: int, change: Callable[[Optional[StoredCart]], T]) -> T:
+        with self._lock:
+            cart = self._carts.get(user_id)
+            try:
+                return change(cart)
+            finally:
+                if cart is not None:
+                    self._carts.move_to_end(user_id)
+                    if cart.dirty:
+                        self._dirty.add(user_id)
+                    self._evict()
+
+    def discard(self, user_id: int) -> None:
+        with self._lock:
+            self._carts.pop(user_id, None)
+            self._dirty.discard(user_id)
+
+    def flush(self, db: Session, user_id: Optional[int] = None) -> int:
+        with self._lock:
+            user_ids = [user_id] if user_id is not None else list(self._dirty)
+            pending = [self._take_pending(key) for key in user_ids]
+        pending = [entry for entry in pending if entry is not None]
+        if not pending:
+            return 0
+
+        try:
+            self._write(db, pending)
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                for cart_user_id, _, _, updates, removed in pending:
+                    self._restore_pending(cart_user_id, {row["item_id"] for row in updates}, removed)
+            raise
+        return len(pending)
+
+    def _take_pending(self, user_id: int) -> Optional[Tuple[int, int, datetime, List[dict], Set[int]]]:
+        # Extrae (con el lock tomado) lo pendiente de un carrito y lo marca como escrito
+        self._dirty.discard(user_id)
+        cart = self._carts.get(user_id)
+        if cart is None or not cart.dirty:
+            return None
+        updates = [
+            {"item_id": item.cart_item_id, "new_quantity": item.quantity, "new_updated_at": item.updated_at}
+            for item in (cart.items[key] for key in cart.changed if key in cart.items)
+        ]
+        removed = set(cart.removed)
+        cart.changed.clear()
+        cart.removed.clear()
+        return user_id, cart.cart_id, cart.updated_at, updates, removed
+
+    def _restore_pending(self, user_id: int, changed: Set[int], removed: Set[int]) -> None:
+        cart = self._carts.get(user_id)
+        if cart is None:
+            return
+        cart.changed |= {key for key in changed if key in cart.items}
+        cart.removed |= removed
+        self._dirty.add(user_id)
+
+    @staticmethod
+    def _write(db: Session, pending: List[Tuple[int, int, datetime, List[dict], Set[int]]]) -> None:
+        # Un UPDATE por lote de items cambiados, un DELETE para los eliminados y un UPDATE
+        # de updated_at por lote de carritos
+        updates = [row for entry in pending for row in entry[3]]
+        removed = [item_id for entry in pending for item_id in entry[4]]
+        if updates:
+            db.execute(
+                update(CartItem.__table__)
+                .where(CartItem.__table__.c.cart_item_id == bindparam("item_id"))
+                .values(quantity=bindparam("new_quantity"), updated_at=bindparam("new_updated_at")),
+                updates
+            )
+        if removed:
+            db.execute(delete(CartItem).where(CartItem.cart_item_id.in_(removed)))
+        db.execute(
+            update(ShoppingCart.__table__)
+            .where(ShoppingCart.__table__.c.cart_id == bindparam("target_cart_id"))
+            .values(updated_at=bindparam("cart_updated_at")),
+            [{"target_cart_id": cart_id, "cart_updated_at": updated_at} for _, cart_id, updated_at, _, _ in pending]
+        )
+
+    def _evict(self) -> None:
+        # Descarta los carritos menos usados sin cambios pendientes
+        excess = len(self._carts) - self.max_carts
+        if excess <= 0:
+            return
+        for user_id in [key for key in self._carts if key not in self._dirty][:excess]:
+            del self._carts[user_id]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._carts)
+
+
+def create_cart_store(backend: str) -> CartStore:
+    """
+    Autor: Luis Flores
+    Descripción: Crea el store de carritos configurado.
+    Parámetros:
+        backend (str): "database" o "memory".
+    Retorna:
+        CartStore: Store del backend indicado.
+    Excepciones:
+        ValueError: Si el backend no existe.
+    """
+    if backend == "database":
+        return CartStore()
+    if backend == "memory":
+        return MemoryCartStore(max_carts=settings.CART_STORE_MAX_CARTS)
+    raise ValueError(f"Backend de carrito no soportado: {backend}")
+
+
+# Instancia global (CART_STORE_BACKEND)
+cart_store = create_cart_store(settings.CART_STORE_BACKEND)
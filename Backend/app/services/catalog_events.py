@@ -0,0 +1,260 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Versión global del catálogo y hook de cambios. Cada commit que modifica
+#              productos de forma relevante para el catálogo (datos visibles, precio,
+#              estado activo o cambio de disponibilidad) incrementa la versión, lo que
+#              invalida los caches que la usan como parte de su llave.
+#              Las reseñas (altas, bajas y cambios de calificación) también cuentan como cambio
+#              de catálogo porque modifican el rating del producto. Los demás cambios de un
+#              producto (stock sin cruzar a agotado, imágenes) no cambian la versión; se publican
+#              por un canal aparte (notify_product_change) para los caches por producto.
+#              Las unidades vendidas (sales_count) solo afectan el orden "best_selling" de la
+#              búsqueda: tienen su propia versión (notify_sales_change) y no invalidan los
+#              caches del catálogo.
+#              Las escrituras masivas que no pasan por el ORM (UPDATE/INSERT directos)
+#              deben llamar a notify_catalog_change() / notify_product_change() después del
+#              commit, o record_changes() dentro de la transacción.
+
+import logging
+import threading
+from typing import Callable, Iterable, List, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.models.product_image import ProductImage
+from app.models.review import Review
+
+logger = logging.getLogger(__name__)
+
+# Columnas de producto cuyo cambio afecta resultados de búsqueda/listados
+CATALOG_FIELDS = (
+    "name", "description", "brand", "category", "physical_activities",
+    "fitness_objectives", "price", "is_active",
+)
+
+_lock = threading.Lock()
+_catalog_version = 0
+_sales_version = 0
+_listeners: List[Callable[[Set[int]], None]] = []
+_product_listeners: List[Callable[[Set[int]], None]] = []
+
+
+def get_catalog_version() -> int:
+    """
+    Autor: Luis Flores
+    Descripción: Obtiene la versión actual del catálogo.
+    Retorna:
+        int: Versión actual (se incrementa con cada cambio relevante).
+    """
+    return _catalog_version
+
+
+def get_sales_version() -> int:
+    """
+    Autor: Luis Flores
+    Descripción: Obtiene la versión de las unidades vendidas (orden "best_selling").
+    Retorna:
+        int: Versión actual (se incrementa cada vez que cambia algún sales_count).
+    """
+    return _sales_version
+
+
+def notify_sales_change() -> int:
+    """
+    Autor: Luis Flores
+    Descripción: Incrementa la versión de las unidades vendidas, sin tocar la versión del
+                 catálogo ni avisar a sus listeners.
+    Retorna:
+        int: Nueva versión de las unidades vendidas.
+    """
+    global _sales_version
+    with _lock:
+        _sales_version += 1
+        return _sales_version
+
+
+def register_catalog_listener(callback: Callable[[Set[int]], None]) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Registra una función que se ejecuta después de cada cambio de catálogo.
+                 Recibe el conjunto de product_ids afectados (vacío si no se conocen).
+    Parámetros:
+        callback (Callable): Función a ejecutar.
+    Retorna:
+        None
+    """
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def register_product_listener(callback: Callable[[Set[int]], None]) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Registra una función que se ejecuta cuando cambian datos de productos que
+                 no afectan al catálogo (stock, imágenes). Los cambios de catálogo no pasan
+                 por este canal: quien necesite ambos debe registrarse en los dos.
+    Parámetros:
+        callback (Callable): Función a ejecutar; recibe los product_ids afectados.
+    Retorna:
+        None
+    """
+    if callback not in _product_listeners:
+        _product_listeners.append(callback)
+
+
+def _run_listeners(listeners: List[Callable[[Set[int]], None]], ids: Set[int]) -> None:
+    for callback in list(listeners):
+        try:
+            callback(ids)
+        except Exception as e:
+            logger.error(f"Error en listener de catálogo: {str(e)}", exc_info=True)
+
+
+def notify_product_change(product_ids: Iterable[int]) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Avisa a los listeners de producto que cambiaron datos de esos productos,
+                 sin incrementar la versión del catálogo.
+    Parámetros:
+        product_ids (Iterable[int]): Productos afectados.
+    Retorna:
+        None
+    """
+    ids = set(product_ids)
+    if ids:
+        _run_listeners(_product_listeners, ids)
+
+
+def notify_catalog_change(product_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Autor: Luis Flores
+    Descripción: Incrementa la versión del catálogo y avisa a los listeners registrados.
+    Parámetros:
+        product_ids (Iterable[int] | None): Productos afectados, si se conocen.
+    Retorna:
+        int: Nueva versión del catálogo.
+    """
+    global _catalog_version
+    ids = set(product_ids or [])
+    with _lock:
+        _catalog_version += 1
+        version = _catalog_version
+
+    _run_listeners(_listeners, ids)
+    return version
+
+
+def record_changes(
+    session: Session,
+    catalog_ids: Iterable[int] = (),
+    product_ids: Iterable[int] = ()
+) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Registra en la transacción de la sesión cambios hechos con sentencias
+                 directas (sin flush de objetos), para publicarlos en el commit junto con los
+                 del ORM o descartarlos si la transacción se revierte.
+    Parámetros:
+        session (Session): Sesión con la transacción en curso.
+        catalog_ids (Iterable[int]): Productos con cambios de catálogo.
+        product_ids (Iterable[int]): Productos con otros cambios (stock, imágenes).
+    Retorna:
+        None
+    """
+    catalog_ids = set(catalog_ids)
+    product_ids = set(product_ids) - catalog_ids
+    if catalog_ids:
+        session.info.setdefault("catalog_changes", set()).update(catalog_ids)
+    if product_ids:
+        session.info.setdefault("product_changes", set()).update(product_ids)
+
+
+def _stock_state_changed(product: Product) -> bool:
+    """
+    Autor: Luis Flores
+    Descripción: Indica si el stock del producto cruzó entre agotado y disponible.
+    """
+    history = inspect(product).attrs.stock.history
+    if not history.has_changes() or not history.deleted:
+        return False
+    before = history.deleted[0] or 0
+    after = history.added[0] if history.added else before
+    return (before > 0) != ((after or 0) > 0)
+
+
+def _is_catalog_change(product: Product) -> bool:
+    """
+    Autor: Luis Flores
+    Descripción: Determina si un producto modificado tiene cambios relevantes para el catálogo.
+    """
+    state = inspect(product)
+    if any(state.attrs[field].history.has_changes() for field in CATALOG_FIELDS):
+        return True
+    return _stock_state_changed(product)
+
+
+def _is_rating_change(review: Review) -> bool:
+    """
+    Autor: Luis Flores
+    Descripción: Indica si una reseña modificada cambió de calificación.
+    """
+    return inspect(review).attrs.rating.history.has_changes()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_changes(session: Session, flush_context) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Acumula en la sesión los productos con cambios de catálogo de cada flush
+                 (productos y reseñas) y, por separado, los productos con otros cambios
+                 (stock, imágenes).
+    """
+    changed = session.info.setdefault("catalog_changes", set())
+    touched = session.info.setdefault("product_changes", set())
+
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (Product, Review)):
+            changed.add(obj.product_id)
+        elif isinstance(obj, ProductImage):
+            touched.add(obj.product_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Product) and _is_catalog_change(obj):
+            changed.add(obj.product_id)
+        elif isinstance(obj, Review) and _is_rating_change(obj):
+            changed.add(obj.product_id)
+        elif isinstance(obj, (Product, ProductImage)) and session.is_modified(obj):
+            touched.add(obj.product_id)
+
+    changed.discard(None)
+    touched.discard(None)
+    if not changed:
+        session.info.pop("catalog_changes", None)
+    if not touched:
+        session.info.pop("product_changes", None)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_catalog_changes(session: Session) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Publica los cambios acumulados una vez que la transacción se confirmó.
+    """
+    changed = session.info.pop("catalog_changes", None)
+    touched = session.info.pop("product_changes", None)
+    if changed:
+        notify_catalog_change(changed)
+    if touched:
+        notify_product_change(touched - (changed or set()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session: Session) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Descarta los cambios acumulados si la transacción se revirtió.
+    """
+    session.info.pop("catalog_changes", None)
+    session.info.pop("product_changes", None)
@@ -0,0 +1,158 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Construcción de la matriz de co-compra ("comprados juntos") a partir de las
+#              órdenes entregadas. Las co-ocurrencias de cada lote de órdenes se acumulan como
+#              una matriz dispersa en formato COO con NumPy y se suman a los conteos guardados
+#              en product_co_purchase; después se recalcula la similitud coseno de los pares
+#              afectados. Cada orden se cuenta una sola vez (Order.co_purchase_processed), por lo
+#              que el job nocturno solo procesa las órdenes entregadas desde la última ejecución.
+
+import logging
+import math
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.orm import Session
+
+from app.models.enum import OrderStatus
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.product_co_purchase import ProductCoPurchase
+
+logger = logging.getLogger(__name__)
+
+# Órdenes por lote al leer order_item / marcar órdenes procesadas
+CHUNK_SIZE = 1000
+
+
+def _chunks(values: List[int], size: int = CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _count_pairs(rows: List[Tuple[int, int]]) -> Counter:
+    """
+    Autor: Luis Flores
+    Descripción: Cuenta co-ocurrencias de productos por orden (incluida la diagonal, que es el
+                 número de órdenes que contienen cada producto).
+    Parámetros:
+        rows (List[Tuple[int, int]]): Pares (order_id, product_id) sin duplicados.
+    Retorna:
+        Counter: Conteo por par (product_id, related_product_id).
+    """
+    if not rows:
+        return Counter()
+
+    data = np.array(rows, dtype=np.int64)
+    data = data[np.lexsort((data[:, 1], data[:, 0]))]
+    base = int(data[:, 1].max()) + 1
+
+    # Índices donde empieza cada orden
+    boundaries = np.flatnonzero(np.diff(data[:, 0])) + 1
+    keys = []
+    for products in np.split(data[:, 1], boundaries):
+        left, right = np.meshgrid(products, products, indexing="ij")
+        keys.append(left.ravel() * base + right.ravel())
+
+    unique_keys, counts = np.unique(np.concatenate(keys), return_counts=True)
+    return Counter({
+        (int(key // base), int(key % base)): int(count)
+        for key, count in zip(unique_keys, counts)
+    })
+
+
+def build_co_purchase(db: Session, rebuild: bool = False) -> Dict[str, int]:
+    """
+    Autor: Luis Flores
+    Descripción: Agrega a product_co_purchase las órdenes entregadas que aún no se han contado
+                 y recalcula el score de los pares afectados. Con rebuild=True se borra la
+                 matriz y se recalcula desde todas las órdenes entregadas (útil si se cancelan
+                 o corrigen órdenes ya contadas).
+    Parámetros:
+        db (Session): Sesión de base de datos.
+        rebuild (bool): Recalcular desde cero.
+    Retorna:
+        Dict[str, int]: Órdenes procesadas y pares insertados/actualizados.
+    """
+    if rebuild:
+        db.execute(delete(ProductCoPurchase))
+        db.execute(
+            update(Order).where(Order.co_purchase_processed == True).values(co_purchase_processed=False)
+        )
+
+    pending_ids = [
+        row[0] for row in db.query(Order.order_id).filter(
+            Order.order_status == OrderStatus.DELIVERED,
+            Order.co_purchase_processed == False
+        ).order_by(Order.order_id).all()
+    ]
+    if not pending_ids:
+        db.commit()
+        return {"orders_processed": 0, "pairs_inserted": 0, "pairs_updated": 0}
+
+    # 1. Co-ocurrencias nuevas (por lotes de órdenes)
+    deltas: Counter = Counter()
+    for chunk in _chunks(pending_ids):
+        rows = db.query(OrderItem.order_id, OrderItem.product_id).filter(
+            OrderItem.order_id.in_(chunk)
+        ).distinct().all()
+        deltas.update(_count_pairs([(row.order_id, row.product_id) for row in rows]))
+
+    # 2. Conteos actuales de todos los pares que involucran productos afectados
+    touched = sorted({product_id for product_id, _ in deltas})
+    counts: Dict[Tuple[int, int], int] = {}
+    for chunk in _chunks(touched):
+        for row in db.query(
+            ProductCoPurchase.product_id, ProductCoPurchase.related_product_id, ProductCoPurchase.co_count
+        ).filter(
+            or_(ProductCoPurchase.product_id.in_(chunk), ProductCoPurchase.related_product_id.in_(chunk))
+        ).all():
+            counts[(row.product_id, row.related_product_id)] = row.co_count
+    existing = set(counts)
+
+    for pair, delta in deltas.items():
+        counts[pair] = counts.get(pair, 0) + delta
+
+    # 3. Órdenes por producto (diagonal) para normalizar
+    orders_per_product = {i: count for (i, j), count in counts.items() if i == j}
+    missing = sorted({i for i, _ in counts} - set(orders_per_product))
+    for chunk in _chunks(missing):
+        for row in db.query(ProductCoPurchase.product_id, ProductCoPurchase.co_count).filter(
+            ProductCoPurchase.product_id.in_(chunk),
+            ProductCoPurchase.related_product_id == ProductCoPurchase.product_id
+        ).all():
+            orders_per_product[row.product_id] = row.co_count
+
+    def score(i: int, j: int, count: int) -> float:
+        denominator = math.sqrt(orders_per_product.get(i, 0) * orders_per_product.get(j, 0))
+        return round(count / denominator, 6) if denominator else 0.0
+
+    rows = [
+        {"product_id": i, "related_product_id": j, "co_count": count, "score": score(i, j, count)}
+        for (i, j), count in counts.items()
+    ]
+    to_update = [row for row in rows if (row["product_id"], row["related_product_id"]) in existing]
+    to_insert = [row for row in rows if (row["product_id"], row["related_product_id"]) not in existing]
+
+    # 4. Escritura masiva y marca de órdenes procesadas (misma transacción)
+    if to_update:
+        db.execute(update(ProductCoPurchase), to_update)
+    if to_insert:
+        db.execute(insert(ProductCoPurchase), to_insert)
+    for chunk in _chunks(pending_ids):
+        db.execute(
+            update(Order).where(Order.order_id.in_(chunk)).values(co_purchase_processed=True)
+        )
+    db.commit()
+
+    logger.info(
+        f"Co-compra actualizada: {len(pending_ids)} órdenes, "
+        f"{len(to_insert)} pares nuevos, {len(to_update)} pares actualizados"
+    )
+    return {
+        "orders_processed": len(pending_ids),
+        "pairs_inserted": len(to_insert),
+        "pairs_updated": len(to_update),
+    }
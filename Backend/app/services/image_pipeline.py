@@ -0,0 +1,131 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Procesamiento de imágenes de producto fuera del event loop. Cada imagen se
+#              decodifica una sola vez y se generan variantes WebP (thumb, medium, large)
+#              en un pool de workers; Pillow libera el GIL al redimensionar y codificar, por
+#              lo que varias imágenes se procesan en paralelo. Las variantes se guardan bajo
+#              una llave derivada del contenido (hash SHA-256 de la imagen original), de modo
+#              que una URL nunca cambia de contenido y puede cachearse indefinidamente.
+
+import hashlib
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from app.config import settings
+
+# Lado mayor (px) de cada variante; de mayor a menor para redimensionar en cascada
+VARIANTS: Dict[str, int] = {
+    "large": 1200,
+    "medium": 600,
+    "thumb": 200,
+}
+
+# Variante que se guarda como image_path del producto
+DEFAULT_VARIANT = "large"
+
+WEBP_QUALITY = 82
+
+# Las llaves son inmutables (dependen del contenido): se cachean por un año
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+ALLOWED_FORMATS = ("JPEG", "PNG", "WEBP")
+
+_VARIANT_URL = re.compile(r"/(thumb|medium|large)\.webp$")
+
+# Pool compartido para el trabajo de CPU (decodificar, redimensionar, codificar)
+image_pool = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix="image")
+
+
+class ImageValidationError(ValueError):
+    """Imagen rechazada por tamaño, formato o contenido inválido."""
+
+
+@dataclass
+class ProcessedImage:
+    """
+    Autor: Luis Flores
+    Descripción: Resultado de procesar una imagen: hash del contenido original y bytes WebP
+                 de cada variante con sus dimensiones.
+    """
+    content_hash: str
+    variants: Dict[str, Tuple[bytes, int, int]] = field(default_factory=dict)
+
+    def key(self, variant: str, prefix: str = "product_images") -> str:
+        return f"{prefix}/{self.content_hash}/{variant}.webp"
+
+
+def process_image(
+    file_content: bytes,
+    max_size_mb: int = 5,
+    allowed_formats: Tuple[str, ...] = ALLOWED_FORMATS
+) -> ProcessedImage:
+    """
+    Autor: Luis Flores
+    Descripción: Valida una imagen y genera sus variantes WebP. Es una función síncrona de
+                 CPU: debe ejecutarse en image_pool, nunca directamente en el event loop.
+    Parámetros:
+        file_content (bytes): Contenido original del archivo.
+        max_size_mb (int): Tamaño máximo permitido en MB.
+        allowed_formats (tuple): Formatos de entrada permitidos.
+    Retorna:
+        ProcessedImage: Hash del contenido y variantes codificadas.
+    Excepciones:
+        ImageValidationError: Si la imagen excede el tamaño, tiene un formato no permitido
+            o no se puede decodificar.
+    """
+    if len(file_content) / (1024 * 1024) > max_size_mb:
+        raise ImageValidationError(f"El tamaño del archivo excede el limite de {max_size_mb} MB")
+
+    try:
+        img = Image.open(io.BytesIO(file_content))
+        if img.format not in allowed_formats:
+            raise ImageValidationError(
+                f"Formato de imagen no permitido. Los formatos permitidos son: {', '.join(allowed_formats)}"
+            )
+        # En JPEG, draft() decodifica directamente a una escala reducida (mucho más rápido)
+        largest = max(VARIANTS.values())
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    except ImageValidationError:
+        raise
+    except Exception as e:
+        raise ImageValidationError(f"El archivo no es una imagen válida o está corrupto. Detalle: {str(e)}")
+
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+    processed = ProcessedImage(content_hash=hashlib.sha256(file_content).hexdigest()[:32])
+
+    # Cada variante parte de la anterior (ya reducida) en lugar del original
+    current = img
+    for name, size in VARIANTS.items():
+        if max(current.size) > size:
+            current = current.copy()
+            current.thumbnail((size, size), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        current.save(output, format="WEBP", quality=WEBP_QUALITY, method=4)
+        processed.variants[name] = (output.getvalue(), current.width, current.height)
+
+    return processed
+
+
+def variant_url(image_url: Optional[str], variant: str) -> Optional[str]:
+    """
+    Autor: Luis Flores
+    Descripción: Obtiene la URL de otra variante de una imagen procesada por el pipeline
+                 (las variantes comparten carpeta y solo cambia el nombre del archivo).
+    Parámetros:
+        image_url (str | None): URL de cualquier variante.
+        variant (str): Variante deseada (thumb, medium, large).
+    Retorna:
+        str | None: URL de la variante, o None si la imagen no viene del pipeline.
+    """
+    if not image_url or variant not in VARIANTS or not _VARIANT_URL.search(image_url):
+        return None
+    return _VARIANT_URL.sub(f"/{variant}.webp", image_url)
@@ -0,0 +1,156 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Procesamiento diferido de imágenes subidas directo a S3 con una política POST
+#              prefirmada. El cliente sube el original a "uploads/..." sin pasar por la API;
+#              al confirmar la subida, estas tareas (BackgroundTasks) descargan el original,
+#              generan las variantes con el mismo pipeline que la subida tradicional, registran
+#              la imagen en la base de datos y eliminan el original. Cada tarea abre su propia
+#              sesión porque se ejecuta después de enviar la respuesta.
+
+import logging
+from typing import Callable, Dict, Optional
+
+from botocore.exceptions import ClientError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.database import SessionLocal
+from app.models.product import Product
+from app.models.product_image import ProductImage
+from app.services.s3_service import S3Service
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_UPLOAD_PREFIX = "uploads/products"
+PROFILE_UPLOAD_PREFIX = "uploads/profiles"
+
+
+def product_upload_prefix(product_id: int) -> str:
+    return f"{PRODUCT_UPLOAD_PREFIX}/{product_id}"
+
+
+def profile_upload_prefix(cognito_sub: str) -> str:
+    return f"{PROFILE_UPLOAD_PREFIX}/{cognito_sub}"
+
+
+def owns_upload_key(key: str, prefix: str) -> bool:
+    """
+    Autor: Luis Flores
+    Descripción: Verifica que una llave de subida pertenece a la carpeta del dueño (evita que
+                 un cliente confirme el original de otro producto o usuario).
+    """
+    return key.startswith(f"{prefix}/") and ".." not in key and "/" not in key[len(prefix) + 1:]
+
+
+async def _download_upload(s3_service: S3Service, key: str) -> bytes:
+    return await run_in_threadpool(s3_service.download_object, key)
+
+
+async def _discard_upload(s3_service: S3Service, key: str) -> None:
+    try:
+        await run_in_threadpool(s3_service.delete_object, key)
+    except ClientError as e:
+        logger.warning(f"No se pudo eliminar la subida original {key}: {e}")
+
+
+async def process_product_upload(
+    key: str,
+    product_id: int,
+    is_primary: bool = False,
+    session_factory: Optional[Callable[[], Session]] = None
+) -> Dict:
+    """
+    Autor: Luis Flores
+    Descripción: Procesa una imagen de producto subida directo a S3: genera las variantes WebP,
+                 agrega la imagen al producto y elimina el original.
+    Parámetros:
+        key (str): Llave del original en S3 (uploads/products/{product_id}/...).
+        product_id (int): ID del producto.
+        is_primary (bool): Marcar como imagen principal (también lo es si el producto no tiene
+            imágenes).
+        session_factory (Callable | None): Fábrica de sesiones (SessionLocal por defecto).
+    Retorna:
+        dict: success y, si tuvo éxito, image_id y file_url; si no, error.
+    """
+    s3_service = S3Service()
+    try:
+        content = await _download_upload(s3_service, key)
+    except ClientError as e:
+        logger.error(f"No se pudo descargar la subida {key}: {e}")
+        return {"success": False, "error": f"Error al descargar de S3: {str(e)}"}
+
+    result = await s3_service.upload_product_img(content, product_id=str(product_id))
+    if not result["success"]:
+        logger.warning(f"Subida {key} rechazada para el producto {product_id}: {result['error']}")
+        await _discard_upload(s3_service, key)
+        return result
+
+    db = (session_factory or SessionLocal)()
+    try:
+        product = db.get(Product, product_id)
+        if product is None:
+            return {"success": False, "error": "Producto no encontrado"}
+
+        current_images = db.query(ProductImage).filter(ProductImage.product_id == product_id).all()
+        is_primary = is_primary or not current_images
+        if is_primary:
+            for image in current_images:
+                image.is_primary = False
+
+        db_image = ProductImage(product_id=product_id, image_path=result["file_url"], is_primary=is_primary)
+        db.add(db_image)
+        db.commit()
+        image_id = db_image.image_id
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error al registrar la imagen {key} del producto {product_id}: {e}")
+        return {"success": False, "error": f"Error al registrar la imagen: {str(e)}"}
+    finally:
+        db.close()
+
+    await _discard_upload(s3_service, key)
+    return {"success": True, "image_id": image_id, "file_url": result["file_url"]}
+
+
+async def process_profile_upload(
+    key: str,
+    cognito_sub: str,
+    session_factory: Optional[Callable[[], Session]] = None
+) -> Dict:
+    """
+    Autor: Luis Flores
+    Descripción: Procesa una imagen de perfil subida directo a S3 con el mismo flujo que la
+                 subida tradicional (redimensionar, reemplazar la anterior y guardar la URL) y
+                 elimina el original.
+    Parámetros:
+        key (str): Llave del original en S3 (uploads/profiles/{cognito_sub}/...).
+        cognito_sub (str): Identificador del usuario en Cognito.
+        session_factory (Callable | None): Fábrica de sesiones (SessionLocal por defecto).
+    Retorna:
+        dict: Resultado de UserProfileService.update_profile_image.
+    """
+    # Import local: el paquete user_profile importa este módulo desde sus rutas
+    from app.api.v1.user_profile.service import user_profile_service
+
+    s3_service = S3Service()
+    try:
+        content = await _download_upload(s3_service, key)
+    except ClientError as e:
+        logger.error(f"No se pudo descargar la subida {key}: {e}")
+        return {"success": False, "error": f"Error al descargar de S3: {str(e)}"}
+
+    db = (session_factory or SessionLocal)()
+    try:
+        result = await user_profile_service.update_profile_image(
+            db=db,
+            cognito_sub=cognito_sub,
+            image_content=content
+        )
+    finally:
+        db.close()
+
+    if not result.get("success"):
+        logger.warning(f"Subida {key} rechazada para el usuario {cognito_sub}: {result.get('error')}")
+
+    await _discard_upload(s3_service, key)
+    return result
@@ -0,0 +1,883 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Operaciones de inventario atómicas. El stock nunca se lee, compara y escribe
+#              desde Python: cada operación es un UPDATE condicional (stock - reservado >= q)
+#              para todas las líneas de la compra en una sola sentencia, de modo que dos
+#              checkouts concurrentes no pueden vender la misma unidad.
+#              Las reservas apartan unidades (product.reserved_stock) mientras el usuario paga
+#              en Stripe o PayPal; expiran tras INVENTORY_RESERVATION_TTL_MINUTES (las de
+#              Stripe Checkout duran lo mismo que la sesión más ese margen) y el scheduler
+#              las libera. Al crear la orden, la reserva del usuario se consume en
+#              la misma sentencia que descuenta el stock.
+#              Si una operación lanza InsufficientStockError, la transacción puede haber
+#              modificado otras filas: quien llama debe hacer rollback.
+#              Productos con stock fragmentado (product.stock_shards > 0, SKUs de alta demanda):
+#              las unidades disponibles viven en N filas de product_stock_shard y cada compra
+#              descuenta de un fragmento al azar que no esté bloqueado (FOR UPDATE SKIP
+#              LOCKED), así que las compras concurrentes no hacen fila sobre la fila de product.
+#              En ese modo las reservas sacan las unidades de los fragmentos (reserved_stock no
+#              se usa) y product.stock es un total que el scheduler sincroniza cada
+#              INVENTORY_SHARD_SYNC_SECONDS.
+#              Cada cambio de stock (venta, cancelación, suscripción, ajuste o importación)
+#              agrega filas a inventory_movement en la misma transacción, con un solo INSERT
+#              por operación, y actualiza low_stock_product (productos bajo
+#              LOW_STOCK_THRESHOLD) solo para los productos que cruzan el umbral. Las
+#              escrituras de stock por el ORM (alta o edición de producto) se registran con
+#              un hook de flush como ajuste.
+
+import logging
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta, UTC
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.enum import InventoryMovementReason
+from app.models.inventory_movement import InventoryMovement
+from app.models.inventory_reservation import InventoryReservation
+from app.models.low_stock_product import LowStockProduct
+from app.models.product import Product
+from app.models.product_stock_shard import ProductStockShard
+from app.services.catalog_events import record_changes
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStockError(Exception):
+    """
+    Autor: Luis Flores
+    Descripción: No hay unidades disponibles para uno o más productos.
+    """
+
+    def __init__(self, product_ids: Iterable[int]):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f"Stock insuficiente para los productos: {self.product_ids}")
+
+
+def quantities_by_product(items: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    """
+    Autor: Luis Flores
+    Descripción: Suma cantidades por producto (un producto puede aparecer en varias líneas).
+    Parámetros:
+        items (Iterable[Tuple[int, int]]): Pares (product_id, cantidad).
+    Retorna:
+        Dict[int, int]: Cantidad total por product_id.
+    """
+    totals: Dict[int, int] = defaultdict(int)
+    for product_id, quantity in items:
+        totals[product_id] += quantity
+    return dict(totals)
+
+
+def _by_product(values: Dict[int, int], default: int = 0):
+    # CASE product_id WHEN ... THEN ... END: un valor distinto por fila en la misma sentencia
+    return case(values, value=Product.product_id, else_=default)
+
+
+def record_movements(
+    db,
+    deltas: Dict[int, int],
+    reason: InventoryMovementReason,
+    stock_after: Optional[Dict[int, int]] = None,
+    order_id: Optional[int] = None
+) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Agrega movimientos al ledger de inventario con un solo INSERT para todos los
+                 productos (las filas nunca se modifican después).
+    Parámetros:
+        db (Session | Connection): Sesión o conexión de la transacción en curso.
+        deltas (Dict[int, int]): Cambio de unidades por product_id (negativo = salida).
+        reason (InventoryMovementReason): Motivo del movimiento.
+        stock_after (Dict[int, int], opcional): Stock resultante por product_id.
+        order_id (int, opcional): Orden que originó el movimiento.
+    Retorna:
+        None
+    """
+    now = datetime.now(UTC)
+    stock_after = stock_after or {}
+    rows = [
+        {
+            "product_id": product_id,
+            "order_id": order_id,
+            "quantity_change": delta,
+            "reason": reason,
+            "stock_after": stock_after.get(product_id),
+            "created_at": now,
+        }
+        for product_id, delta in deltas.items()
+        if delta
+    ]
+    if rows:
+        db.execute(insert(InventoryMovement), rows)
+
+
+def track_low_stock(db, stock: Dict[int, int]) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Mantiene el conjunto de productos con stock bajo. Solo escribe los productos
+                 que entran o salen del conjunto y actualiza el stock de los que siguen en él;
+                 los productos que siguen sobre el umbral no generan escrituras.
+    Parámetros:
+        db (Session | Connection): Sesión o conexión de la transacción en curso.
+        stock (Dict[int, int]): Stock actual por product_id.
+    Retorna:
+        None
+    """
+    if not stock:
+        return
+
+    threshold = settings.LOW_STOCK_THRESHOLD
+    flagged = set(db.execute(
+        select(LowStockProduct.product_id).where(LowStockProduct.product_id.in_(list(stock)))
+    ).scalars())
+    low = {product_id: units for product_id, units in stock.items() if units < threshold}
+
+    cleared = flagged - set(low)
+    if cleared:
+        db.execute(delete(LowStockProduct).where(LowStockProduct.product_id.in_(list(cleared))))
+
+    entered = {product_id: units for product_id, units in low.items() if product_id not in flagged}
+    if entered:
+        now = datetime.now(UTC)
+        db.execute(insert(LowStockProduct), [
+            {"product_id": product_id, "stock": units, "flagged_at": now}
+            for product_id, units in entered.items()
+        ])
+
+    remaining = {product_id: units for product_id, units in low.items() if product_id in flagged}
+    if remaining:
+        db.execute(
+            update(LowStockProduct)
+            .where(LowStockProduct.product_id.in_(list(remaining)))
+            .values(stock=case(remaining, value=LowStockProduct.product_id, else_=LowStockProduct.stock))
+        )
+
+
+def rebuild_low_stock(db, threshold: Optional[int] = None) -> int:
+    """
+    Autor: Luis Flores
+    Descripción: Recalcula el conjunto de productos con stock bajo a partir de product, con
+                 tres sentencias por conjunto: elimina los que ya no están bajo el umbral,
+                 actualiza el stock de los que siguen (conservan flagged_at) y agrega los que
+                 faltan. Corrige el conjunto cuando cambia LOW_STOCK_THRESHOLD o cuando hubo
+                 escrituras de stock que no pasaron por track_low_stock.
+    Parámetros:
+        db (Session | Connection): Sesión o conexión (no hace commit).
+        threshold (int, opcional): Umbral; por defecto LOW_STOCK_THRESHOLD.
+    Retorna:
+        int: Productos en el conjunto al terminar.
+    """
+    threshold = settings.LOW_STOCK_THRESHOLD if threshold is None else threshold
+    low = select(Product.product_id).where(Product.stock < threshold)
+    current_stock = (
+        select(Product.stock)
+        .where(Product.product_id == LowStockProduct.product_id)
+        .scalar_subquery()
+    )
+
+    db.execute(delete(LowStockProduct).where(LowStockProduct.product_id.not_in(low)))
+    db.execute(
+        update(LowStockProduct)
+        .where(LowStockProduct.stock != current_stock)
+        .values(stock=current_stock)
+    )
+    db.execute(
+        insert(LowStockProduct).from_select(
+            ["product_id", "stock", "flagged_at"],
+            select(Product.product_id, Product.stock, func.current_timestamp())
+            .where(
+                Product.stock < threshold,
+                Product.product_id.not_in(select(LowStockProduct.product_id))
+            )
+        )
+    )
+    return db.execute(select(func.count()).select_from(LowStockProduct)).scalar_one()
+
+
+def _log_stock_rows(
+    db: Session,
+    rows: List[Tuple[int, int]],
+    deltas: Dict[int, int],
+    reason: InventoryMovementReason,
+    order_id: Optional[int],
+    crossed
+) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Registra un cambio de stock: movimientos en el ledger, conjunto de stock bajo
+                 y cambios para los caches del catálogo (los productos que cruzaron entre
+                 agotado y disponible son cambio de catálogo).
+    """
+    stock_after = dict(rows)
+    record_movements(db, deltas, reason, stock_after, order_id)
+    track_low_stock(db, stock_after)
+    catalog_ids = {product_id for product_id, stock in rows if crossed(product_id, stock)}
+    record_changes(db, catalog_ids, set(stock_after))
+
+
+def sharded_products(db: Session, product_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Autor: Luis Flores
+    Descripción: Productos con stock fragmentado entre los indicados.
+    Parámetros:
+        db (Session): Sesión de base de datos.
+        product_ids (Iterable[int]): IDs a revisar.
+    Retorna:
+        Dict[int, int]: Número de fragmentos por product_id (solo los fragmentados).
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    return dict(db.execute(
+        select(Product.product_id, Product.stock_shards)
+        .where(Product.product_id.in_(product_ids), Product.stock_shards > 0)
+    ).all())
+
+
+def lock_products(db: Session, product_ids: Iterable[int]) -> Dict[int, Any]:
+    """
+    Autor: Luis Flores
+    Descripción: Lee los productos de una compra (ID, nombre, precio, activo) bloqueando las
+                 filas en orden de product_id (SELECT ... ORDER BY product_id FOR UPDATE), de
+                 modo que dos checkouts con productos en común siempre toman los bloqueos en el
+                 mismo orden y no pueden bloquearse mutuamente. Los productos fragmentados no se
+                 bloquean (su stock se descuenta en los fragmentos y bloquear la fila del
+                 producto serializaría todas las compras del SKU); se leen con una segunda
+                 consulta solo si los hay.
+    Parámetros:
+        db (Session): Sesión de base de datos.
+        product_ids (Iterable[int]): IDs de los productos.
+    Retorna:
+        Dict[int, Row]: Filas por product_id (los IDs inexistentes se omiten).
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return {}
+    columns = (Product.product_id, Product.name, Product.price, Product.is_active)
+    rows = {
+        row.product_id: row
+        for row in db.execute(
+            select(*columns)
+            .where(Product.product_id.in_(product_ids), Product.stock_shards == 0)
+            .order_by(Product.product_id)
+            .with_for_update(of=Product)
+        ).all()
+    }
+    if len(rows) < len(product_ids):
+        rows.update(
+            (row.product_id, row)
+            for row in db.execute(
+                select(*columns).where(
+                    Product.product_id.in_([pid for pid in product_ids if pid not in rows]),
+                    Product.stock_shards > 0
+                )
+            ).all()
+        )
+    return rows
+
+
+def shard_totals(db: Session, product_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Autor: Luis Flores
+    Descripción: Unidades disponibles de los productos fragmentados (suma de sus fragmentos).
+                 Es una lectura sin bloqueos.
+    Parámetros:
+        db (Session): Sesión de base de datos.
+        product_ids (Iterable[int]): IDs a revisar.
+    Retorna:
+        Dict[int, int]: Total por product_id (los productos sin fragmentos se omiten).
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    return dict(db.execute(
+        select(ProductStockShard.product_id, func.sum(ProductStockShard.stock))
+        .where(ProductStockShard.product_id.in_(product_ids))
+        .group_by(ProductStockShard.product_id)
+    ).all())
+
+
+def lock_stock_shards(db: Session, product_ids: Iterable[int]) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    Autor: Luis Flores
+    Descripción: Bloquea los fragmentos de los productos indicados en orden (product_id,
+                 shard_no) con SELECT ... FOR UPDATE, el mismo orden que usan las compras que
+                 descuentan de varios fragmentos. Mientras la transacción siga abierta ninguna
+                 compra puede cambiar esos fragmentos, así que su total es estable.
+    Parámetros:
+        db (Session): Sesión de base de datos.
+        product_ids (Iterable[int]): IDs a bloquear (los no fragmentados se ignoran).
+    Retorna:
+        Dict[int, List[Tuple[int, int]]]: (shard_no, stock) por product_id.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return {}
+    shards: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    for product_id, shard_no, stock in db.execute(
+        select(ProductStockShard.product_id, ProductStockShard.shard_no, ProductStockShard.stock)
+        .where(ProductStockShard.product_id.in_(product_ids))
+        .order_by(ProductStockShard.product_id, ProductStockShard.shard_no)
+        .with_for_update()
+    ).all():
+        shards[product_id].append((shard_no, stock))
+    return dict(shards)
+
+
+def adjust_shard_stock(
+    db: Session,
+    deltas: Dict[int, int],
+    shards: Dict[int, List[Tuple[int, int]]]
+) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Aplica un ajuste relativo de stock directamente sobre los fragmentos, sin
+                 volver a repartirlos: las unidades que se suman van a un fragmento (como una
+                 devolución) y las que se restan se descuentan de los fragmentos en orden. Los
+                 fragmentos deben estar bloqueados con lock_stock_shards.
+    Parámetros:
+        db (Session): Sesión de base de datos (no hace commit).
+        deltas (Dict[int, int]): Unidades a sumar (o restar, si es negativo) por product_id;
+            una resta no puede superar el total de los fragmentos.
+        shards (Dict[int, List[Tuple[int, int]]]): Resultado de lock_stock_shards.
+    Retorna:
+        None
+    """
+    _return_to_shards(
+        db,
+        {pid: units for pid, units in deltas.items() if units > 0 and pid in shards},
+        {pid: len(rows) for pid, rows in shards.items()}
+    )
+    for product_id, units in deltas.items():
+        if units >= 0 or product_id not in shards:
+            continue
+        units = -units
+        takes: Dict[int, int] = {}
+        for number, stock in shards[product_id]:
+            if stock > 0:
+                takes[number] = min(stock, units)
+                units -= takes[number]
+            if not units:
+                break
+        db.execute(
+            update(ProductStockShard)
+            .where(ProductStockShard.product_id == product_id, ProductStockShard.shard_no.in_(list(takes)))
+            .values(stock=ProductStockShard.stock - case(takes, value=ProductStockShard.shard_no, else_=0))
+        )
+
+
+def _take_from_shards(db: Session, product_id: int, units: int) -> bool:
+    """
+    Autor: Luis Flores
+    Descripción: Descuenta unidades de los fragmentos de un producto. Primero intenta un solo
+                 fragmento al azar con unidades suficientes que no tenga bloqueado otra
+                 transacción; si ninguno alcanza (quedan pocas unidades repartidas), bloquea
+                 todos los fragmentos del producto en orden y descuenta de varios.
+    Retorna:
+        bool: False si el producto no tiene unidades suficientes.
+    """
+    shard_no = db.scalar(
+        select(ProductStockShard.shard_no)
+        .where(ProductStockShard.product_id == product_id, ProductStockShard.stock >= units)
+        .order_by(func.random())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if shard_no is not None:
+        taken = db.execute(
+            update(ProductStockShard)
+            .where(
+                ProductStockShard.product_id == product_id,
+                ProductStockShard.shard_no == shard_no,
+                ProductStockShard.stock >= units
+            )
+            .values(stock=ProductStockShard.stock - units)
+        ).rowcount
+        if taken:
+            return True
+
+    shards = db.execute(
+        select(ProductStockShard.shard_no, ProductStockShard.stock)
+        .where(ProductStockShard.product_id == product_id, ProductStockShard.stock > 0)
+        .order_by(ProductStockShard.shard_no)
+        .with_for_update()
+    ).all()
+    if sum(stock for _, stock in shards) < units:
+        return False
+
+    takes: Dict[int, int] = {}
+    for number, stock in shards:
+        takes[number] = min(stock, units)
+        units -= takes[number]
+        if not units:
+            break
+    db.execute(
+        update(ProductStockShard)
+        .where(ProductStockShard.product_id == product_id, ProductStockShard.shard_no.in_(list(takes)))
+        .values(stock=ProductStockShard.stock - case(takes, value=ProductStockShard.shard_no, else_=0))
+    )
+    return True
+
+
+def _return_to_shards(db: Session, quantities: Dict[int, int], shards: Dict[int, int]) -> None:
+    # Cada producto regresa (o descuenta, si es negativo) sus unidades en un fragmento al
+    # azar; solo se bloquea esa fila
+    for product_id, units in quantities.items():
+        if not units:
+            continue
+        returned = db.execute(
+            update(ProductStockShard)
+            .where(
+                ProductStockShard.product_id == product_id,
+                ProductStockShard.shard_no == random.randrange(shards[product_id])
+            )
+            .values(stock=ProductStockShard.stock + units)
+        ).rowcount
+        if not returned:
+            # El producto dejó de estar fragmentado: las unidades vuelven a product.stock
+            db.execute(
+                update(Product)
+                .where(Product.product_id == product_id)
+                .values(stock=Product.stock + units),
+                execution_options={"synchronize_session": "fetch"}
+            )
+
+
+def _split_units(total: int, shards: int) -> List[int]:
+    # Reparte el total en partes casi iguales (las primeras reciben el residuo)
+    base, extra = divmod(max(total, 0), shards)
+    return [base + (1 if number < extra else 0) for number in range(shards)]
+
+
+def held_quantities(db: Session, user_id: int) -> Dict[int, int]:
+    """
+    Autor: Luis Flores
+    Descripción: Unidades reservadas por un usuario, por producto.
+    Parámetros:
+        db (Session): Sesión de base de datos.
+        user_id (int): ID del usuario.
+    Retorna:
+        Dict[int, int]: Cantidad reservada por product_id.
+    """
+    return quantities_by_product(
+        db.query(InventoryReservation.product_id, InventoryReservation.quantity)
+        .filter(InventoryReservation.user_id == user_id)
+        .all()
+    )
+
+
+def _release_held(db: Session, held: Dict[int, int]) -> None:
+    # Reservas de productos fragmentados regresan sus unidades a un fragmento
+    shards = sharded_products(db, held)
+    _return_to_shards(db, {pid: units for pid, units in held.items() if pid in shards}, shards)
+    plain = {pid: units for pid, units in held.items() if pid not in shards}
+    if plain:
+        db.execute(
+            update(Product)
+            .where(Product.product_id.in_(list(plain)))
+            .values(reserved_stock=Product.reserved_stock - _by_product(plain)),
+            execution_options={"synchronize_session": "fetch"}
+        )
+
+
+def _take_user_reservations(db: Session, user_id: int) -> Dict[int, int]:
+    # Elimina las reservas del usuario y retorna las unidades que tenían apartadas
+    rows = db.execute(
+        delete(InventoryReservation)
+        .where(InventoryReservation.user_id == user_id)
+        .returning(InventoryReservation.product_id, InventoryReservation.quantity)
+    ).all()
+    return quantities_by_product(rows)
+
+
+def decrement_stock(
+    db: Session,
+    quantities: Dict[int, int],
+    user_id: Optional[int] = None,
+    reason: InventoryMovementReason = InventoryMovementReason.SALE,
+    order_id: Optional[int] = None
+) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Descuenta el stock de todas las líneas de una compra con un solo UPDATE
+                 condicional. Cada producto debe tener disponibles (stock - reservado por
+                 otros) las unidades pedidas. Si se indica el usuario, sus reservas se
+                 consumen en la misma sentencia y se eliminan. Los productos fragmentados
+                 descuentan de uno de sus fragmentos.
+    Parámetros:
+        db (Session): Sesión de base de datos (no hace commit).
+        quantities (Dict[int, int]): Unidades por product_id.
+        user_id (int, opcional): Usuario cuyas reservas se consumen.
+        reason (InventoryMovementReason): Motivo que se registra en el ledger.
+        order_id (int, opcional): Orden que se registra en el ledger.
+    Retorna:
+        None
+    Excepciones:
+        InsufficientStockError: Si algún producto no tiene unidades suficientes.
+    """
+    if not quantities:
+        return
+
+    held = _take_user_reservations(db, user_id) if user_id is not None else {}
+    shards = sharded_products(db, set(quantities) | set(held))
+    plain = {pid: units for pid, units in quantities.items() if pid not in shards}
+    consumed = {pid: units for pid, units in held.items() if pid in plain}
+
+    rows = []
+    missing = set()
+    if plain:
+        requested = _by_product(plain)
+        released = _by_product(consumed) if consumed else 0
+        rows = db.execute(
+            update(Product)
+            .where(
+                Product.product_id.in_(list(plain)),
+                Product.stock - Product.reserved_stock + released >= requested
+            )
+            .values(
+                stock=Product.stock - requested,
+                reserved_stock=Product.reserved_stock - released
+            )
+            .returning(Product.product_id, Product.stock),
+            execution_options={"synchronize_session": "fetch"}
+        ).all()
+        missing = set(plain) - {product_id for product_id, _ in rows}
+
+    # Fragmentados: la reserva ya sacó sus unidades; solo se descuenta la diferencia
+    surplus: Dict[int, int] = {}
+    for product_id in sorted(set(quantities) - set(plain)):
+        extra = quantities[product_id] - held.get(product_id, 0)
+        if extra > 0 and not _take_from_shards(db, product_id, extra):
+            missing.add(product_id)
+        elif extra < 0:
+            surplus[product_id] = -extra
+
+    if missing:
+        raise InsufficientStockError(missing)
+
+    # Reservas de productos que ya no están en la compra (o que apartaron de más)
+    _release_held(db, {pid: units for pid, units in held.items() if pid not in quantities})
+    _return_to_shards(db, surplus, shards)
+    _log_stock_rows(
+        db, rows, {pid: -units for pid, units in quantities.items()}, reason, order_id,
+        lambda product_id, stock: stock <= 0
+    )
+
+
+def adjust_stock(
+    db: Session,
+    deltas: Dict[int, int],
+    reason: InventoryMovementReason,
+    order_id: Optional[int] = None
+) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Aplica cambios de stock sin condición (p. ej. regresar las unidades de una
+                 orden cancelada) con un solo UPDATE y los registra en el ledger.
+    Parámetros:
+        db (Session): Sesión de base de datos (no hace commit).
+        deltas (Dict[int, int]): Cambio de unidades por product_id (negativo = salida).
+        reason (InventoryMovementReason): Motivo que se registra en el ledger.
+        order_id (int, opcional): Orden que se registra en el ledger.
+    Retorna:
+        None
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    shards = sharded_products(db, deltas)
+    _return_to_shards(db, {pid: units for pid, units in deltas.items() if pid in shards}, shards)
+    plain = {pid: units for pid, units in deltas.items() if pid not in shards}
+
+    rows = []
+    if plain:
+        rows = db.execute(
+            update(Product)
+            .where(Product.product_id.in_(list(plain)))
+            .values(stock=Product.stock + _by_product(plain))
+            .returning(Product.product_id, Product.stock),
+            execution_options={"synchronize_session": "fetch"}
+        ).all()
+    _log_stock_rows(
+        db, rows, deltas, reason, order_id,
+        lambda product_id, stock: (stock > 0) != (stock - plain[product_id] > 0)
+    )
+
+
+def reserve_stock(
+    db: Session,
+    user_id: int,
+    quantities: Dict[int, int],
+    reference: Optional[str] = None,
+    ttl_minutes: Optional[int] = None
+) -> datetime:
+    """
+    Autor: Luis Flores
+    Descripción: Aparta unidades para el checkout de un usuario. Reemplaza las reservas que
+                 el usuario tuviera (un solo checkout activo por usuario) y aparta todas las
+                 líneas con un UPDATE condicional sobre reserved_stock (los productos
+                 fragmentados sacan las unidades de sus fragmentos).
+    Parámetros:
+        db (Session): Sesión de base de datos (no hace commit).
+        user_id (int): ID del usuario.
+        quantities (Dict[int, int]): Unidades por product_id.
+        reference (str, opcional): Sesión de Stripe u orden de PayPal asociada.
+        ttl_minutes (int, opcional): Vigencia; por defecto INVENTORY_RESERVATION_TTL_MINUTES.
+    Retorna:
+        datetime: Fecha de expiración de la reserva.
+    Excepciones:
+        InsufficientStockError: Si algún producto no tiene unidades disponibles.
+    """
+    release_user_reservations(db, user_id)
+
+    now = datetime.now(UTC)
+    expires_at = now + timedelta(minutes=ttl_minutes or settings.INVENTORY_RESERVATION_TTL_MINUTES)
+    if not quantities:
+        return expires_at
+
+    shards = sharded_products(db, quantities)
+    plain = {pid: units for pid, units in quantities.items() if pid not in shards}
+    missing = set()
+    if plain:
+        requested = _by_product(plain)
+        reserved = db.scalars(
+            update(Product)
+            .where(
+                Product.product_id.in_(list(plain)),
+                Product.stock - Product.reserved_stock >= requested
+            )
+            .values(reserved_stock=Product.reserved_stock + requested)
+            .returning(Product.product_id),
+            execution_options={"synchronize_session": "fetch"}
+        ).all()
+        missing = set(plain) - set(reserved)
+
+    for product_id in sorted(shards):
+        if not _take_from_shards(db, product_id, quantities[product_id]):
+            missing.add(product_id)
+
+    if missing:
+        raise InsufficientStockError(missing)
+
+    db.execute(insert(InventoryReservation), [
+        {
+            "user_id": user_id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "reference": reference,
+            "created_at": now,
+            "expires_at": expires_at,
+        }
+        for product_id, quantity in quantities.items()
+    ])
+    return expires_at
+
+
+def set_reservation_reference(db: Session, user_id: int, reference: str) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Asocia las reservas del usuario con la sesión de pago creada.
+    """
+    db.execute(
+        update(InventoryReservation)
+        .where(InventoryReservation.user_id == user_id)
+        .values(reference=reference)
+    )
+
+
+def release_user_reservations(db: Session, user_id: int) -> int:
+    """
+    Autor: Luis Flores
+    Descripción: Libera las reservas de un usuario (checkout cancelado o fallido).
+    Parámetros:
+        db (Session): Sesión de base de datos (no hace commit).
+        user_id (int): ID del usuario.
+    Retorna:
+        int: Unidades liberadas.
+    """
+    held = _take_user_reservations(db, user_id)
+    _release_held(db, held)
+    return sum(held.values())
+
+
+def release_expired_reservations(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Autor: Luis Flores
+    Descripción: Libera las reservas vencidas (job del scheduler). Las filas se eliminan con
+                 DELETE ... RETURNING, por lo que una reserva consumida al mismo tiempo por un
+                 checkout no se libera dos veces.
+    Parámetros:
+        db (Session): Sesión de base de datos.
+        now (datetime, opcional): Fecha de corte; por defecto ahora.
+    Retorna:
+        int: Unidades liberadas.
+    """
+    now = now or datetime.now(UTC)
+    rows = db.execute(
+        delete(InventoryReservation)
+        .where(InventoryReservation.expires_at <= now)
+        .returning(InventoryReservation.product_id, InventoryReservation.quantity)
+    ).all()
+    held = quantities_by_product(rows)
+    _release_held(db, held)
+    db.commit()
+
+    released = sum(held.values())
+    if released:
+        logger.info(f"Reservas vencidas liberadas: {len(rows)} ({released} unidades)")
+    return released
+
+
+def set_stock_shards(db: Session, product_id: int, shards: int) -> Optional[Product]:
+    """
+    Autor: Luis Flores
+    Descripción: Activa, cambia o desactiva el stock fragmentado de un producto. Primero
+                 consolida (suma de fragmentos más unidades reservadas, que vuelven a
+                 reserved_stock) y después, si shards > 0, reparte las unidades disponibles
+                 entre los nuevos fragmentos; las reservas vigentes quedan fuera de ellos.
+    Parámetros:
+        db (Session): Sesión de base de datos (no hace commit).
+        product_id (int): ID del producto.
+        shards (int): Número de fragmentos (0 desactiva).
+    Retorna:
+        Product | None: Producto actualizado, o None si no existe.
+    """
+    product = db.get(Product, product_id, with_for_update=True)
+    if product is None:
+        return None
+
+    stock, reserved_stock = product.stock, product.reserved_stock
+    reserved = db.scalar(
+        select(func.coalesce(func.sum(InventoryReservation.quantity), 0))
+        .where(InventoryReservation.product_id == product_id)
+    )
+    if product.stock_shards:
+        stock = shard_totals(db, [product_id]).get(product_id, 0) + reserved
+        reserved_stock = reserved
+        db.execute(delete(ProductStockShard).where(ProductStockShard.product_id == product_id))
+
+    if shards:
+        stock = max(stock - reserved_stock, 0)
+        reserved_stock = 0
+        db.execute(insert(ProductStockShard), [
+            {"product_id": product_id, "shard_no": number, "stock": units}
+            for number, units in enumerate(_split_units(stock, shards))
+        ])
+
+    # Sentencia directa: mover unidades entre fragmentos y reservas no es un movimiento
+    # de inventario (el hook del ORM lo registraría como ajuste)
+    db.execute(
+        update(Product)
+        .where(Product.product_id == product_id)
+        .values(stock=stock, reserved_stock=reserved_stock, stock_shards=shards),
+        execution_options={"synchronize_session": "fetch"}
+    )
+    track_low_stock(db, {product_id: stock})
+    record_changes(db, (), {product_id})
+    return product
+
+
+def redistribute_stock_shards(db: Session, product_ids: Iterable[int]) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Vuelve a repartir product.stock entre los fragmentos después de que un
+                 administrador lo fijó a un valor absoluto (edición, ajuste "set" o importación).
+                 Solo afecta a los productos fragmentados; sus fragmentos se bloquean en orden
+                 antes de reemplazarlos. Los ajustes relativos usan adjust_shard_stock.
+    Parámetros:
+        db (Session): Sesión de base de datos (no hace commit).
+        product_ids (Iterable[int]): IDs modificados.
+    Retorna:
+        None
+    """
+    shards = sharded_products(db, product_ids)
+    if not shards:
+        return
+
+    lock_stock_shards(db, shards)
+    stock = dict(db.execute(
+        select(Product.product_id, Product.stock).where(Product.product_id.in_(list(shards)))
+    ).all())
+    db.execute(delete(ProductStockShard).where(ProductStockShard.product_id.in_(list(shards))))
+    db.execute(insert(ProductStockShard), [
+        {"product_id": product_id, "shard_no": number, "stock": units}
+        for product_id, count in shards.items()
+        for number, units in enumerate(_split_units(stock[product_id], count))
+    ])
+
+
+def sync_sharded_stock(db: Session, product_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Autor: Luis Flores
+    Descripción: Copia a product.stock la suma de los fragmentos de los productos
+                 fragmentados (listados y caches leen product.stock). Solo escribe los
+                 productos cuyo total cambió, con un solo UPDATE.
+    Parámetros:
+        db (Session): Sesión de base de datos (no hace commit).
+        product_ids (Iterable[int], opcional): Limitar a estos productos.
+    Retorna:
+        int: Productos actualizados.
+    """
+    query = select(Product.product_id, Product.stock).where(Product.stock_shards > 0)
+    if product_ids is not None:
+        query = query.where(Product.product_id.in_(list(product_ids)))
+    current = dict(db.execute(query).all())
+    if not current:
+        return 0
+
+    totals = shard_totals(db, current)
+    changed = {
+        product_id: totals.get(product_id, 0)
+        for product_id, stock in current.items()
+        if stock != totals.get(product_id, 0)
+    }
+    if not changed:
+        return 0
+
+    db.execute(
+        update(Product)
+        .where(Product.product_id.in_(list(changed)))
+        .values(stock=_by_product(changed)),
+        execution_options={"synchronize_session": "fetch"}
+    )
+    track_low_stock(db, changed)
+    record_changes(
+        db,
+        {pid for pid, total in changed.items() if (total > 0) != (current[pid] > 0)},
+        set(changed)
+    )
+    return len(changed)
+
+
+@event.listens_for(Session, "after_flush")
+def _log_orm_stock_changes(session: Session, flush_context) -> None:
+    """
+    Autor: Luis Flores
+    Descripción: Registra como ajuste los cambios de stock hechos por el ORM (alta de
+                 producto, edición desde administración) en la misma transacción del flush.
+                 Las sentencias directas de este módulo no pasan por aquí.
+    """
+    deltas: Dict[int, int] = {}
+    stock: Dict[int, int] = {}
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Product):
+            continue
+        history = inspect(obj).attrs.stock.history
+        if not history.added or not history.has_changes():
+            continue
+        after = history.added[0] or 0
+        stock[obj.product_id] = after
+        if obj in session.new:
+            deltas[obj.product_id] = after
+        elif history.deleted:
+            deltas[obj.product_id] = after - (history.deleted[0] or 0)
+
+    if stock:
+        connection = session.connection()
+        record_movements(connection, deltas, InventoryMovementReason.ADJUSTMENT, stock)
+        track_low_stock(connection, stock)
@@ -0,0 +1,192 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Cache en memoria de "tarjetas" de producto: el registro inmutable con lo que
+#              muestran los listados (nombre, marca, precio, stock, imagen principal, rating).
+#              Cada tarjeta se guarda con la versión del producto con la que se leyó; los
+#              cambios de producto, imágenes y reseñas (hooks de catalog_events) incrementan esa
+#              versión, de modo que la siguiente lectura la vuelve a cargar. Los listados
+#              (búsqueda, relacionados, comprados juntos, analítica) arman su respuesta con
+#              get_many() sin cargar el ORM ni la colección de imágenes.
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.product import Product
+from app.services.catalog_events import register_catalog_listener, register_product_listener
+
+
+@dataclass(frozen=True)
+class ProductCard:
+    """
+    Autor: Luis Flores
+    Descripción: Datos de un producto para listados. Es inmutable para poder compartirse
+                 entre peticiones sin copiarse.
+    """
+    product_id: int
+    name: str
+    brand: str
+    category: Optional[str]
+    price: Decimal
+    stock: int
+    is_active: bool
+    average_rating: Optional[Decimal]
+    rating_count: int
+    primary_image: Optional[str]
+
+    @property
+    def in_stock(self) -> bool:
+        return self.stock > 0
+
+
+class ProductCardCache:
+    """
+    Autor: Luis Flores
+    Descripción: LRU de tarjetas de producto con invalidación por versión. La llave efectiva
+                 es (product_id, versión): una tarjeta guardada con una versión anterior se
+                 trata como ausente. Un cambio sin IDs (cambio masivo) incrementa la
+                 generación global e invalida todas las tarjetas.
+    """
+
+    def __init__(self, maxsize: int = 5000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._cards: "OrderedDict[int, Tuple[Tuple[int, int], ProductCard]]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._generation = 0
+
+    def _stamp(self, product_id: int) -> Tuple[int, int]:
+        return self._generation, self._versions.get(product_id, 0)
+
+    def mark_changed(self, product_ids: Set[int]) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Listener de catálogo/producto. Incrementa la versión de los productos
+                     indicados (o la generación global si no se indican IDs).
+        """
+        with self._lock:
+            if not product_ids:
+                self._generation += 1
+                self._versions.clear()
+                self._cards.clear()
+                return
+            for product_id in product_ids:
+                self._versions[product_id] = self._versions.get(product_id, 0) + 1
+                self._cards.pop(product_id, None)
+
+    def clear(self) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Descarta todas las tarjetas.
+        """
+        self.mark_changed(set())
+
+    def get(self, db: Session, product_id: int) -> Optional[ProductCard]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene la tarjeta de un producto.
+        Retorna:
+            ProductCard | None: Tarjeta o None si el producto no existe.
+        """
+        return self.get_many(db, [product_id]).get(product_id)
+
+    def get_many(self, db: Session, product_ids: Iterable[int]) -> Dict[int, ProductCard]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene las tarjetas de varios productos. Las que no están en cache (o
+                     tienen una versión anterior) se cargan con una sola consulta de productos
+                     para todo el lote (la imagen principal está desnormalizada en product).
+        Parámetros:
+            db (Session): Sesión de base de datos (solo se usa si faltan tarjetas).
+            product_ids (Iterable[int]): IDs a obtener.
+        Retorna:
+            Dict[int, ProductCard]: Tarjetas por product_id (los IDs inexistentes se omiten).
+        """
+        cards: Dict[int, ProductCard] = {}
+        missing: Dict[int, Tuple[int, int]] = {}
+
+        with self._lock:
+            for product_id in product_ids:
+                if product_id in cards or product_id in missing:
+                    continue
+                stamp = self._stamp(product_id)
+                entry = self._cards.get(product_id)
+                if entry is not None and entry[0] == stamp:
+                    self._cards.move_to_end(product_id)
+                    cards[product_id] = entry[1]
+                else:
+                    missing[product_id] = stamp
+
+        if not missing:
+            return cards
+
+        loaded = self._load(db, list(missing))
+        with self._lock:
+            for product_id, card in loaded.items():
+                cards[product_id] = card
+                # Si el producto cambió mientras se leía, la tarjeta no se guarda
+                if self._stamp(product_id) != missing[product_id]:
+                    continue
+                self._cards[product_id] = (missing[product_id], card)
+                self._cards.move_to_end(product_id)
+            while len(self._cards) > self.maxsize:
+                self._cards.popitem(last=False)
+
+        return cards
+
+    def get_ordered(
+        self,
+        db: Session,
+        product_ids: List[int],
+        active_only: bool = False
+    ) -> List[ProductCard]:
+        """
+        Autor: Luis Flores
+        Descripción: Obtiene las tarjetas en el orden de los IDs recibidos.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            product_ids (List[int]): IDs en el orden deseado.
+            active_only (bool): Omitir productos inactivos.
+        Retorna:
+            List[ProductCard]: Tarjetas existentes, en el mismo orden.
+        """
+        cards = self.get_many(db, product_ids)
+        return [
+            cards[pid] for pid in product_ids
+            if pid in cards and (cards[pid].is_active or not active_only)
+        ]
+
+    @staticmethod
+    def _load(db: Session, product_ids: List[int]) -> Dict[int, ProductCard]:
+        rows = db.query(
+            Product.product_id, Product.name, Product.brand, Product.category, Product.price,
+            Product.stock, Product.is_active, Product.average_rating, Product.rating_count,
+            Product.primary_image_path
+        ).filter(Product.product_id.in_(product_ids)).all()
+
+        return {
+            row.product_id: ProductCard(
+                product_id=row.product_id,
+                name=row.name,
+                brand=row.brand,
+                category=row.category,
+                price=row.price,
+                stock=row.stock or 0,
+                is_active=bool(row.is_active),
+                average_rating=row.average_rating,
+                rating_count=row.rating_count or 0,
+                primary_image=row.primary_image_path,
+            )
+            for row in rows
+        }
+
+
+# Instancia global; se invalida con los cambios de catálogo y de producto
+product_cards = ProductCardCache(maxsize=settings.PRODUCT_CARD_CACHE_SIZE)
+register_catalog_listener(product_cards.mark_changed)
+register_product_listener(product_cards.mark_changed)
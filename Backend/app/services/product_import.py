@@ -0,0 +1,349 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Importación masiva de productos desde CSV o JSONL. El archivo se lee en
+#              streaming (una fila a la vez) y se procesa por lotes: cada lote se valida,
+#              se deduplica por SKU y se escribe con un solo INSERT ... ON CONFLICT (sku)
+#              DO UPDATE, con commit por lote. El progreso y los errores por fila quedan en un
+#              registro de jobs en memoria que la API consulta mientras la importación corre.
+
+import csv
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.api.v1.admin.schemas import ProductImportRow
+from app.core.database import SessionLocal
+from app.core.text import build_search_text
+from app.core.upsert import upsert_insert
+from app.models.enum import InventoryMovementReason
+from app.models.product import Product
+from app.services.catalog_events import notify_catalog_change
+from app.services.inventory import record_movements, redistribute_stock_shards, track_low_stock
+
+logger = logging.getLogger(__name__)
+
+# Filas por lote (un INSERT ... ON CONFLICT y un commit por lote)
+CHUNK_SIZE = 500
+
+# Errores por fila que se guardan en el job; el resto solo se cuentan
+MAX_ERRORS = 1000
+
+# Jobs terminados que se conservan para consulta
+MAX_JOBS = 100
+
+# Columnas que la importación escribe (y actualiza si el SKU ya existe)
+IMPORT_FIELDS = (
+    "name", "description", "brand", "category", "physical_activities", "fitness_objectives",
+    "nutritional_value", "price", "stock", "is_active",
+)
+
+# Valores de las columnas opcionales para productos nuevos. En un SKU existente solo se
+# actualizan las columnas que trae la fila; las omitidas conservan su valor
+IMPORT_DEFAULTS = {
+    "description": "", "physical_activities": [], "fitness_objectives": [],
+    "nutritional_value": "", "stock": 0, "is_active": True,
+}
+
+
+@dataclass
+class ImportJob:
+    """
+    Autor: Luis Flores
+    Descripción: Estado y progreso de una importación. Solo la tarea de importación lo
+                 modifica; la API lo lee con snapshot().
+    """
+    job_id: str
+    filename: Optional[str]
+    file_format: str
+    status: str = "pending"
+    rows_processed: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    errors_truncated: bool = False
+    detail: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    finished_at: Optional[datetime] = None
+
+    def add_error(self, row: int, error: str, sku: Optional[str] = None) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"row": row, "sku": sku, "error": error})
+        else:
+            self.errors_truncated = True
+
+    def finish(self, status: str, detail: Optional[str] = None) -> None:
+        self.status = status
+        self.detail = detail
+        self.finished_at = datetime.now(UTC)
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = dict(self.__dict__)
+        data["errors"] = list(self.errors)
+        return data
+
+
+class ImportJobRegistry:
+    """
+    Autor: Luis Flores
+    Descripción: Registro en memoria de las importaciones recientes (las más antiguas se
+                 descartan al superar max_jobs).
+    """
+
+    def __init__(self, max_jobs: int = MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, filename: Optional[str], file_format: str) -> ImportJob:
+        job = ImportJob(job_id=uuid.uuid4().hex, filename=filename, file_format=file_format)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+# Instancia global del registro de importaciones
+import_jobs = ImportJobRegistry()
+
+
+def detect_import_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    """
+    Autor: Luis Flores
+    Descripción: Determina el formato del archivo por su extensión o tipo de contenido.
+    Parámetros:
+        filename (str | None): Nombre del archivo subido.
+        content_type (str | None): Tipo MIME declarado.
+    Retorna:
+        str: "csv" o "jsonl".
+    Excepciones:
+        ValueError: Si el formato no es soportado.
+    """
+    extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+    if content_type in ("application/x-ndjson", "application/jsonl"):
+        return "jsonl"
+    if content_type == "text/csv":
+        return "csv"
+    raise ValueError("Formato no soportado. Usa un archivo .csv o .jsonl")
+
+
+def spool_upload(source: BinaryIO) -> str:
+    """
+    Autor: Luis Flores
+    Descripción: Copia el archivo subido a un archivo temporal por bloques (sin cargarlo
+                 completo en memoria) para que la importación lo lea después de responder.
+    Parámetros:
+        source (BinaryIO): Archivo subido.
+    Retorna:
+        str: Ruta del archivo temporal (la importación lo elimina al terminar).
+    """
+    with tempfile.NamedTemporaryFile(prefix="product_import_", delete=False) as target:
+        shutil.copyfileobj(source, target, length=1024 * 1024)
+        return target.name
+
+
+def iter_rows(path: str, file_format: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Autor: Luis Flores
+    Descripción: Lee las filas del archivo una a una.
+    Parámetros:
+        path (str): Ruta del archivo.
+        file_format (str): "csv" (con encabezado) o "jsonl" (un objeto JSON por línea).
+    Retorna:
+        Iterator[Tuple[int, Any]]: (número de fila, dict de la fila o mensaje de error si la
+            fila no se pudo leer). Las líneas vacías de JSONL se omiten.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as source:
+        if file_format == "csv":
+            for number, row in enumerate(csv.DictReader(source), start=1):
+                if None in row:
+                    yield number, "La fila tiene más columnas que el encabezado"
+                else:
+                    yield number, row
+            return
+
+        for number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, f"JSON inválido: {e.msg}"
+                continue
+            yield number, row if isinstance(row, dict) else "Cada línea debe ser un objeto JSON"
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'fila'}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+def _write_chunk(db: Session, rows: Dict[str, Dict[str, Any]]) -> Tuple[List[int], int]:
+    """
+    Autor: Luis Flores
+    Descripción: Inserta o actualiza un lote de productos con un INSERT ... ON CONFLICT por
+                 cada combinación de columnas presentes (normalmente una sola en CSV). En los
+                 SKUs existentes solo se actualizan las columnas que trae la fila.
+    Parámetros:
+        db (Session): Sesión de base de datos.
+        rows (Dict[str, dict]): Valores por SKU (ya validados, sin SKUs repetidos y sin las
+            columnas omitidas).
+    Retorna:
+        Tuple[List[int], int]: IDs escritos y cuántos SKUs ya existían (actualizados).
+    """
+    insert = upsert_insert(db)
+
+    # Stock previo (para el ledger de inventario) y descripción de los SKUs existentes (para
+    # el texto de búsqueda cuando la fila no la trae)
+    before = {
+        sku: (stock, description)
+        for sku, stock, description in db.execute(
+            select(Product.sku, Product.stock, Product.description).where(Product.sku.in_(list(rows)))
+        ).all()
+    }
+
+    groups: Dict[Tuple[str, ...], Dict[str, Dict[str, Any]]] = {}
+    for sku, row in rows.items():
+        groups.setdefault(tuple(name for name in IMPORT_FIELDS if name in row), {})[sku] = row
+
+    now = datetime.now(UTC)
+    written = []
+    for columns, group in groups.items():
+        values = []
+        for sku, row in group.items():
+            description = row.get("description", before[sku][1] if sku in before else "")
+            values.append({
+                **IMPORT_DEFAULTS,
+                **row,
+                "sku": sku,
+                "search_text": build_search_text(row["name"], description, row["brand"], row["category"]),
+                "updated_at": now,
+            })
+        statement = insert(Product).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Product.sku],
+            set_={name: statement.excluded[name] for name in columns + ("search_text", "updated_at")}
+        ).returning(Product.product_id, Product.sku, Product.stock)
+        written.extend(db.execute(statement).all())
+
+    # El stock solo cambia en los productos nuevos y en las filas que traen la columna
+    stock_after = {
+        product_id: stock for product_id, sku, stock in written
+        if sku not in before or "stock" in rows[sku]
+    }
+    record_movements(
+        db,
+        {
+            product_id: stock - (before[sku][0] if sku in before else 0)
+            for product_id, sku, stock in written if product_id in stock_after
+        },
+        InventoryMovementReason.IMPORT,
+        stock_after
+    )
+    track_low_stock(db, stock_after)
+    redistribute_stock_shards(db, stock_after)
+    return [product_id for product_id, _, _ in written], len(before)
+
+
+def run_import(
+    job: ImportJob,
+    path: str,
+    session_factory: Optional[Callable[[], Session]] = None
+) -> ImportJob:
+    """
+    Autor: Luis Flores
+    Descripción: Ejecuta una importación (tarea en segundo plano). Cada lote se valida, se
+                 escribe y se confirma por separado: un lote que falla al escribirse marca sus
+                 filas como fallidas y la importación continúa con el siguiente. Al terminar
+                 se elimina el archivo temporal.
+    Parámetros:
+        job (ImportJob): Job a actualizar con el progreso.
+        path (str): Ruta del archivo a importar.
+        session_factory (Callable | None): Fábrica de sesiones (SessionLocal por defecto).
+    Retorna:
+        ImportJob: El mismo job, terminado.
+    """
+    job.status = "running"
+    db = (session_factory or SessionLocal)()
+    try:
+        rows = iter_rows(path, job.file_format)
+        while True:
+            chunk = list(islice(rows, CHUNK_SIZE))
+            if not chunk:
+                break
+
+            # Validación; si un SKU se repite en el lote gana la última fila
+            valid: Dict[str, Dict[str, Any]] = {}
+            numbers: Dict[str, int] = {}
+            for number, raw in chunk:
+                if isinstance(raw, str):
+                    job.add_error(number, raw)
+                    continue
+                try:
+                    row = ProductImportRow.model_validate(raw)
+                except ValidationError as e:
+                    job.add_error(number, _validation_message(e), raw.get("sku") or None)
+                    continue
+                if row.sku in valid:
+                    job.add_error(numbers[row.sku], "SKU repetido; se usó una fila posterior", row.sku)
+                valid[row.sku] = row.model_dump(include=set(IMPORT_FIELDS), exclude_none=True)
+                numbers[row.sku] = number
+
+            if valid:
+                try:
+                    product_ids, existing = _write_chunk(db, valid)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Importación {job.job_id}: error al escribir un lote: {e}")
+                    for sku, number in numbers.items():
+                        job.add_error(number, f"Error al guardar: {str(e)}", sku)
+                else:
+                    job.inserted += len(product_ids) - existing
+                    job.updated += existing
+                    notify_catalog_change(set(product_ids))
+
+            job.rows_processed += len(chunk)
+
+        job.finish("completed")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Importación {job.job_id} interrumpida: {e}")
+        job.finish("failed", str(e))
+    finally:
+        db.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    logger.info(
+        f"Importación {job.job_id}: {job.rows_processed} filas, {job.inserted} nuevas, "
+        f"{job.updated} actualizadas, {job.failed} con error"
+    )
+    return job
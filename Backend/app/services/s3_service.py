@@ -2,21 +2,33 @@
 # Fecha: 13/11/2025
 # Descripción: Este servicio define la clase S3Service, la cual proporciona métodos para manejar
 # imágenes dentro de un bucket de Amazon S3
-import boto3, re, io
+import boto3, re, io, asyncio, uuid
+from functools import partial
 from botocore.exceptions import ClientError
-#import uuid
 from PIL import Image
 from app.config import settings
-from typing import Dict
+from app.services.image_pipeline import (
+    ALLOWED_FORMATS, CACHE_CONTROL, DEFAULT_VARIANT, ImageValidationError, ProcessedImage,
+    image_pool, process_image
+)
+from typing import Dict, List
 from starlette.concurrency import run_in_threadpool
 
+# Tipos aceptados en subidas directas a S3 y su extensión
+UPLOAD_CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+}
+
 class S3Service:
     def __init__(self):
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION
+            region_name=settings.AWS_REGION,
+            endpoint_url=settings.S3_ENDPOINT_URL
         )
         self.bucket_name = settings.S3_BUCKET_NAME
 
@@ -101,80 +113,156 @@ class S3Service:
         except Exception as e:
             return {"success": False, "error": f"Error inesperado: {str(e)}"}
          
-    async def upload_product_img(self, file_content: bytes, product_id: str, max_size_mb: int = 5, allowed_formats: tuple = ('JPEG', 'PNG', 'WEBP')) -> dict:
+    def _object_url(self, key: str) -> str:
+        if settings.S3_ENDPOINT_URL:
+            return f"{settings.S3_ENDPOINT_URL.rstrip('/')}/{self.bucket_name}/{key}"
+        return f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{key}"
+
+    def create_presigned_upload(self, key_prefix: str, content_type: str, max_size_mb: int = 5) -> dict:
         """
-        Autor: Gabriel Vilchis
-        Sube una imagen de producto a S3 siguiendo el mismo proceso de validación
-        y redimensionamiento que las imágenes de perfil, pero usando una ruta
-        distinta asociada al producto.
+        Autor: Luis Flores
+        Genera una política de POST prefirmada para que el cliente suba una imagen directo a
+        S3, sin pasar los bytes por el servidor de la API. La política fija la llave, el
+        Content-Type y el tamaño máximo; la firma se calcula localmente (sin red).
+
+        Args:
+            key_prefix (str): Carpeta de subidas del dueño (p. ej. "uploads/products/12").
+            content_type (str): Tipo MIME de la imagen (image/jpeg, image/png o image/webp).
+            max_size_mb (int, opcional): Tamaño máximo permitido en MB. Default = 5.
+
+        Returns:
+            dict: url y fields para el formulario POST, key asignada y expires_in (segundos).
+
+        Raises:
+            ValueError: Si el tipo de contenido no está permitido.
+        """
+        extension = UPLOAD_CONTENT_TYPES.get(content_type)
+        if extension is None:
+            raise ValueError(
+                f"Tipo de contenido no permitido. Los tipos permitidos son: {', '.join(UPLOAD_CONTENT_TYPES)}"
+            )
+
+        key = f"{key_prefix}/{uuid.uuid4().hex}.{extension}"
+        expires_in = settings.S3_PRESIGNED_EXPIRES_SECONDS
+        presigned = self.s3_client.generate_presigned_post(
+            Bucket=self.bucket_name,
+            Key=key,
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_size_mb * 1024 * 1024],
+            ],
+            ExpiresIn=expires_in
+        )
+        return {"url": presigned["url"], "fields": presigned["fields"], "key": key, "expires_in": expires_in}
+
+    def object_exists(self, key: str) -> bool:
+        """
+        Autor: Luis Flores
+        Indica si un objeto existe en el bucket (HEAD, sin descargarlo).
+        """
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def download_object(self, key: str) -> bytes:
+        """
+        Autor: Luis Flores
+        Descarga el contenido de un objeto del bucket.
+        """
+        return self.s3_client.get_object(Bucket=self.bucket_name, Key=key)["Body"].read()
+
+    def delete_object(self, key: str) -> None:
+        """
+        Autor: Luis Flores
+        Elimina un objeto del bucket (no falla si no existe).
+        """
+        self.s3_client.delete_object(Bucket=self.bucket_name, Key=key)
+
+    def _put_variant(self, processed: ProcessedImage, variant: str, product_id: str) -> None:
+        body, width, height = processed.variants[variant]
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=processed.key(variant),
+            Body=body,
+            ContentType="image/webp",
+            CacheControl=CACHE_CONTROL,
+            Metadata={'product_id': product_id, 'width': str(width), 'height': str(height)}
+        )
+
+    async def upload_product_img(self, file_content: bytes, product_id: str, max_size_mb: int = 5, allowed_formats: tuple = ALLOWED_FORMATS) -> dict:
+        """
+        Autor: Gabriel Vilchis y Luis Flores
+        Valida una imagen de producto, genera sus variantes WebP (thumb, medium, large) en el
+        pool de imágenes y las sube a S3 en paralelo. Nada de esto corre en el event loop.
+        Las llaves dependen del contenido (product_images/{hash}/{variante}.webp), por lo que
+        cada URL es inmutable y se sirve con Cache-Control de un año.
 
         Args:
             file_content (bytes): Contenido binario de la imagen.
-            product_id (str): ID del producto asociado a la imagen.
+            product_id (str): ID del producto asociado a la imagen (metadata del objeto).
             max_size_mb (int, opcional): Tamaño máximo permitido en MB. Default = 5.
             allowed_formats (tuple, opcional): Formatos permitidos. Default = ('JPEG', 'PNG', 'WEBP').
 
         Returns:
             dict: Resultado de la subida. Contiene:
                 - success (bool)
-                - file_url (str, opcional)
-                - file_name (str, opcional)
+                - file_url (str, opcional): URL de la variante large
+                - file_name (str, opcional): Llave de la variante large
+                - variants (dict, opcional): URL por variante
                 - error (str, opcional)
         """
         try:
-            # Tamaño del archivo en MB
-            file_size = len(file_content) / (1024 * 1024)
-            if file_size > max_size_mb:
-                return {"success": False, "error": f"El tamaño del archivo excede el limite de {max_size_mb} MB"}
-            
-            # Abrir la imagen para verificar formato
-            try:
-                img = Image.open(io.BytesIO(file_content))
-                img_format = img.format
+            loop = asyncio.get_running_loop()
+            processed = await loop.run_in_executor(
+                image_pool, partial(process_image, file_content, max_size_mb, allowed_formats)
+            )
 
-                if img_format not in allowed_formats:
-                    return {"success": False, "error": f"Formato de imagen no permitido. Los formatos permitidos son: {", ".join(allowed_formats)}"}
-            
-            except Exception as e:
-                return {"success": False, "error": f"El archivo no es una imagen válida o está corrupto. Detalle: {str(e)}"}
-            
-            # Redimensiona la imagen
-            max_dimension = 1024
-            if max(img.size) > max_dimension:
-                img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
-                output = io.BytesIO()
-                img.save(output, format=img_format, optimize=True, quality=85)
-                file_content = output.getvalue()
-
-            # Lógica para S3
-            file_ext = img_format.lower()
-            file_name = f"product_images/{product_id}/picture.{file_ext}" # de igual forma aqui 
-
-            content_types = {
-                'jpeg': 'image/jpeg',
-                'png': 'image/png',
-                'webp': 'image/webp'
-            }
-            content_type = content_types.get(file_ext, 'image/jpeg') 
+            await asyncio.gather(*(
+                run_in_threadpool(self._put_variant, processed, variant, product_id)
+                for variant in processed.variants
+            ))
 
-            # Subir el archivo
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=file_name,
-                Body=file_content, 
-                ContentType=content_type,
-                Metadata={'product_id': product_id}
-            )
+            return {
+                "success": True,
+                "file_url": self._object_url(processed.key(DEFAULT_VARIANT)),
+                "file_name": processed.key(DEFAULT_VARIANT),
+                "variants": {variant: self._object_url(processed.key(variant)) for variant in processed.variants},
+            }
 
-            img_url = f"https://{self.bucket_name}.s3.{settings.AWS_REGION}.amazonaws.com/{file_name}"
+        except ImageValidationError as e:
+            return {"success": False, "error": str(e)}
 
-            return {"success": True, "file_url": img_url, "file_name": file_name}
-        
         except ClientError as e:
             return {"success": False, "error": f"Error al subir a S3: {str(e)}"}
         
         except Exception as e:
             return {"success": False, "error": f"Error inesperado: {str(e)}"}
+
+    async def upload_product_images(self, files: List[bytes], product_id: str) -> List[dict]:
+        """
+        Autor: Luis Flores
+        Procesa y sube varias imágenes de producto a la vez (hasta IMAGE_UPLOAD_CONCURRENCY
+        simultáneas). Una imagen inválida no detiene a las demás.
+
+        Args:
+            files (List[bytes]): Contenido de cada imagen.
+            product_id (str): ID del producto asociado.
+
+        Returns:
+            List[dict]: Resultado de upload_product_img por imagen, en el mismo orden.
+        """
+        semaphore = asyncio.Semaphore(settings.IMAGE_UPLOAD_CONCURRENCY)
+
+        async def upload_one(content: bytes) -> dict:
+            async with semaphore:
+                return await self.upload_product_img(content, product_id)
+
+        return list(await asyncio.gather(*(upload_one(content) for content in files)))
             
     async def delete_profile_img(self, old_url: str, user_id: str) -> Dict:
         """
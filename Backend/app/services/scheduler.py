@@ -7,12 +7,20 @@
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.orm import Session
 from datetime import datetime
 import logging
+from app.config import settings
 from app.core.database import SessionLocal
 from app.api.v1.loyalty.service import loyalty_service
 from app.api.v1.subscriptions.service import subscription_service
+from app.api.v1.products.service import product_service, review_service
+from app.services.search_log import search_log_buffer
+from app.services.cart_store import cart_store
+from app.services.cart_cleanup import purge_abandoned_carts
+from app.services.co_purchase import build_co_purchase
+from app.services.inventory import rebuild_low_stock, release_expired_reservations, sync_sharded_stock
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -118,6 +126,256 @@ def process_subscriptions_daily_job():
         logger.info(f"Job de suscripciones finalizado\n")
 
 
+def refresh_sales_counts_job():
+    """
+    Autor: Luis Flores
+
+    Descripción:
+        Job programado que recalcula las unidades vendidas por producto (sales_count)
+        a partir de order_item. Se ejecuta cada hora y respalda el orden "best_selling"
+        de la búsqueda.
+
+    Parámetros:
+        Ninguno
+
+    Retorna:
+        None: Solo ejecuta el recálculo y registra logs.
+    """
+    logger.info(f"[{datetime.now()}] Iniciando job: Recálculo de ventas por producto")
+    
+    db = get_db_session()
+    try:
+        updated = product_service.refresh_sales_counts(db)
+        logger.info(f"Ventas por producto recalculadas: {updated} productos")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Excepción en job de ventas por producto: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
+def build_co_purchase_job():
+    """
+    Autor: Luis Flores
+
+    Descripción:
+        Job programado que actualiza la matriz de co-compra ("comprados juntos") con las
+        órdenes entregadas desde la última ejecución. Se ejecuta diariamente a la 01:00.
+
+    Parámetros:
+        Ninguno
+
+    Retorna:
+        None: Solo ejecuta la actualización y registra logs.
+    """
+    logger.info(f"[{datetime.now()}] Iniciando job: Matriz de co-compra")
+    
+    db = get_db_session()
+    try:
+        result = build_co_purchase(db)
+        logger.info(
+            f"Co-compra actualizada:\n"
+            f"  - Órdenes procesadas: {result['orders_processed']}\n"
+            f"  - Pares nuevos: {result['pairs_inserted']}\n"
+            f"  - Pares actualizados: {result['pairs_updated']}"
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Excepción en job de co-compra: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
+def reconcile_rating_aggregates_job():
+    """
+    Autor: Luis Flores
+
+    Descripción:
+        Job programado que recalcula desde la tabla review los agregados de reseñas
+        de los productos (suma, total, histograma y promedio) y corrige los que se
+        hayan desviado. Se ejecuta diariamente a las 02:00.
+
+    Parámetros:
+        Ninguno
+
+    Retorna:
+        None: Solo ejecuta la conciliación y registra logs.
+    """
+    logger.info(f"[{datetime.now()}] Iniciando job: Conciliación de ratings")
+    
+    db = get_db_session()
+    try:
+        corrected = review_service.reconcile_rating_aggregates(db)
+        if corrected:
+            logger.warning(f"Ratings conciliados: {corrected} productos tenían agregados desviados")
+        else:
+            logger.info("Ratings conciliados: sin diferencias")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Excepción en job de conciliación de ratings: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
+def flush_search_log_job():
+    """
+    Autor: Luis Flores
+
+    Descripción:
+        Job programado que escribe en la tabla search_log las búsquedas acumuladas en el
+        buffer en memoria, con un solo INSERT masivo. Se ejecuta cada pocos segundos
+        (SEARCH_LOG_FLUSH_SECONDS).
+
+    Parámetros:
+        Ninguno
+
+    Retorna:
+        None: Solo persiste el buffer y registra logs en caso de error.
+    """
+    if not len(search_log_buffer):
+        return
+    
+    db = get_db_session()
+    try:
+        written = search_log_buffer.flush(db)
+        logger.debug(f"Log de búsquedas: {written} entradas escritas")
+    except Exception as e:
+        logger.error(f"Excepción en job de log de búsquedas: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
+def release_expired_reservations_job():
+    """
+    Autor: Luis Flores
+
+    Descripción:
+        Job programado que libera las reservas de inventario de checkouts que no se
+        pagaron a tiempo, regresando esas unidades al stock disponible. Se ejecuta
+        cada minuto.
+
+    Parámetros:
+        Ninguno
+
+    Retorna:
+        None: Solo libera reservas y registra logs en caso de error.
+    """
+    db = get_db_session()
+    try:
+        release_expired_reservations(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Excepción en job de reservas de inventario: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
+def sync_sharded_stock_job():
+    """
+    Autor: Luis Flores
+
+    Descripción:
+        Job programado que copia a product.stock la suma de los fragmentos de stock de
+        los productos de alta demanda, para que listados y caches muestren la
+        disponibilidad actual. Se ejecuta cada INVENTORY_SHARD_SYNC_SECONDS.
+
+    Parámetros:
+        Ninguno
+
+    Retorna:
+        None: Solo actualiza el stock y registra logs en caso de error.
+    """
+    db = get_db_session()
+    try:
+        sync_sharded_stock(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Excepción en job de sincronización de stock fragmentado: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
+def flush_cart_store_job():
+    """
+    Autor: Luis Flores
+
+    Descripción:
+        Job programado que escribe en shopping_cart y cart_item los cambios de carrito
+        acumulados en el store en memoria (solo los items que cambiaron, en lotes). Se
+        ejecuta cada CART_STORE_FLUSH_SECONDS cuando el store difiere las escrituras.
+
+    Parámetros:
+        Ninguno
+
+    Retorna:
+        None: Solo persiste los carritos y registra logs en caso de error.
+    """
+    if not cart_store.write_behind:
+        return
+    
+    db = get_db_session()
+    try:
+        written = cart_store.flush(db)
+        logger.debug(f"Store de carritos: {written} carritos escritos")
+    except Exception as e:
+        logger.error(f"Excepción en job del store de carritos: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
+def purge_abandoned_carts_job():
+    """
+    Autor: Luis Flores
+
+    Descripción:
+        Job programado que elimina por lotes los carritos sin cambios en
+        CART_ABANDONED_DAYS días (con sus items), para mantener chicas las tablas
+        del carrito. Se ejecuta diariamente a las 03:00.
+
+    Parámetros:
+        Ninguno
+
+    Retorna:
+        None: Solo elimina carritos y registra logs en caso de error.
+    """
+    db = get_db_session()
+    try:
+        purge_abandoned_carts(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Excepción en job de carritos abandonados: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
+def rebuild_low_stock_job():
+    """
+    Autor: Luis Flores
+
+    Descripción:
+        Job programado que recalcula el conjunto de productos con stock bajo
+        (low_stock_product) a partir de product con el LOW_STOCK_THRESHOLD vigente.
+        Se ejecuta al iniciar el scheduler (el umbral pudo cambiar con el despliegue)
+        y diariamente a las 03:30 para corregir cualquier desfase.
+
+    Parámetros:
+        Ninguno
+
+    Retorna:
+        None: Solo actualiza el conjunto y registra logs en caso de error.
+    """
+    db = get_db_session()
+    try:
+        rebuild_low_stock(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Excepción en job de stock bajo: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
 # ==================== SCHEDULER ====================
 
 # Variable global para mantener referencia al scheduler
@@ -129,7 +387,12 @@ def start_scheduler():
 
     Descripción:
         Inicia el scheduler global de la aplicación y registra todos los cron jobs
-        configurados (expiración de puntos y procesamiento de suscripciones).
+        configurados (expiración de puntos, procesamiento de suscripciones,
+        recálculo de ventas por producto, escritura del log de búsquedas,
+        matriz de co-compra, conciliación de ratings, liberación de reservas
+        de inventario vencidas, sincronización del stock fragmentado, escritura
+        del store de carritos, limpieza de carritos abandonados y recálculo del
+        conjunto de productos con stock bajo).
         Esta función se ejecuta al iniciar la aplicación.
 
     Parámetros:
@@ -175,6 +438,89 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # Job 3: Recalculo de ventas por producto (cada hora, minuto 15)
+    _scheduler.add_job(
+        func=refresh_sales_counts_job,
+        trigger=CronTrigger(minute=15),
+        id='refresh_sales_counts_hourly',
+        name='Recálculo de ventas por producto',
+        replace_existing=True
+    )
+    
+    # Job 4: Escritura del log de búsquedas (cada pocos segundos)
+    _scheduler.add_job(
+        func=flush_search_log_job,
+        trigger=IntervalTrigger(seconds=settings.SEARCH_LOG_FLUSH_SECONDS),
+        id='flush_search_log',
+        name='Escritura del log de búsquedas',
+        replace_existing=True
+    )
+    
+    # Job 5: Matriz de co-compra (01:00)
+    _scheduler.add_job(
+        func=build_co_purchase_job,
+        trigger=CronTrigger(hour=1, minute=0),
+        id='build_co_purchase_daily',
+        name='Actualización de productos comprados juntos',
+        replace_existing=True
+    )
+    
+    # Job 6: Conciliación de agregados de reseñas (02:00)
+    _scheduler.add_job(
+        func=reconcile_rating_aggregates_job,
+        trigger=CronTrigger(hour=2, minute=0),
+        id='reconcile_ratings_daily',
+        name='Conciliación de ratings de productos',
+        replace_existing=True
+    )
+    
+    # Job 7: Liberación de reservas de inventario vencidas (cada minuto)
+    _scheduler.add_job(
+        func=release_expired_reservations_job,
+        trigger=IntervalTrigger(minutes=1),
+        id='release_expired_reservations',
+        name='Liberación de reservas de inventario',
+        replace_existing=True
+    )
+    
+    # Job 8: Sincronización del stock fragmentado (cada INVENTORY_SHARD_SYNC_SECONDS)
+    _scheduler.add_job(
+        func=sync_sharded_stock_job,
+        trigger=IntervalTrigger(seconds=settings.INVENTORY_SHARD_SYNC_SECONDS),
+        id='sync_sharded_stock',
+        name='Sincronización de stock fragmentado',
+        replace_existing=True
+    )
+    
+    # Job 9: Escritura del store de carritos (cada CART_STORE_FLUSH_SECONDS)
+    if cart_store.write_behind:
+        _scheduler.add_job(
+            func=flush_cart_store_job,
+            trigger=IntervalTrigger(seconds=settings.CART_STORE_FLUSH_SECONDS),
+            id='flush_cart_store',
+            name='Escritura del store de carritos',
+            replace_existing=True
+        )
+    
+    # Job 10: Limpieza de carritos abandonados (03:00)
+    _scheduler.add_job(
+        func=purge_abandoned_carts_job,
+        trigger=CronTrigger(hour=3, minute=0),
+        id='purge_abandoned_carts_daily',
+        name='Limpieza de carritos abandonados',
+        replace_existing=True
+    )
+    
+    # Job 11: Recálculo del conjunto de stock bajo (al iniciar y a las 03:30)
+    _scheduler.add_job(
+        func=rebuild_low_stock_job,
+        trigger=CronTrigger(hour=3, minute=30),
+        id='rebuild_low_stock_daily',
+        name='Recálculo de productos con stock bajo',
+        next_run_time=datetime.now(_scheduler.timezone),
+        replace_existing=True
+    )
+    
     # Iniciar el scheduler
     _scheduler.start()
     logger.info("Scheduler iniciado correctamente")
@@ -195,6 +541,8 @@ def stop_scheduler():
     Descripción:
         Detiene de forma segura el scheduler global. Esta función es llamada
         cuando la aplicación se apaga o requiere detener las tareas programadas.
+        Antes de terminar escribe las búsquedas que queden en el buffer y los
+        cambios de carrito pendientes.
 
     Parámetros:
         Ninguno
@@ -208,6 +556,8 @@ def stop_scheduler():
         logger.info("Deteniendo scheduler...")
         _scheduler.shutdown(wait=True)
         _scheduler = None
+        flush_search_log_job()
+        flush_cart_store_job()
         logger.info("Scheduler detenido correctamente")
     else:
         logger.warning("El scheduler no estaba corriendo")
@@ -0,0 +1,100 @@
+# Autor: Luis Flores
+# Fecha: 19/10/2026
+# Descripción: Registro de búsquedas para analítica. Las búsquedas se acumulan en un buffer
+#              circular en memoria y un job del scheduler las escribe en la tabla search_log
+#              con inserts masivos, de modo que la petición de búsqueda nunca paga un INSERT.
+
+import logging
+import threading
+from collections import deque
+from datetime import datetime, UTC
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.search_log import SearchLog
+
+logger = logging.getLogger(__name__)
+
+
+class SearchLogBuffer:
+    """
+    Autor: Luis Flores
+    Descripción: Buffer circular de búsquedas pendientes de persistir. Si se llena antes del
+                 siguiente flush se descartan las entradas más antiguas (la analítica tolera
+                 pérdida; la búsqueda no debe bloquearse).
+    """
+
+    def __init__(self, maxlen: int = 10000):
+        self._entries: deque = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]],
+        result_count: int,
+        latency_ms: float
+    ) -> None:
+        """
+        Autor: Luis Flores
+        Descripción: Agrega una búsqueda al buffer (operación O(1), sin acceso a BD).
+        Parámetros:
+            query (str): Texto de búsqueda normalizado.
+            filters (dict | None): Filtros aplicados (solo los que tienen valor).
+            result_count (int): Total de coincidencias.
+            latency_ms (float): Tiempo de respuesta del servicio en milisegundos.
+        Retorna:
+            None
+        """
+        entry = {
+            "query": (query or "")[:255],
+            "filters": filters or None,
+            "result_count": result_count,
+            "latency_ms": round(latency_ms, 3),
+            "searched_at": datetime.now(UTC),
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """
+        Autor: Luis Flores
+        Descripción: Extrae y retorna todas las entradas pendientes, dejando el buffer vacío.
+        """
+        with self._lock:
+            entries = list(self._entries)
+            self._entries.clear()
+        return entries
+
+    def flush(self, db: Session) -> int:
+        """
+        Autor: Luis Flores
+        Descripción: Escribe las entradas pendientes en search_log con un solo INSERT masivo.
+                     Si la escritura falla las entradas se descartan y se registra el error.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+        Retorna:
+            int: Número de búsquedas escritas.
+        """
+        entries = self.drain()
+        if not entries:
+            return 0
+        try:
+            db.execute(insert(SearchLog), entries)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"No se pudo escribir el log de búsquedas ({len(entries)} entradas): {str(e)}")
+            return 0
+        return len(entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+# Instancia global del buffer
+search_log_buffer = SearchLogBuffer(maxlen=settings.SEARCH_LOG_BUFFER_SIZE)
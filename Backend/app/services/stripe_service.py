@@ -19,7 +19,8 @@ class StripeService:
         product_name: str,
         success_url: str,
         cancel_url: str,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        expires_at: Optional[int] = None
     ) -> Dict:
         """
         Autor: Gabriel Vilchis
@@ -35,6 +36,8 @@ class StripeService:
             success_url (str): URL a redirigir después de un pago exitoso.
             cancel_url (str): URL a redirigir si el usuario cancela el pago.
             metadata (dict, opcional): Metadatos adicionales a adjuntar.
+            expires_at (int, opcional): Timestamp Unix en que expira la sesión (entre 30
+                minutos y 24 horas; por defecto Stripe usa 24 horas).
 
         Retorna:
             dict: ID de la sesión y URL del checkout, o None en caso de error.
@@ -60,6 +63,9 @@ class StripeService:
             if metadata:
                 session_params['metadata'] = metadata
             
+            if expires_at:
+                session_params['expires_at'] = expires_at
+            
             session = stripe.checkout.Session.create(**session_params)
             
             return {
@@ -372,6 +378,38 @@ class StripeService:
             print(f"Error retrieving session: {str(e)}")
             return None
     
+    def refund_payment(self, payment_intent_id: str, reason: str = "requested_by_customer") -> Dict:
+        """
+        Autor: Luis Flores
+
+        Descripción:
+            Reembolsa completo un pago ya cobrado. Se usa cuando el pago se completó pero la
+            orden no se pudo crear (por ejemplo, el inventario se agotó).
+
+        Parámetros:
+            payment_intent_id (str): ID del intent de pago a reembolsar.
+            reason (str): Motivo del reembolso según Stripe.
+
+        Retorna:
+            dict: Estado de la operación y el ID del reembolso.
+        """
+        try:
+            refund = stripe.Refund.create(payment_intent=payment_intent_id, reason=reason)
+            return {
+                'success': True,
+                'refund_id': refund.id
+            }
+        except stripe.error.StripeError as e:
+            return {
+                'success': False,
+                'error': f"Stripe error: {str(e)}"
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
     def construct_webhook_event(self, payload: str, signature: str, secret: str):
         """
         Autor: Lizbeth Barajas
@@ -46,6 +46,7 @@ from app.models.address import Address
 from app.models.payment_method import PaymentMethod
 from app.models.enum import UserRole, AuthType, Gender, PaymentType
 from app.core.security import hash_password
+from app.services.catalog_events import notify_catalog_change
 
 # Configuración de base de datos en memoria para tests
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -79,6 +80,8 @@ def db():
         db.close()
         # Limpiar las tablas después del test
         Base.metadata.drop_all(bind=engine)
+        # El borrado no pasa por el ORM: avisar para que los índices en memoria se reconstruyan
+        notify_catalog_change()
 
 
 @pytest.fixture(scope="function")
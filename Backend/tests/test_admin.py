@@ -4,6 +4,7 @@
 #             unitarias, integrales y funcionales para operaciones administrativas.
 
 import pytest
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from decimal import Decimal  # <-- IMPORTADO
 from app.api.v1.admin.service import admin_product_service
@@ -11,8 +12,17 @@ from app.api.v1.admin import schemas
 from app.api.v1.products import schemas as product_schemas
 from app.models.product import Product
 from app.models.product_image import ProductImage
+from app.models.product_stock_shard import ProductStockShard
 from app.models.user import User
 from app.api.v1.products.service import product_service
+from app.services.inventory import decrement_stock, set_stock_shards, shard_totals
+from app.services.image_pipeline import ImageValidationError, process_image, variant_url
+import io
+import requests
+from unittest.mock import MagicMock, patch
+from PIL import Image
+from moto import mock_aws
+from sqlalchemy.orm import sessionmaker
 
 
 # ==================== PRUEBAS UNITARIAS ====================
@@ -216,6 +226,161 @@ class TestAdminProductServiceUnit:
         assert result.failed == 0
         assert len(result.errors) == 0
 
+    def test_bulk_update_price_and_stock_adjustments(self, db: Session):
+        """
+        Autor: Luis Flores
+        Descripción: Verifica los ajustes de precio (porcentaje) y stock (suma, sin quedar
+                     negativo) combinados con desactivar, en una sola operación en lote.
+        """
+        # Arrange
+        products = []
+        for price, stock in ((Decimal('100.00'), 10), (Decimal('59.99'), 3)):
+            product = Product(
+                name="Producto Ajuste",
+                description="Test",
+                brand="Test",
+                category="Test",
+                physical_activities=["test"],
+                fitness_objectives=["test"],
+                nutritional_value="Test",
+                price=price,
+                stock=stock,
+                is_active=True
+            )
+            db.add(product)
+            products.append(product)
+        db.commit()
+
+        # Act
+        action_data = schemas.BulkProductAction(
+            product_ids=[p.product_id for p in products] + [9999],
+            action="deactivate",
+            price={"mode": "percent", "value": -10},
+            stock={"mode": "add", "value": -5}
+        )
+        result = admin_product_service.bulk_update_products(db, action_data)
+
+        # Assert
+        assert result.success == 2
+        assert result.errors == ["Producto 9999 no encontrado"]
+        for product in products:
+            db.refresh(product)
+        assert [p.price for p in products] == [Decimal('90.00'), Decimal('53.99')]
+        assert [p.stock for p in products] == [5, 0]
+        assert all(p.is_active is False for p in products)
+
+        with pytest.raises(ValueError):
+            schemas.BulkProductAction(product_ids=[1], action="update")
+
+    def test_bulk_stock_adjustment_on_sharded_product(self, db: Session, test_product: Product):
+        """
+        Autor: Luis Flores
+        Descripción: Verifica que un ajuste relativo de stock sobre un producto fragmentado
+                     parte del total real de los fragmentos (incluida una compra que aún no se
+                     sincroniza a product.stock) y se aplica sobre ellos sin repartirlos de nuevo.
+        Parámetros:
+            db (Session): Sesión de base de datos de prueba.
+            test_product (Product): Producto con 50 unidades.
+        """
+        # Arrange - 4 fragmentos y una compra de 5 unidades sin sincronizar
+        product_id = test_product.product_id
+        set_stock_shards(db, product_id, 4)
+        decrement_stock(db, {product_id: 5})
+        db.commit()
+
+        def shard_stock():
+            return dict(db.execute(
+                select(ProductStockShard.shard_no, ProductStockShard.stock)
+                .where(ProductStockShard.product_id == product_id)
+            ).all())
+
+        def adjust(value):
+            return admin_product_service.bulk_update_products(db, schemas.BulkProductAction(
+                product_ids=[product_id], action="update", stock={"mode": "add", "value": value}
+            ))
+
+        # Act & Assert - Resta: parte de 45, no de los 50 de product.stock
+        assert adjust(-10).success == 1
+        db.refresh(test_product)
+        assert test_product.stock == 35
+        assert shard_totals(db, [product_id]) == {product_id: 35}
+
+        # Suma: las unidades van a un solo fragmento
+        before = shard_stock()
+        assert adjust(7).success == 1
+        after = shard_stock()
+        assert sum(after.values()) == 42
+        assert len([number for number in before if before[number] != after[number]]) == 1
+
+
+def _png_bytes(width: int, height: int) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(output, format="PNG")
+    return output.getvalue()
+
+
+class TestProductImagePipelineUnit:
+    """
+    Autor: Luis Flores
+    Descripción: Pruebas unitarias del procesamiento y subida de imágenes de producto.
+    """
+
+    def test_process_image_builds_webp_variants(self):
+        """
+        Autor: Luis Flores
+        Descripción: Verifica que se generan las tres variantes WebP con el lado mayor
+                     esperado y una llave derivada del contenido.
+        """
+        # Arrange
+        content = _png_bytes(2000, 1000)
+
+        # Act
+        processed = process_image(content)
+        again = process_image(content)
+
+        # Assert
+        sizes = {name: (width, height) for name, (_, width, height) in processed.variants.items()}
+        assert sizes == {"large": (1200, 600), "medium": (600, 300), "thumb": (200, 100)}
+        assert all(Image.open(io.BytesIO(body)).format == "WEBP" for body, _, _ in processed.variants.values())
+        assert processed.key("thumb") == f"product_images/{processed.content_hash}/thumb.webp"
+        assert again.content_hash == processed.content_hash
+        assert variant_url(f"https://cdn/{processed.key('large')}", "thumb").endswith("/thumb.webp")
+
+    def test_process_image_rejects_invalid_content(self):
+        """
+        Autor: Luis Flores
+        Descripción: Verifica que un archivo que no es imagen se rechaza.
+        """
+        with pytest.raises(ImageValidationError):
+            process_image(b"no es una imagen")
+
+    async def test_upload_product_images_in_parallel(self):
+        """
+        Autor: Luis Flores
+        Descripción: Verifica que se suben las variantes de cada imagen válida con
+                     Cache-Control inmutable y que una imagen inválida no detiene al resto.
+        """
+        # Arrange
+        from app.services.s3_service import S3Service
+        s3_client = MagicMock()
+        with patch("app.services.s3_service.boto3.client", return_value=s3_client):
+            s3_service = S3Service()
+
+        # Act
+        results = await s3_service.upload_product_images(
+            [_png_bytes(800, 800), b"corrupta", _png_bytes(100, 50)], product_id="7"
+        )
+
+        # Assert
+        assert [result["success"] for result in results] == [True, False, True]
+        assert results[0]["file_url"].endswith("/large.webp")
+        assert set(results[0]["variants"]) == {"thumb", "medium", "large"}
+        assert s3_client.put_object.call_count == 6
+        assert all(
+            call.kwargs["CacheControl"].endswith("immutable") and call.kwargs["ContentType"] == "image/webp"
+            for call in s3_client.put_object.call_args_list
+        )
+
 
 # ==================== PRUEBAS DE INTEGRACIÓN ====================
 
@@ -338,6 +503,207 @@ class TestAdminAPIIntegration:
         assert data["failed"] == 0
 
 
+    def test_direct_upload_presigned_post_and_complete(self, admin_client, db, test_product):
+        """
+        Autor: Luis Flores
+        Descripción: Verifica el flujo de subida directa contra un S3 simulado (moto): se
+                     genera la política, el cliente sube el archivo a S3 y, al confirmar, las
+                     variantes se generan en segundo plano y la imagen se agrega al producto.
+        """
+        import boto3
+        from app.config import settings
+
+        with mock_aws():
+            # Arrange
+            s3 = boto3.client("s3", region_name=settings.AWS_REGION)
+            s3.create_bucket(Bucket=settings.S3_BUCKET_NAME)
+            product_id = test_product.product_id
+
+            # Act
+            policy = admin_client.post(
+                f"/api/v1/admin/products/{product_id}/images/upload-url",
+                json={"content_type": "image/png"}
+            )
+            rejected = admin_client.post(
+                f"/api/v1/admin/products/{product_id}/images/upload-url",
+                json={"content_type": "image/gif"}
+            )
+            upload = policy.json()
+            uploaded = requests.post(
+                upload["url"],
+                data=upload["fields"],
+                files={"file": ("foto.png", _png_bytes(900, 300), "image/png")}
+            )
+            foreign = admin_client.post(
+                f"/api/v1/admin/products/{product_id}/images/complete",
+                json={"key": f"uploads/products/{product_id + 1}/otra.png"}
+            )
+            with patch("app.services.image_uploads.SessionLocal", sessionmaker(bind=db.get_bind())):
+                completed = admin_client.post(
+                    f"/api/v1/admin/products/{product_id}/images/complete",
+                    json={"key": upload["key"], "is_primary": True}
+                )
+
+            # Assert
+            assert policy.status_code == 200
+            assert upload["key"].startswith(f"uploads/products/{product_id}/")
+            assert upload["fields"]["Content-Type"] == "image/png"
+            assert rejected.status_code == 400
+            assert uploaded.status_code in (200, 204)
+            assert foreign.status_code == 400
+            assert completed.status_code == 202
+
+            keys = {obj["Key"] for obj in s3.list_objects_v2(Bucket=settings.S3_BUCKET_NAME)["Contents"]}
+            assert upload["key"] not in keys
+            assert {key.rsplit("/", 1)[1] for key in keys} == {"thumb.webp", "medium.webp", "large.webp"}
+
+            db.expire_all()
+            images = db.query(ProductImage).filter(ProductImage.product_id == product_id).all()
+            primary = [image for image in images if image.is_primary]
+            assert len(images) == 2 and len(primary) == 1
+            assert primary[0].image_path.endswith("/large.webp")
+            assert db.get(Product, product_id).primary_image_path == primary[0].image_path
+
+
+
+    def test_create_product_without_images_for_direct_upload(self, admin_client, db):
+        """
+        Autor: Luis Flores
+        Descripción: Verifica que un producto se puede crear sin enviar imágenes por la API,
+                     para subirlas después directo a S3 con la política prefirmada.
+        """
+        # Act
+        response = admin_client.post(
+            "/api/v1/admin/products",
+            data={
+                "name": "Producto sin imágenes", "description": "Descripción", "brand": "Admin Brand",
+                "category": "Test", "physical_activities": "running", "fitness_objectives": "[]",
+                "nutritional_value": "10g", "price": "199.90", "stock": "5",
+            }
+        )
+
+        # Assert
+        assert response.status_code == 201
+        product_id = response.json()["product_id"]
+        assert response.json()["product_images"] == []
+        assert db.get(Product, product_id).physical_activities == ["running"]
+        with patch("app.api.v1.admin.routes.S3Service") as s3_service:
+            s3_service.return_value.create_presigned_upload.return_value = {
+                "url": "https://bucket.s3.amazonaws.com", "fields": {}, "key": f"uploads/products/{product_id}/x.png",
+                "expires_in": 300
+            }
+            policy = admin_client.post(
+                f"/api/v1/admin/products/{product_id}/images/upload-url",
+                json={"content_type": "image/png"}
+            )
+        assert policy.status_code == 200
+    def test_bulk_import_csv_and_jsonl(self, admin_client, db, test_product):
+        """
+        Autor: Luis Flores
+        Descripción: Verifica la importación masiva: las filas válidas se insertan o actualizan
+                     por SKU, las inválidas se reportan con su número de fila y el progreso
+                     queda disponible en el job.
+        """
+        # Arrange
+        test_product.sku = "WHEY-001"
+        db.commit()
+        csv_content = (
+            "sku,name,description,brand,category,physical_activities,fitness_objectives,nutritional_value,price,stock\n"
+            "CREA-100,Creatina Monohidratada,Creatina pura,Test Brand,Creatinas,\"weightlifting, crossfit\",muscle_gain,5g,499.50,30\n"
+            "BAD-1,Sin precio,,Test Brand,Proteínas,,,,-3,1\n"
+            "WHEY-001,Whey Protein Isolate,Nueva descripción,Test Brand,Proteínas,[],[],24g,950.00,80\n"
+        )
+        jsonl_content = (
+            '{"sku": "OMEGA-7", "name": "Omega 3", "brand": "Fish", "category": "Salud", "price": 300}\n'
+            "\n"
+            "{no es json\n"
+        )
+
+        # Act
+        with patch("app.services.product_import.SessionLocal", sessionmaker(bind=db.get_bind())):
+            csv_response = admin_client.post(
+                "/api/v1/admin/products/import",
+                files={"file": ("catalogo.csv", csv_content.encode(), "text/csv")}
+            )
+            jsonl_response = admin_client.post(
+                "/api/v1/admin/products/import",
+                files={"file": ("catalogo.jsonl", jsonl_content.encode(), "application/octet-stream")}
+            )
+        unsupported = admin_client.post(
+            "/api/v1/admin/products/import",
+            files={"file": ("catalogo.xlsx", b"x", "application/octet-stream")}
+        )
+        job = admin_client.get(f"/api/v1/admin/products/import/{csv_response.json()['job_id']}").json()
+
+        # Assert
+        assert csv_response.status_code == 202
+        assert unsupported.status_code == 400
+        assert job["status"] == "completed"
+        assert (job["rows_processed"], job["inserted"], job["updated"], job["failed"]) == (3, 1, 1, 1)
+        assert job["errors"][0]["row"] == 2 and job["errors"][0]["sku"] == "BAD-1"
+        assert "price" in job["errors"][0]["error"]
+
+        jsonl_job = admin_client.get(f"/api/v1/admin/products/import/{jsonl_response.json()['job_id']}").json()
+        assert (jsonl_job["inserted"], jsonl_job["failed"]) == (1, 1)
+        assert jsonl_job["errors"][0]["row"] == 3
+
+        db.expire_all()
+        creatine = db.query(Product).filter(Product.sku == "CREA-100").one()
+        assert creatine.physical_activities == ["weightlifting", "crossfit"]
+        assert creatine.price == Decimal("499.50") and creatine.search_text.startswith("creatina")
+        whey = db.get(Product, test_product.product_id)
+        assert whey.name == "Whey Protein Isolate" and whey.stock == 80
+        assert db.query(Product).filter(Product.sku == "BAD-1").count() == 0
+
+    def test_bulk_import_keeps_omitted_columns(self, admin_client, db, test_product):
+        """
+        Autor: Luis Flores
+        Descripción: Verifica que al reimportar un SKU existente con un archivo sin algunas
+                     columnas (o con celdas vacías) esas columnas conservan su valor, mientras
+                     que un SKU nuevo toma los valores por defecto.
+        """
+        # Arrange
+        test_product.sku = "WHEY-001"
+        test_product.is_active = False
+        db.commit()
+        csv_content = (
+            "sku,name,brand,category,price,nutritional_value\n"
+            "WHEY-001,Whey Protein Isolate,Test Brand,Proteínas,950.00,\n"
+            "CREA-100,Creatina,Test Brand,Creatinas,499.50,5g\n"
+        )
+        jsonl_content = (
+            '{"sku": "WHEY-001", "name": "Whey Protein Isolate", "brand": "Test Brand", '
+            '"category": "Proteínas", "price": 960, "stock": 12}\n'
+        )
+
+        # Act
+        with patch("app.services.product_import.SessionLocal", sessionmaker(bind=db.get_bind())):
+            csv_response = admin_client.post(
+                "/api/v1/admin/products/import",
+                files={"file": ("catalogo.csv", csv_content.encode(), "text/csv")}
+            )
+            db.expire_all()
+            whey = db.get(Product, test_product.product_id)
+            after_csv = (whey.price, whey.stock, whey.is_active, whey.description, whey.nutritional_value)
+            admin_client.post(
+                "/api/v1/admin/products/import",
+                files={"file": ("catalogo.jsonl", jsonl_content.encode(), "application/x-ndjson")}
+            )
+        job = admin_client.get(f"/api/v1/admin/products/import/{csv_response.json()['job_id']}").json()
+
+        # Assert
+        assert (job["inserted"], job["updated"], job["failed"]) == (1, 1, 0)
+        assert after_csv == (
+            Decimal("950.00"), 50, False, "Proteína de prueba para tests", "24g proteína por servida"
+        )
+        db.expire_all()
+        whey = db.get(Product, test_product.product_id)
+        assert (whey.price, whey.stock, whey.is_active) == (Decimal("960.00"), 12, False)
+        assert "proteina de prueba" in whey.search_text
+        creatine = db.query(Product).filter(Product.sku == "CREA-100").one()
+        assert (creatine.stock, creatine.is_active, creatine.description) == (0, True, "")
+
+
 # ==================== PRUEBAS FUNCIONALES ====================
 
 class TestAdminFunctional:
@@ -6,12 +6,23 @@
 import pytest
 from sqlalchemy.orm import Session
 from decimal import Decimal  # <-- IMPORTADO
+from datetime import datetime, timedelta, UTC
+from app.api.v1.cart import service as cart_service_module
 from app.api.v1.cart.service import cart_service
 from app.api.v1.cart import schemas
+from app.api.v1.shipping import service as shipping_service_module
+from app.api.v1.shipping.service import shipping_service
+from app.api.v1.shipping.schemas import CreateOrder
 from app.models.shopping_cart import ShoppingCart
 from app.models.cart_item import CartItem
 from app.models.product import Product
 from app.models.user import User
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.enum import OrderStatus
+from app.services.cart_cleanup import purge_abandoned_carts
+from app.services.cart_store import MemoryCartStore
+from app.services.co_purchase import build_co_purchase
 
 
 # ==================== PRUEBAS UNITARIAS ====================
@@ -130,7 +141,35 @@ class TestCartServiceUnit:
             cart_service.add_item_to_cart(db, test_cart.user_id, item_data)
         
         assert "stock insuficiente" in str(exc_info.value).lower()
-    
+
+    def test_add_item_existing_item_exceeds_stock(self, db: Session, test_cart: ShoppingCart, test_product: Product):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria del upsert condicional: si la suma con la cantidad que ya
+                     está en el carrito excede el stock, el item no cambia y se reporta error.
+        Parámetros:
+            db (Session): Sesión de base de datos de prueba.
+            test_cart (ShoppingCart): Carrito de prueba.
+            test_product (Product): Producto de prueba.
+        """
+        # Arrange - Ocupar casi todo el stock
+        first_item = cart_service.add_item_to_cart(
+            db, test_cart.user_id,
+            schemas.CartItemAdd(product_id=test_product.product_id, quantity=test_product.stock - 1)
+        )
+
+        # Act & Assert
+        with pytest.raises(Exception) as exc_info:
+            cart_service.add_item_to_cart(
+                db, test_cart.user_id,
+                schemas.CartItemAdd(product_id=test_product.product_id, quantity=2)
+            )
+
+        assert "en carrito" in str(exc_info.value).lower()
+        items = db.query(CartItem).filter(CartItem.cart_id == test_cart.cart_id).all()
+        assert len(items) == 1
+        assert items[0].quantity == first_item.quantity
+
     def test_update_cart_item(self, db: Session, test_cart: ShoppingCart, test_product: Product):
         """
         Autor: Luis Flores
@@ -292,6 +331,42 @@ class TestCartServiceUnit:
         assert len(validation["issues"]) > 0
         assert validation["issues"][0]["issue"] == "Stock insuficiente"
 
+    def test_get_cart_pricing(self, db: Session, test_cart: ShoppingCart, test_product: Product):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria de la consulta de precios del carrito: subtotales por
+                     línea y agregados (unidades, total y líneas no disponibles) en SQL.
+        Parámetros:
+            db (Session): Sesión de base de datos de prueba.
+            test_cart (ShoppingCart): Carrito de prueba.
+            test_product (Product): Producto de prueba (899.99, stock 50).
+        """
+        # Arrange - Un producto disponible y uno inactivo
+        inactive = Product(
+            name="Creatina Test", description="Test", brand="Test", category="Test",
+            physical_activities=["test"], fitness_objectives=["test"], nutritional_value="Test",
+            price=Decimal('250.50'), stock=10, is_active=False
+        )
+        db.add(inactive)
+        db.flush()
+        db.add_all([
+            CartItem(cart_id=test_cart.cart_id, product_id=test_product.product_id, quantity=2),
+            CartItem(cart_id=test_cart.cart_id, product_id=inactive.product_id, quantity=1),
+        ])
+        db.commit()
+
+        # Act
+        pricing = cart_service.get_cart_pricing(db, test_cart.user_id)
+        validation = cart_service.validate_cart_stock(db, test_cart.user_id)
+
+        # Assert
+        assert [line.subtotal for line in pricing.lines] == [Decimal('1799.98'), Decimal('250.50')]
+        assert pricing.total_items == 3
+        assert pricing.total_price == Decimal('2050.48')
+        assert pricing.unavailable_lines == 1
+        assert [issue["product_id"] for issue in validation["issues"]] == [inactive.product_id]
+        assert cart_service.get_cart_pricing(db, test_cart.user_id + 1) is None
+
 
 # ==================== PRUEBAS DE INTEGRACIÓN ====================
 
@@ -322,6 +397,43 @@ class TestCartAPIIntegration:
         assert "items" in data
         assert data["user_id"] == test_user.user_id
     
+    def test_get_cart_totals_integration(self, user_client, db, test_user, test_cart, test_product):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba de integración de la vista del carrito: subtotales, total de
+                     unidades y precio total calculados en la consulta.
+        Parámetros:
+            user_client (TestClient): Cliente HTTP autenticado.
+            db (Session): Sesión de base de datos.
+            test_user (User): Usuario de prueba.
+            test_cart (ShoppingCart): Carrito de prueba.
+            test_product (Product): Producto de prueba (899.99).
+        """
+        # Arrange
+        other = Product(
+            name="Creatina Test", description="Test", brand="Test", category="Test",
+            physical_activities=["test"], fitness_objectives=["test"], nutritional_value="Test",
+            price=Decimal('250.50'), stock=10, is_active=True
+        )
+        db.add(other)
+        db.flush()
+        db.add_all([
+            CartItem(cart_id=test_cart.cart_id, product_id=test_product.product_id, quantity=2),
+            CartItem(cart_id=test_cart.cart_id, product_id=other.product_id, quantity=3),
+        ])
+        db.commit()
+
+        # Act
+        response = user_client.get("/api/v1/cart/")
+
+        # Assert
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_items"] == 5
+        assert data["total_price"] == pytest.approx(2551.48)
+        assert [item["subtotal"] for item in data["items"]] == [pytest.approx(1799.98), pytest.approx(751.50)]
+        assert data["items"][1]["product"]["name"] == "Creatina Test"
+
     # --- CORREGIDO: Se usa 'user_client' y se quita 'client', 'test_user' y 'patch' ---
     def test_add_to_cart_integration(self, user_client, db, test_product):
         """
@@ -346,7 +458,51 @@ class TestCartAPIIntegration:
         data = response.json()
         assert data["product_id"] == test_product.product_id
         assert data["quantity"] == 2
-    
+
+    def test_cart_batch_integration(self, user_client, db, test_cart, test_product):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba de integración del lote de operaciones: se aplican en orden en una
+                     sola petición, y si un producto no tiene stock no se aplica ninguna.
+        Parámetros:
+            user_client (TestClient): Cliente HTTP autenticado.
+            db (Session): Sesión de base de datos.
+            test_cart (ShoppingCart): Carrito de prueba.
+            test_product (Product): Producto de prueba (stock 50).
+        """
+        # Arrange
+        other = Product(
+            name="Creatina Test", description="Test", brand="Test", category="Test",
+            physical_activities=["test"], fitness_objectives=["test"], nutritional_value="Test",
+            price=Decimal('250.50'), stock=10, is_active=True
+        )
+        db.add(other)
+        db.flush()
+        db.add(CartItem(cart_id=test_cart.cart_id, product_id=test_product.product_id, quantity=1))
+        db.commit()
+
+        # Act
+        response = user_client.post("/api/v1/cart/batch", json={"operations": [
+            {"op": "add", "product_id": test_product.product_id, "quantity": 2},
+            {"op": "add", "product_id": other.product_id, "quantity": 4},
+            {"op": "set", "product_id": other.product_id, "quantity": 5},
+        ]})
+        rejected = user_client.post("/api/v1/cart/batch", json={"operations": [
+            {"op": "remove", "product_id": test_product.product_id},
+            {"op": "add", "product_id": other.product_id, "quantity": 6},
+        ]})
+
+        # Assert
+        assert response.status_code == 200
+        data = response.json()
+        assert {item["product_id"]: item["quantity"] for item in data["items"]} == {
+            test_product.product_id: 3, other.product_id: 5
+        }
+        assert data["total_items"] == 8
+        assert rejected.status_code == 400
+        assert rejected.json()["detail"]["issues"][0]["available"] == 10
+        assert len(db.query(CartItem).filter(CartItem.cart_id == test_cart.cart_id).all()) == 2
+
     # --- CORREGIDO: Se usa 'user_client' y se quita 'client', 'test_user' y 'patch' ---
     def test_get_cart_summary_integration(self, user_client, db, test_user, test_cart, test_product):
         """
@@ -375,6 +531,46 @@ class TestCartAPIIntegration:
         assert "total_items" in data
         assert "total_price" in data
         assert data["total_items"] == 2
+    
+    def test_get_cart_recommendations_integration(
+        self, user_client, db, test_user, test_cart_with_items, test_product, test_address, test_payment_method
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba de integración para recomendaciones de co-compra del carrito.
+                     Los productos que ya están en el carrito no se recomiendan.
+        """
+        # Arrange - Una orden entregada con el producto del carrito y otro producto
+        shaker = Product(
+            name="Shaker Test", description="Accesorio", brand="Test Brand", category="Accesorios",
+            physical_activities=[], fitness_objectives=[], nutritional_value="N/A",
+            price=Decimal('149.99'), stock=15, is_active=True
+        )
+        db.add(shaker)
+        db.flush()
+        order = Order(
+            user_id=test_user.user_id,
+            address_id=test_address.address_id,
+            payment_id=test_payment_method.payment_id,
+            order_status=OrderStatus.DELIVERED,
+            subtotal=Decimal('1049.98'),
+            shipping_cost=Decimal('0.00'),
+            total_amount=Decimal('1049.98')
+        )
+        order.order_items = [
+            OrderItem(product_id=p.product_id, quantity=1, unit_price=p.price, subtotal=p.price)
+            for p in (test_product, shaker)
+        ]
+        db.add(order)
+        db.commit()
+        build_co_purchase(db)
+        
+        # Act
+        response = user_client.get("/api/v1/cart/recommendations")
+        
+        # Assert
+        assert response.status_code == 200
+        assert [item["product_id"] for item in response.json()] == [shaker.product_id]
 
 
 # ==================== PRUEBAS FUNCIONALES ====================
@@ -385,6 +581,209 @@ class TestCartFunctional:
     Descripción: Clase que agrupa las pruebas funcionales end-to-end del carrito.
     """
     
+    def test_purge_abandoned_carts(self, db, test_cart, test_product):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba funcional de la limpieza de carritos abandonados: un carrito con
+                     un item reciente se conserva; cuando todo es más antiguo que el corte se
+                     elimina con sus items.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            test_cart (ShoppingCart): Carrito de prueba.
+            test_product (Product): Producto de prueba.
+        """
+        # Arrange - Carrito viejo con un item recién modificado
+        now = datetime.now(UTC)
+        old = now - timedelta(days=90)
+        test_cart.updated_at = old
+        item = CartItem(
+            cart_id=test_cart.cart_id, product_id=test_product.product_id, quantity=1,
+            added_at=old, updated_at=now
+        )
+        db.add(item)
+        db.commit()
+        
+        # Act & Assert - El item reciente mantiene vivo el carrito
+        assert purge_abandoned_carts(db, idle_days=60, batch_size=1, now=now).carts == 0
+        
+        item.updated_at = old
+        db.commit()
+        stats = purge_abandoned_carts(db, idle_days=60, batch_size=1, now=now)
+        
+        assert (stats.carts, stats.items) == (1, 1)
+        db.expire_all()
+        assert db.query(ShoppingCart).count() == 0
+        assert db.query(CartItem).count() == 0
+
+    def test_purge_keeps_cart_edited_through_service(self, db, test_cart, test_product):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba funcional: editar un carrito viejo con CartService renueva las
+                     fechas del item y del carrito (con la hora de la edición, no la de carga
+                     del módulo), por lo que la limpieza ya no lo considera abandonado.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            test_cart (ShoppingCart): Carrito de prueba.
+            test_product (Product): Producto de prueba.
+        """
+        # Arrange - Carrito e item sin cambios en 90 días
+        old = datetime.now(UTC) - timedelta(days=90)
+        item = CartItem(
+            cart_id=test_cart.cart_id, product_id=test_product.product_id, quantity=1,
+            added_at=old, updated_at=old
+        )
+        db.add(item)
+        test_cart.updated_at = old
+        db.commit()
+        edited_at = datetime.now(UTC).replace(tzinfo=None)
+
+        # Act - Edición por el servicio (backend "database")
+        cart_service.update_cart_item(
+            db, test_cart.user_id, item.cart_item_id, schemas.CartItemUpdate(quantity=2)
+        )
+        db.expire_all()
+
+        # Assert
+        assert db.get(CartItem, item.cart_item_id).updated_at.replace(tzinfo=None) >= edited_at
+        assert db.get(ShoppingCart, test_cart.cart_id).updated_at.replace(tzinfo=None) >= edited_at
+        assert purge_abandoned_carts(db, idle_days=60).carts == 0
+
+        # Vaciar el carrito también cuenta como actividad del carrito
+        cart_service.clear_cart(db, test_cart.user_id)
+        db.expire_all()
+        assert db.get(ShoppingCart, test_cart.cart_id).updated_at.replace(tzinfo=None) >= edited_at
+
+    def test_cart_write_behind_store(self, db, test_cart, test_product, monkeypatch):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba funcional del store de carritos en memoria: los cambios de
+                     cantidad y las eliminaciones se ven de inmediato en el carrito, pero solo
+                     llegan a cart_item al hacer flush (un cambio por item, coalescido).
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            test_cart (ShoppingCart): Carrito de prueba.
+            test_product (Product): Producto de prueba.
+            monkeypatch: Fixture de pytest para usar el store en memoria.
+        """
+        store = MemoryCartStore()
+        monkeypatch.setattr(cart_service_module, "cart_store", store)
+        user_id = test_cart.user_id
+        
+        # Línea nueva: se escribe de inmediato (necesita cart_item_id)
+        line = cart_service.add_item_to_cart(
+            db, user_id, schemas.CartItemAdd(product_id=test_product.product_id, quantity=1)
+        )
+        
+        # Cambios de cantidad: solo en memoria
+        cart_service.add_item_to_cart(
+            db, user_id, schemas.CartItemAdd(product_id=test_product.product_id, quantity=2)
+        )
+        cart_service.update_cart_item(db, user_id, line.cart_item_id, schemas.CartItemUpdate(quantity=4))
+        
+        view = cart_service.get_cart_view(db, user_id)
+        assert view.total_items == 4
+        assert view.total_price == test_product.price * 4
+        stored = db.query(CartItem).filter(CartItem.cart_item_id == line.cart_item_id).one()
+        assert stored.quantity == 1
+        
+        # Flush: una escritura con la cantidad final
+        assert store.flush(db) == 1
+        db.expire_all()
+        assert db.get(CartItem, line.cart_item_id).quantity == 4
+        assert store.flush(db) == 0
+        
+        # Eliminación diferida; el checkout (get_cart) escribe lo pendiente antes de leer
+        cart_service.remove_item_from_cart(db, user_id, line.cart_item_id)
+        assert cart_service.get_cart_view(db, user_id).items == ()
+        db.expire_all()
+        assert len(cart_service.get_cart(db, user_id).cart_items) == 0
+
+    def test_cart_write_behind_concurrent_changes(self, db, test_cart, test_product, monkeypatch):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba funcional del store en memoria con dos peticiones intercaladas
+                     sobre el mismo carrito: mientras una actualiza un item, otra cambia y
+                     elimina los demás. Los cambios se aplican sobre el carrito guardado, por
+                     lo que ninguno se pierde ni reaparece un item eliminado.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            test_cart (ShoppingCart): Carrito de prueba.
+            test_product (Product): Producto de prueba.
+            monkeypatch: Fixture de pytest para usar el store en memoria e intercalar la
+                segunda petición.
+        """
+        store = MemoryCartStore()
+        monkeypatch.setattr(cart_service_module, "cart_store", store)
+        user_id = test_cart.user_id
+        others = [
+            Product(
+                name=f"Producto {i}", description="Test", brand="Test Brand", category="Test",
+                physical_activities=["test"], fitness_objectives=["test"],
+                nutritional_value="Test", price=Decimal("10.00"), stock=20, is_active=True
+            )
+            for i in range(2)
+        ]
+        db.add_all(others)
+        db.commit()
+        first, second, third = (
+            cart_service.add_item_to_cart(db, user_id, schemas.CartItemAdd(product_id=product_id, quantity=1))
+            for product_id in (test_product.product_id, others[0].product_id, others[1].product_id)
+        )
+
+        # La petición B corre mientras A consulta el producto (después de leer el carrito)
+        product_cards = cart_service_module.product_cards
+        get_card = product_cards.get
+
+        def get_interleaved(session, product_id):
+            monkeypatch.setattr(product_cards, "get", get_card)
+            cart_service.update_cart_item(db, user_id, second.cart_item_id, schemas.CartItemUpdate(quantity=3))
+            cart_service.remove_item_from_cart(db, user_id, third.cart_item_id)
+            return get_card(session, product_id)
+
+        monkeypatch.setattr(product_cards, "get", get_interleaved)
+        cart_service.update_cart_item(db, user_id, first.cart_item_id, schemas.CartItemUpdate(quantity=5))
+
+        quantities = {line.cart_item_id: line.quantity for line in cart_service.get_cart_view(db, user_id).items}
+        assert quantities == {first.cart_item_id: 5, second.cart_item_id: 3}
+
+        store.flush(db)
+        db.expire_all()
+        rows = db.query(CartItem).filter(CartItem.cart_id == test_cart.cart_id).all()
+        assert {row.cart_item_id: row.quantity for row in rows} == quantities
+
+    def test_cart_store_discarded_after_checkout(
+        self, db, test_cart, test_product, test_address, test_payment_method, monkeypatch
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba funcional del store en memoria con el checkout de shipping: al
+                     confirmarse el pedido, el carrito en memoria se descarta y GET /cart ya
+                     no muestra las líneas compradas.
+        Parámetros:
+            db (Session): Sesión de base de datos.
+            test_cart (ShoppingCart): Carrito de prueba.
+            test_product (Product): Producto de prueba.
+            test_address (Address): Dirección de envío.
+            test_payment_method (PaymentMethod): Método de pago.
+            monkeypatch: Fixture de pytest para usar el store en memoria.
+        """
+        store = MemoryCartStore()
+        monkeypatch.setattr(cart_service_module, "cart_store", store)
+        monkeypatch.setattr(shipping_service_module, "cart_store", store)
+        user_id = test_cart.user_id
+        cart_service.add_item_to_cart(
+            db, user_id, schemas.CartItemAdd(product_id=test_product.product_id, quantity=2)
+        )
+        assert cart_service.get_cart_view(db, user_id).total_items == 2
+
+        # Act
+        shipping_service.create_order_db(db, CreateOrder(
+            user_id=user_id, address_id=test_address.address_id, payment_id=test_payment_method.payment_id
+        ))
+
+        # Assert
+        assert cart_service.get_cart_view(db, user_id).items == ()
+
     # --- CORREGIDO: Se quita 'client' (no usado) y se arregla 'Decimal' ---
     def test_cart_shopping_flow(self, db, test_user, test_product):
         """
@@ -6,7 +6,7 @@
 import pytest
 from sqlalchemy.orm import Session
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timedelta, UTC
 from app.api.v1.orders.service import order_service
 from app.api.v1.orders import schemas
 from app.models.order import Order
@@ -17,7 +17,15 @@ from app.models.shopping_cart import ShoppingCart
 from app.models.cart_item import CartItem
 from app.models.product import Product
 from app.models.user import User
-from app.models.enum import OrderStatus, PaymentType
+from app.models.enum import OrderStatus, PaymentType, InventoryMovementReason
+from app.models.inventory_movement import InventoryMovement
+from app.models.low_stock_product import LowStockProduct
+from app.models.inventory_reservation import InventoryReservation
+from app.models.product_stock_shard import ProductStockShard
+from app.services.inventory import (
+    InsufficientStockError, adjust_stock, decrement_stock, rebuild_low_stock, release_expired_reservations,
+    release_user_reservations, reserve_stock, set_stock_shards, shard_totals, sync_sharded_stock
+)
 
 
 # ==================== FIXTURES ADICIONALES ====================
@@ -128,6 +136,57 @@ class TestOrderServiceUnit:
         assert result["order"].total_amount == total_amount
         assert result["points_earned"] > 0
 
+    def test_create_order_from_cart_bulk_items(
+        self, db: Session, test_user: User, test_address: Address,
+        test_payment_method: PaymentMethod, test_cart_with_items: ShoppingCart,
+        test_product: Product
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria de la creación de orden con varias líneas (una de un
+                     producto fragmentado): los order_items se insertan en lote con el precio
+                     de cada producto y el carrito queda vacío.
+        Parámetros:
+            db (Session): Sesión de base de datos de prueba.
+            test_user (User): Usuario de prueba.
+            test_address (Address): Dirección de prueba.
+            test_payment_method (PaymentMethod): Método de pago de prueba.
+            test_cart_with_items (ShoppingCart): Carrito con 2 unidades de test_product.
+            test_product (Product): Producto de prueba (899.99).
+        """
+        # Arrange
+        hot = Product(
+            name="Creatina Test", description="Test", brand="Test", category="Test",
+            physical_activities=["test"], fitness_objectives=["test"], nutritional_value="Test",
+            price=Decimal('250.50'), stock=20, is_active=True
+        )
+        db.add(hot)
+        db.flush()
+        db.add(CartItem(cart_id=test_cart_with_items.cart_id, product_id=hot.product_id, quantity=3))
+        set_stock_shards(db, hot.product_id, 2)
+        db.commit()
+
+        # Act
+        result = order_service.create_order_from_cart(
+            db=db,
+            user_id=test_user.user_id,
+            address_id=test_address.address_id,
+            payment_id=test_payment_method.payment_id,
+            subtotal=Decimal('2551.48'),
+            shipping_cost=Decimal('150.00'),
+            discount_amount=Decimal('0.00'),
+            total_amount=Decimal('2701.48')
+        )
+        db.commit()
+
+        # Assert
+        assert result["success"] is True
+        items = {item.product_id: item for item in result["order"].order_items}
+        assert (items[test_product.product_id].quantity, items[test_product.product_id].subtotal) == (2, Decimal('1799.98'))
+        assert (items[hot.product_id].unit_price, items[hot.product_id].subtotal) == (Decimal('250.50'), Decimal('751.50'))
+        assert shard_totals(db, [hot.product_id]) == {hot.product_id: 17}
+        assert db.query(CartItem).filter(CartItem.cart_id == test_cart_with_items.cart_id).count() == 0
+
     def test_create_order_empty_cart(
         self, db: Session, test_user: User, test_address: Address,
         test_payment_method: PaymentMethod
@@ -277,6 +336,237 @@ class TestOrderServiceUnit:
         assert len(orders) >= 1
         assert orders[0].user_id == test_user.user_id
 
+    def test_reservations_hold_stock_until_expired(
+        self, db: Session, test_user: User, test_admin: User, test_address: Address,
+        test_payment_method: PaymentMethod, test_cart_with_items: ShoppingCart,
+        test_product: Product
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria de reservas de inventario: las unidades reservadas por
+                     otro usuario no se pueden vender hasta que la reserva vence, y el
+                     descuento de stock es condicional.
+        Parámetros:
+            db (Session): Sesión de base de datos de prueba.
+            test_user (User): Usuario que compra.
+            test_admin (User): Otro usuario que reserva.
+            test_address (Address): Dirección de prueba.
+            test_payment_method (PaymentMethod): Método de pago de prueba.
+            test_cart_with_items (ShoppingCart): Carrito con 2 unidades.
+            test_product (Product): Producto con 50 unidades.
+        """
+        # Arrange: otro usuario aparta 49 de las 50 unidades
+        reserve_stock(db, test_admin.user_id, {test_product.product_id: 49})
+        db.commit()
+        order_args = dict(
+            db=db,
+            user_id=test_user.user_id,
+            address_id=test_address.address_id,
+            payment_id=test_payment_method.payment_id,
+            subtotal=Decimal('1799.98'),
+            shipping_cost=Decimal('150.00'),
+            discount_amount=Decimal('0.00'),
+            total_amount=Decimal('1949.98')
+        )
+
+        # Act / Assert: solo queda 1 unidad disponible
+        result = order_service.create_order_from_cart(**order_args)
+        assert result["success"] is False
+        assert "Stock insuficiente" in result["error"]
+        db.rollback()
+
+        with pytest.raises(InsufficientStockError):
+            reserve_stock(db, test_user.user_id, {test_product.product_id: 2})
+        db.rollback()
+
+        # La reserva vence y se libera
+        released = release_expired_reservations(db, now=datetime.now(UTC) + timedelta(hours=1))
+        assert released == 49
+        assert db.query(InventoryReservation).count() == 0
+
+        # El comprador reserva y su orden consume la reserva
+        reserve_stock(db, test_user.user_id, {test_product.product_id: 2})
+        db.commit()
+        result = order_service.create_order_from_cart(**order_args)
+        assert result["success"] is True
+
+        db.refresh(test_product)
+        assert test_product.stock == 48
+        assert test_product.reserved_stock == 0
+        assert db.query(InventoryReservation).count() == 0
+
+        with pytest.raises(InsufficientStockError):
+            decrement_stock(db, {test_product.product_id: 49})
+        db.rollback()
+
+    def test_sharded_stock_for_hot_products(
+        self, db: Session, test_user: User, test_admin: User, test_address: Address,
+        test_payment_method: PaymentMethod, test_cart_with_items: ShoppingCart,
+        test_product: Product
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria del stock fragmentado: las reservas y compras descuentan
+                     de los fragmentos, el total se sincroniza a product.stock y las últimas
+                     unidades se pueden vender aunque estén repartidas en varios fragmentos.
+        Parámetros:
+            db (Session): Sesión de base de datos de prueba.
+            test_user (User): Usuario que compra.
+            test_admin (User): Otro usuario que reserva.
+            test_address (Address): Dirección de prueba.
+            test_payment_method (PaymentMethod): Método de pago de prueba.
+            test_cart_with_items (ShoppingCart): Carrito con 2 unidades.
+            test_product (Product): Producto con 50 unidades.
+        """
+        # Arrange
+        product_id = test_product.product_id
+        set_stock_shards(db, product_id, 4)
+        db.commit()
+        shards = db.query(ProductStockShard).filter(ProductStockShard.product_id == product_id).all()
+        assert sorted(shard.stock for shard in shards) == [12, 12, 13, 13]
+
+        # Act: una reserva y una compra descuentan de los fragmentos, no de product
+        reserve_stock(db, test_admin.user_id, {product_id: 3})
+        db.commit()
+        result = order_service.create_order_from_cart(
+            db=db,
+            user_id=test_user.user_id,
+            address_id=test_address.address_id,
+            payment_id=test_payment_method.payment_id,
+            subtotal=Decimal('1799.98'),
+            shipping_cost=Decimal('150.00'),
+            discount_amount=Decimal('0.00'),
+            total_amount=Decimal('1949.98')
+        )
+
+        # Assert
+        assert result["success"] is True
+        assert shard_totals(db, [product_id]) == {product_id: 45}
+        db.refresh(test_product)
+        assert test_product.stock == 50
+        assert test_product.reserved_stock == 0
+
+        release_user_reservations(db, test_admin.user_id)
+        assert sync_sharded_stock(db) == 1
+        db.commit()
+        db.refresh(test_product)
+        assert test_product.stock == 48
+
+        # Las últimas unidades están repartidas: se toman de varios fragmentos
+        decrement_stock(db, {product_id: 48})
+        db.commit()
+        assert shard_totals(db, [product_id]) == {product_id: 0}
+        with pytest.raises(InsufficientStockError):
+            decrement_stock(db, {product_id: 1})
+        db.rollback()
+
+        # Al desactivar, el total vuelve a una sola fila
+        set_stock_shards(db, product_id, 0)
+        db.commit()
+        db.refresh(test_product)
+        assert test_product.stock == 0
+        assert test_product.stock_shards == 0
+        assert db.query(ProductStockShard).count() == 0
+
+    def test_inventory_movements_and_low_stock_set(
+        self, db: Session, test_user: User, test_address: Address,
+        test_payment_method: PaymentMethod, test_cart_with_items: ShoppingCart,
+        test_product: Product
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria del ledger de inventario y del conjunto de stock bajo:
+                     venta y cancelación quedan registradas con su orden, y el producto entra
+                     y sale del conjunto al cruzar el umbral.
+        Parámetros:
+            db (Session): Sesión de base de datos de prueba.
+            test_user (User): Usuario que compra.
+            test_address (Address): Dirección de prueba.
+            test_payment_method (PaymentMethod): Método de pago de prueba.
+            test_cart_with_items (ShoppingCart): Carrito con 2 unidades.
+            test_product (Product): Producto con 50 unidades.
+        """
+        # Arrange
+        product_id = test_product.product_id
+        result = order_service.create_order_from_cart(
+            db=db,
+            user_id=test_user.user_id,
+            address_id=test_address.address_id,
+            payment_id=test_payment_method.payment_id,
+            subtotal=Decimal('1799.98'),
+            shipping_cost=Decimal('150.00'),
+            discount_amount=Decimal('0.00'),
+            total_amount=Decimal('1949.98')
+        )
+        db.commit()
+        order_id = result["order"].order_id
+
+        # Act
+        cancel = order_service.cancel_order(db, test_user.cognito_sub, order_id)
+
+        # Assert: alta (fixture), venta y cancelación en orden
+        assert cancel["success"] is True
+        movements = db.query(InventoryMovement).filter(
+            InventoryMovement.product_id == product_id
+        ).order_by(InventoryMovement.movement_id).all()
+        assert [(m.reason, m.quantity_change, m.stock_after, m.order_id) for m in movements] == [
+            (InventoryMovementReason.ADJUSTMENT, 50, 50, None),
+            (InventoryMovementReason.SALE, -2, 48, order_id),
+            (InventoryMovementReason.CANCELLATION, 2, 50, order_id),
+        ]
+        assert db.get(LowStockProduct, product_id) is None
+
+        # Cruza el umbral hacia abajo y luego hacia arriba
+        decrement_stock(db, {product_id: 45})
+        db.commit()
+        assert db.get(LowStockProduct, product_id).stock == 5
+
+        adjust_stock(db, {product_id: 20}, InventoryMovementReason.ADJUSTMENT)
+        db.commit()
+        assert db.get(LowStockProduct, product_id) is None
+
+    def test_rebuild_low_stock_and_ledger_survives_product_delete(self, db: Session, test_product: Product):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria de rebuild_low_stock y del historial de inventario: al
+                     cambiar el umbral el conjunto se recalcula (los que siguen conservan
+                     flagged_at), y los movimientos sobreviven al borrado del producto.
+        Parámetros:
+            db (Session): Sesión de base de datos de prueba.
+            test_product (Product): Producto con 50 unidades.
+        """
+        # Arrange: el producto queda con 5 unidades (bajo el umbral por defecto)
+        product_id = test_product.product_id
+        decrement_stock(db, {product_id: 45})
+        db.commit()
+        flagged_at = db.get(LowStockProduct, product_id).flagged_at
+
+        # Act / Assert: un umbral menor lo saca, uno mayor lo vuelve a agregar
+        assert rebuild_low_stock(db, threshold=5) == 0
+        assert db.get(LowStockProduct, product_id) is None
+        assert rebuild_low_stock(db, threshold=100) == 1
+        db.expire_all()
+        assert db.get(LowStockProduct, product_id).stock == 5
+
+        # Stock escrito sin pasar por track_low_stock: el rebuild lo corrige sin tocar flagged_at
+        db.get(LowStockProduct, product_id).flagged_at = flagged_at
+        db.flush()
+        db.execute(Product.__table__.update().where(Product.product_id == product_id).values(stock=3))
+        assert rebuild_low_stock(db, threshold=100) == 1
+        db.commit()
+        db.expire_all()
+        row = db.get(LowStockProduct, product_id)
+        assert (row.stock, row.flagged_at) == (3, flagged_at)
+
+        # El historial sobrevive al borrado del producto
+        db.delete(row)
+        db.delete(db.get(Product, product_id))
+        db.commit()
+        reasons = db.query(InventoryMovement.reason).filter(
+            InventoryMovement.product_id == product_id
+        ).order_by(InventoryMovement.movement_id).all()
+        assert [r for (r,) in reasons] == [InventoryMovementReason.ADJUSTMENT, InventoryMovementReason.SALE]
+
 
 # ==================== PRUEBAS DE INTEGRACIÓN ====================
 
@@ -7,6 +7,7 @@ import pytest
 from unittest.mock import Mock, patch, MagicMock, AsyncMock
 from sqlalchemy.orm import Session
 from decimal import Decimal
+from datetime import datetime, timedelta, UTC
 from app.api.v1.payments.service import payment_process_service as service
 from app.api.v1.payments import schemas
 from app.models.user import User
@@ -17,7 +18,9 @@ from app.models.cart_item import CartItem
 from app.models.product import Product
 from app.models.order import Order
 from app.models.coupon import Coupon
+from app.models.inventory_reservation import InventoryReservation
 from app.models.enum import PaymentType, OrderStatus
+from app.services.inventory import release_expired_reservations
 
 
 # ==================== FIXTURES ADICIONALES ====================
@@ -173,6 +176,174 @@ class TestPaymentServiceUnit:
         assert result["success"] is True
         assert "stripe_session_id" in result or "stripe_checkout_url" in result
 
+    @pytest.mark.asyncio
+    @patch('app.api.v1.payments.service.stripe_service')
+    @patch('app.api.v1.payments.service.order_service')
+    async def test_stripe_session_expiry_and_refund_without_stock(
+        self, mock_order_service, mock_stripe_service,
+        db: Session, test_user: User, test_address: Address,
+        test_cart_with_items: ShoppingCart
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria: la sesión de Checkout se crea con expires_at y la reserva
+                     de inventario vence después que ella; si al llegar el webhook ya no hay
+                     stock, el pago se reembolsa.
+        Parámetros:
+            mock_order_service: Mock del servicio de órdenes.
+            mock_stripe_service: Mock del servicio de Stripe.
+            db (Session): Sesión de base de datos de prueba.
+            test_user (User): Usuario de prueba.
+            test_address (Address): Dirección de prueba.
+            test_cart_with_items (ShoppingCart): Carrito con items.
+        """
+        # Arrange
+        mock_stripe_service.create_checkout_session.return_value = {"id": "cs_test_123", "url": "https://checkout"}
+        mock_stripe_service.refund_payment.return_value = {"success": True, "refund_id": "re_test_1"}
+
+        # Act - Sesión de pago
+        result = await service.create_stripe_checkout_session(
+            db, test_user.cognito_sub, test_address.address_id
+        )
+
+        # Assert - La sesión expira antes que la reserva
+        assert result["success"] is True
+        expires_at = mock_stripe_service.create_checkout_session.call_args.kwargs["expires_at"]
+        reservation = db.query(InventoryReservation).filter(InventoryReservation.user_id == test_user.user_id).first()
+        assert datetime.fromtimestamp(expires_at, UTC) - datetime.now(UTC) >= timedelta(minutes=29)
+        assert reservation.expires_at.replace(tzinfo=UTC).timestamp() > expires_at
+
+        # Act - Webhook cuando el inventario ya se agotó
+        mock_stripe_service.retrieve_session.return_value = {
+            "id": "cs_test_123",
+            "metadata": {"user_id": str(test_user.user_id), "address_id": str(test_address.address_id)}
+        }
+        mock_stripe_service.get_payment_method.return_value = {
+            "success": True,
+            "payment_method": {"card": {"last4": "4242", "exp_month": 12, "exp_year": 2030}}
+        }
+        mock_order_service.create_order_from_cart = Mock(return_value={
+            "success": False, "error": "Stock insuficiente para Test", "out_of_stock": True
+        })
+        with patch('app.api.v1.payments.service.stripe.PaymentIntent') as mock_pi:
+            mock_pi.retrieve.return_value = Mock(payment_method="pm_test_123")
+            webhook_result = await service.process_stripe_webhook(db, "cs_test_123", "pi_test_456")
+
+        # Assert - Sin orden, con reembolso
+        assert webhook_result["success"] is False
+        mock_stripe_service.refund_payment.assert_called_once_with("pi_test_456")
+        assert webhook_result["refund"]["refund_id"] == "re_test_1"
+
+    @pytest.mark.asyncio
+    @patch('app.api.v1.payments.service.stripe_service')
+    async def test_stripe_webhook_refunds_when_stock_sold_out(
+        self, mock_stripe_service,
+        db: Session, test_user: User, test_address: Address,
+        test_cart_with_items: ShoppingCart, test_product: Product
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria: si la reserva venció y el producto se agotó antes de
+                     llegar el webhook, no se crea orden, el pago se reembolsa y el carrito
+                     se conserva.
+        Parámetros:
+            mock_stripe_service: Mock del servicio de Stripe.
+            db (Session): Sesión de base de datos de prueba.
+            test_user (User): Usuario de prueba.
+            test_address (Address): Dirección de prueba.
+            test_cart_with_items (ShoppingCart): Carrito con items.
+            test_product (Product): Producto del carrito.
+        """
+        # Arrange - Sesión creada; la reserva vence y otro cliente se lleva el stock
+        mock_stripe_service.create_checkout_session.return_value = {"id": "cs_test_123", "url": "https://checkout"}
+        mock_stripe_service.refund_payment.return_value = {"success": True, "refund_id": "re_test_1"}
+        result = await service.create_stripe_checkout_session(
+            db, test_user.cognito_sub, test_address.address_id
+        )
+        assert result["success"] is True
+        release_expired_reservations(db, now=datetime.now(UTC) + timedelta(days=1))
+        test_product.stock = 0
+        db.commit()
+
+        mock_stripe_service.retrieve_session.return_value = {
+            "id": "cs_test_123",
+            "metadata": {"user_id": str(test_user.user_id), "address_id": str(test_address.address_id)}
+        }
+        mock_stripe_service.get_payment_method.return_value = {
+            "success": True,
+            "payment_method": {"card": {"last4": "4242", "exp_month": 12, "exp_year": 2030}}
+        }
+
+        # Act
+        with patch('app.api.v1.payments.service.stripe.PaymentIntent') as mock_pi:
+            mock_pi.retrieve.return_value = Mock(payment_method="pm_test_123")
+            webhook_result = await service.process_stripe_webhook(db, "cs_test_123", "pi_test_456")
+
+        # Assert
+        assert webhook_result["success"] is False
+        assert webhook_result["out_of_stock"] is True
+        mock_stripe_service.refund_payment.assert_called_once_with("pi_test_456")
+        assert db.query(Order).filter(Order.user_id == test_user.user_id).count() == 0
+        assert db.query(CartItem).filter(CartItem.cart_id == test_cart_with_items.cart_id).count() == 1
+
+    @pytest.mark.asyncio
+    @patch('app.api.v1.payments.service.paypal_service')
+    async def test_capture_paypal_checks_stock_before_charging(
+        self, mock_paypal_service,
+        db: Session, test_user: User, test_address: Address,
+        test_cart_with_items: ShoppingCart, test_product: Product
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria de la captura de PayPal: sin stock no se captura el pago;
+                     si la captura falla no queda orden y la reserva se libera; si se completa,
+                     la orden se crea y consume la reserva.
+        Parámetros:
+            mock_paypal_service: Mock del servicio de PayPal.
+            db (Session): Sesión de base de datos de prueba.
+            test_user (User): Usuario de prueba.
+            test_address (Address): Dirección de prueba.
+            test_cart_with_items (ShoppingCart): Carrito con items (2 unidades).
+            test_product (Product): Producto con 50 unidades.
+        """
+        # Arrange
+        mock_paypal_service.capture_order = AsyncMock(return_value={"status": "DECLINED"})
+        assert service._reserve_cart(db, test_user.user_id) is None
+
+        # Act / Assert - La captura falla: sin orden, reserva liberada, carrito intacto
+        result = await service.capture_paypal_payment(
+            db, test_user.cognito_sub, "PAYPAL123", test_address.address_id
+        )
+        assert result["success"] is False
+        assert db.query(Order).filter(Order.user_id == test_user.user_id).count() == 0
+        assert db.query(InventoryReservation).filter(InventoryReservation.user_id == test_user.user_id).count() == 0
+        assert db.query(CartItem).filter(CartItem.cart_id == test_cart_with_items.cart_id).count() == 1
+        db.refresh(test_product)
+        assert (test_product.stock, test_product.reserved_stock) == (50, 0)
+
+        # Act / Assert - Sin stock: no se llega a capturar
+        test_product.stock = 0
+        db.commit()
+        mock_paypal_service.capture_order.reset_mock()
+        result = await service.capture_paypal_payment(
+            db, test_user.cognito_sub, "PAYPAL123", test_address.address_id
+        )
+        assert result["success"] is False
+        assert result["out_of_stock"] is True
+        mock_paypal_service.capture_order.assert_not_called()
+
+        # Act / Assert - Con stock y captura completa: orden pagada
+        test_product.stock = 50
+        db.commit()
+        assert service._reserve_cart(db, test_user.user_id) is None
+        mock_paypal_service.capture_order = AsyncMock(return_value={"status": "COMPLETED"})
+        result = await service.capture_paypal_payment(
+            db, test_user.cognito_sub, "PAYPAL123", test_address.address_id
+        )
+        assert result["success"] is True
+        db.refresh(test_product)
+        assert (test_product.stock, test_product.reserved_stock) == (48, 0)
+
     @pytest.mark.asyncio
     @patch('app.api.v1.payments.service.paypal_service')
     async def test_initialize_paypal_checkout(
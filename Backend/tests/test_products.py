@@ -6,12 +6,86 @@
 import pytest
 from sqlalchemy.orm import Session
 from decimal import Decimal  # <-- IMPORTADO
+from fastapi import HTTPException
 from app.api.v1.products.service import product_service, review_service
 from app.api.v1.products import schemas
+from app.api.v1.products.similarity import similarity_index
 from app.models.product import Product
 from app.models.product_image import ProductImage
 from app.models.review import Review
 from app.models.user import User
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.product_co_purchase import ProductCoPurchase
+from app.models.enum import OrderStatus, AuthType, UserRole, Gender
+from datetime import date
+from app.services.co_purchase import build_co_purchase
+from app.services.product_cards import product_cards
+from app.services.catalog_events import notify_catalog_change
+
+
+# ==================== FIXTURES ADICIONALES ====================
+
+@pytest.fixture
+def co_purchase_orders(db: Session, test_product, test_user, test_address, test_payment_method):
+    """
+    Fixture que crea dos productos extra y órdenes con combinaciones de productos:
+    {A, B} y {A, B, C} entregadas, {A, C} pagada (aún no entregada).
+    Retorna (producto_b, producto_c, orden_pendiente).
+    """
+    extra = []
+    for name in ("Creatina Test", "Shaker Test"):
+        product = Product(
+            name=name, description="Producto extra", brand="Test Brand", category="Accesorios",
+            physical_activities=[], fitness_objectives=[], nutritional_value="Test",
+            price=Decimal('199.99'), stock=40, is_active=True
+        )
+        db.add(product)
+        extra.append(product)
+    db.flush()
+    product_b, product_c = extra
+
+    orders = []
+    for status_, products in [
+        (OrderStatus.DELIVERED, [test_product, product_b]),
+        (OrderStatus.DELIVERED, [test_product, product_b, product_c]),
+        (OrderStatus.PAID, [test_product, product_c]),
+    ]:
+        order = Order(
+            user_id=test_user.user_id,
+            address_id=test_address.address_id,
+            payment_id=test_payment_method.payment_id,
+            order_status=status_,
+            subtotal=Decimal('100.00'),
+            shipping_cost=Decimal('0.00'),
+            total_amount=Decimal('100.00')
+        )
+        order.order_items = [
+            OrderItem(product_id=p.product_id, quantity=1, unit_price=p.price, subtotal=p.price)
+            for p in products
+        ]
+        db.add(order)
+        orders.append(order)
+    db.commit()
+    return product_b, product_c, orders[2]
+
+
+@pytest.fixture
+def review_users(db: Session):
+    """
+    Fixture que crea tres usuarios para reseñar un mismo producto (una reseña por usuario).
+    """
+    users = [
+        User(
+            cognito_sub=f"review-user-{i}", email=f"review{i}@example.com", first_name="Review",
+            last_name=f"User {i}", gender=Gender.FEMALE, date_of_birth=date(1995, 1, 1),
+            auth_type=AuthType.EMAIL, role=UserRole.USER, account_status=True
+        )
+        for i in range(3)
+    ]
+    db.add_all(users)
+    db.commit()
+    return users
 
 
 # ==================== PRUEBAS UNITARIAS ====================
@@ -170,6 +244,235 @@ class TestProductServiceUnit:
         assert len(related) >= 0  # Puede tener 0 o más relacionados
         assert test_product.product_id not in [p.product_id for p in related]
 
+    def test_get_related_products_ranked_by_similarity(self, db: Session, test_product: Product):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que los relacionados se ordenan por similitud
+                     de contenido, excluyen inactivos y se actualizan al cambiar un producto.
+        Parámetros:
+            db (Session): Sesión de base de datos de prueba.
+            test_product (Product): Producto de prueba.
+        """
+        # Arrange
+        def make(name, description, category, objectives, activities, is_active=True):
+            return Product(
+                name=name, description=description, brand="Otra Marca", category=category,
+                physical_activities=activities, fitness_objectives=objectives,
+                nutritional_value="Test", price=Decimal('499.99'), stock=10, is_active=is_active
+            )
+
+        close = make("Whey Protein Isolate", "Proteína aislada de suero", "Proteínas",
+                     ["muscle_gain", "recovery"], ["weightlifting"])
+        medium = make("Creatina Monohidratada", "Creatina para fuerza", "Creatina",
+                      ["muscle_gain"], ["crossfit"])
+        unrelated = make("Té Verde", "Infusión relajante", "Bebidas", ["relax"], ["yoga"])
+        inactive = make("Whey Protein Legacy", "Proteína de suero", "Proteínas",
+                        ["muscle_gain"], ["weightlifting"], is_active=False)
+        db.add_all([close, medium, unrelated, inactive])
+        db.commit()
+
+        # Act
+        related = product_service.get_related_products(db, test_product.product_id, limit=5)
+        score_before = dict(similarity_index.neighbors(db, test_product.product_id))[medium.product_id]
+
+        medium.name = "Whey Protein Creatina"
+        medium.category = "Proteínas"
+        db.commit()
+        score_after = dict(similarity_index.neighbors(db, test_product.product_id))[medium.product_id]
+
+        # Assert
+        assert [p.product_id for p in related] == [close.product_id, medium.product_id]
+        assert inactive.product_id not in [p.product_id for p in related]
+        assert score_after > score_before
+        with pytest.raises(HTTPException):
+            product_service.get_related_products(db, 9999)
+
+    def test_similarity_index_incremental_updates(self, db: Session, test_product: Product, monkeypatch):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria del índice de similitud: un cambio que no toca el texto
+                     (precio) ni un aviso sin IDs recalculan vecinos; un cambio de texto solo
+                     descarta las listas afectadas.
+        Parámetros:
+            db (Session): Sesión de base de datos de prueba.
+            test_product (Product): Producto de prueba.
+            monkeypatch: Fixture de pytest para contar los cálculos de vecinos.
+        """
+        # Arrange
+        def make(name, category):
+            return Product(
+                name=name, description="Suplemento", brand="Otra Marca", category=category,
+                physical_activities=["weightlifting"], fitness_objectives=["muscle_gain"],
+                nutritional_value="Test", price=Decimal('499.99'), stock=10, is_active=True
+            )
+
+        close = make("Whey Protein Isolate", "Proteínas")
+        bar = make("Barra Avena", "Snacks")
+        tea = Product(
+            name="Té Verde", description="Infusión", brand="Tea House", category="Bebidas",
+            physical_activities=["yoga"], fitness_objectives=["relax"],
+            nutritional_value="Test", price=Decimal('99.99'), stock=10, is_active=True
+        )
+        db.add_all([close, bar, tea])
+        db.commit()
+        related = similarity_index.neighbors(db, test_product.product_id)
+        assert similarity_index.neighbors(db, tea.product_id) == []
+
+        computed = []
+        compute = similarity_index._compute_neighbors
+        monkeypatch.setattr(
+            similarity_index, "_compute_neighbors",
+            lambda product_id: computed.append(product_id) or compute(product_id)
+        )
+
+        # Act & Assert - Precio y aviso sin IDs: mismas listas en cache
+        close.price = Decimal('399.99')
+        db.commit()
+        notify_catalog_change()
+        assert similarity_index.neighbors(db, test_product.product_id) == related
+        assert computed == []
+
+        # Cambio de texto de tea: no comparte términos con test_product, su lista se conserva
+        tea.name = "Té Verde Matcha"
+        db.commit()
+        assert similarity_index.neighbors(db, test_product.product_id) == related
+        assert computed == []
+
+        # Cambio de texto de bar: está en la lista de test_product, se recalcula
+        bar.name = "Barra Whey Protein"
+        db.commit()
+        updated = similarity_index.neighbors(db, test_product.product_id)
+        assert computed == [test_product.product_id]
+        assert dict(updated)[bar.product_id] > dict(related)[bar.product_id]
+
+
+    def test_build_co_purchase_incremental(self, db: Session, test_product: Product, co_purchase_orders):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria de la matriz de co-compra: solo cuenta órdenes entregadas,
+                     normaliza con coseno y en ejecuciones posteriores procesa únicamente las
+                     órdenes nuevas.
+        """
+        # Arrange
+        product_b, product_c, pending_order = co_purchase_orders
+        a = test_product.product_id
+
+        def co_count(i, j):
+            return db.get(ProductCoPurchase, (i, j)).co_count
+
+        # Act
+        first = build_co_purchase(db)
+        bought_together = product_service.get_bought_together(db, a)
+
+        pending_order.order_status = OrderStatus.DELIVERED
+        db.commit()
+        second = build_co_purchase(db)
+        third = build_co_purchase(db)
+        db.expire_all()
+        counts_incremental = (co_count(a, a), co_count(a, product_b.product_id), co_count(a, product_c.product_id))
+        build_co_purchase(db, rebuild=True)
+        db.expire_all()
+        counts_rebuilt = (co_count(a, a), co_count(a, product_b.product_id), co_count(a, product_c.product_id))
+
+        # Assert
+        assert first["orders_processed"] == 2
+        assert [p.product_id for p in bought_together] == [product_b.product_id, product_c.product_id]
+        assert second["orders_processed"] == 1
+        assert third["orders_processed"] == 0
+        assert counts_incremental == counts_rebuilt == (3, 2, 2)
+        assert db.get(ProductCoPurchase, (product_c.product_id, a)).score == pytest.approx(2 / (3 * 2) ** 0.5, abs=1e-5)
+
+
+    def test_get_product_detail_first_review_page(self, db: Session, test_product: Product, test_user: User):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que el detalle trae los agregados de reseñas
+                     y solo la primera página, y que el cargador interno no trae colecciones.
+        """
+        # Arrange
+        product_id = test_product.product_id
+        for rating in [5, 5, 4, 2, 4.5]:
+            db.add(Review(product_id=product_id, user_id=test_user.user_id, rating=rating))
+        db.commit()
+        review_service.reconcile_rating_aggregates(db)
+        db.expunge_all()
+
+        # Act
+        product, summary, reviews = product_service.get_product_detail(db, product_id, review_limit=2)
+        db.expunge_all()
+        slim = product_service.get_product_by_id(db, product_id)
+
+        # Assert
+        assert product.product_id == product_id
+        assert summary["count"] == 5
+        assert summary["average"] == 4.1
+        assert summary["histogram"] == {1: 0, 2: 1, 3: 0, 4: 2, 5: 2}
+        assert len(reviews) == 2
+        assert "reviews" not in slim.__dict__
+        assert "product_images" not in slim.__dict__
+
+
+    def test_primary_image_path_kept_in_sync(self, db: Session, test_product: Product):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que primary_image_path sigue a la imagen
+                     principal al agregar, cambiar y eliminar imágenes.
+        """
+        # Arrange
+        original = test_product.product_images[0]
+        extra = ProductImage(product_id=test_product.product_id, image_path="https://example.com/extra.jpg")
+        db.add(extra)
+        db.commit()
+        after_add = test_product.primary_image_path
+
+        # Act
+        original.is_primary = False
+        extra.is_primary = True
+        db.commit()
+        after_switch = test_product.primary_image_path
+
+        db.delete(extra)
+        db.commit()
+        after_delete = test_product.primary_image_path
+
+        # Assert
+        assert after_add == "https://example.com/test-image.jpg"
+        assert after_switch == "https://example.com/extra.jpg"
+        assert after_delete == "https://example.com/test-image.jpg"
+
+    def test_product_cards_invalidated_by_writes(self, db: Session, test_product: Product, review_users):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que las tarjetas de producto se sirven desde
+                     el cache y se recargan tras cambios de producto, imágenes y reseñas.
+        """
+        # Arrange
+        product_id = test_product.product_id
+        first = product_cards.get(db, product_id)
+        cached = product_cards.get_many(db, [product_id, 9999])
+
+        # Act
+        test_product.stock = 3
+        db.commit()
+        after_stock = product_cards.get(db, product_id)
+
+        for image in db.query(ProductImage).filter(ProductImage.product_id == product_id).all():
+            image.is_primary = False
+        db.add(ProductImage(product_id=product_id, image_path="https://example.com/nueva.jpg", is_primary=True))
+        db.commit()
+        after_image = product_cards.get(db, product_id)
+
+        review_service.create_review(db, product_id, review_users[0].user_id, schemas.ReviewCreate(rating=4))
+        after_review = product_cards.get(db, product_id)
+
+        # Assert
+        assert cached == {product_id: first}
+        assert cached[product_id] is first
+        assert first.stock == 50 and after_stock.stock == 3
+        assert after_image.primary_image == "https://example.com/nueva.jpg"
+        assert after_review.rating_count == 1
+        assert after_review.average_rating == Decimal("4.0")
+
 
 class TestReviewServiceUnit:
     """
@@ -258,6 +561,59 @@ class TestReviewServiceUnit:
         assert review.product_id == test_product.product_id
         assert review.user_id == test_user.user_id
     
+    def test_review_writes_update_rating_aggregates(self, db: Session, test_product: Product, review_users):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que crear, editar y eliminar reseñas actualiza
+                     la suma, el total, el histograma y el promedio del producto.
+        """
+        # Arrange
+        product_id = test_product.product_id
+        reviews = [
+            review_service.create_review(db, product_id, user.user_id, schemas.ReviewCreate(rating=rating))
+            for user, rating in zip(review_users, [5, 4, 4])
+        ]
+        db.refresh(test_product)
+        after_create = (test_product.rating_count, test_product.rating_sum, test_product.average_rating)
+
+        # Act
+        review_service.update_review(db, reviews[0].review_id, review_users[0].user_id, schemas.ReviewUpdate(rating=2))
+        review_service.delete_review(db, reviews[1].review_id, review_users[1].user_id)
+        db.refresh(test_product)
+
+        # Assert
+        assert after_create == (3, Decimal("13"), Decimal("4.3"))
+        assert test_product.rating_count == 2
+        assert test_product.rating_sum == Decimal("6")
+        assert test_product.average_rating == Decimal("3.0")
+        assert review_service.get_review_summary(test_product)["histogram"] == {1: 0, 2: 1, 3: 0, 4: 1, 5: 0}
+
+    def test_reconcile_rating_aggregates(self, db: Session, test_product: Product, review_users):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que la conciliación corrige agregados
+                     desviados desde la tabla review y no toca los que ya están bien.
+        """
+        # Arrange
+        product_id = test_product.product_id
+        for user, rating in zip(review_users, [5, 3]):
+            review_service.create_review(db, product_id, user.user_id, schemas.ReviewCreate(rating=rating))
+        db.add(Review(product_id=product_id, user_id=review_users[2].user_id, rating=Decimal("4.5")))
+        db.commit()
+
+        # Act
+        corrected = review_service.reconcile_rating_aggregates(db)
+        corrected_again = review_service.reconcile_rating_aggregates(db)
+        db.refresh(test_product)
+
+        # Assert
+        assert corrected == 1
+        assert corrected_again == 0
+        assert test_product.rating_count == 3
+        assert test_product.rating_sum == Decimal("12.5")
+        assert test_product.average_rating == Decimal("4.2")
+        assert (test_product.rating_3, test_product.rating_4, test_product.rating_5) == (1, 1, 1)
+
     def test_get_product_reviews(self, db: Session, test_product: Product, test_user: User):
         """
         Autor: Luis Flores
@@ -365,6 +721,58 @@ class TestProductAPIIntegration:
         assert data["name"] == "Whey Protein Test"
         assert "product_images" in data
     
+    def test_get_product_detail_reviews_integration(self, client, db, test_product, test_user):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba de integración que verifica el resumen de reseñas y la primera
+                     página incluidos en el detalle de producto.
+        """
+        # Arrange
+        for rating in [5, 3, 4]:
+            db.add(Review(product_id=test_product.product_id, user_id=test_user.user_id, rating=rating))
+        db.commit()
+        review_service.reconcile_rating_aggregates(db)
+        
+        # Act
+        response = client.get(f"/api/v1/products/{test_product.product_id}?review_limit=2")
+        next_page = client.get(f"/api/v1/products/{test_product.product_id}/reviews?page=2&limit=2")
+        
+        # Assert
+        assert response.status_code == 200
+        data = response.json()
+        assert data["review_summary"]["count"] == 3
+        assert data["review_summary"]["average"] == 4.0
+        assert data["review_summary"]["histogram"] == {"1": 0, "2": 0, "3": 1, "4": 1, "5": 1}
+        assert len(data["reviews"]) == 2
+        assert data["reviews"][0]["user_name"] == f"{test_user.first_name} {test_user.last_name}"
+        assert len(data["product_images"]) == 1
+        assert len(next_page.json()) == 1
+    
+    def test_get_products_by_ids_integration(self, client, db, test_product, co_purchase_orders):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba de integración de la consulta de productos por lote: respeta el
+                     orden pedido, omite IDs inexistentes o inactivos y limita a 100 IDs.
+        """
+        # Arrange
+        product_b, product_c, _ = co_purchase_orders
+        product_c.is_active = False
+        db.commit()
+        ids = [product_b.product_id, 9999, test_product.product_id, product_c.product_id, product_b.product_id]
+
+        # Act
+        response = client.get(f"/api/v1/products/?ids={','.join(map(str, ids))}")
+        too_many = client.get(f"/api/v1/products/?ids={','.join(map(str, range(1, 102)))}")
+        invalid = client.get("/api/v1/products/?ids=1,abc")
+
+        # Assert
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["product_id"] for item in data] == [product_b.product_id, test_product.product_id]
+        assert data[1]["primary_image"] == "https://example.com/test-image.jpg"
+        assert too_many.status_code == 400
+        assert invalid.status_code == 400
+
     def test_get_product_not_found_integration(self, client):
         """
         Autor: Luis Flores
@@ -394,6 +802,24 @@ class TestProductAPIIntegration:
         assert response.status_code == 200
         data = response.json()
         assert isinstance(data, list)
+    
+    def test_get_bought_together_integration(self, client, db, test_product, co_purchase_orders):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba de integración para obtener productos comprados juntos.
+        """
+        # Arrange
+        product_b, product_c, _ = co_purchase_orders
+        build_co_purchase(db)
+        
+        # Act
+        response = client.get(f"/api/v1/products/{test_product.product_id}/bought-together?limit=1")
+        
+        # Assert
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["product_id"] for item in data] == [product_b.product_id]
+        assert data[0]["primary_image"] is None
 
 
 # ==================== PRUEBAS FUNCIONALES ====================
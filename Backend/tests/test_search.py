@@ -6,10 +6,22 @@
 import pytest
 from sqlalchemy.orm import Session
 from decimal import Decimal
-from app.api.v1.search.service import search_service
+from datetime import date
+from app.api.v1.search.service import search_service, search_cache
 from app.api.v1.search import schemas
+from app.api.v1.products.service import product_service
+from app.services.search_log import search_log_buffer
+from app.services.catalog_events import get_catalog_version
+from app.api.v1.search.ranking import profile_ranker, invalidate_profile
+from app.api.deps import get_optional_user
+from app.main import app
 from app.models.product import Product
 from app.models.product_image import ProductImage
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.search_log import SearchLog
+from app.models.fitness_profile import FitnessProfile
+from app.models.enum import OrderStatus
 
 
 # ==================== FIXTURES ADICIONALES ====================
@@ -226,6 +238,229 @@ class TestSearchServiceUnit:
         assert len(filters["categories"]) >= 4
 
 
+    def test_search_accent_insensitive(
+        self, db: Session, test_multiple_products
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que la búsqueda ignora acentos y mayúsculas.
+        """
+        # Act
+        products, total = search_service.search_and_filter_products(
+            db, query="  PROTEINAS ", skip=0, limit=10
+        )
+
+        # Assert
+        assert total == 1
+        assert products[0].category == "Proteínas"
+
+    def test_search_results_are_cached(
+        self, db: Session, test_multiple_products
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que búsquedas equivalentes comparten
+                     la entrada de cache y que no vuelven a consultar la base de datos.
+        """
+        # Arrange
+        first_ids, first_total = search_service.search_product_ids(
+            db, query="Proteínas", category="Proteínas", skip=0, limit=10
+        )
+        # Se borra la tabla sin pasar por el ORM (no cambia la versión del catálogo)
+        db.query(ProductImage).delete()
+        db.query(Product).delete()
+
+        # Act
+        cached_ids, cached_total = search_service.search_product_ids(
+            db, query="proteinas", category="Proteínas", skip=0, limit=10
+        )
+
+        # Assert
+        assert cached_ids == first_ids
+        assert cached_total == first_total == 1
+        db.rollback()
+
+    def test_search_cache_invalidated_on_catalog_change(
+        self, db: Session, test_multiple_products
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que un cambio de producto invalida
+                     los resultados en cache.
+        """
+        # Arrange
+        _, total_before = search_service.search_product_ids(
+            db, max_price=Decimal('350.00'), skip=0, limit=10
+        )
+        entries_before = len(search_cache)
+
+        product = test_multiple_products[0]
+        product.price = Decimal('199.99')
+        db.commit()
+
+        # Act
+        _, total_after = search_service.search_product_ids(
+            db, max_price=Decimal('350.00'), skip=0, limit=10
+        )
+
+        # Assert
+        assert total_before == 1
+        assert total_after == 2
+        assert len(search_cache) == entries_before + 1
+
+
+    def test_sort_by_price(
+        self, db: Session, test_multiple_products
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria para ordenar resultados por precio (ascendente y descendente).
+        """
+        # Act
+        asc_products, _ = search_service.search_and_filter_products(
+            db, sort=schemas.SearchSort.PRICE_ASC, skip=0, limit=10
+        )
+        desc_products, _ = search_service.search_and_filter_products(
+            db, sort="price_desc", skip=0, limit=10
+        )
+
+        # Assert
+        asc_prices = [p.price for p in asc_products]
+        assert asc_prices == sorted(asc_prices)
+        assert [p.product_id for p in desc_products] == [p.product_id for p in reversed(asc_products)]
+
+    def test_sort_best_selling(
+        self, db: Session, test_multiple_products, test_user, test_address, test_payment_method
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria para el orden por más vendidos usando la columna
+                     precalculada sales_count (las órdenes canceladas no cuentan).
+        """
+        # Arrange
+        vitaminas, creatina = test_multiple_products[3], test_multiple_products[1]
+        for status_, product, quantity in [
+            (OrderStatus.DELIVERED, vitaminas, 5),
+            (OrderStatus.PAID, creatina, 2),
+            (OrderStatus.CANCELLED, creatina, 10),
+        ]:
+            order = Order(
+                user_id=test_user.user_id,
+                address_id=test_address.address_id,
+                payment_id=test_payment_method.payment_id,
+                order_status=status_,
+                subtotal=product.price * quantity,
+                shipping_cost=Decimal('0.00'),
+                total_amount=product.price * quantity
+            )
+            order.order_items = [OrderItem(
+                product_id=product.product_id,
+                quantity=quantity,
+                unit_price=product.price,
+                subtotal=product.price * quantity
+            )]
+            db.add(order)
+        db.commit()
+
+        # Act - La búsqueda en cache se renueva al cambiar las ventas, sin cambio de catálogo
+        cached_ids, _ = search_service.search_product_ids(
+            db, sort=schemas.SearchSort.BEST_SELLING, skip=0, limit=2
+        )
+        catalog_version = get_catalog_version()
+        assert product_service.refresh_sales_counts(db) == 2
+        products, _ = search_service.search_and_filter_products(
+            db, sort=schemas.SearchSort.BEST_SELLING, skip=0, limit=2
+        )
+
+        # Assert
+        assert cached_ids != [vitaminas.product_id, creatina.product_id]
+        assert [p.product_id for p in products] == [vitaminas.product_id, creatina.product_id]
+        assert products[0].sales_count == 5
+        assert products[1].sales_count == 2
+        assert get_catalog_version() == catalog_version
+        assert product_service.refresh_sales_counts(db) == 0
+
+    def test_search_log_buffered_and_flushed(
+        self, db: Session, test_multiple_products
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que las búsquedas se acumulan en el buffer
+                     (solo la primera página) y se escriben en search_log al hacer flush.
+        """
+        # Arrange
+        search_log_buffer.drain()
+
+        # Act
+        search_service.search_product_ids(db, query="Proteínas", category="Proteínas", skip=0, limit=10)
+        search_service.search_product_ids(db, query="Proteínas", category="Proteínas", skip=10, limit=10)
+        search_service.search_product_ids(db, query="  Colágeno ", skip=0, limit=10)
+        pending = len(search_log_buffer)
+        written = search_log_buffer.flush(db)
+
+        # Assert
+        assert pending == 2
+        assert written == 2
+        assert len(search_log_buffer) == 0
+        logs = db.query(SearchLog).order_by(SearchLog.search_log_id).all()
+        assert [(log.query, log.result_count) for log in logs] == [("proteinas", 1), ("colageno", 0)]
+        assert logs[0].filters == {"category": "Proteínas"}
+        assert logs[0].latency_ms >= 0
+
+    def test_profile_reranking(
+        self, db: Session, test_multiple_products
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que el perfil fitness re-ordena la página
+                     por afinidad y que un orden explícito tiene prioridad sobre el perfil.
+        """
+        # Arrange
+        profile = {
+            "recommended_plan": "BeBalance",
+            "goal_declared": "Maintain",
+            "activity_type": "Any",
+            "recommended_products": ["Multivitamínico", "Colágeno", "Proteína media"],
+        }
+        vitaminas = test_multiple_products[3]
+
+        # Act
+        plain, _ = search_service.search_and_filter_products(db, skip=0, limit=10)
+        ranked, _ = search_service.search_and_filter_products(
+            db, skip=0, limit=10, profile_attributes=profile
+        )
+        sorted_products, _ = search_service.search_and_filter_products(
+            db, skip=0, limit=10, sort=schemas.SearchSort.PRICE_DESC, profile_attributes=profile
+        )
+
+        # Assert
+        assert plain[0].product_id != vitaminas.product_id
+        assert ranked[0].product_id == vitaminas.product_id
+        assert sorted(p.product_id for p in ranked) == sorted(p.product_id for p in plain)
+        assert sorted_products[0].price == Decimal('899.99')
+
+    def test_profile_ranker_ignores_unknown_products(
+        self, db: Session, test_multiple_products
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba unitaria que verifica que productos fuera del índice (p. ej. inactivos)
+                     o perfiles sin afinidad conservan el orden original.
+        """
+        # Arrange
+        ids = [p.product_id for p in test_multiple_products] + [9999]
+        profile_ranker.clear()
+
+        # Act
+        unchanged = profile_ranker.rerank(db, ids, {"recommended_plan": "Unknown"})
+        ranked = profile_ranker.rerank(db, ids, {"recommended_plan": "BeStrong"})
+
+        # Assert
+        assert unchanged == ids
+        assert ranked[-1] == 9999
+        assert set(ranked[:2]) == {test_multiple_products[0].product_id, test_multiple_products[1].product_id}
+
+
 # ==================== PRUEBAS DE INTEGRACIÓN ====================
 
 class TestSearchAPIIntegration:
@@ -267,6 +502,81 @@ class TestSearchAPIIntegration:
         data = response.json()
         assert "items" in data
 
+    def test_search_sorted_endpoint(
+        self, client, db, test_multiple_products
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba de integración para búsqueda ordenada via API.
+        """
+        # Act
+        response = client.get("/api/v1/search/?sort=price_desc&limit=2")
+        invalid = client.get("/api/v1/search/?sort=popularity")
+
+        # Assert
+        assert response.status_code == 200
+        prices = [item["price"] for item in response.json()["items"]]
+        assert prices == [899.99, 599.99]
+        assert invalid.status_code == 422
+
+    def test_search_personalized_endpoint(
+        self, client, db, test_user, test_multiple_products
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba de integración que verifica que un usuario autenticado con perfil
+                     fitness recibe resultados ordenados por afinidad.
+        """
+        # Arrange
+        db.add(FitnessProfile(
+            user_id=test_user.user_id,
+            test_date=date.today(),
+            attributes={
+                "recommended_plan": "BeLean",
+                "goal_declared": "Lose Fat",
+                "activity_type": "Cardio",
+                "recommended_products": ["Proteína ligera", "Termogénicos", "Omega 3"],
+            }
+        ))
+        db.commit()
+        invalidate_profile(test_user.user_id)
+        anonymous = client.get("/api/v1/search/")
+        app.dependency_overrides[get_optional_user] = lambda: test_user
+
+        # Act
+        response = client.get("/api/v1/search/")
+
+        # Assert
+        assert response.status_code == 200
+        assert anonymous.json()["items"][0]["name"] == "Proteínas Test 1"
+        assert response.json()["items"][0]["name"] == "Pre-Workout Test 3"
+
+    def test_search_report_endpoint(
+        self, client, admin_client, db, test_multiple_products
+    ):
+        """
+        Autor: Luis Flores
+        Descripción: Prueba de integración para el reporte de búsquedas (top queries y
+                     queries sin resultados), accesible solo para administradores.
+        """
+        # Arrange
+        search_log_buffer.drain()
+        for query in ["proteinas", "Proteínas", "creatina", "colageno"]:
+            client.get(f"/api/v1/search/?query={query}")
+        search_log_buffer.flush(db)
+
+        # Act
+        response = admin_client.get("/api/v1/analytics/reports/search?days=7")
+
+        # Assert
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_searches"] == 4
+        assert data["zero_result_searches"] == 1
+        assert data["top_queries"][0]["query"] == "proteinas"
+        assert data["top_queries"][0]["searches"] == 2
+        assert [q["query"] for q in data["zero_result_queries"]] == ["colageno"]
+
     def test_get_filters_endpoint(
         self, client, db, test_multiple_products
     ):
@@ -232,6 +232,7 @@ export const API_ENDPOINTS = {
     
     // ============ PRODUCTOS ============
     PRODUCT_DETAIL: (productId) => `/api/v1/products/${productId}`,
+    PRODUCTS_BY_IDS: (productIds) => `/api/v1/products/?ids=${productIds.join(',')}`,
     PRODUCT_RELATED: (productId, limit = 6) => `/api/v1/products/${productId}/related?limit=${limit}`,
     PRODUCT_REVIEWS: (productId, page = 1, limit = 10) => `/api/v1/products/${productId}/reviews?page=${page}&limit=${limit}`,
     PRODUCT_CREATE_REVIEW: (productId) => `/api/v1/products/${productId}/reviews`,
@@ -605,6 +606,18 @@ export const getAvailableFilters = () => apiFetch(API_ENDPOINTS.SEARCH_FILTERS);
  */
 export const getProductDetail = (productId) => apiFetch(API_ENDPOINTS.PRODUCT_DETAIL(productId));
 
+/**
+ * Autor: Luis Flores
+ * Descripción: Obtiene varios productos en una sola petición (lista de deseos, vistos
+ *   recientemente, carruseles). Sustituye llamar a getProductDetail por cada producto.
+ * Endpoint: GET /api/v1/products/?ids=1,2,3
+ * Parámetros:
+ *   @param {number[]} productIds - IDs de producto (máximo 100)
+ * Retorna: Lista de productos con información de listado, en el orden solicitado
+ */
+export const getProductsByIds = (productIds) =>
+    apiFetch(API_ENDPOINTS.PRODUCTS_BY_IDS(productIds));
+
 /**
  * Autor: Diego Jasso
  * Descripción: Obtiene productos relacionados basados en categoría y objetivos fitness.
@@ -1163,7 +1176,9 @@ export const deleteProduct = (productId, hardDelete = false) => {
  * Parámetros:
  *   @param {object} bulkData - Datos de la operación en lote:
  *     - product_ids (array): Lista de IDs de productos
- *     - action (string): Acción a realizar ('activate', 'deactivate', 'delete')
+ *     - action (string): Acción a realizar ('activate', 'deactivate', 'delete', 'update')
+ *     - price (object, opcional): { mode: 'set' | 'percent', value }
+ *     - stock (object, opcional): { mode: 'set' | 'add' | 'percent', value }
  * Retorna: Resultado con cantidad de éxitos, fallos y lista de errores
  * **REQUIERE ROL: ADMIN** - Validado por dependencia require_admin
  */